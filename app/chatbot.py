@@ -1,491 +1,666 @@
-# app/chatbot.py
-import json
-import re
-import logging
-from typing import Tuple, Optional
-from thefuzz import fuzz
-from .llm_service import get_llm
-from .db_service import DBService
-from langchain.prompts import PromptTemplate
-from langchain_core.output_parsers import JsonOutputParser, StrOutputParser
-from langchain_core.documents import Document
-from langchain.schema import OutputParserException
-from requests.exceptions import RequestException, Timeout
-from google.api_core.exceptions import GoogleAPIError
-
-class WelfareChatbot:
-    def __init__(self, user_id, llm_choice="exaone", embedding_type="google"):
-        self.user_id = user_id
-        self.db_service = DBService(embedding_type=embedding_type)
-        self.llm = get_llm(llm_choice)
-        self.schema_context_str = None
-        self.service_names_list = []
-        self._prepare_chatbot_data()
-
-    def _prepare_chatbot_data(self):
-        context_data = self.db_service.get_schema_context() #"""DB의 구조(카테고리 계층)와 사업명 목록을 미리 준비합니다."""
-        self.schema_context_str = context_data.get('context_string', '') #  이제 'context_string'에 대분류-중분류 계층 정보가 모두 담겨 있습니다.
-        self.service_names_list = context_data.get('service_names', [])
-        print("DEBUG: LLM에 전달될 DB 카테고리 계층 및 사업명 컨텍스트가 준비되었습니다.")
-
-    def _create_chain(self, template, parser):
-        """PromptTemplate, LLM, OutputParser를 연결한 체인을 생성합니다."""
-        return PromptTemplate.from_template(template) | self.llm | parser
-
-    def chat(self, session_state):
-        """사용자 메시지를 받아 지능형 RAG 파이프라인을 실행하고 답변을 반환합니다."""
-        messages = session_state.get('messages', [])
-        user_message = messages[-1]['content'].strip()
-        chat_history = self._format_chat_history(messages)
-
-        try:
-            return self._get_intelligent_response(user_message, chat_history)
-        except GoogleAPIError as e:
-            logging.error(f"Google API 오류 발생: {e}")
-            return "Google AI 서비스에 일시적인 문제가 발생했습니다. 잠시 후 다시 시도해주세요.", "NORMAL"
-        except (RequestException, Timeout) as e:
-            logging.error(f"네트워크 연결 오류: {e}")
-            return "네트워크 연결에 문제가 있습니다. 인터넷 연결을 확인하고 다시 시도해주세요.", "NORMAL"
-        except OutputParserException as e:
-            logging.error(f"AI 응답 파싱 오류: {e}")
-            return "AI 응답을 처리하는 중 문제가 발생했습니다. 질문을 다시 입력해주세요.", "NORMAL"
-        except FileNotFoundError as e:
-            logging.error(f"데이터베이스 파일 누락: {e}")
-            return "복지 정보 데이터베이스에 접근할 수 없습니다. 관리자에게 문의해주세요.", "NORMAL"
-        except ValueError as e:
-            logging.error(f"입력 값 오류: {e}")
-            return "입력하신 내용을 이해할 수 없습니다. 다른 방식으로 질문해주세요.", "NORMAL"
-        except Exception as e:
-            logging.error(f"예상치 못한 오류 발생: {e}", exc_info=True)
-            return "죄송합니다, 답변을 생성하는 중 예상치 못한 오류가 발생했습니다. 잠시 후 다시 시도해주세요.", "NORMAL"
-
-    def _format_chat_history(self, messages):
-        """세션의 메시지 기록을 LLM 컨텍스트에 넣을 문자열로 변환합니다."""
-        if len(messages) <= 1:
-            return "이전 대화 기록이 없습니다."
-        history = []
-        for msg in messages[-6:-1]:
-            role = "사용자" if msg["role"] == "user" else "지니(AI)"
-            history.append(f"{role}: {msg['content']}")
-        return "\n".join(history)
-
-    def _detect_fast_track_keyword(self, user_message: str) -> str | None:
-        """
-        [역할 변경] 사용자 질문에서 특정 사업명을 '탐지'하여 그 이름을 반환합니다.
-        """
-        if not self.service_names_list: return None
-        
-        normalized_message = user_message.replace(" ", "")
-        
-        # 1단계: 정확성 우선 검사
-        for service_name in self.service_names_list:
-            if not service_name: continue
-            normalized_service_name = service_name.replace(" ", "")
-            
-            # ✅ [논리 오류 수정] '서비스명'이 '사용자 질문'에 포함되어 있는지 확인해야 합니다.
-            if normalized_service_name in normalized_message and len(normalized_service_name) > 2:
-                 print(f"DEBUG: 🚀 Fast Track 키워드 (정확성) 탐지! -> '{service_name}'")
-                 return service_name # 문서가 아닌 '사업명'을 반환
-        
-        # 2단계: 유사도 보조 검사
-        scores = {
-            name: fuzz.partial_ratio(normalized_message, name.replace(" ", "")) 
-            for name in self.service_names_list if name
-        }
-        if not scores: return None
-        
-        best_match = max(scores, key=scores.get)
-        if scores[best_match] >= 80: # 임계값은 조정 가능
-            print(f"DEBUG: 🚀 Fast Track 키워드 (유사도) 탐지! -> '{best_match}'")
-            return best_match # 문서가 아닌 '사업명'을 반환
-            
-        return None
-    
-    def _merge_and_deduplicate(self, docs1: list[Document], docs2: list[Document]) -> list[Document]:
-        """
-        [신규 추가] 두 문서 리스트를 병합하고 중복을 제거합니다.
-        """
-        merged_docs = {} # 순서 유지를 위해 딕셔너리 사용
-        
-        # 고유 키를 사용하여 문서를 딕셔너리에 추가
-        for doc in docs1 + docs2:
-            # 문서의 내용과 사업명을 조합하여 고유 키 생성
-            doc_key = (doc.page_content, doc.metadata.get('사업명'))
-            if doc_key not in merged_docs:
-                merged_docs[doc_key] = doc
-        
-        final_list = list(merged_docs.values())
-        print(f"DEBUG: 合併 및 중복 제거 완료. (리스트1: {len(docs1)}개, 리스트2: {len(docs2)}개 -> 최종: {len(final_list)}개)")
-        return final_list
-
-    def _generate_fallback_answer(self, user_message: str, documents: list):
-        """검색 결과가 없을 때, 전체 서비스 카테고리를 안내하는 폴백 답변을 생성합니다."""
-        print(f"DEBUG: 폴백 답변 생성을 위해 {len(documents)}개의 안내 문서를 컨텍스트로 사용합니다.")
-        
-        context_parts = []
-        for doc in documents:
-            try:
-                # page_content가 JSON 문자열이므로 파싱합니다.
-                content_data = json.loads(doc.page_content)
-                # 'categories' 키에 있는 정보를 추출합니다.
-                if 'categories' in content_data and content_data['categories']:
-                    # categories는 리스트 형태의 JSON 문자열일 수 있으므로 다시 파싱합니다.
-                    categories_list = json.loads(content_data['categories'])
-                    for category in categories_list:
-                        context_parts.append(f"- **{category.get('category')}**: {category.get('description')}")
-            except (json.JSONDecodeError, TypeError):
-                # JSON 파싱 실패 시 원본 텍스트를 사용합니다.
-                context_parts.append(doc.page_content)
-
-        context_string = "\n".join(context_parts)
-
-        fallback_template = """
-        당신은 사용자의 질문에 딱 맞는 정보를 찾지 못했을 때, 대신 어떤 종류의 복지 서비스가 있는지 친절하게 안내하는 AI 복지 컨설턴트 '지니'입니다.
-
-        [답변 생성 지침]
-        1.  "문의하신 내용에 꼭 맞는 서비스를 찾지 못했지만, 제가 도와드릴 수 있는 전체 복지 서비스 분야는 다음과 같습니다." 와 같이 먼저 상황을 설명하며 답변을 시작해주세요.
-        2.  주어진 '전체 서비스 분야 정보'를 바탕으로, 각 분야의 이름과 설명을 목록 형태로 명확하게 정리하여 보여주세요.
-        3.  사용자가 정보를 보고 다시 질문할 수 있도록 유도하는 문장으로 마무리해주세요.
-        4.  마지막 인사는 반드시 "더 궁금한 점이 있으시면 위 분야를 참고하여 다시 질문해주세요!" 로 끝내주세요.
-
-        --- 전체 서비스 분야 정보 ---
-        {context}
-
-        --- 사용자 질문 ---
-        {question}
-
-        --- 지니의 안내 답변 ---
-        """
-        fallback_chain = self._create_chain(fallback_template, StrOutputParser())
-        final_response = fallback_chain.invoke({
-            "question": user_message, "context": context_string
-        })
-        
-        return f'{final_response}', "NORMAL"
-
-    # app/chatbot.py
-
-# ... (다른 코드는 그대로 유지) ...
-
-    def _generate_search_plan(self, user_message: str, chat_history: str):
-        """LLM을 사용하여 사용자의 질문과 대화 기록을 분석하고, 검색 계획(키워드, 필터)을 생성합니다."""
-        print("DEBUG: 🕵️‍♂️ 1단계 - LLM을 활용한 검색 설계도 생성 시작...")
-        parser = JsonOutputParser()
-        
-        # [수정 완료] '대분류' 필터링 부분을 복원한 프롬프트
-        analysis_template = """
-    당신은 사용자의 질문을 깊이 있게 분석하여, 가장 중요한 순서대로 검색을 실행할 수 있는 '우선순위가 적용된 검색 계획'을 JSON 형식으로 만드는 최고의 검색 전략가입니다.
-
-    [임무]
-    사용자의 최신 질문('{question}')을 바탕으로, 아래 [단계별 사고 과정]에 따라 최적의 '검색 계획'을 작성해주세요.
-
-    [단계별 사고 과정]
-    1.  **핵심 필요(Core Needs)와 사용자 맥락(User Context) 식별:** 사용자의 상황에서 가장 시급한 필요(예: 의료비, 생계비)와 사용자의 배경(예: 청년, 실직)을 구분합니다.
-    2.  **대상과 질의사항 식별:** 사용자 질의에서 사용자의 대상(예: 미성년자, 임산부, 장애인, 중증질환자, 보훈대상자 등)을 식별하고 식별한 대상이 원하는 질의 사항을 구분합니다.
-    3.  **검색 우선순위 결정:** 식별된 필요 사항들의 시급성과 중요도를 판단하여 검색할 순서를 정합니다. 가장 생명과 직결되거나 시급한 문제를 최우선(priority 1)으로 설정합니다.
-    4.  **JSON 계획 생성:**
-        -   `intent`: 사용자의 대상과 사용자의 핵심 의도를 요약합니다.
-        -   `search_plan`: 2단계에서 결정한 우선순위에 따라 검색에 필요한 `keywords`와 `filters`를 묶어 리스트 형태로 만듭니다. 가장 중요한 검색 계획이 리스트의 첫 번째 요소가 되어야 합니다.
-
-    [✨✨✨ 핵심 수정 사항 시작 ✨✨✨]
-    [중요 규칙]
-    -   '중분류'를 선택할 때는 아래 '전체 중분류 목록 및 상세 설명'에 있는 내용을 보고 사용자 질문을 포함하고 있는 중분류_개요를 찾고 해당 중분류_개요가 해당하는 중분류의 이름과 '정확히 일치'하는 것만 골라야 합니다.
-    -   절대 새로운 이름을 만들거나 요약하거나 추론해서는 안 됩니다. 목록에 있는 그대로 사용하세요.
-    -   keywords를 추출할 때 사용자 질문의 맥락을 이해하고 질문에 없는 내용을 일부 정보를 가지고 상상으로 만들지 마세요. 예를 들멸 "15세 가출 여중생 임신 걱정" 이라는 내용으로 학생이라는 단어에서 '교육비'라는 keyword를 만들면 안됩니다. 질문에 있는 맥락을 이해하고 그 안에서 keyword를 추출하세요. 
-    [✨✨✨ 핵심 수정 사항 종료 ✨✨✨]
-
-
-    [전체 중분류 목록 및 상세 설명]
-    {schema_context}
-
-    [이전 대화 기록]
-    {chat_history}
-
-    [출력할 JSON 구조]
-    {{
-        "intent": "사용자의 핵심 의도를 2~3단어로 요약",
-        "search_plan": [
-            {{
-                "priority": 1,
-                "reason": "가장 시급한 문제(예: 중증질환 의료비)에 대한 검색",
-                "base_condition": 서비스 제공 대상 여부를 판단하는 사용자의 대상(예: 미성년자, 임산부, 장애인, 중증질환자, 보훈대상자 등),
-                "keywords": ["1순위 검색에 사용할 핵심 키워드 배열"],
-                "filters": {{ 
-                    "중분류": ["(예시) 치료가 어려운 질환을 앓고 있을 때"] 
-                }}
-            }},
-            {{
-                "priority": 2,
-                "reason": "그 다음으로 중요한 문제(예: 실직으로 인한 생계비)에 대한 검색",
-                "base_condition": 서비스 제공 대상 여부를 판단하는 사용자의 대상(예: 미성년자, 임산부, 장애인, 중증질환자, 보훈대상자 등),
-                "keywords": ["2순위 검색에 사용할 키워드 배열"],
-                "filters": {{ 
-                    "중분류": ["(예시) 생계를 유지하기가 힘들 때", "(예시) 실직으로 곤란을 겪고 있을 때"] 
-                }}
-            }}
-        ]
-    }}
-    
-    ---
-    [사용자 최신 질문]
-    {question}
-    ---
-    [검색 계획 (JSON)]
-"""
-
-        analysis_chain = self._create_chain(analysis_template, parser)
-        try:
-            analysis_result = analysis_chain.invoke({
-                "question": user_message, "schema_context": self.schema_context_str, "chat_history": chat_history
-            })
-            logging.debug(f"LLM 분석 결과 (검색 설계도):\n{json.dumps(analysis_result, ensure_ascii=False, indent=2)}")
-            return analysis_result
-        except GoogleAPIError as e:
-            logging.error(f"Google API 호출 실패 - 질의어 분석: {e}")
-            return {"intent": "API 오류", "semantic_keywords": [user_message], "metadata_filters": {}}
-        except OutputParserException as e:
-            logging.error(f"LLM 응답 파싱 실패 - 질의어 분석: {e}")
-            return {"intent": "파싱 오류", "semantic_keywords": [user_message], "metadata_filters": {}}
-        except Exception as e:
-            logging.error(f"질의어 분석 중 예상치 못한 오류: {e}")
-            return {"intent": "분석 실패", "semantic_keywords": [user_message], "metadata_filters": {}}
-
-    
-    def _get_intelligent_response(self, user_message, chat_history):
-        """
-        [최종 수정] '다단계 필터링' 로직을 적용한 최종 파이프라인
-        """
-        fast_track_docs = []
-        intelligent_docs = []
-        remaining_query = user_message.strip()
-
-        # [유지] 1. 순차적 Fast Track 루프 실행
-        while True:
-            if not remaining_query:
-                break
-                
-            detected_service_name = self._detect_fast_track_keyword(remaining_query)
-            
-            if detected_service_name:
-                print(f"DEBUG: 🕵️‍♂️ 순차적 Fast Track 실행... (탐지된 사업명: {detected_service_name})")
-                found_docs = self.db_service.metadata_search({"사업명": detected_service_name})
-                if found_docs:
-                    fast_track_docs.extend(found_docs)
-                
-                query_before_removal = remaining_query
-                pattern_text = detected_service_name.replace(" ", "")
-                pattern = r''.join(char + r'\s*' for char in pattern_text)
-                remaining_query = re.sub(pattern, '', remaining_query, count=1, flags=re.IGNORECASE).strip()
-
-                if query_before_removal == remaining_query:
-                    print(f"DEBUG: ⚠️ Fast Track으로 탐지된 '{detected_service_name}'가 원본 질문에 없어 제거에 실패했습니다. Fast Track을 중단합니다.")
-                    remaining_query = query_before_removal
-                    break
-            else:
-                break
-
-        # [전면 수정] 2. Fast Track 처리 후 남은 질문에 대한 지능형 검색 실행 (다단계 필터링)
-        if remaining_query:
-            print(f"DEBUG: 🚀 지능형 검색 실행 (남은 질문: '{remaining_query}')")
-            
-            # 2-1. [유지] 분석 - 우선순위가 포함된 검색 계획 생성
-            query_analysis = self._generate_search_plan(remaining_query, chat_history)
-            search_plan = query_analysis.get("search_plan", [])
-
-            # 2-2. [신규 로직] 계획에 따라 '다단계 필터링'을 순차적으로 실행하여 결과 누적
-            if search_plan:
-                print(f"DEBUG: 🕵️‍♂️ 총 {len(search_plan)}개의 우선순위 계획에 따라 순차 검색을 시작합니다.")
-                for i, plan in enumerate(search_plan):
-                    priority = plan.get('priority', i + 1)
-                    reason = plan.get('reason', 'N/A')
-                    base_conditions = plan.get('base_condition', [])
-                    keywords = plan.get('keywords', [])
-                    # 중분류는 리스트 형태이므로 여러 개일 수 있습니다.
-                    middle_categories = plan.get('filters', {}).get('중분류', [])
-                    
-                    if not middle_categories:
-                        print(f"DEBUG: [Priority {priority}] 필터링의 기준이 되는 '중분류'가 없어 건너뜁니다.")
-                        continue
-                    
-                    print(f"DEBUG: [Priority {priority} - {reason}] 필터링 실행...")
-                    
-                    # [신규] Step 1: '중분류'에 해당하는 모든 사업 문서를 DB에서 가져옵니다.
-                    # 각 중분류에 대해 metadata_search를 호출하여 문서를 가져옵니다.
-                    category_docs = []
-                    for category in middle_categories:
-                         category_docs.extend(self.db_service.metadata_search({"중분류": category}))
-                    
-                    if not category_docs:
-                        print(f"DEBUG: ➡️  '{middle_categories}' 중분류에 해당하는 문서가 없습니다.")
-                        continue
-                    
-                    print(f"DEBUG: ➡️  {len(category_docs)}개의 '{middle_categories}' 관련 문서를 찾았습니다. 필터링을 시작합니다.")
-
-                    # [신규] Step 2: 1차 필터링 - 'base_condition' (사용자 대상)
-                    # base_condition이 없으면 이 단계는 건너뛰고 모든 문서를 통과시킵니다.
-                    first_filtered_docs = []
-                    if base_conditions:
-                        for doc in category_docs:
-                            target_info = doc.metadata.get('대상', '').replace(" ", "")
-                            # base_condition 중 하나라도 '대상' 정보에 포함되면 통과
-                            if any(bc.replace(" ", "") in target_info for bc in base_conditions):
-                                first_filtered_docs.append(doc)
-                    else:
-                        first_filtered_docs = category_docs # 조건이 없으면 모두 통과
-                    
-                    print(f"DEBUG: ➡️  1차 필터링('base_condition') 후 {len(first_filtered_docs)}개 문서가 남았습니다.")
-                    if first_filtered_docs:
-                        intelligent_docs.extend(first_filtered_docs)
-
-                    
-            else:
-                print("DEBUG: ⚠️ LLM이 유효한 검색 계획을 생성하지 못했습니다.")
-       
-        # [유지] 3. 위기 상황 대비, '10장. 기타 위기별 상황별 지원' 사업을 추가로 검색
-        print("DEBUG: 🆘 위기 상황 대비, '10장. 기타 위기별 상황별 지원' 사업을 추가로 검색합니다.")
-        crisis_support_docs = self.db_service.metadata_search({
-            "대분류": "10장. 기타 위기별 상황별 지원"
-        })
-
-        # [수정] 4. 모든 검색 결과 병합 (단순 결합, 중복 제거 없음)
-        # _merge_and_deduplicate 함수를 사용하지 않고 리스트를 그대로 합칩니다.
-        final_docs = fast_track_docs + intelligent_docs + crisis_support_docs
-        print(f"DEBUG: 최종 문서 취합 완료. (FastTrack: {len(fast_track_docs)}개, 지능형: {len(intelligent_docs)}개, 위기지원: {len(crisis_support_docs)}개 -> 최종: {len(final_docs)}개)")
-        
-        # 수정 코드 (수정 후)
-        # 5. [수정] 최종 결과 유효성 확인 및 단계적 폴백 답변 생성
-        if not final_docs:
-            print("DEBUG: 🕵️‍♂️ 최종 검색 결과 없음. 단계적 폴백 로직 시작...")
-            
-            
-            fallback_docs = self.db_service.metadata_search({
-                "사업명": "책 안에 어떤 내용이 담겨 있나요?",
-                "항목": "sections"
-            })
-            if fallback_docs:
-                return self._generate_fallback_answer(user_message, fallback_docs)
-            else:
-                # 최종 안전장치
-                return "죄송합니다, 문의하신 내용과 관련된 복지서비스를 찾지 못했습니다. 조금 더 자세히 질문해주시겠어요?", "NORMAL"
-
-        return self._generate_final_answer(user_message, chat_history, final_docs)
-                   
-    def _format_content(self, data, indent_level=0):
-        if not data: return ""
-        text_parts = []
-        indent = "  " * indent_level
-        if isinstance(data, dict):
-            for key, value in data.items():
-                if value and isinstance(value, str) and value.strip():
-                    text_parts.append(f"{indent}- **{key}**: {value.strip()}")
-                elif isinstance(value, (dict, list)):
-                    formatted_sub_content = self._format_content(value, indent_level + 1)
-                    if formatted_sub_content:
-                         text_parts.append(f"{indent}- **{key}**:")
-                         text_parts.append(formatted_sub_content)
-        elif isinstance(data, list):
-            for item in data:
-                if item:
-                    formatted_item = self._format_content(item, indent_level)
-                    if formatted_item: text_parts.append(formatted_item)
-        else:
-            cleaned_data = str(data).strip()
-            if cleaned_data: text_parts.append(f"{indent}- {cleaned_data}")
-        return "\n".join(filter(None, text_parts))
-
-    def _generate_final_answer(self, user_message, chat_history, documents):
-        print(f"DEBUG: 최종 답변 생성을 위해 검색된 {len(documents)}개 문서를 컨텍스트로 사용합니다.")
-        
-        grouped_docs = {}
-        for doc in documents:
-            service_name = doc.metadata.get('사업명')
-            if not service_name or any(keyword in service_name for keyword in ["목차", "안내", "기준", "소개", "연락처"]):
-                continue
-            
-            if service_name not in grouped_docs:
-                grouped_docs[service_name] = {'contents': set()}
-            
-            content_parts = []
-            if doc.metadata.get('개요'): content_parts.append(f"**개요**: {doc.metadata['개요']}")
-            if doc.metadata.get('대상'): content_parts.append(f"**지원 대상**: {doc.metadata['대상']}")
-            if doc.metadata.get('내용'): content_parts.append(f"**지원 내용**: {doc.metadata['내용']}")
-            if '지원내용' in doc.metadata: content_parts.append(f"**지원 내용**: {doc.metadata['지원내용']}")
-            
-            try:
-                content_data = json.loads(doc.page_content)
-                formatted_page_content = self._format_content(content_data)
-                if formatted_page_content: content_parts.append(f"**세부 정보**:\n{formatted_page_content}")
-            except (json.JSONDecodeError, TypeError):
-                 if doc.page_content: content_parts.append(f"**내용**: {doc.page_content}")
-            
-            if doc.metadata.get('방법'): content_parts.append(f"**신청 방법**: {doc.metadata.get('방법')}")
-            if doc.metadata.get('문의'):
-                contact_info = self._format_content({'문의처': doc.metadata.get('문의')})
-                if contact_info: content_parts.append(contact_info)
-            
-            full_content_str = "\n".join(part for part in content_parts if part)
-            if full_content_str:
-                grouped_docs[service_name]['contents'].add(full_content_str)
-
-        context_list = []
-        for service_name, data in grouped_docs.items():
-            full_text = "\n\n".join(sorted(list(data['contents'])))
-            context_list.append(f"### 서비스명: {service_name}\n{full_text}\n")
-        
-        context_string = "\n---\n".join(context_list)
-
-        final_template = """
-### 페르소나 (Persona)
-당신은 대한민국 복지정책을 30년 이상 총괄해 온 베테랑 정책 담당자이자, AI 복지 전문가 '지니'입니다. 당신의 지식과 경험은 대한민국 최고 수준이며, 어떤 국민이 자신의 상황을 이야기하든 그 사람에게 최적의 복지 서비스 조합을 찾아 제안할 수 있습니다. 당신의 임무는 단순 정보 전달을 넘어, 한 사람의 삶에 실질적인 도움이 될 수 있는 최상의 해결책을 제시하는 것입니다.
-
-### 지니의 임무 및 답변 생성 원칙
-
-주어진 '[관련 서비스 정보]'와 '[사용자 질문]'을 바탕으로, 아래의 단계별 사고 과정을 거쳐 사용자에게 가장 도움이 되는 답변을 생성하세요.
-
-**[1단계: 질문 의도 및 유형 분석]**
-먼저 사용자 질문의 근본적인 의도와 유형을 파악합니다.
--   **상황 기반 해결책 요구**: 자신의 어려운 상황을 설명하며, 이에 맞는 전반적인 복지 서비스를 문의하는가?
--   **서비스 간 비교/차이 문의**: 두 가지 이상의 특정 서비스 간의 차이점을 묻는가?
--   **자격 조건 문의**: 특정 서비스를 받기 위한 구체적인 자격 조건을 묻는가?
--   **심화 질문**: 이전 대화에 이어, 더 구체적이거나 발전된 내용을 묻는가?
-
-**[2단계: 핵심 정보 추출 및 우선순위 결정]**
-사용자 질문에서 '상태 정보(Who/What)'와 '지원 필요 사항(Needs)'을 명확히 분리하여 추출합니다. 이 정보를 바탕으로 '[관련 서비스 정보]'에서 사용할 내용의 우선순위를 결정합니다.
--   **(예시) 질문**: "80대 노인입니다. 치료가 어려운 질환을 앓고 있어 병원비와 생계비 마련이 어려워요"
--   **(분석)**
-    -   `상태 정보`: 80대 노인, 치료가 어려운 질환
-    -   `지원 필요 사항`: 병원비, 생계비
--   **(우선순위 결정)**
-    1.  먼저 '지원 필요 사항'인 **'병원비'와 '생계비' 지원**에 대한 내용을 '[관련 서비스 정보]'에서 찾는다.
-    2.  찾아낸 서비스들의 지원 대상이 '상태 정보'인 **'80대 노인', '치료가 어려운 질환'**과 일치하는지, 혹은 관련이 있는지 교차 확인하여 답변에 사용할 핵심 정보를 최종 선별한다.
-
-**[3단계: 답변 초안 작성 및 구조화]**
-선별된 핵심 정보를 바탕으로, 아래 규칙에 따라 답변의 초안을 작성합니다.
--   **전문성과 신뢰의 톤**: "보건복지부의 '나에게 힘이되는 복지서비스'를 바탕으로 말씀드리겠습니다." 와 같이 전문가의 입장에서 신뢰를 주는 톤으로 시작합니다.
--   **정확한 사업명 제시**: 지원 받을 수 있는 사업명을 명확히 제시하고 해당 사업의 개요, 대상자 등을 알려 줍니다
--   **구조적 설명**: 사용자가 이해하기 쉽게 **어떤 혜택(What)**을, **누가(Who)**, **어떻게(How)** 받을 수 있는지 명확히 구조화하여 설명합니다.
--   **정보의 조합**: 필요한 경우, 여러 복지 서비스를 유기적으로 연결하여 사용자에게 최적화된 '서비스 조합'을 제안합니다.
-
-**[4단계: 자격 요건 명시 및 최종 검수]**
--   **엄격한 정보 선별**: '상태 정보'와 '지원 필요 사항'에 부합하지 않는 정보는 답변에서 과감히 제외합니다.
--   **자격 요건 명시 및 안내**: 만약 주어진 정보만으로 사용자가 지원 대상인지 명확히 판단할 수 없다면, **"이 서비스를 이용하시려면 [서비스 제공 대상]에 해당하셔야 합니다."** 와 같이 검색된 서비스의 공식적인 지원 대상을 명확히 알려주고, 본인이 여기에 해당하는지 확인해야 한다고 안내합니다.
--   **마무리**: "안내해 드린 내용이 보탬이 되길 바랍니다. 추가로 궁금한 점이 있으시면 언제든지 다시 찾아주십시오." 와 같이 전문가로서 격려하며 마무리합니다.
--   **정보 부족 시**: 만약 적절한 정보가 전혀 없다면, "안타깝게도 문의하신 내용과 정확히 일치하는 서비스 정보를 찾지 못했습니다. 하지만 다른 방법이 있을 수 있으니, 거주지 주민센터나 보건복지상담센터(국번없이 129)에 문의해보시는 것을 권해드립니다."라고 대안을 제시하며 솔직하게 답변합니다.
-
----
-[관련 서비스 정보]
-{context}
----
-[사용자 질문]
-{question}
----
-[30년 경력 복지 전문가 지니의 최종 답변]
-"""
-        final_chain = self._create_chain(final_template, StrOutputParser())
-        final_response = final_chain.invoke({
-            "question": user_message, "context": context_string, "chat_history": chat_history
-        })
-        
-        return f'{final_response}', "NORMAL"
-    
+# app/chatbot.py
+import json
+import re
+import logging
+from typing import List, Tuple, Optional
+from .llm_service import get_llm
+from .db_service import DBService
+from .fast_track import detect_fast_track_keyword
+from .faq import DEFAULT_LEXICAL_THRESHOLD, DEFAULT_SEMANTIC_THRESHOLD
+from .conversation import TRIMMED_TURNS_KEY, ConversationContext, classify_followup
+from .history import DEFAULT_HISTORY_TOKEN_BUDGET, compact_history
+from .tokens import estimate_tokens, fit_sections, prompt_budgets, truncate_head_to_tokens, truncate_to_tokens
+from .merge import MergedResults
+from .fallback import FALLBACK_ITEM, FALLBACK_SERVICE_NAME, fallback_context
+from .telemetry import REGISTRY, span
+from .logging_utils import LazyJson, log_dump
+from langchain_core.prompts import PromptTemplate
+from langchain_core.output_parsers import JsonOutputParser, StrOutputParser
+from langchain_core.documents import Document
+from langchain_core.exceptions import OutputParserException
+from requests.exceptions import RequestException, Timeout
+
+
+def _google_api_error():
+    """
+    GoogleAPIError 클래스를 반환합니다. (google.api_core는 Gemini를 쓸 때만 필요하므로 예외 처리 시점에 임포트)
+    패키지가 없으면 어떤 예외와도 일치하지 않는 빈 튜플을 반환합니다.
+    """
+    try:
+        from google.api_core.exceptions import GoogleAPIError
+        return GoogleAPIError
+    except ImportError:
+        return ()
+
+class WelfareChatbot:
+    def __init__(self, user_id, llm_choice="exaone", embedding_type="google", index_reload_interval=0,
+                 shard_cache_size=4, faq_threshold=DEFAULT_LEXICAL_THRESHOLD,
+                 faq_semantic_threshold=DEFAULT_SEMANTIC_THRESHOLD, directory_enabled=True, eligibility_enabled=True,
+                 personalized_fallback=False, history_token_budget=DEFAULT_HISTORY_TOKEN_BUDGET,
+                 prompt_token_budgets=None):
+        self.user_id = user_id
+        # index_reload_interval > 0이면 새 인덱스가 배포될 때 재시작 없이 교체됩니다.
+        # shard_cache_size: 메모리에 유지할 대분류 샤드 수 (0이면 무제한)
+        self.db_service = DBService(embedding_type=embedding_type, reload_interval=index_reload_interval,
+                                    shard_cache_size=shard_cache_size)
+        self.llm = get_llm(llm_choice)
+        # 자주하는 질문 직접 답변 임계값 (faq_threshold가 None이면 사용하지 않음)
+        self.faq_threshold = faq_threshold
+        self.faq_semantic_threshold = faq_semantic_threshold
+        # 연락처 질문은 메타데이터의 연락처 색인에서 표로 답합니다.
+        self.directory_enabled = directory_enabled
+        # 질문의 가구원 수·소득·나이·장애 여부로 자격 조건에 명백히 맞지 않는 문서를 답변 생성 전에 뺍니다.
+        self.eligibility_enabled = eligibility_enabled
+        # 검색 결과가 없을 때 기본은 미리 렌더링한 안내 답변, True이면 질문에 맞춰 LLM이 안내 답변을 작성합니다.
+        self.personalized_fallback = personalized_fallback
+        # 프롬프트에 넣는 대화 기록의 토큰 예산 (마크업 제거 + 이전 턴 추출 요약)
+        self.history_token_budget = history_token_budget
+        # 단계별(planning, generation, fallback_generation) 프롬프트 토큰 예산. 넘으면 낮은 우선순위 내용부터 줄입니다.
+        self.prompt_token_budgets = prompt_budgets(prompt_token_budgets)
+        # 메트릭 라벨로 사용할 실제 LLM 백엔드 이름 (예: gemini-2.0-flash, gemma3:latest)
+        self.llm_backend = getattr(self.llm, 'model', None) or llm_choice
+
+    def _prepare_chatbot_data(self) -> Tuple[str, List[str]]:
+        """
+        DB의 구조(대분류-중분류 계층) 컨텍스트와 사업명 목록을 이번 요청이 고정한 스냅샷에서 가져옵니다.
+        챗봇 인스턴스는 모든 세션이 공유하므로 인스턴스 속성에 저장하지 않고 요청 안에서만 넘겨 씁니다.
+        """
+        context_data = self.db_service.get_schema_context()
+        return context_data.get('context_string', ''), context_data.get('service_names', [])
+
+    def _create_chain(self, template, parser):
+        """PromptTemplate, LLM, OutputParser를 연결한 체인을 생성합니다."""
+        return PromptTemplate.from_template(template) | self.llm | parser
+
+    def _invoke_chain(self, chain, template: str, inputs: dict, s):
+        """
+        체인을 실행하고 토큰 수를 span에 기록합니다.
+        공급자가 사용량 메타데이터를 주지 않으면(로컬 모델 등) 프롬프트/응답 길이로 추정한 값을 기록합니다.
+        템플릿에 없는 입력(예: 생성 단계의 chat_history)은 프롬프트에 들어가지 않으므로 넘기지도 세지도 않습니다.
+        """
+        variables = PromptTemplate.from_template(template).input_variables
+        inputs = {name: value for name, value in inputs.items() if name in variables}
+        prompt_tokens = estimate_tokens(template) + sum(estimate_tokens(str(value)) for value in inputs.values())
+        s.set(prompt_tokens_estimated=prompt_tokens)
+        result = chain.invoke(inputs, config={"callbacks": s.callbacks()})
+        if s.attributes.get("prompt_tokens"):
+            s.set(token_source="provider")
+        else:
+            output = result if isinstance(result, str) else json.dumps(result, ensure_ascii=False, default=str)
+            s.add_tokens(prompt_tokens, estimate_tokens(output))
+            s.set(token_source="estimate")
+        return result
+
+    def _allowance(self, stage: str, template: str, *fixed: str) -> Optional[int]:
+        """단계 예산에서 템플릿과 고정 입력을 뺀, 줄일 수 있는 입력에 남은 토큰 수 (예산이 없으면 None)"""
+        budget = self.prompt_token_budgets.get(stage)
+        if budget is None:
+            return None
+        return max(budget - estimate_tokens(template) - sum(estimate_tokens(text or "") for text in fixed), 0)
+
+    def _record_trim(self, stage: str, part: str, before: int, after: int):
+        REGISTRY.inc("rag_prompt_trims_total", stage=stage, part=part)
+        logging.debug("✂️ %s 프롬프트 예산 초과: %s %d → %d 토큰", stage, part, before, after)
+
+    def chat(self, session_state):
+        """사용자 메시지를 받아 지능형 RAG 파이프라인을 실행하고 답변을 반환합니다."""
+        messages = session_state.get('messages', [])
+        user_message = messages[-1]['content'].strip()
+        chat_history = self._format_chat_history(messages, session_state)
+        # 직전 턴의 검색 결과(청크 키, 사업명, 검색 계획)는 세션에 저장되어 후속 질문에서 재사용됩니다.
+        turn = sum(1 for msg in messages if msg.get("role") == "user") + session_state.get(TRIMMED_TURNS_KEY, 0)
+        context = ConversationContext.from_session(session_state)
+
+        try:
+            # 처리 도중 인덱스가 교체되어도 이 요청은 시작 시점의 스냅샷으로 끝까지 처리합니다.
+            with self.db_service.pin(), span("chat", llm_backend=self.llm_backend):
+                response = self._get_intelligent_response(user_message, chat_history, context, turn)
+            # 검색 결과로 답하지 않은 턴(FAQ, 연락처, 폴백)은 이어받을 상태가 없습니다.
+            if context.turn != turn:
+                context.clear(turn)
+            context.save(session_state)
+            return response
+        except _google_api_error() as e:
+            logging.error(f"Google API 오류 발생: {e}")
+            return "Google AI 서비스에 일시적인 문제가 발생했습니다. 잠시 후 다시 시도해주세요.", "NORMAL"
+        except (RequestException, Timeout) as e:
+            logging.error(f"네트워크 연결 오류: {e}")
+            return "네트워크 연결에 문제가 있습니다. 인터넷 연결을 확인하고 다시 시도해주세요.", "NORMAL"
+        except OutputParserException as e:
+            logging.error(f"AI 응답 파싱 오류: {e}")
+            return "AI 응답을 처리하는 중 문제가 발생했습니다. 질문을 다시 입력해주세요.", "NORMAL"
+        except FileNotFoundError as e:
+            logging.error(f"데이터베이스 파일 누락: {e}")
+            return "복지 정보 데이터베이스에 접근할 수 없습니다. 관리자에게 문의해주세요.", "NORMAL"
+        except ValueError as e:
+            logging.error(f"입력 값 오류: {e}")
+            return "입력하신 내용을 이해할 수 없습니다. 다른 방식으로 질문해주세요.", "NORMAL"
+        except Exception as e:
+            logging.error(f"예상치 못한 오류 발생: {e}", exc_info=True)
+            return "죄송합니다, 답변을 생성하는 중 예상치 못한 오류가 발생했습니다. 잠시 후 다시 시도해주세요.", "NORMAL"
+
+    def _format_chat_history(self, messages, session_state=None):
+        """
+        세션의 메시지 기록을 LLM 컨텍스트에 넣을 문자열로 변환합니다.
+        HTML/마크다운을 지우고, 직전 턴은 원문으로, 그 이전 턴은 세션에 캐시된 요약으로 넣어 토큰 예산을 지킵니다.
+        """
+        with span("history_compaction", messages=len(messages)) as s:
+            history = compact_history(messages, session_state, self.history_token_budget)
+            s.set(tokens=estimate_tokens(history))
+        return history
+
+    def _answer_from_faq(self, user_message: str) -> Optional[Tuple[str, str]]:
+        """
+        질문이 코퍼스의 '자주하는 질문'과 일치하면 큐레이션된 답변을 출처와 함께 반환합니다. (LLM 호출 없음)
+        일치하지 않으면 None을 반환하고 일반 파이프라인으로 진행합니다.
+        """
+        if self.faq_threshold is None:
+            return None
+        match = self.db_service.match_faq(user_message, self.faq_threshold, self.faq_semantic_threshold)
+        if match is None:
+            REGISTRY.inc("rag_faq_requests_total", result="miss")
+            return None
+        REGISTRY.inc("rag_faq_requests_total", result="hit", method=match.method)
+        logging.debug(
+            "📌 FAQ 직접 답변 (%s, 어휘 %.2f, 의미 %s): %s",
+            match.method, match.lexical_score, match.semantic_score, match.question,
+        )
+        return match.format_answer(), "NORMAL"
+
+    def _answer_from_directory(self, user_message: str) -> Optional[Tuple[str, str]]:
+        """
+        연락처·기관 질문이면 연락처 색인에서 찾은 항목을 표로 반환합니다. (LLM 호출 없음)
+        연락처 질문이 아니거나 대상을 특정할 수 없으면 None을 반환하고 일반 파이프라인으로 진행합니다.
+        """
+        if not self.directory_enabled:
+            return None
+        result = self.db_service.lookup_contacts(user_message)
+        if result is None:
+            return None
+        REGISTRY.inc("rag_directory_requests_total", result="hit")
+        logging.debug("📇 연락처 디렉토리 답변: 지역 %s, 검색어 %s, %d개 항목", result.regions, result.terms, len(result.entries))
+        return result.render(), "NORMAL"
+
+    def _answer_from_context(self, user_message: str, chat_history: str, context: ConversationContext, turn: int,
+                             service_names: List[str]) -> Optional[Tuple[str, str]]:
+        """
+        직전 턴과 같은 서비스에 대한 후속 질문이면 저장된 청크로 바로 답변을 생성합니다. (검색 계획 LLM 호출과 검색 생략)
+        새 질문이면 None을 반환하고 일반 파이프라인으로 진행합니다.
+        """
+        if not context:
+            return None
+        with span("followup_match", candidates=len(context.doc_ids)) as s:
+            followup = classify_followup(user_message, context, turn, self.db_service.index_version,
+                                         self._detect_fast_track_keyword(user_message, service_names))
+            docs = self.db_service.get_documents(context.doc_ids) if followup else []
+            if followup and followup.services:
+                docs = [doc for doc in docs if doc.metadata.get('사업명') in followup.services]
+            # 직전 턴 문서를 재사용하면 검색 계획·검색 단계를 건너뛰므로 캐시 적중으로 집계합니다.
+            s.set(documents=len(docs), cache_hit=bool(docs))
+        if not docs:
+            REGISTRY.inc("rag_followup_requests_total", result="new")
+            return None
+        REGISTRY.inc("rag_followup_requests_total", result="reused", reason=followup.reason)
+        logging.debug("🔁 후속 질문(%s): 직전 턴 문서 %d개 재사용 (사업명: %s)", followup.reason, len(docs),
+                      followup.services or context.services)
+        # 다음 턴에서도 같은 서비스 목록으로 이어갈 수 있도록 저장된 상태를 유지합니다.
+        context.turn = turn
+        return self._generate_final_answer(user_message, chat_history, docs)
+
+    def _prune_ineligible(self, user_message: str, *doc_lists: list[Document]) -> list[list[Document]]:
+        """
+        질문에서 뽑은 가구원 수·소득·나이·장애 여부가 문서의 자격 규칙(기준 중위소득 %, 선정기준액, 나이 범위)을
+        명백히 위반하면 해당 문서를 제외합니다. 목록별로 걸러 순서를 유지합니다.
+        """
+        results, pruned = [], {}
+        for docs in doc_lists:
+            result = self.db_service.filter_eligible(user_message, docs)
+            results.append(result.kept)
+            for reason, count in result.pruned.items():
+                pruned[reason] = pruned.get(reason, 0) + count
+        for reason, count in pruned.items():
+            REGISTRY.inc("rag_eligibility_pruned_total", count, reason=reason)
+        if pruned:
+            logging.debug("⚖️ 자격 규칙으로 %d개 문서 제외 (%s, 사실: %s)",
+                          sum(pruned.values()), pruned, LazyJson(result.facts.as_dict(), indent=None))
+        return results
+
+    def _detect_fast_track_keyword(self, user_message: str, service_names: List[str]) -> str | None:
+        """
+        [역할 변경] 사용자 질문에서 특정 사업명을 '탐지'하여 그 이름을 반환합니다.
+        """
+        return detect_fast_track_keyword(user_message, service_names)
+    
+    def _prune_merged(self, user_message: str, merged: MergedResults):
+        """병합된 결과에 자격 규칙을 적용합니다. (사용자가 직접 언급한 Fast Track 사업은 모든 청크를 유지)"""
+        mentioned = {doc.metadata.get('사업명') for doc in merged.documents if merged.found_by(doc, "fast_track")}
+        exempt = [doc for doc in merged.documents if doc.metadata.get('사업명') in mentioned]
+        candidates = [doc for doc in merged.documents if doc.metadata.get('사업명') not in mentioned]
+        kept = self._prune_ineligible(user_message, candidates)[0]
+        if len(kept) < len(candidates):
+            merged.retain(exempt + kept)
+
+    def _generate_fallback_answer(self, user_message: str, documents: list):
+        """검색 결과가 없을 때, 전체 서비스 카테고리를 안내하는 폴백 답변을 생성합니다."""
+        logging.debug("폴백 답변 생성을 위해 %d개의 안내 문서를 컨텍스트로 사용합니다.", len(documents))
+        
+        # 메타데이터의 'categories'에서 분야명/설명/대표 사업을 뽑습니다. (읽을 수 없으면 원본 텍스트 사용)
+        context_string = fallback_context(documents)
+
+        fallback_template = """
+        당신은 사용자의 질문에 딱 맞는 정보를 찾지 못했을 때, 대신 어떤 종류의 복지 서비스가 있는지 친절하게 안내하는 AI 복지 컨설턴트 '지니'입니다.
+
+        [답변 생성 지침]
+        1.  "문의하신 내용에 꼭 맞는 서비스를 찾지 못했지만, 제가 도와드릴 수 있는 전체 복지 서비스 분야는 다음과 같습니다." 와 같이 먼저 상황을 설명하며 답변을 시작해주세요.
+        2.  주어진 '전체 서비스 분야 정보'를 바탕으로, 각 분야의 이름과 설명을 목록 형태로 명확하게 정리하여 보여주세요.
+        3.  사용자가 정보를 보고 다시 질문할 수 있도록 유도하는 문장으로 마무리해주세요.
+        4.  마지막 인사는 반드시 "더 궁금한 점이 있으시면 위 분야를 참고하여 다시 질문해주세요!" 로 끝내주세요.
+
+        --- 전체 서비스 분야 정보 ---
+        {context}
+
+        --- 사용자 질문 ---
+        {question}
+
+        --- 지니의 안내 답변 ---
+        """
+        allowance = self._allowance("fallback_generation", fallback_template, user_message)
+        if allowance is not None and estimate_tokens(context_string) > allowance:
+            trimmed = truncate_to_tokens(context_string, allowance)
+            self._record_trim("fallback_generation", "context", estimate_tokens(context_string), estimate_tokens(trimmed))
+            context_string = trimmed
+
+        fallback_chain = self._create_chain(fallback_template, StrOutputParser())
+        with span("fallback_generation", llm_backend=self.llm_backend, documents=len(documents)) as s:
+            final_response = self._invoke_chain(fallback_chain, fallback_template, {
+                "question": user_message, "context": context_string
+            }, s)
+        
+        return f'{final_response}', "NORMAL"
+
+    # app/chatbot.py
+
+# ... (다른 코드는 그대로 유지) ...
+
+    def _generate_search_plan(self, user_message: str, chat_history: str, schema_context: str):
+        """LLM을 사용하여 사용자의 질문과 대화 기록을 분석하고, 검색 계획(키워드, 필터)을 생성합니다."""
+        logging.debug("🕵️‍♂️ 1단계 - LLM을 활용한 검색 설계도 생성 시작...")
+        parser = JsonOutputParser()
+        
+        # [수정 완료] '대분류' 필터링 부분을 복원한 프롬프트
+        analysis_template = """
+    당신은 사용자의 질문을 깊이 있게 분석하여, 가장 중요한 순서대로 검색을 실행할 수 있는 '우선순위가 적용된 검색 계획'을 JSON 형식으로 만드는 최고의 검색 전략가입니다.
+
+    [임무]
+    사용자의 최신 질문('{question}')을 바탕으로, 아래 [단계별 사고 과정]에 따라 최적의 '검색 계획'을 작성해주세요.
+
+    [단계별 사고 과정]
+    1.  **핵심 필요(Core Needs)와 사용자 맥락(User Context) 식별:** 사용자의 상황에서 가장 시급한 필요(예: 의료비, 생계비)와 사용자의 배경(예: 청년, 실직)을 구분합니다.
+    2.  **대상과 질의사항 식별:** 사용자 질의에서 사용자의 대상(예: 미성년자, 임산부, 장애인, 중증질환자, 보훈대상자 등)을 식별하고 식별한 대상이 원하는 질의 사항을 구분합니다.
+    3.  **검색 우선순위 결정:** 식별된 필요 사항들의 시급성과 중요도를 판단하여 검색할 순서를 정합니다. 가장 생명과 직결되거나 시급한 문제를 최우선(priority 1)으로 설정합니다.
+    4.  **JSON 계획 생성:**
+        -   `intent`: 사용자의 대상과 사용자의 핵심 의도를 요약합니다.
+        -   `search_plan`: 2단계에서 결정한 우선순위에 따라 검색에 필요한 `keywords`와 `filters`를 묶어 리스트 형태로 만듭니다. 가장 중요한 검색 계획이 리스트의 첫 번째 요소가 되어야 합니다.
+
+    [✨✨✨ 핵심 수정 사항 시작 ✨✨✨]
+    [중요 규칙]
+    -   '중분류'를 선택할 때는 아래 '전체 중분류 목록 및 상세 설명'에 있는 내용을 보고 사용자 질문을 포함하고 있는 중분류_개요를 찾고 해당 중분류_개요가 해당하는 중분류의 이름과 '정확히 일치'하는 것만 골라야 합니다.
+    -   절대 새로운 이름을 만들거나 요약하거나 추론해서는 안 됩니다. 목록에 있는 그대로 사용하세요.
+    -   keywords를 추출할 때 사용자 질문의 맥락을 이해하고 질문에 없는 내용을 일부 정보를 가지고 상상으로 만들지 마세요. 예를 들멸 "15세 가출 여중생 임신 걱정" 이라는 내용으로 학생이라는 단어에서 '교육비'라는 keyword를 만들면 안됩니다. 질문에 있는 맥락을 이해하고 그 안에서 keyword를 추출하세요. 
+    [✨✨✨ 핵심 수정 사항 종료 ✨✨✨]
+
+
+    [전체 중분류 목록 및 상세 설명]
+    {schema_context}
+
+    [이전 대화 기록]
+    {chat_history}
+
+    [출력할 JSON 구조]
+    {{
+        "intent": "사용자의 핵심 의도를 2~3단어로 요약",
+        "search_plan": [
+            {{
+                "priority": 1,
+                "reason": "가장 시급한 문제(예: 중증질환 의료비)에 대한 검색",
+                "base_condition": 서비스 제공 대상 여부를 판단하는 사용자의 대상(예: 미성년자, 임산부, 장애인, 중증질환자, 보훈대상자 등),
+                "keywords": ["1순위 검색에 사용할 핵심 키워드 배열"],
+                "filters": {{ 
+                    "중분류": ["(예시) 치료가 어려운 질환을 앓고 있을 때"] 
+                }}
+            }},
+            {{
+                "priority": 2,
+                "reason": "그 다음으로 중요한 문제(예: 실직으로 인한 생계비)에 대한 검색",
+                "base_condition": 서비스 제공 대상 여부를 판단하는 사용자의 대상(예: 미성년자, 임산부, 장애인, 중증질환자, 보훈대상자 등),
+                "keywords": ["2순위 검색에 사용할 키워드 배열"],
+                "filters": {{ 
+                    "중분류": ["(예시) 생계를 유지하기가 힘들 때", "(예시) 실직으로 곤란을 겪고 있을 때"] 
+                }}
+            }}
+        ]
+    }}
+    
+    ---
+    [사용자 최신 질문]
+    {question}
+    ---
+    [검색 계획 (JSON)]
+"""
+
+        # 예산을 넘으면 중분류 목록(계획에 필수)은 두고 오래된 대화 기록부터 줄입니다.
+        allowance = self._allowance("planning", analysis_template, user_message, schema_context)
+        if allowance is not None and estimate_tokens(chat_history) > allowance:
+            trimmed = truncate_head_to_tokens(chat_history, allowance)
+            self._record_trim("planning", "chat_history", estimate_tokens(chat_history), estimate_tokens(trimmed))
+            chat_history = trimmed
+
+        analysis_chain = self._create_chain(analysis_template, parser)
+        try:
+            with span("planning", llm_backend=self.llm_backend) as s:
+                analysis_result = self._invoke_chain(analysis_chain, analysis_template, {
+                    "question": user_message, "schema_context": schema_context, "chat_history": chat_history
+                }, s)
+                s.set(plan_steps=len(analysis_result.get("search_plan", [])) if isinstance(analysis_result, dict) else 0)
+            log_dump("plan", "LLM 분석 결과 (검색 설계도):\n%s", LazyJson(analysis_result))
+            return analysis_result
+        except _google_api_error() as e:
+            logging.error(f"Google API 호출 실패 - 질의어 분석: {e}")
+            return {"intent": "API 오류", "semantic_keywords": [user_message], "metadata_filters": {}}
+        except OutputParserException as e:
+            logging.error(f"LLM 응답 파싱 실패 - 질의어 분석: {e}")
+            return {"intent": "파싱 오류", "semantic_keywords": [user_message], "metadata_filters": {}}
+        except Exception as e:
+            logging.error(f"질의어 분석 중 예상치 못한 오류: {e}")
+            return {"intent": "분석 실패", "semantic_keywords": [user_message], "metadata_filters": {}}
+
+    
+    def _get_intelligent_response(self, user_message, chat_history, context: Optional[ConversationContext] = None, turn: int = 0):
+        """
+        [최종 수정] '다단계 필터링' 로직을 적용한 최종 파이프라인
+        context가 주어지면 직전 턴의 검색 결과를 후속 질문에 재사용하고, 이번 턴의 검색 결과를 기록합니다.
+        """
+        # 0. 자주하는 질문과 일치하면 검색 계획/답변 생성 없이 바로 답합니다.
+        faq_answer = self._answer_from_faq(user_message)
+        if faq_answer is not None:
+            return faq_answer
+        # 0-1. 연락처·기관 질문은 연락처 색인에서 표로 답합니다. (전화번호를 LLM이 생성하지 않도록)
+        directory_answer = self._answer_from_directory(user_message)
+        if directory_answer is not None:
+            return directory_answer
+        schema_context, service_names = self._prepare_chatbot_data()
+        # 0-2. 직전 턴의 서비스에 대한 후속 질문이면 검색 계획/검색 없이 저장된 문서로 답합니다.
+        if context is not None:
+            followup_answer = self._answer_from_context(user_message, chat_history, context, turn, service_names)
+            if followup_answer is not None:
+                return followup_answer
+
+        # 단계별 결과를 청크 번호로 바로 병합합니다. (같은 청크는 한 번만, 찾은 단계·우선순위는 출처로 기록)
+        merged = MergedResults()
+        search_plan = []
+        remaining_query = user_message.strip()
+
+        # [유지] 1. 순차적 Fast Track 루프 실행
+        with span("fast_track") as s:
+            detected_count = 0
+            while True:
+                if not remaining_query:
+                    break
+                    
+                detected_service_name = self._detect_fast_track_keyword(remaining_query, service_names)
+                
+                if detected_service_name:
+                    detected_count += 1
+                    logging.debug("🕵️‍♂️ 순차적 Fast Track 실행... (탐지된 사업명: %s)", detected_service_name)
+                    merged.add("fast_track", self.db_service.metadata_search({"사업명": detected_service_name}))
+                    
+                    query_before_removal = remaining_query
+                    pattern_text = detected_service_name.replace(" ", "")
+                    pattern = r''.join(char + r'\s*' for char in pattern_text)
+                    remaining_query = re.sub(pattern, '', remaining_query, count=1, flags=re.IGNORECASE).strip()
+
+                    if query_before_removal == remaining_query:
+                        logging.debug("⚠️ Fast Track으로 탐지된 '%s'가 원본 질문에 없어 제거에 실패했습니다. Fast Track을 중단합니다.", detected_service_name)
+                        remaining_query = query_before_removal
+                        break
+                else:
+                    break
+            s.set(matches=detected_count, documents=len(merged))
+
+        # [전면 수정] 2. Fast Track 처리 후 남은 질문에 대한 지능형 검색 실행 (다단계 필터링)
+        if remaining_query:
+            logging.debug("🚀 지능형 검색 실행 (남은 질문: '%s')", remaining_query)
+            
+            # 2-1. [유지] 분석 - 우선순위가 포함된 검색 계획 생성
+            query_analysis = self._generate_search_plan(remaining_query, chat_history, schema_context)
+            search_plan = query_analysis.get("search_plan", [])
+
+            # 2-2. [신규 로직] 계획에 따라 '다단계 필터링'을 순차적으로 실행하여 결과 누적
+            if search_plan:
+                logging.debug("🕵️‍♂️ 총 %d개의 우선순위 계획에 따라 순차 검색을 시작합니다.", len(search_plan))
+                with span("retrieval", plan_steps=len(search_plan)) as s:
+                    for i, plan in enumerate(search_plan):
+                        priority = plan.get('priority', i + 1)
+                        reason = plan.get('reason', 'N/A')
+                        base_conditions = plan.get('base_condition', [])
+                        keywords = plan.get('keywords', [])
+                        # 중분류는 리스트 형태이므로 여러 개일 수 있습니다.
+                        middle_categories = plan.get('filters', {}).get('중분류', [])
+                        
+                        if not middle_categories:
+                            logging.debug("[Priority %s] 필터링의 기준이 되는 '중분류'가 없어 건너뜁니다.", priority)
+                            continue
+                        
+                        logging.debug("[Priority %s - %s] 필터링 실행...", priority, reason)
+                        
+                        # [신규] Step 1: '중분류'에 해당하는 모든 사업 문서를 DB에서 가져옵니다.
+                        # 각 중분류에 대해 metadata_search를 호출하여 문서를 가져옵니다.
+                        category_docs = []
+                        for category in middle_categories:
+                             category_docs.extend(self.db_service.metadata_search({"중분류": category}))
+                        
+                        if not category_docs:
+                            logging.debug("➡️  '%s' 중분류에 해당하는 문서가 없습니다.", middle_categories)
+                            continue
+                        
+                        logging.debug("➡️  %d개의 '%s' 관련 문서를 찾았습니다. 필터링을 시작합니다.", len(category_docs), middle_categories)
+
+                        # [신규] Step 2: 1차 필터링 - 'base_condition' (사용자 대상)
+                        # base_condition이 없으면 이 단계는 건너뛰고 모든 문서를 통과시킵니다.
+                        first_filtered_docs = []
+                        if base_conditions:
+                            for doc in category_docs:
+                                target_info = doc.metadata.get('대상', '').replace(" ", "")
+                                # base_condition 중 하나라도 '대상' 정보에 포함되면 통과
+                                if any(bc.replace(" ", "") in target_info for bc in base_conditions):
+                                    first_filtered_docs.append(doc)
+                        else:
+                            first_filtered_docs = category_docs # 조건이 없으면 모두 통과
+                        
+                        logging.debug("➡️  1차 필터링('base_condition') 후 %d개 문서가 남았습니다.", len(first_filtered_docs))
+                        if first_filtered_docs:
+                            merged.add("intelligent", first_filtered_docs, priority)
+                    s.set(documents=merged.stage_counts().get("intelligent", 0))
+
+                    
+            else:
+                logging.debug("⚠️ LLM이 유효한 검색 계획을 생성하지 못했습니다.")
+       
+        # [유지] 3. 위기 상황 대비, '10장. 기타 위기별 상황별 지원' 사업을 추가로 검색
+        logging.debug("🆘 위기 상황 대비, '10장. 기타 위기별 상황별 지원' 사업을 추가로 검색합니다.")
+        with span("crisis_search") as s:
+            crisis_support_docs = self.db_service.metadata_search({
+                "대분류": "10장. 기타 위기별 상황별 지원"
+            })
+            merged.add("crisis", crisis_support_docs)
+            s.set(documents=len(crisis_support_docs))
+
+        # 3-1. 자격 규칙으로 수치상 대상이 아닌 문서를 제외 (사용자가 직접 언급한 Fast Track 사업은 유지)
+        if self.eligibility_enabled:
+            self._prune_merged(user_message, merged)
+
+        # 4. 모든 검색 결과 취합 (단계 간·우선순위 간 중복 청크는 병합 시 이미 제거됨)
+        final_docs = merged.documents
+        REGISTRY.inc("rag_merge_duplicates_total", merged.duplicates)
+        logging.debug("최종 문서 취합 완료. (단계별: %s, 중복 제거: %d개 -> 최종: %d개)",
+                      merged.stage_counts(), merged.duplicates, len(final_docs))
+        
+        # 수정 코드 (수정 후)
+        # 5. [수정] 최종 결과 유효성 확인 및 단계적 폴백 답변 생성
+        if not final_docs:
+            logging.debug("🕵️‍♂️ 최종 검색 결과 없음. 단계적 폴백 로직 시작...")
+            
+            
+            # 인덱스 로드 시 렌더링해 둔 안내 답변을 그대로 반환합니다. (LLM 호출 없음)
+            if not self.personalized_fallback:
+                static_answer = self.db_service.get_fallback_answer()
+                if static_answer:
+                    REGISTRY.inc("rag_fallback_answers_total", mode="static")
+                    return static_answer, "NORMAL"
+
+            fallback_docs = self.db_service.metadata_search({
+                "사업명": FALLBACK_SERVICE_NAME,
+                "항목": FALLBACK_ITEM
+            })
+            if fallback_docs:
+                REGISTRY.inc("rag_fallback_answers_total", mode="llm")
+                return self._generate_fallback_answer(user_message, fallback_docs)
+            else:
+                # 최종 안전장치
+                return "죄송합니다, 문의하신 내용과 관련된 복지서비스를 찾지 못했습니다. 조금 더 자세히 질문해주시겠어요?", "NORMAL"
+
+        if context is not None:
+            context.remember(turn, self.db_service.index_version, final_docs, search_plan)
+        return self._generate_final_answer(user_message, chat_history, final_docs)
+                   
+    def _format_content(self, data, indent_level=0):
+        if not data: return ""
+        text_parts = []
+        indent = "  " * indent_level
+        if isinstance(data, dict):
+            for key, value in data.items():
+                if value and isinstance(value, str) and value.strip():
+                    text_parts.append(f"{indent}- **{key}**: {value.strip()}")
+                elif isinstance(value, (dict, list)):
+                    formatted_sub_content = self._format_content(value, indent_level + 1)
+                    if formatted_sub_content:
+                         text_parts.append(f"{indent}- **{key}**:")
+                         text_parts.append(formatted_sub_content)
+        elif isinstance(data, list):
+            for item in data:
+                if item:
+                    formatted_item = self._format_content(item, indent_level)
+                    if formatted_item: text_parts.append(formatted_item)
+        else:
+            cleaned_data = str(data).strip()
+            if cleaned_data: text_parts.append(f"{indent}- {cleaned_data}")
+        return "\n".join(filter(None, text_parts))
+
+    def _generate_final_answer(self, user_message, chat_history, documents):
+        logging.debug("최종 답변 생성을 위해 검색된 %d개 문서를 컨텍스트로 사용합니다.", len(documents))
+        
+        grouped_docs = {}
+        for doc in documents:
+            service_name = doc.metadata.get('사업명')
+            if not service_name or any(keyword in service_name for keyword in ["목차", "안내", "기준", "소개", "연락처"]):
+                continue
+            
+            if service_name not in grouped_docs:
+                grouped_docs[service_name] = {'contents': set()}
+            
+            content_parts = []
+            if doc.metadata.get('개요'): content_parts.append(f"**개요**: {doc.metadata['개요']}")
+            if doc.metadata.get('대상'): content_parts.append(f"**지원 대상**: {doc.metadata['대상']}")
+            if doc.metadata.get('내용'): content_parts.append(f"**지원 내용**: {doc.metadata['내용']}")
+            if '지원내용' in doc.metadata: content_parts.append(f"**지원 내용**: {doc.metadata['지원내용']}")
+            
+            try:
+                content_data = json.loads(doc.page_content)
+                formatted_page_content = self._format_content(content_data)
+                if formatted_page_content: content_parts.append(f"**세부 정보**:\n{formatted_page_content}")
+            except (json.JSONDecodeError, TypeError):
+                 if doc.page_content: content_parts.append(f"**내용**: {doc.page_content}")
+            
+            if doc.metadata.get('방법'): content_parts.append(f"**신청 방법**: {doc.metadata.get('방법')}")
+            if doc.metadata.get('문의'):
+                contact_info = self._format_content({'문의처': doc.metadata.get('문의')})
+                if contact_info: content_parts.append(contact_info)
+            
+            full_content_str = "\n".join(part for part in content_parts if part)
+            if full_content_str:
+                grouped_docs[service_name]['contents'].add(full_content_str)
+
+        context_list = []
+        for service_name, data in grouped_docs.items():
+            full_text = "\n\n".join(sorted(list(data['contents'])))
+            context_list.append(f"### 서비스명: {service_name}\n{full_text}\n")
+        
+        context_separator = "\n---\n"
+        context_string = context_separator.join(context_list)
+
+        final_template = """
+### 페르소나 (Persona)
+당신은 대한민국 복지정책을 30년 이상 총괄해 온 베테랑 정책 담당자이자, AI 복지 전문가 '지니'입니다. 당신의 지식과 경험은 대한민국 최고 수준이며, 어떤 국민이 자신의 상황을 이야기하든 그 사람에게 최적의 복지 서비스 조합을 찾아 제안할 수 있습니다. 당신의 임무는 단순 정보 전달을 넘어, 한 사람의 삶에 실질적인 도움이 될 수 있는 최상의 해결책을 제시하는 것입니다.
+
+### 지니의 임무 및 답변 생성 원칙
+
+주어진 '[관련 서비스 정보]'와 '[사용자 질문]'을 바탕으로, 아래의 단계별 사고 과정을 거쳐 사용자에게 가장 도움이 되는 답변을 생성하세요.
+
+**[1단계: 질문 의도 및 유형 분석]**
+먼저 사용자 질문의 근본적인 의도와 유형을 파악합니다.
+-   **상황 기반 해결책 요구**: 자신의 어려운 상황을 설명하며, 이에 맞는 전반적인 복지 서비스를 문의하는가?
+-   **서비스 간 비교/차이 문의**: 두 가지 이상의 특정 서비스 간의 차이점을 묻는가?
+-   **자격 조건 문의**: 특정 서비스를 받기 위한 구체적인 자격 조건을 묻는가?
+-   **심화 질문**: 이전 대화에 이어, 더 구체적이거나 발전된 내용을 묻는가?
+
+**[2단계: 핵심 정보 추출 및 우선순위 결정]**
+사용자 질문에서 '상태 정보(Who/What)'와 '지원 필요 사항(Needs)'을 명확히 분리하여 추출합니다. 이 정보를 바탕으로 '[관련 서비스 정보]'에서 사용할 내용의 우선순위를 결정합니다.
+-   **(예시) 질문**: "80대 노인입니다. 치료가 어려운 질환을 앓고 있어 병원비와 생계비 마련이 어려워요"
+-   **(분석)**
+    -   `상태 정보`: 80대 노인, 치료가 어려운 질환
+    -   `지원 필요 사항`: 병원비, 생계비
+-   **(우선순위 결정)**
+    1.  먼저 '지원 필요 사항'인 **'병원비'와 '생계비' 지원**에 대한 내용을 '[관련 서비스 정보]'에서 찾는다.
+    2.  찾아낸 서비스들의 지원 대상이 '상태 정보'인 **'80대 노인', '치료가 어려운 질환'**과 일치하는지, 혹은 관련이 있는지 교차 확인하여 답변에 사용할 핵심 정보를 최종 선별한다.
+
+**[3단계: 답변 초안 작성 및 구조화]**
+선별된 핵심 정보를 바탕으로, 아래 규칙에 따라 답변의 초안을 작성합니다.
+-   **전문성과 신뢰의 톤**: "보건복지부의 '나에게 힘이되는 복지서비스'를 바탕으로 말씀드리겠습니다." 와 같이 전문가의 입장에서 신뢰를 주는 톤으로 시작합니다.
+-   **정확한 사업명 제시**: 지원 받을 수 있는 사업명을 명확히 제시하고 해당 사업의 개요, 대상자 등을 알려 줍니다
+-   **구조적 설명**: 사용자가 이해하기 쉽게 **어떤 혜택(What)**을, **누가(Who)**, **어떻게(How)** 받을 수 있는지 명확히 구조화하여 설명합니다.
+-   **정보의 조합**: 필요한 경우, 여러 복지 서비스를 유기적으로 연결하여 사용자에게 최적화된 '서비스 조합'을 제안합니다.
+
+**[4단계: 자격 요건 명시 및 최종 검수]**
+-   **엄격한 정보 선별**: '상태 정보'와 '지원 필요 사항'에 부합하지 않는 정보는 답변에서 과감히 제외합니다.
+-   **자격 요건 명시 및 안내**: 만약 주어진 정보만으로 사용자가 지원 대상인지 명확히 판단할 수 없다면, **"이 서비스를 이용하시려면 [서비스 제공 대상]에 해당하셔야 합니다."** 와 같이 검색된 서비스의 공식적인 지원 대상을 명확히 알려주고, 본인이 여기에 해당하는지 확인해야 한다고 안내합니다.
+-   **마무리**: "안내해 드린 내용이 보탬이 되길 바랍니다. 추가로 궁금한 점이 있으시면 언제든지 다시 찾아주십시오." 와 같이 전문가로서 격려하며 마무리합니다.
+-   **정보 부족 시**: 만약 적절한 정보가 전혀 없다면, "안타깝게도 문의하신 내용과 정확히 일치하는 서비스 정보를 찾지 못했습니다. 하지만 다른 방법이 있을 수 있으니, 거주지 주민센터나 보건복지상담센터(국번없이 129)에 문의해보시는 것을 권해드립니다."라고 대안을 제시하며 솔직하게 답변합니다.
+
+---
+[관련 서비스 정보]
+{context}
+---
+[사용자 질문]
+{question}
+---
+[30년 경력 복지 전문가 지니의 최종 답변]
+"""
+        # 예산을 넘으면 검색 우선순위가 낮은(목록 뒤쪽) 서비스부터 컨텍스트에서 뺍니다.
+        allowance = self._allowance("generation", final_template, user_message)
+        dropped = 0
+        if allowance is not None and estimate_tokens(context_string) > allowance:
+            before = estimate_tokens(context_string)
+            context_list, dropped = fit_sections(context_list, allowance, context_separator)
+            context_string = context_separator.join(context_list)
+            self._record_trim("generation", "context", before, estimate_tokens(context_string))
+
+        final_chain = self._create_chain(final_template, StrOutputParser())
+        with span("generation", llm_backend=self.llm_backend, documents=len(documents), services=len(grouped_docs)) as s:
+            s.set(services_dropped=dropped)
+            final_response = self._invoke_chain(final_chain, final_template, {
+                "question": user_message, "context": context_string
+            }, s)
+        
+        return f'{final_response}', "NORMAL"
+    
     
\ No newline at end of file
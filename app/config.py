@@ -1,65 +1,194 @@
-"""
-Configuration management and validation for Welfare Chatbot
-"""
-import os
-import logging
-from dataclasses import dataclass
-from pathlib import Path
-from typing import Optional
-from dotenv import load_dotenv
-
-# Load environment variables
-load_dotenv()
-
-@dataclass
-class Config:
-    """Application configuration with validation"""
-    google_api_key: str
-    max_retries: int = 3
-    timeout: int = 30
-    log_level: str = "INFO"
-    faiss_path: Optional[str] = None
-
-    def __post_init__(self):
-        """Validate configuration after initialization"""
-        self.validate()
-
-    def validate(self):
-        """Validate all configuration values"""
-        if not self.google_api_key or self.google_api_key == "your-google-api-key-here":
-            raise ValueError(
-                "GOOGLE_API_KEY is not set or is using placeholder value. "
-                "Please set a valid Google API key in the .env file."
-            )
-
-        if self.max_retries < 0:
-            raise ValueError("max_retries must be non-negative")
-
-        if self.timeout <= 0:
-            raise ValueError("timeout must be positive")
-
-        if self.log_level not in ["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"]:
-            raise ValueError(f"Invalid log_level: {self.log_level}")
-
-        logging.info("Configuration validation passed")
-
-def get_config() -> Config:
-    """Get validated configuration instance"""
-    return Config(
-        google_api_key=os.getenv("GOOGLE_API_KEY", ""),
-        max_retries=int(os.getenv("MAX_RETRIES", "3")),
-        timeout=int(os.getenv("TIMEOUT", "30")),
-        log_level=os.getenv("LOG_LEVEL", "INFO"),
-        faiss_path=os.getenv("FAISS_PATH")
-    )
-
-def setup_logging(config: Config):
-    """Setup logging configuration"""
-    logging.basicConfig(
-        level=getattr(logging, config.log_level),
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.FileHandler('welfare_chatbot.log'),
-            logging.StreamHandler()
-        ]
-    )
\ No newline at end of file
+"""
+Configuration management and validation for Welfare Chatbot
+"""
+import os
+import queue
+import atexit
+import logging
+import logging.handlers
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Optional
+from dotenv import load_dotenv
+from .logging_utils import DeferredFormatQueueHandler, configure_dump_sampling, parse_sample_rates
+from .health_check import parse_budgets
+
+# Load environment variables
+load_dotenv()
+
+@dataclass
+class Config:
+    """Application configuration with validation"""
+    google_api_key: str
+    max_retries: int = 3
+    timeout: int = 30
+    log_level: str = "INFO"
+    faiss_path: Optional[str] = None
+    embedding_type: str = "google"
+    index_reload_interval: float = 60
+    shard_cache_size: int = 4
+    faq_enabled: bool = True
+    faq_threshold: float = 0.8
+    faq_semantic_threshold: float = 0.9
+    directory_enabled: bool = True
+    eligibility_enabled: bool = True
+    personalized_fallback: bool = False
+    history_token_budget: int = 600
+    prompt_token_budgets: Dict[str, float] = field(default_factory=dict)
+    readiness_budgets: Dict[str, float] = field(default_factory=dict)
+    session_db_path: str = "./db/sessions.sqlite3"
+    session_cache_size: int = 64
+    session_max_conversations: int = 20
+    session_max_messages: int = 100
+    session_max_bytes: int = 1_000_000
+    session_max_age_days: float = 30
+    readiness_llm_check: bool = False
+    metrics_port: Optional[int] = None
+    otel_enabled: bool = False
+    log_file: str = "welfare_chatbot.log"
+    log_max_bytes: int = 10 * 1024 * 1024
+    log_backup_count: int = 5
+    log_rotate_when: Optional[str] = None
+    log_dump_sample_rate: float = 0.1
+    log_dump_sample_rates: Dict[str, float] = field(default_factory=dict)
+
+    def __post_init__(self):
+        """Validate configuration after initialization"""
+        self.validate()
+
+    def validate(self):
+        """Validate all configuration values"""
+        if not self.google_api_key or self.google_api_key == "your-google-api-key-here":
+            raise ValueError(
+                "GOOGLE_API_KEY is not set or is using placeholder value. "
+                "Please set a valid Google API key in the .env file."
+            )
+
+        if self.max_retries < 0:
+            raise ValueError("max_retries must be non-negative")
+
+        if self.timeout <= 0:
+            raise ValueError("timeout must be positive")
+
+        if self.log_level not in ["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"]:
+            raise ValueError(f"Invalid log_level: {self.log_level}")
+
+        if self.log_max_bytes < 0 or self.log_backup_count < 0:
+            raise ValueError("log_max_bytes and log_backup_count must be non-negative")
+
+        if not 0.0 <= self.log_dump_sample_rate <= 1.0:
+            raise ValueError("log_dump_sample_rate must be between 0 and 1")
+
+        if self.embedding_type not in ["google", "bge", "ollama"]:
+            raise ValueError(f"Invalid embedding_type: {self.embedding_type}")
+
+        if self.index_reload_interval < 0:
+            raise ValueError("index_reload_interval must be non-negative")
+
+        if self.shard_cache_size < 0:
+            raise ValueError("shard_cache_size must be non-negative")
+
+        if not (0.0 < self.faq_threshold <= 1.0 and 0.0 < self.faq_semantic_threshold <= 1.0):
+            raise ValueError("faq_threshold and faq_semantic_threshold must be in (0, 1]")
+
+        if self.history_token_budget <= 0:
+            raise ValueError("history_token_budget must be positive")
+
+        if any(budget < 0 for budget in self.prompt_token_budgets.values()):
+            raise ValueError("prompt token budgets must be non-negative")
+
+        if any(budget < 0 for budget in self.readiness_budgets.values()):
+            raise ValueError("readiness budgets must be non-negative")
+
+        if self.session_cache_size <= 0:
+            raise ValueError("session_cache_size must be positive")
+
+        if min(self.session_max_conversations, self.session_max_messages, self.session_max_bytes, self.session_max_age_days) < 0:
+            raise ValueError("session limits must be non-negative")
+
+        if self.metrics_port is not None and not (0 < self.metrics_port < 65536):
+            raise ValueError(f"Invalid metrics_port: {self.metrics_port}")
+
+        logging.info("Configuration validation passed")
+
+def get_config() -> Config:
+    """Get validated configuration instance"""
+    return Config(
+        google_api_key=os.getenv("GOOGLE_API_KEY", ""),
+        max_retries=int(os.getenv("MAX_RETRIES", "3")),
+        timeout=int(os.getenv("TIMEOUT", "30")),
+        log_level=os.getenv("LOG_LEVEL", "INFO"),
+        faiss_path=os.getenv("FAISS_PATH"),
+        embedding_type=os.getenv("EMBEDDING_TYPE", "google").lower(),
+        index_reload_interval=float(os.getenv("INDEX_RELOAD_INTERVAL", "60")),
+        shard_cache_size=int(os.getenv("SHARD_CACHE_SIZE", "4")),
+        faq_enabled=os.getenv("FAQ_ENABLED", "true").lower() in ("1", "true", "yes"),
+        faq_threshold=float(os.getenv("FAQ_THRESHOLD", "0.8")),
+        faq_semantic_threshold=float(os.getenv("FAQ_SEMANTIC_THRESHOLD", "0.9")),
+        directory_enabled=os.getenv("DIRECTORY_ENABLED", "true").lower() in ("1", "true", "yes"),
+        eligibility_enabled=os.getenv("ELIGIBILITY_ENABLED", "true").lower() in ("1", "true", "yes"),
+        personalized_fallback=os.getenv("PERSONALIZED_FALLBACK", "false").lower() in ("1", "true", "yes"),
+        history_token_budget=int(os.getenv("HISTORY_TOKEN_BUDGET", "600")),
+        prompt_token_budgets=parse_budgets(os.getenv("PROMPT_TOKEN_BUDGETS", "")),
+        readiness_budgets=parse_budgets(os.getenv("READINESS_BUDGETS", "")),
+        session_db_path=os.getenv("SESSION_DB_PATH", "./db/sessions.sqlite3"),
+        session_cache_size=int(os.getenv("SESSION_CACHE_SIZE", "64")),
+        session_max_conversations=int(os.getenv("SESSION_MAX_CONVERSATIONS", "20")),
+        session_max_messages=int(os.getenv("SESSION_MAX_MESSAGES", "100")),
+        session_max_bytes=int(os.getenv("SESSION_MAX_BYTES", "1000000")),
+        session_max_age_days=float(os.getenv("SESSION_MAX_AGE_DAYS", "30")),
+        readiness_llm_check=os.getenv("READINESS_LLM_CHECK", "false").lower() in ("1", "true", "yes"),
+        metrics_port=int(os.getenv("METRICS_PORT")) if os.getenv("METRICS_PORT") else None,
+        otel_enabled=os.getenv("OTEL_ENABLED", "false").lower() in ("1", "true", "yes"),
+        log_file=os.getenv("LOG_FILE", "welfare_chatbot.log"),
+        log_max_bytes=int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024))),
+        log_backup_count=int(os.getenv("LOG_BACKUP_COUNT", "5")),
+        log_rotate_when=os.getenv("LOG_ROTATE_WHEN") or None,
+        log_dump_sample_rate=float(os.getenv("LOG_DUMP_SAMPLE_RATE", "0.1")),
+        log_dump_sample_rates=parse_sample_rates(os.getenv("LOG_DUMP_SAMPLE_RATES", ""))
+    )
+
+_log_listener: Optional[logging.handlers.QueueListener] = None
+
+def setup_logging(config: Config):
+    """
+    Setup non-blocking logging.
+
+    The root logger only gets a QueueHandler; formatting and file/console I/O
+    happen on a QueueListener thread. The log file rotates by size, or by time
+    when LOG_ROTATE_WHEN (e.g. 'midnight') is set. Safe to call on every
+    Streamlit rerun: the pipeline is installed once per process.
+    """
+    global _log_listener
+    configure_dump_sampling(config.log_dump_sample_rate, config.log_dump_sample_rates)
+
+    root = logging.getLogger()
+    root.setLevel(getattr(logging, config.log_level))
+    if _log_listener is not None:
+        return
+
+    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    if config.log_rotate_when:
+        file_handler = logging.handlers.TimedRotatingFileHandler(
+            config.log_file, when=config.log_rotate_when,
+            backupCount=config.log_backup_count, encoding='utf-8'
+        )
+    else:
+        file_handler = logging.handlers.RotatingFileHandler(
+            config.log_file, maxBytes=config.log_max_bytes,
+            backupCount=config.log_backup_count, encoding='utf-8'
+        )
+    stream_handler = logging.StreamHandler()
+    for handler in (file_handler, stream_handler):
+        handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    _log_listener = logging.handlers.QueueListener(
+        log_queue, file_handler, stream_handler, respect_handler_level=True
+    )
+    _log_listener.start()
+    atexit.register(_log_listener.stop)
+
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(DeferredFormatQueueHandler(log_queue))
@@ -0,0 +1,133 @@
+# app/conversation.py
+"""
+멀티턴 대화의 검색 상태 이어받기.
+
+직전 턴에서 답변에 사용한 청크 키(chunk_id), 사업명, 검색 계획을 세션에 저장해 두고,
+"그 서비스 신청 방법은?" 같은 후속 질문이면 검색 계획(LLM)과 메타데이터 검색을 건너뛰고
+저장된 문서로 바로 답변을 생성합니다.
+
+후속 질문 판정은 LLM 없이 규칙으로 합니다.
+- 질문에 직전 턴의 사업명이 나오면 → 해당 사업으로 좁혀서 이어받기
+- 지시어('그 서비스', '거기', '방금' …)가 있으면 → 이어받기
+- 세부 항목('신청 방법', '서류', '금액' …)만 묻고 다른 주제어가 없는 질문 → 이어받기
+- 직전 턴에 없던 사업명이 탐지되면 → 새 질문 (전체 파이프라인)
+"""
+import re
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Iterable, List, Optional
+
+if TYPE_CHECKING:
+    # streamlit_app이 첫 화면 전에 세션 키를 임포트하므로 LangChain은 타입 검사에서만 임포트합니다.
+    from langchain_core.documents import Document
+
+# 세션 상태(st.session_state)에 저장하는 키
+SESSION_KEY = "retrieval_context"
+# 메시지 수 상한으로 현재 대화에서 잘라낸 사용자 질문 수 (턴 번호가 줄지 않도록 더함)
+TRIMMED_TURNS_KEY = "trimmed_turns"
+
+# 이전 답변을 가리키는 표현
+REFERENCE_TERMS = ("그 서비스", "그서비스", "그 사업", "그사업", "그 제도", "그제도", "이 서비스", "이서비스", "해당 서비스",
+                   "해당 사업", "위 서비스", "위의", "그거", "그것", "그건", "그게", "이거", "거기", "그곳", "그 중", "그중",
+                   "방금", "아까", "앞에서", "위에서", "말씀하신", "알려주신", "말한", "추천해준", "추천하신")
+# 세부 항목을 묻는 표현 (다른 주제어가 없을 때만 후속 질문으로 봅니다)
+ASPECT_TERMS = ("신청", "방법", "서류", "절차", "대상", "자격", "조건", "금액", "얼마", "기간", "언제", "어디", "문의",
+                "연락처", "전화", "혜택", "내용", "중복", "같이", "받을 수", "지원금")
+# 세부 항목 외에 새 주제가 있는지 볼 때 함께 지우는 말 (남는 글자가 SHORT_LEFTOVER_CHARS 이하면 세부 항목만 묻는 질문)
+FILLER_TERMS = ("어떻게", "어떤", "무엇", "뭐예요", "뭐에요", "뭔가요", "뭐야", "뭐", "필요한", "필요해요", "필요", "하나요",
+                "되나요", "돼요", "인가요", "있나요", "있어요", "알려주세요", "알려줘", "알려", "해요", "해야", "하면", "주세요",
+                "그럼", "그러면", "그리고", "또", "좀", "는", "은", "이", "가", "을", "를", "도", "요", "에", "서")
+SHORT_LEFTOVER_CHARS = 2
+
+_SPACE = re.compile(r"\s+")
+_PUNCTUATION = re.compile(r"[\W_]+")
+
+
+def _compact(text: str) -> str:
+    return _SPACE.sub("", str(text or ""))
+
+
+@dataclass
+class ConversationContext:
+    """직전 턴의 검색 결과. 세션 상태에는 JSON으로 옮길 수 있는 dict로 저장합니다."""
+    turn: int = 0
+    index_version: Optional[int] = None
+    doc_ids: List[str] = field(default_factory=list)
+    services: List[str] = field(default_factory=list)
+    plan: List[dict] = field(default_factory=list)
+
+    def __bool__(self) -> bool:
+        return bool(self.doc_ids)
+
+    @classmethod
+    def from_session(cls, session_state) -> "ConversationContext":
+        stored = session_state.get(SESSION_KEY) if session_state is not None else None
+        if not isinstance(stored, dict):
+            return cls()
+        return cls(
+            turn=int(stored.get("turn", 0)),
+            index_version=stored.get("index_version"),
+            doc_ids=list(stored.get("doc_ids", [])),
+            services=list(stored.get("services", [])),
+            plan=list(stored.get("plan", [])),
+        )
+
+    def save(self, session_state) -> None:
+        session_state[SESSION_KEY] = {
+            "turn": self.turn, "index_version": self.index_version, "doc_ids": self.doc_ids,
+            "services": self.services, "plan": self.plan,
+        }
+
+    def remember(self, turn: int, index_version: Optional[int], documents: Iterable["Document"], plan: Optional[list] = None) -> None:
+        """이번 턴에 답변에 사용한 문서를 기억합니다. (chunk_id가 없는 문서는 이어받을 수 없으므로 제외)"""
+        doc_ids, services = [], []
+        for doc in documents:
+            chunk_id = doc.metadata.get('chunk_id')
+            if chunk_id and chunk_id not in doc_ids:
+                doc_ids.append(chunk_id)
+            service = doc.metadata.get('사업명')
+            if service and service not in services:
+                services.append(service)
+        self.turn, self.index_version = turn, index_version
+        self.doc_ids, self.services, self.plan = doc_ids, services, list(plan or [])
+
+    def clear(self, turn: int) -> None:
+        self.turn, self.index_version = turn, None
+        self.doc_ids, self.services, self.plan = [], [], []
+
+
+@dataclass(frozen=True)
+class FollowUp:
+    """후속 질문 판정 결과. services가 비어 있으면 직전 턴 문서 전체를 사용합니다."""
+    reason: str  # "service" | "reference" | "aspect"
+    services: List[str]
+
+
+def classify_followup(
+    question: str,
+    context: ConversationContext,
+    turn: int,
+    index_version: Optional[int],
+    detected_service: Optional[str] = None,
+) -> Optional[FollowUp]:
+    """직전 턴의 검색 결과를 그대로 쓸 수 있는 후속 질문이면 FollowUp, 새로 검색해야 하면 None"""
+    if not context or context.turn != turn - 1 or context.index_version != index_version:
+        return None
+    if detected_service and detected_service not in context.services:
+        return None
+
+    compact = _compact(question)
+    mentioned = [service for service in context.services if _compact(service) in compact]
+    if mentioned:
+        return FollowUp("service", mentioned)
+    if any(_compact(term) in compact for term in REFERENCE_TERMS):
+        return FollowUp("reference", [])
+    if any(_compact(term) in compact for term in ASPECT_TERMS) and len(_leftover(compact)) <= SHORT_LEFTOVER_CHARS:
+        return FollowUp("aspect", [])
+    return None
+
+
+def _leftover(compact: str) -> str:
+    """세부 항목·군더더기 말·문장부호를 지우고 남은 글자 ('주거 지원 대상은?' → '주거지원')"""
+    for term in sorted(ASPECT_TERMS + FILLER_TERMS, key=len, reverse=True):
+        compact = compact.replace(_compact(term), "")
+    return _PUNCTUATION.sub("", compact)
@@ -0,0 +1,328 @@
+# app/corpus.py
+"""
+복지 코퍼스(vd_base_v2_refined.json) 읽기 유틸리티.
+
+- iter_corpus(): 코퍼스 항목을 하나씩 스트리밍합니다.
+  JSON 옆에 변환된 컬럼 형식 파일(.arrow)이 있고 JSON보다 최신이면 그 파일을 메모리 맵으로 읽습니다.
+- iter_chunks(): 각 항목에 안정적인 청크 키('<metadata.id>#<순번>')를 붙여 반환합니다.
+  metadata.id는 페이지/섹션 단위 값이라 여러 청크가 공유하므로, 같은 id 안에서의 등장 순번을 덧붙입니다.
+- convert_corpus(): JSON 코퍼스를 Arrow IPC(Feather v2) 컬럼 형식으로 변환합니다.
+- create_enriched_content() / item_to_document(): 인덱스 구축용 Document 변환.
+
+컬럼 형식 파일은 'key', 'text' 컬럼과 메타데이터 필드별 'metadata.<필드>' 컬럼으로 구성됩니다.
+필요한 컬럼만 읽을 수 있고(fields 인자), 압축 없이 저장하므로 메모리 맵으로 복사 없이 접근합니다.
+메타데이터는 원본과 똑같이 복원되어야 하므로(조금이라도 달라지면 청크 내용 해시가 바뀌어 재임베딩됨)
+값의 타입이 섞인 필드는 JSON 문자열로 저장하고, 명시적인 null 값은 행별 'null_fields' 컬럼에 필드명을 기록합니다.
+"""
+import os
+import json
+import logging
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from langchain_core.documents import Document
+
+DATA_PATH = Path(__file__).parent.parent / "data" / "vd_base_v2_refined.json"
+
+COLUMNAR_SUFFIX = ".arrow"
+COLUMNAR_FORMAT = "1"
+METADATA_PREFIX = "metadata."
+
+_READ_CHUNK_SIZE = 1 << 16
+_WRITE_BATCH_SIZE = 1024
+
+
+def _pyarrow():
+    """pyarrow를 지연 임포트합니다. 설치되어 있지 않으면 None을 반환합니다."""
+    try:
+        import pyarrow
+        import pyarrow.ipc  # noqa: F401
+        return pyarrow
+    except ImportError:
+        return None
+
+
+def columnar_path(path: Union[str, Path]) -> Path:
+    """JSON 코퍼스 경로에 대응하는 컬럼 형식 파일 경로"""
+    return Path(path).with_suffix(COLUMNAR_SUFFIX)
+
+
+def resolve_corpus_path(path: Union[str, Path] = DATA_PATH, prefer_columnar: bool = True) -> Path:
+    """
+    실제로 읽을 코퍼스 파일을 고릅니다.
+    JSON 경로가 주어졌더라도 변환된 컬럼 형식 파일이 JSON보다 최신이고 pyarrow를 쓸 수 있으면 그 파일을 사용합니다.
+    """
+    path = Path(path)
+    if path.suffix == COLUMNAR_SUFFIX or not prefer_columnar:
+        return path
+    columnar = columnar_path(path)
+    if columnar.exists() and _pyarrow() is None:
+        logging.warning(f"pyarrow가 설치되어 있지 않아 컬럼 형식 코퍼스 대신 JSON을 읽습니다. (pip install pyarrow): {columnar}")
+    elif columnar.exists():
+        if not path.exists() or columnar.stat().st_mtime >= path.stat().st_mtime:
+            return columnar
+        logging.warning(f"컬럼 형식 코퍼스가 JSON보다 오래되어 JSON을 읽습니다. 다시 변환해주세요: {columnar}")
+    return path
+
+
+def iter_corpus(path: Union[str, Path] = DATA_PATH, fields: Optional[Iterable[str]] = None) -> Iterator[dict]:
+    """
+    코퍼스 항목({'text', 'metadata'})을 순서대로 스트리밍합니다.
+    fields가 주어지면 해당 메타데이터 필드만 포함합니다. (컬럼 형식에서는 그 컬럼만 읽습니다)
+    """
+    path = resolve_corpus_path(path)
+    if path.suffix == COLUMNAR_SUFFIX:
+        for _, item in _iter_columnar(path, fields):
+            yield item
+        return
+    if fields is None:
+        yield from _iter_json(path)
+        return
+    fields = set(fields)
+    for item in _iter_json(path):
+        metadata = item.get("metadata", {})
+        yield {**item, "metadata": {k: v for k, v in metadata.items() if k in fields}}
+
+
+def _iter_json(path: Union[str, Path]) -> Iterator[dict]:
+    """JSON 배열 파일의 항목을 순서대로 스트리밍합니다."""
+    decoder = json.JSONDecoder()
+    with open(path, 'r', encoding='utf-8') as f:
+        buffer, pos, started, eof = "", 0, False, False
+        while True:
+            # 공백과 구분자(',')를 건너뜁니다.
+            while pos < len(buffer) and (buffer[pos].isspace() or (started and buffer[pos] == ',')):
+                pos += 1
+            if pos < len(buffer):
+                if not started:
+                    if buffer[pos] != '[':
+                        raise ValueError(f"코퍼스 파일이 JSON 배열이 아닙니다: {path}")
+                    started, pos = True, pos + 1
+                    continue
+                if buffer[pos] == ']':
+                    return
+                try:
+                    item, end = decoder.raw_decode(buffer, pos)
+                    yield item
+                    pos = end
+                    continue
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+            elif eof:
+                if started:
+                    raise ValueError(f"코퍼스 파일이 완전하지 않습니다: {path}")
+                return
+            # 더 읽어야 하는 경우: 처리한 부분을 버리고 다음 청크를 이어 붙입니다.
+            chunk = f.read(_READ_CHUNK_SIZE)
+            eof = not chunk
+            buffer, pos = buffer[pos:] + chunk, 0
+
+
+def iter_chunks(
+    path: Union[str, Path] = DATA_PATH,
+    fields: Optional[Iterable[str]] = None,
+    prefer_columnar: bool = True,
+) -> Iterator[Tuple[str, dict]]:
+    """(청크 키, 항목) 쌍을 스트리밍합니다. 컬럼 형식 파일은 변환 시 저장한 키를 그대로 사용합니다."""
+    path = resolve_corpus_path(path, prefer_columnar)
+    if path.suffix == COLUMNAR_SUFFIX:
+        yield from _iter_columnar(path, fields)
+        return
+    yield from _with_chunk_keys(_iter_json(path), fields)
+
+
+def _with_chunk_keys(items: Iterable[dict], fields: Optional[Iterable[str]] = None) -> Iterator[Tuple[str, dict]]:
+    seen = defaultdict(int)
+    fields = set(fields) if fields is not None else None
+    for item in items:
+        metadata = item.get("metadata", {})
+        item_id = str(metadata.get("id", ""))
+        seq = seen[item_id]
+        seen[item_id] += 1
+        if fields is not None:
+            item = {**item, "metadata": {k: v for k, v in metadata.items() if k in fields}}
+        yield f"{item_id}#{seq}", item
+
+
+def open_columnar(path: Union[str, Path], memory_map: bool = True):
+    """컬럼 형식 코퍼스를 열어 pyarrow.ipc.RecordBatchFileReader를 반환합니다."""
+    pa = _pyarrow()
+    if pa is None:
+        raise ImportError("컬럼 형식 코퍼스를 읽으려면 pyarrow가 필요합니다. (pip install pyarrow)")
+    source = pa.memory_map(str(path), "r") if memory_map else pa.OSFile(str(path), "rb")
+    reader = pa.ipc.open_file(source)
+    schema_meta = reader.schema.metadata or {}
+    if schema_meta.get(b"format") != COLUMNAR_FORMAT.encode():
+        raise ValueError(f"지원하지 않는 컬럼 형식 코퍼스입니다: {path}")
+    return reader
+
+
+def read_corpus_table(path: Union[str, Path] = DATA_PATH, fields: Optional[Iterable[str]] = None, text: bool = True):
+    """
+    컬럼 형식 코퍼스를 pyarrow.Table로 읽습니다. (메모리 맵, 필요한 컬럼만)
+    분석/통계처럼 행 단위 dict가 필요 없는 용도에 사용합니다.
+    """
+    path = resolve_corpus_path(path)
+    if path.suffix != COLUMNAR_SUFFIX:
+        raise FileNotFoundError(f"컬럼 형식 코퍼스가 없습니다. 먼저 scripts/convert_corpus.py로 변환해주세요: {columnar_path(path)}")
+    table = open_columnar(path).read_all()
+    columns = ["key"] + (["text"] if text else [])
+    if fields is None:
+        columns += [name for name in table.column_names if name.startswith(METADATA_PREFIX)]
+    else:
+        columns += [METADATA_PREFIX + f for f in fields if METADATA_PREFIX + f in table.column_names]
+    return table.select(columns)
+
+
+def _iter_columnar(path: Union[str, Path], fields: Optional[Iterable[str]] = None) -> Iterator[Tuple[str, dict]]:
+    """컬럼 형식 코퍼스를 레코드 배치 단위로 읽어 (청크 키, 항목) 쌍을 스트리밍합니다."""
+    reader = open_columnar(path)
+    schema = reader.schema
+    json_fields = set(json.loads((schema.metadata or {}).get(b"json_fields", b"[]")))
+    field_names = [name[len(METADATA_PREFIX):] for name in schema.names if name.startswith(METADATA_PREFIX)]
+    if fields is not None:
+        wanted = set(fields)
+        field_names = [name for name in field_names if name in wanted]
+
+    wanted_names = set(field_names)
+
+    for i in range(reader.num_record_batches):
+        batch = reader.get_batch(i)
+        keys = batch.column("key").to_pylist()
+        texts = batch.column("text").to_pylist()
+        null_fields = batch.column("null_fields").to_pylist()
+        # 배치 안에서 값이 하나도 없는 필드는 건너뜁니다. (대부분의 필드는 소수의 청크에만 존재)
+        columns = []
+        for name in field_names:
+            column = batch.column(METADATA_PREFIX + name)
+            if column.null_count < len(column):
+                columns.append((name, name in json_fields, column.to_pylist()))
+        for row, key in enumerate(keys):
+            metadata = {}
+            for name, is_json, values in columns:
+                value = values[row]
+                if value is not None:
+                    metadata[name] = json.loads(value) if is_json else value
+            for name in null_fields[row] or ():
+                if name in wanted_names:
+                    metadata[name] = None
+            yield key, {"text": texts[row], "metadata": metadata}
+
+
+def convert_corpus(
+    source: Union[str, Path] = DATA_PATH,
+    output: Union[str, Path, None] = None,
+    batch_size: int = _WRITE_BATCH_SIZE,
+) -> Path:
+    """
+    JSON 코퍼스를 컬럼 형식(Arrow IPC 파일)으로 변환합니다.
+    원본을 두 번 스트리밍합니다. (1차: 필드 목록과 타입 수집, 2차: 레코드 배치 기록)
+    """
+    pa = _pyarrow()
+    if pa is None:
+        raise ImportError("컬럼 형식 코퍼스로 변환하려면 pyarrow가 필요합니다. (pip install pyarrow)")
+    source = Path(source)
+    output = Path(output) if output else columnar_path(source)
+
+    # 1차: 필드 등장 순서와 값 타입을 수집합니다.
+    field_types: Dict[str, set] = {}
+    for item in _iter_json(source):
+        for name, value in item.get("metadata", {}).items():
+            types = field_types.setdefault(name, set())
+            if value is not None:
+                types.add(type(value))
+    arrow_types = {bool: pa.bool_(), int: pa.int64(), float: pa.float64(), str: pa.string()}
+    json_fields: List[str] = []
+    columns = [pa.field("key", pa.string()), pa.field("text", pa.string()), pa.field("null_fields", pa.list_(pa.string()))]
+    for name, types in field_types.items():
+        if not types:
+            columns.append(pa.field(METADATA_PREFIX + name, pa.string()))
+        elif len(types) == 1 and next(iter(types)) in arrow_types:
+            columns.append(pa.field(METADATA_PREFIX + name, arrow_types[next(iter(types))]))
+        else:
+            json_fields.append(name)
+            columns.append(pa.field(METADATA_PREFIX + name, pa.string()))
+    schema = pa.schema(columns, metadata={
+        "format": COLUMNAR_FORMAT,
+        "source": source.name,
+        "json_fields": json.dumps(json_fields, ensure_ascii=False),
+    })
+
+    # 2차: 배치 단위로 기록합니다. (임시 파일에 쓴 뒤 교체)
+    names = list(field_types)
+    tmp_path = output.with_suffix(output.suffix + ".tmp")
+    rows = 0
+    with pa.OSFile(str(tmp_path), "wb") as sink, pa.ipc.new_file(sink, schema) as writer:
+        def flush(batch_rows):
+            arrays = [
+                pa.array([key for key, _ in batch_rows], pa.string()),
+                pa.array([item.get("text", "") for _, item in batch_rows], pa.string()),
+                pa.array([
+                    [name for name, value in item.get("metadata", {}).items() if value is None] or None
+                    for _, item in batch_rows
+                ], pa.list_(pa.string())),
+            ]
+            for name in names:
+                values = []
+                for _, item in batch_rows:
+                    metadata = item.get("metadata", {})
+                    if metadata.get(name) is None:
+                        values.append(None)
+                    elif name in json_fields:
+                        values.append(json.dumps(metadata[name], ensure_ascii=False))
+                    else:
+                        values.append(metadata[name])
+                arrays.append(pa.array(values, schema.field(METADATA_PREFIX + name).type))
+            writer.write_batch(pa.record_batch(arrays, schema=schema))
+
+        pending = []
+        for key, item in _with_chunk_keys(_iter_json(source)):
+            pending.append((key, item))
+            if len(pending) >= batch_size:
+                flush(pending)
+                rows += len(pending)
+                pending = []
+        if pending:
+            flush(pending)
+            rows += len(pending)
+    os.replace(tmp_path, output)
+    logging.info(f"컬럼 형식 코퍼스 변환 완료: {output} ({rows}개 항목, 필드 {len(names)}개, JSON 저장 필드 {len(json_fields)}개)")
+    return output
+
+
+def create_enriched_content(item_data: dict) -> str:
+    """
+    메타데이터를 활용하여 검색 품질을 높이기 위한 '의미 보강 텍스트'를 생성합니다.
+    이 텍스트는 벡터로 변환될 때 사용되어, 문맥적 의미를 풍부하게 담게 됩니다.
+    """
+    metadata = item_data.get("metadata", {})
+    text = item_data.get("text", "")
+
+    # 메타데이터의 주요 필드를 추출합니다. 값이 없는 경우 '정보 없음'으로 처리합니다.
+    dae_bulryu = metadata.get('대분류', '정보 없음')
+    jung_bulryu = metadata.get('중분류', '정보 없음')
+    service_name = metadata.get('사업명', '정보 없음')
+    item_name = metadata.get('항목', '정보 없음')
+
+    # 템플릿을 사용하여 자연스러운 문장 형태로 콘텐츠를 재구성합니다.
+    # 이를 통해 각 데이터 조각이 어떤 맥락에 속하는지 AI가 더 잘 이해할 수 있습니다.
+    enriched_content = (
+        f"이 서비스의 대분류는 '{dae_bulryu}', 중분류는 '{jung_bulryu}'이며, 사업명은 '{service_name}'입니다. "
+        f"세부 항목 '{item_name}'에 대한 내용은 다음과 같습니다: {text}"
+    )
+    return enriched_content
+
+
+def item_to_document(chunk_key: str, item: dict, enrich: bool) -> Document:
+    """
+    코퍼스 항목을 LangChain Document로 변환합니다.
+    enrich=True이면 page_content에 '의미 보강 텍스트'를 넣고 원본 텍스트는 metadata['original_text']에 보관합니다.
+    """
+    metadata = dict(item.get("metadata", {}))
+    metadata["chunk_id"] = chunk_key
+    if enrich:
+        metadata["original_text"] = item.get("text", "")
+        return Document(page_content=create_enriched_content(item), metadata=metadata)
+    return Document(page_content=item.get("text", ""), metadata=metadata)
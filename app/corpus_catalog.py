@@ -0,0 +1,149 @@
+# app/corpus_catalog.py
+"""
+컴파일된 코퍼스 카탈로그(catalog.json).
+
+인덱스 구축 시 코퍼스 전체의 구조 정보를 한 번만 계산해 인덱스 디렉토리에 함께 저장합니다.
+- taxonomy       : 대분류 → 중분류(+중분류_개요) 계층 (코퍼스 등장 순서)
+- service_names  : 정렬된 사업명 목록
+- toc            : 목차(중분류='목차', 항목='세부목차') 청크 키 목록
+- schema_context : 플래너 프롬프트에 들어가는 '대분류-중분류' 계층 문자열
+- fields         : 짧은 값을 가지는 메타데이터 필드별 {값: 문서 수} 사전
+
+DBService(IndexSnapshot), 챗봇 플래너 프롬프트, data/verify_context.py는 이 파일을 읽어 사용하며,
+카탈로그가 없는 기존 인덱스에서는 같은 함수로 문서 메타데이터에서 즉석 컴파일합니다.
+"""
+import os
+import json
+import logging
+from collections import Counter, OrderedDict, defaultdict
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+CATALOG_FILE = "catalog.json"
+CATALOG_FORMAT = 1
+
+# fields 사전에 포함할 필드 조건: 값이 짧고 고유 값 수가 많지 않은 필드 (본문/답변 같은 긴 텍스트 제외)
+MAX_FIELD_VALUE_LENGTH = 200
+MAX_FIELD_CARDINALITY = 2000
+# 구축·로드 과정에서 추가되는 필드는 카탈로그에서 제외합니다. (chunk_no는 스냅샷 로드 시 붙는 청크 번호)
+_INTERNAL_FIELDS = ("chunk_id", "chunk_no", "original_text")
+
+
+def is_toc_entry(metadata: dict) -> bool:
+    return metadata.get('중분류') == '목차' and metadata.get('항목') == '세부목차'
+
+
+def render_schema_context(taxonomy: List[dict]) -> str:
+    """LLM의 검색 설계를 돕기 위한 '대분류-중분류' 전체 계층 구조 문자열을 만듭니다."""
+    context_parts = ["# [전체 카테고리 목록]"]
+    for major in taxonomy:
+        context_parts.append(f"## {major['대분류']}")
+        for minor in sorted(entry['중분류'] for entry in major['중분류']):
+            context_parts.append(f"- {minor}")
+        context_parts.append("")
+    return "\n".join(context_parts)
+
+
+class CatalogCompiler:
+    """청크 메타데이터를 스트리밍으로 받아 카탈로그를 컴파일합니다."""
+
+    def __init__(self):
+        self._entries: List[Tuple[str, dict]] = []
+
+    def add(self, key: str, metadata: dict):
+        self._entries.append((key, {k: v for k, v in metadata.items() if k not in _INTERNAL_FIELDS}))
+
+    def compile(self, keys: Optional[Iterable[str]] = None, corpus_hash: Optional[str] = None) -> dict:
+        """카탈로그를 만듭니다. keys가 주어지면 해당 청크만 포함합니다. (인덱스에 실제로 들어간 청크)"""
+        included = set(keys) if keys is not None else None
+        taxonomy: "OrderedDict[str, OrderedDict[str, Optional[str]]]" = OrderedDict()
+        service_names, toc = set(), []
+        field_counts: Dict[str, Counter] = defaultdict(Counter)
+        excluded_fields = set()
+        doc_count = 0
+
+        for key, metadata in self._entries:
+            if included is not None and key not in included:
+                continue
+            if not metadata:
+                continue
+            doc_count += 1
+            major, minor = metadata.get('대분류'), metadata.get('중분류')
+            if major and minor:
+                minors = taxonomy.setdefault(major, OrderedDict())
+                if minors.get(minor) is None:
+                    minors[minor] = metadata.get('중분류_개요') or None
+            if metadata.get('사업명'):
+                service_names.add(metadata['사업명'])
+            if is_toc_entry(metadata):
+                toc.append(key)
+            for field, value in metadata.items():
+                if value is None or field in excluded_fields:
+                    continue
+                value = str(value)
+                if len(value) > MAX_FIELD_VALUE_LENGTH:
+                    excluded_fields.add(field)
+                    field_counts.pop(field, None)
+                    continue
+                field_counts[field][value] += 1
+
+        taxonomy_list = [
+            {"대분류": major, "중분류": [{"중분류": minor, "개요": overview} for minor, overview in minors.items()]}
+            for major, minors in taxonomy.items()
+        ]
+        return {
+            "format": CATALOG_FORMAT,
+            "built_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "corpus_hash": corpus_hash,
+            "doc_count": doc_count,
+            "taxonomy": taxonomy_list,
+            "service_names": sorted(service_names),
+            "toc": toc,
+            "schema_context": render_schema_context(taxonomy_list),
+            "fields": {
+                field: dict(sorted(counts.items()))
+                for field, counts in sorted(field_counts.items())
+                if len(counts) <= MAX_FIELD_CARDINALITY
+            },
+        }
+
+
+def compile_corpus_catalog(data_path: Union[str, Path, None] = None) -> dict:
+    """원본 코퍼스 JSON에서 카탈로그를 바로 컴파일합니다. (인덱스 없이 사용할 때)"""
+    from .corpus import DATA_PATH, iter_chunks
+    compiler = CatalogCompiler()
+    for key, item in iter_chunks(data_path or DATA_PATH):
+        compiler.add(key, item.get("metadata", {}))
+    return compiler.compile()
+
+
+def read_catalog(index_dir: Union[str, Path], corpus_hash: Optional[str] = None) -> Optional[dict]:
+    """
+    인덱스 디렉토리의 catalog.json을 읽습니다.
+    corpus_hash가 주어지면 매니페스트와 같은 코퍼스로 만든 카탈로그일 때만 반환합니다.
+    """
+    path = Path(index_dir) / CATALOG_FILE
+    if not path.exists():
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            catalog = json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        logging.warning(f"카탈로그를 읽을 수 없습니다 ({path}): {e}")
+        return None
+    if catalog.get("format") != CATALOG_FORMAT:
+        return None
+    if corpus_hash is not None and catalog.get("corpus_hash") != corpus_hash:
+        logging.warning(f"카탈로그가 현재 인덱스와 다른 코퍼스로 만들어졌습니다. 무시합니다: {path}")
+        return None
+    return catalog
+
+
+def write_catalog(index_dir: Union[str, Path], catalog: dict):
+    """catalog.json을 원자적으로 기록합니다."""
+    path = Path(index_dir) / CATALOG_FILE
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(catalog, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, path)
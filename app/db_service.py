@@ -1,224 +1,424 @@
-# app/db_service.py
-
-import numpy as np
-import logging
-from pathlib import Path
-from typing import List, Dict, Optional
-from collections import defaultdict, OrderedDict
-
-# .env 파일에서 환경 변수 로드
-from dotenv import load_dotenv
-load_dotenv()
-
-# LangChain 관련 라이브러리 임포트
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
-from langchain_community.vectorstores import FAISS
-from langchain_core.documents import Document
-# 로컬 임베딩은 Streamlit Cloud 배포 시 제외
-# from .local_embeddings import get_local_embeddings  # BGE-M3 활성화
-# from .ollama_embeddings import get_ollama_embeddings
-
-
-# --- 상수 정의 (배포 환경 호환) ---
-def get_faiss_path() -> str:
-    """배포 환경에 맞는 FAISS 경로를 동적으로 결정"""
-    import os
-
-    # 환경변수로 경로 설정 가능
-    if os.getenv('FAISS_PATH'):
-        return os.getenv('FAISS_PATH')
-
-    # 현재 파일 기준 상대 경로
-    current_dir = Path(__file__).parent
-    base_dir = current_dir.parent
-    db_dir = base_dir / "db"
-
-    # 우선순위: Google -> BGE -> Ollama
-    possible_paths = [
-        db_dir / "faiss_index_google_backup",
-        db_dir / "faiss_index_bge",
-        db_dir / "faiss_index"
-    ]
-
-    for path in possible_paths:
-        if path.exists():
-            return str(path)
-
-    # 기본값 (없으면 런타임에 에러 발생)
-    return str(db_dir / "faiss_index_bge")
-
-FAISS_PATH = get_faiss_path()
-
-
-class DBService:
-    """
-    FAISS 벡터 데이터베이스와 상호작용하며,
-    목차 기반 검색을 핵심 전략으로 사용하는 서비스 클래스.
-    """
-    def __init__(self, faiss_path=None, embedding_type="google"):
-        logging.info("DEBUG: DBService 인스턴스 초기화 시작...")
-
-        # 배포 환경에서는 FAISS 경로 동적 설정
-        if faiss_path is None:
-            faiss_path = get_faiss_path()
-
-        try:
-            # Streamlit Cloud 배포 시에는 Google 임베딩만 사용
-            if embedding_type == "google":
-                self.embeddings = GoogleGenerativeAIEmbeddings(model="models/text-embedding-004")
-                logging.info("DEBUG: Google 최신 임베딩 모델 로딩 성공.")
-            else:
-                # 로컬 개발 환경에서만 다른 임베딩 사용 가능
-                logging.warning(f"'{embedding_type}' 임베딩은 배포 환경에서 지원되지 않습니다. Google 임베딩으로 대체합니다.")
-                self.embeddings = GoogleGenerativeAIEmbeddings(model="models/text-embedding-004")
-                logging.info("DEBUG: Google 임베딩으로 대체 완료.")
-        except Exception as e:
-            logging.error(f"!!! 임베딩 모델 초기화 실패: {e}")
-            raise ConnectionError(
-                f"Google Embedding 모델 초기화에 실패했습니다. 다음을 확인하세요:\n"
-                f"- 'GOOGLE_API_KEY' 환경 변수가 올바르게 설정되었는지.\n"
-                f"- Google Cloud 프로젝트에서 'Generative Language API'가 활성화되었는지.\n"
-                f"상세 오류: {e}"
-            )
-
-        try:
-            absolute_faiss_path = str(Path(faiss_path).resolve())
-            
-            # FAISS 벡터 DB 로드 (동기 방식으로 안정성 개선)
-            self.vector_db = FAISS.load_local(
-                absolute_faiss_path, self.embeddings, allow_dangerous_deserialization=True
-            )
-            
-            self.all_docs = [self.vector_db.docstore.search(doc_id) 
-                             for doc_id in self.vector_db.index_to_docstore_id.values() 
-                             if self.vector_db.docstore.search(doc_id) is not None]
-            
-            # --- ✨ [핵심 복원] 목차 검색을 위한 별도 DB 생성 ---
-            self.toc_docs = [
-                doc for doc in self.all_docs 
-                if doc.metadata.get('중분류') == '목차' and doc.metadata.get('항목') == '세부목차'
-            ]
-            # 목차 전용 DB 생성 (동기 방식으로 안정성 개선)
-            self.toc_db = FAISS.from_documents(self.toc_docs, self.embeddings) if self.toc_docs else None
-            logging.info(f"DEBUG: FAISS 벡터 DB 로드 성공. 전체 {len(self.all_docs)}개 문서, 목차 {len(self.toc_docs)}개 항목.")
-            
-        except Exception as e:
-            logging.error(f"!!! FAISS 벡터 DB 로드 실패: {e}")
-            raise FileNotFoundError(
-                f"FAISS 인덱스 파일을 로드하는 데 실패했습니다: {faiss_path}\n"
-                f"FAISS 파일이 존재하고 손상되지 않았는지, 그리고 임베딩 모델과 호환되는지 확인해주세요.\n"
-                f"상세 오류: {e}"
-            )
-
-    def get_schema_context(self) -> Dict[str, any]:
-        """
-        [✨ 개선안] LLM의 검색 설계를 돕기 위해 '대분류-중분류' 전체 계층 구조를 포함한 컨텍스트를 제공합니다.
-        """
-        logging.debug("DEBUG: DB의 전체 '대분류-중분류' 계층 구조 컨텍스트 추출 중...")
-        if not self.all_docs:
-            return {'context_string': '', 'service_names': []}
-        
-        all_meta = [doc.metadata for doc in self.all_docs if doc and doc.metadata]
-        
-        # 전체 사업명 목록 추출
-        service_names = sorted(list(set(m.get('사업명') for m in all_meta if m.get('사업명'))))
-        
-        category_hierarchy = OrderedDict()
-
-        for meta in all_meta:
-            major_cat = meta.get('대분류')
-            minor_cat = meta.get('중분류')
-            
-            if major_cat and minor_cat:
-                if major_cat not in category_hierarchy:
-                    category_hierarchy[major_cat] = set()
-                category_hierarchy[major_cat].add(minor_cat)
-
-        context_parts = ["# [전체 카테고리 목록]"]
-        for major, minors in category_hierarchy.items():
-            context_parts.append(f"## {major}")
-            for minor in sorted(list(minors)):
-                context_parts.append(f"- {minor}")
-            context_parts.append("")
-        
-        context_string = "\n".join(context_parts)
-        
-        logging.debug("LLM에 전달될 카테고리 계층 구조 컨텍스트:\n" + context_string)
-
-        return {'context_string': context_string, 'service_names': service_names}
-    
-    def _search_by_metadata_filters(self, filters: Dict) -> List[Document]:
-        """
-        [내부 헬퍼] metadata_filters의 여러 '중분류' 조건과 일치하는 모든 문서를 반환합니다.
-        """
-        if not filters or '중분류' not in filters or not filters['중분류']:
-            return self.all_docs
-
-        target_categories = set(filters['중분류'])
-        logging.debug(f"DEBUG: 메타데이터 필터링 시작 (대상 중분류: {target_categories})")
-        
-        matched_docs = [
-            doc for doc in self.all_docs
-            if doc.metadata.get('중분류') in target_categories
-        ]
-        
-        logging.debug(f"DEBUG: 메타데이터 필터링 결과 {len(matched_docs)}개 문서 발견.")
-        return matched_docs
-
-    def advanced_search(self, filters: Dict, keywords: List[str], k: int = 15) -> List[Document]:
-        """
-        [새로운 핵심 검색 함수] 메타데이터로 1차 필터링 후, 키워드로 2차 정밀 검색을 수행합니다.
-        """
-        logging.debug(f"고급 검색 시작 (필터: {filters}, 키워드: {keywords})")
-
-        primary_docs = self._search_by_metadata_filters(filters)
-
-        if not primary_docs:
-            logging.warning("메타데이터 필터링 결과, 검색할 문서가 없습니다.")
-            return []
-
-        logging.debug(f"메타데이터 필터링으로 검색 범위가 {len(primary_docs)}개 문서로 좁혀졌습니다.")
-
-        search_query = " ".join(keywords)
-        
-        # 임시 DB 생성 (동기 방식으로 안정성 개선)
-        temp_db = FAISS.from_documents(primary_docs, self.embeddings)
-        
-        # 유사도 검색 (동기 방식으로 안정성 개선)
-        final_docs = temp_db.similarity_search(query=search_query, k=k)
-
-
-        logging.debug("\n" + "="*50)
-        logging.debug(f"🕵️  [DB_SERVICE] 최종 검색 결과 (상위 {len(final_docs)}개)")
-        logging.debug(f"   - 적용된 필터(중분류): {filters.get('중분류', 'N/A')}")
-        logging.debug(f"   - 적용된 키워드: {keywords}")
-        logging.debug("="*50)
-        for i, doc in enumerate(final_docs):
-            minor_category = doc.metadata.get('중분류', 'N/A')
-            service_name = doc.metadata.get('사업명', 'N/A')
-            logging.debug(f"{i+1:02d}. 중분류: {minor_category:<40} | 사업명: {service_name}")
-        logging.debug("="*50 + "\n")
-
-        return final_docs
-    
-    def metadata_search(self, filter_dict: Dict) -> List[Document]:
-        """특정 메타데이터 조건과 일치하는 모든 문서를 반환합니다."""
-        logging.debug(f"DEBUG: 메타데이터 검색 시작 (필터: {filter_dict})")
-        matched_docs = []
-        for doc in self.all_docs:
-            if not (doc and doc.metadata): continue
-            
-            is_match = True
-            for key, value in filter_dict.items():
-                metadata_value = doc.metadata.get(key)
-                if metadata_value is None or not str(metadata_value).startswith(str(value)):
-                    is_match = False
-                    break
-            if is_match:
-                matched_docs.append(doc)
-        
-        logging.debug(f"DEBUG: 메타데이터 검색 결과 {len(matched_docs)}개 문서 발견.")
-        return matched_docs
-
-    def __del__(self):
-        pass
+# app/db_service.py
+
+import os
+import logging
+import weakref
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import List, Dict, Optional
+
+# .env 파일에서 환경 변수 로드
+from dotenv import load_dotenv
+load_dotenv()
+
+# LangChain 관련 라이브러리 임포트
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+from .telemetry import REGISTRY, span
+from .logging_utils import LazyDocListing, log_dump
+from .index_locator import find_index, get_faiss_path, read_manifest, serving_problem
+from .index_snapshot import IndexSnapshot, index_generation
+from .index_shards import DEFAULT_MAX_LOADED_SHARDS
+from .faq import DEFAULT_LEXICAL_THRESHOLD, DEFAULT_SEMANTIC_THRESHOLD, FaqMatch
+from .directory import DirectoryResult
+from .eligibility import EligibilityResult, extract_facts
+# 로컬 임베딩(BGE-M3, Ollama)은 선택된 경우에만 get_embeddings()에서 임포트됩니다. (Streamlit Cloud 배포 호환)
+from .embeddings import LazyEmbeddings, get_embeddings
+
+
+# --- 상수 정의 (배포 환경 호환) ---
+# 인덱스 경로 선택 로직은 헬스 체크와 공유하기 위해 가벼운 index_locator 모듈에 있습니다.
+FAISS_PATH = get_faiss_path()
+# 로드 도중 인덱스가 교체됐을 때 다시 읽는 최대 횟수
+SNAPSHOT_LOAD_ATTEMPTS = 3
+
+
+class DBService:
+    """
+    FAISS 벡터 데이터베이스와 상호작용하며,
+    목차 기반 검색을 핵심 전략으로 사용하는 서비스 클래스.
+
+    인덱스는 첫 검색 시점에, 임베딩 모델은 벡터 검색이 실제로 필요한 시점에 로드합니다.
+    (메타데이터 검색만 사용하는 요청은 임베딩 모델을 로드하지 않습니다.)
+
+    로드된 인덱스와 파생 구조는 IndexSnapshot 하나로 묶여 있습니다. reload_interval을 지정하면
+    백그라운드 스레드가 새 인덱스 세대(매니페스트 버전 또는 파일 수정 시각)를 감지해 새 스냅샷을 미리 만든 뒤
+    참조만 원자적으로 교체합니다. pin() 안에서 처리 중인 요청은 끝날 때까지 기존 스냅샷을 사용합니다.
+
+    인덱스에 대분류별 샤드가 있으면 중분류 필터 검색은 해당 샤드에서만 수행하고,
+    샤드는 처음 필요할 때 로드하여 최근 사용한 shard_cache_size개까지만 메모리에 유지합니다. (0이면 무제한)
+    """
+    def __init__(self, faiss_path=None, embedding_type="google", reload_interval: float = 0,
+                 shard_cache_size: int = DEFAULT_MAX_LOADED_SHARDS):
+        logging.info("DEBUG: DBService 인스턴스 초기화 시작...")
+        self.embedding_type = embedding_type
+        self.shard_cache_size = shard_cache_size
+
+        # 경로를 지정하지 않았으면 새 인덱스 디렉토리가 생겨도 다시 선택할 수 있도록 자동 선택 모드로 둡니다.
+        self._auto_select = faiss_path is None and not os.getenv('FAISS_PATH')
+        # 배포 환경에서는 FAISS 경로 동적 설정
+        if faiss_path is None:
+            faiss_path = get_faiss_path(embedding_type)
+        self.faiss_path = str(Path(faiss_path).resolve())
+
+        # 인덱스 빌더가 기록한 매니페스트 (버전 식별 및 호환성 검사용)
+        manifest = self._read_manifest(self.faiss_path)
+        self._initial_manifest = {k: v for k, v in manifest.items() if k != "chunks"}
+        if manifest.get("version") is not None:
+            logging.info(
+                f"DEBUG: 인덱스 선택: {self.faiss_path} (버전 {manifest.get('version')}, {manifest.get('model')}, "
+                f"{manifest.get('dimension')}차원, {manifest.get('doc_count')}개 청크, {manifest.get('built_at')})"
+            )
+        else:
+            logging.info(f"DEBUG: 인덱스 선택: {self.faiss_path} (매니페스트 없음, 빌더 이전에 생성된 인덱스)")
+
+        self._lock = threading.RLock()
+        self._embeddings_lock = threading.Lock()
+        self._base_embeddings = None
+        self._snapshot: Optional[IndexSnapshot] = None
+        self._local = threading.local()
+        self._pending_generation = None
+        self._failed_generation = None
+        self._stop_event = threading.Event()
+        self._watcher: Optional[threading.Thread] = None
+        if reload_interval > 0:
+            self.start_watcher(reload_interval)
+
+    def _read_manifest(self, path: str) -> dict:
+        """매니페스트를 읽고 요청한 임베딩과 호환되는지 검사합니다."""
+        manifest = read_manifest(path) or {}
+        if manifest and manifest.get("embedding") != self.embedding_type:
+            raise ValueError(
+                f"'{path}' 인덱스는 '{manifest.get('embedding')}' 임베딩으로 구축되었습니다. "
+                f"요청한 임베딩('{self.embedding_type}')과 호환되지 않습니다."
+            )
+        problem = serving_problem(self.embedding_type, manifest)
+        if problem:
+            raise ValueError(f"'{path}' 인덱스를 사용할 수 없습니다. {problem}")
+        return manifest
+
+    def _load_embeddings(self):
+        """임베딩 모델을 생성합니다. (LazyEmbeddings가 첫 벡터 검색 시 호출)"""
+        try:
+            embeddings = get_embeddings(self.embedding_type)
+            logging.info(f"DEBUG: '{self.embedding_type}' 임베딩 모델 로딩 성공.")
+            return embeddings
+        except Exception as e:
+            logging.error(f"!!! 임베딩 모델 초기화 실패: {e}")
+            if self.embedding_type != "google":
+                raise
+            raise ConnectionError(
+                f"Google Embedding 모델 초기화에 실패했습니다. 다음을 확인하세요:\n"
+                f"- 'GOOGLE_API_KEY' 환경 변수가 올바르게 설정되었는지.\n"
+                f"- Google Cloud 프로젝트에서 'Generative Language API'가 활성화되었는지.\n"
+                f"상세 오류: {e}"
+            )
+
+    def _shared_embeddings(self):
+        """스냅샷이 바뀌어도 임베딩 모델은 프로세스에서 한 번만 로드하여 공유합니다."""
+        if self._base_embeddings is None:
+            with self._embeddings_lock:
+                if self._base_embeddings is None:
+                    self._base_embeddings = self._load_embeddings()
+        return self._base_embeddings
+
+    def _load_snapshot(self, path: str) -> IndexSnapshot:
+        """
+        매니페스트와 인덱스를 읽어 스냅샷을 만듭니다.
+        읽는 도중 빌더가 새 버전을 배포하면(세대가 바뀌면) 파일이 섞였을 수 있으므로 다시 읽습니다.
+        """
+        for attempt in range(SNAPSHOT_LOAD_ATTEMPTS):
+            generation = index_generation(path)
+            manifest = self._read_manifest(path)
+            embeddings = LazyEmbeddings(
+                self.embedding_type,
+                loader=self._shared_embeddings,
+                expected_model=manifest.get("model"),
+                expected_dimension=manifest.get("dimension"),
+                expected_normalization=manifest.get("normalization"),
+            )
+            snapshot = IndexSnapshot.load(path, manifest, embeddings, self.embedding_type, self.shard_cache_size)
+            if index_generation(path) == generation:
+                break
+            logging.warning(f"인덱스를 읽는 도중 새 버전이 배포되어 다시 로드합니다: {path} ({attempt + 1}/{SNAPSHOT_LOAD_ATTEMPTS})")
+        else:
+            raise RuntimeError(f"인덱스가 계속 교체되고 있어 일관된 버전을 읽지 못했습니다: {path}")
+        weakref.finalize(snapshot, logging.info, f"DEBUG: 이전 인덱스 스냅샷을 해제했습니다: {path} (버전 {manifest.get('version')})")
+        return snapshot
+
+    def _current(self) -> IndexSnapshot:
+        """현재 요청이 사용할 스냅샷 (pin() 안에서는 고정된 스냅샷, 처음 호출 시 인덱스 로드)"""
+        pinned = getattr(self._local, "snapshot", None)
+        if pinned is not None:
+            return pinned
+        if self._snapshot is None:
+            with self._lock:
+                if self._snapshot is None:
+                    self._snapshot = self._load_snapshot(self.faiss_path)
+        return self._snapshot
+
+    @contextmanager
+    def pin(self):
+        """블록 안의 모든 검색이 같은 스냅샷을 사용하도록 현재 스레드에 고정합니다. (중첩 가능)"""
+        if getattr(self._local, "snapshot", None) is not None:
+            yield self._local.snapshot
+            return
+        self._local.snapshot = self._current()
+        try:
+            yield self._local.snapshot
+        finally:
+            self._local.snapshot = None
+
+    # --- 현재 스냅샷 속성 ---
+    @property
+    def is_loaded(self) -> bool:
+        return self._snapshot is not None
+
+    @property
+    def index_manifest(self) -> dict:
+        snapshot = getattr(self._local, "snapshot", None) or self._snapshot
+        return snapshot.manifest if snapshot is not None else self._initial_manifest
+
+    @property
+    def index_version(self) -> Optional[int]:
+        return self.index_manifest.get("version")
+
+    @property
+    def embeddings(self):
+        return self._current().embeddings
+
+    @property
+    def vector_db(self):
+        return self._current().vector_db
+
+    @property
+    def all_docs(self) -> List[Document]:
+        return self._current().all_docs
+
+    @property
+    def toc_docs(self) -> List[Document]:
+        return self._current().toc_docs
+
+    @property
+    def toc_db(self):
+        return self._current().toc_db
+
+    # --- 무중단 인덱스 교체 ---
+    def _resolve_path(self) -> str:
+        if self._auto_select:
+            path, _ = find_index(self.embedding_type)
+            if path is not None:
+                return str(path.resolve())
+        return self.faiss_path
+
+    def check_for_update(self) -> bool:
+        """새 인덱스 세대가 있으면 백그라운드에서 로드하여 교체합니다. 교체했으면 True를 반환합니다."""
+        path = self._resolve_path()
+        generation = index_generation(path)
+        current = self._snapshot.generation if self._snapshot is not None else None
+        if generation is None or generation == current or generation == self._failed_generation:
+            self._pending_generation = None
+            return False
+        if self._snapshot is None:
+            return False  # 아직 첫 로드 전이면 첫 요청 때 최신 인덱스를 로드합니다.
+        if generation[1] == "mtime" and generation != self._pending_generation:
+            # 매니페스트가 없는 인덱스는 파일 쓰기가 끝났는지 알 수 없으므로 다음 확인에서도 같을 때 교체합니다.
+            self._pending_generation = generation
+            return False
+        return self.reload(path, generation)
+
+    def reload(self, path: Optional[str] = None, generation: Optional[tuple] = None) -> bool:
+        """인덱스를 새로 로드하여 현재 스냅샷과 원자적으로 교체합니다. 실패하면 기존 스냅샷을 유지합니다."""
+        path = path or self._resolve_path()
+        try:
+            with span("index_reload", embedding_type=self.embedding_type):
+                snapshot = self._load_snapshot(path)
+        except Exception as e:
+            self._failed_generation = generation or index_generation(path)
+            REGISTRY.inc("rag_index_reloads_total", result="error")
+            logging.error(f"!!! 새 인덱스 로드 실패, 기존 인덱스를 계속 사용합니다: {e}")
+            return False
+
+        with self._lock:
+            previous, self._snapshot = self._snapshot, snapshot
+            self.faiss_path = path
+        self._pending_generation = None
+        REGISTRY.inc("rag_index_reloads_total", result="success")
+        logging.info(
+            f"인덱스 교체 완료: {path} (버전 {previous.version if previous else None} -> {snapshot.version})"
+        )
+        return True
+
+    def start_watcher(self, interval: float = 60):
+        """interval초마다 새 인덱스 세대를 확인하는 데몬 스레드를 시작합니다."""
+        if self._watcher is not None and self._watcher.is_alive():
+            return
+        self._stop_event.clear()
+
+        def watch():
+            while not self._stop_event.wait(interval):
+                try:
+                    self.check_for_update()
+                except Exception as e:
+                    logging.error(f"인덱스 변경 확인 중 오류: {e}")
+
+        self._watcher = threading.Thread(target=watch, name="index-watcher", daemon=True)
+        self._watcher.start()
+        logging.info(f"DEBUG: 인덱스 변경 감시 시작 ({interval}초 간격)")
+
+    def stop_watcher(self):
+        self._stop_event.set()
+
+    def get_schema_context(self) -> Dict[str, any]:
+        """
+        [✨ 개선안] LLM의 검색 설계를 돕기 위해 '대분류-중분류' 전체 계층 구조를 포함한 컨텍스트를 제공합니다.
+        (스냅샷을 만들 때 한 번 계산해 둔 값을 반환합니다.)
+        """
+        return self._current().schema_context
+    
+    def _search_by_metadata_filters(self, filters: Dict) -> List[Document]:
+        """
+        [내부 헬퍼] metadata_filters의 여러 '중분류' 조건과 일치하는 모든 문서를 반환합니다.
+        """
+        snapshot = self._current()
+        if not filters or '중분류' not in filters or not filters['중분류']:
+            return snapshot.all_docs
+
+        target_categories = set(filters['중분류'])
+        logging.debug("DEBUG: 메타데이터 필터링 시작 (대상 중분류: %s)", target_categories)
+        
+        matched_docs = snapshot.documents_in('중분류', target_categories)
+        
+        logging.debug("DEBUG: 메타데이터 필터링 결과 %d개 문서 발견.", len(matched_docs))
+        return matched_docs
+
+    def advanced_search(self, filters: Dict, keywords: List[str], k: int = 15) -> List[Document]:
+        """
+        [새로운 핵심 검색 함수] 메타데이터로 1차 필터링 후, 키워드로 2차 정밀 검색을 수행합니다.
+        """
+        logging.debug("고급 검색 시작 (필터: %s, 키워드: %s)", filters, keywords)
+
+        with self.pin() as snapshot, span("advanced_search") as s:
+            if snapshot.shards is not None:
+                final_docs = self._sharded_search(snapshot, filters, keywords, k, s)
+            else:
+                final_docs = self._rebuild_and_search(snapshot, filters, keywords, k, s)
+            if final_docs is None:
+                return []
+
+        # 검색 결과 덤프는 샘플링되며, 리스너 스레드에서 지연 포맷팅됩니다.
+        log_dump(
+            "retrieval",
+            "🕵️  [DB_SERVICE] 최종 검색 결과 (상위 %d개)\n   - 적용된 필터(중분류): %s\n   - 적용된 키워드: %s\n%s",
+            len(final_docs), filters.get('중분류', 'N/A'), keywords, LazyDocListing(final_docs)
+        )
+
+        return final_docs
+
+    def _sharded_search(self, snapshot: IndexSnapshot, filters: Dict, keywords: List[str], k: int, s) -> Optional[List[Document]]:
+        """
+        중분류 필터가 있으면 해당 중분류를 포함한 샤드만 병렬로 검색해 상위 k개를 합칩니다.
+        저장된 벡터를 그대로 사용하므로 질의 임베딩 한 번 외에는 임베딩 호출이 없습니다.
+        필터가 없으면 본 인덱스(전체 샤드)에서 검색합니다.
+        """
+        search_query = " ".join(keywords)
+        targets = (filters or {}).get('중분류')
+        if not targets:
+            final_docs = snapshot.vector_db.similarity_search(query=search_query, k=k)
+            s.set(candidates=len(snapshot.all_docs), documents=len(final_docs), shards=0)
+            return final_docs
+
+        routed = snapshot.shards.route(targets)
+        if not routed:
+            logging.warning("메타데이터 필터링 결과, 검색할 문서가 없습니다.")
+            s.set(candidates=0, documents=0, shards=0)
+            return None
+        logging.debug("중분류 필터 %s → 샤드 %s", targets, routed)
+
+        query_vector = snapshot.embeddings.embed_query(search_query)
+        final_docs, searched = snapshot.shards.search(query_vector, k, targets)
+        s.set(documents=len(final_docs), shards=len(searched))
+        return final_docs
+
+    def _rebuild_and_search(self, snapshot: IndexSnapshot, filters: Dict, keywords: List[str], k: int, s) -> Optional[List[Document]]:
+        """샤드가 없는 인덱스: 필터에 맞는 문서로 임시 DB를 만들어 검색합니다. (기존 방식)"""
+        primary_docs = self._search_by_metadata_filters(filters)
+
+        if not primary_docs:
+            logging.warning("메타데이터 필터링 결과, 검색할 문서가 없습니다.")
+            s.set(candidates=0, documents=0)
+            return None
+
+        logging.debug("메타데이터 필터링으로 검색 범위가 %d개 문서로 좁혀졌습니다.", len(primary_docs))
+
+        search_query = " ".join(keywords)
+        
+        # 임시 DB 생성 (동기 방식으로 안정성 개선)
+        temp_db = FAISS.from_documents(primary_docs, snapshot.embeddings)
+        
+        # 유사도 검색 (동기 방식으로 안정성 개선)
+        final_docs = temp_db.similarity_search(query=search_query, k=k)
+        s.set(candidates=len(primary_docs), documents=len(final_docs))
+        return final_docs
+    
+    def match_faq(
+        self,
+        question: str,
+        lexical_threshold: float = DEFAULT_LEXICAL_THRESHOLD,
+        semantic_threshold: float = DEFAULT_SEMANTIC_THRESHOLD,
+    ) -> Optional[FaqMatch]:
+        """질문과 일치하는 '자주하는 질문' 항목을 찾습니다. (어휘 점수가 애매할 때만 질의를 임베딩합니다)"""
+        snapshot = self._current()
+        with span("faq_match", candidates=len(snapshot.faq)) as s:
+            match = snapshot.faq.match(
+                question, snapshot.embeddings.embed_query, lexical_threshold, semantic_threshold,
+            )
+            s.set(documents=1 if match else 0, cache_hit=match is not None)
+        return match
+
+    def lookup_contacts(self, question: str) -> Optional[DirectoryResult]:
+        """연락처 질문이면 지역·기관별 연락처 색인에서 해당 항목을 찾습니다."""
+        snapshot = self._current()
+        with span("directory_lookup", candidates=len(snapshot.directory)) as s:
+            result = snapshot.directory.lookup(question)
+            s.set(documents=len(result.entries) if result else 0)
+        return result
+
+    def get_documents(self, chunk_ids: List[str]) -> List[Document]:
+        """청크 키(chunk_id) 목록에 해당하는 문서를 주어진 순서대로 반환합니다. (현재 인덱스에 없는 키는 건너뜀)"""
+        docs = {doc.metadata.get('chunk_id'): doc for doc in self._current().documents_in('chunk_id', chunk_ids)}
+        return [docs[chunk_id] for chunk_id in chunk_ids if chunk_id in docs]
+
+    def get_fallback_answer(self) -> Optional[str]:
+        """현재 인덱스 버전에서 미리 렌더링한 정적 안내 답변 (분야 정보가 없으면 None)"""
+        return self._current().fallback_answer
+
+    def filter_eligible(self, question: str, docs: List[Document]) -> EligibilityResult:
+        """질문의 가구원 수·소득·나이·장애 여부로 자격 규칙을 명백히 위반하는 문서를 제외합니다."""
+        snapshot = self._current()
+        with span("eligibility_filter", candidates=len(docs)) as s:
+            result = snapshot.eligibility.prune(docs, extract_facts(question))
+            s.set(documents=len(result.kept), pruned=result.pruned_count)
+        return result
+
+    def similarity_search(self, query: str, k: int = 15) -> List[Document]:
+        """필터 없이 전체 인덱스에서 유사도 검색을 수행합니다."""
+        with span("similarity_search") as s:
+            docs = self.vector_db.similarity_search(query=query, k=k)
+            s.set(documents=len(docs))
+        return docs
+
+    def metadata_search(self, filter_dict: Dict) -> List[Document]:
+        """특정 메타데이터 조건과 일치하는 모든 문서를 반환합니다."""
+        logging.debug("DEBUG: 메타데이터 검색 시작 (필터: %s)", filter_dict)
+        with span("metadata_search") as s:
+            # 필드별 정렬 색인에서 접두어 일치 범위를 이분 탐색합니다. (전체 문서 순회 없음)
+            matched_docs = self._current().metadata_search(filter_dict)
+            s.set(documents=len(matched_docs))
+        
+        logging.debug("DEBUG: 메타데이터 검색 결과 %d개 문서 발견.", len(matched_docs))
+        return matched_docs
+
+    def __del__(self):
+        pass
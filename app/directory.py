@@ -0,0 +1,313 @@
+# app/directory.py
+"""
+연락처·기관 디렉토리.
+
+코퍼스 메타데이터의 연락처 정보를 지역/기관별로 색인하여, "서울 지역 정신건강복지센터 연락처" 같은
+연락처 질문에 LLM 없이 표로 답합니다. (전화번호를 생성하지 않으므로 잘못된 번호가 나올 수 없습니다)
+
+- 기관/센터명 : 기관명, 센터명, 시설명 (없으면 사업명)
+- 연락처      : 전화번호, 연락처, 문의처
+- 지역        : 시도, 지역, 시·도명 → 표준 시·도명으로 정규화 (약칭, 옛 명칭, 오타 허용)
+- 시·군·구    : 시·군·구명 (담당 시·군·구 목록, '(전체)'면 시·도 전체)
+- 주소        : 주소, 소재지
+
+질문의 "<도> <시·군>" (예: '경기 광주')은 도 안의 시·군으로 해석합니다. (광주광역시로 보지 않음)
+기관/센터를 언급했는데 일치하는 항목이 없으면 지역 전체 목록을 내놓지 않고 일반 검색으로 넘깁니다.
+"""
+import re
+import difflib
+import logging
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from langchain_core.documents import Document
+
+# 표준 시·도명 → 별칭 (질문에서 찾을 때는 긴 별칭부터 비교합니다)
+REGION_ALIASES: Dict[str, Tuple[str, ...]] = {
+    "서울특별시": ("서울", "서울시"),
+    "부산광역시": ("부산", "부산시"),
+    "대구광역시": ("대구", "대구시"),
+    "인천광역시": ("인천", "인천시"),
+    "광주광역시": ("광주", "광주시"),
+    "대전광역시": ("대전", "대전시"),
+    "울산광역시": ("울산", "울산시"),
+    "세종특별자치시": ("세종", "세종시"),
+    "경기도": ("경기",),
+    "강원특별자치도": ("강원", "강원도"),
+    "충청북도": ("충북",),
+    "충청남도": ("충남",),
+    "전북특별자치도": ("전북", "전라북도"),
+    "전라남도": ("전남",),
+    "경상북도": ("경북",),
+    "경상남도": ("경남",),
+    "제주특별자치도": ("제주", "제주도"),
+}
+_ALIAS_TO_REGION = {alias: region for region, aliases in REGION_ALIASES.items() for alias in (region,) + aliases}
+_ALIASES_BY_LENGTH = sorted(_ALIAS_TO_REGION, key=len, reverse=True)
+# 오타 허용 비교 기준 (3글자 이상 단어만)
+REGION_FUZZY_CUTOFF = 0.75
+
+# 연락처 질문으로 판단하는 표현 ('어디서 신청' 같은 신청 방법 질문은 일반 검색으로 보냅니다)
+CONTACT_INTENT_TERMS = ("연락처", "전화번호", "전화", "번호", "주소", "위치", "문의처", "연락")
+# 대상 기관을 고를 때 무시하는 일반적인 단어
+GENERIC_TERMS = frozenset({"지역", "지원", "서비스", "제도", "사업", "복지", "알려", "알려줘", "알려주세요", "있나요", "뭐예요", "어떻게"})
+_PARTICLES = ("에서", "으로", "에게", "까지", "부터", "은", "는", "이", "가", "을", "를", "의", "에", "로", "도", "좀", "요")
+_TOKEN_SPLIT = re.compile(r"[\s,./?!·()\[\]'\"~]+")
+
+# 표가 너무 길면 디렉토리 답변 대신 일반 검색으로 넘깁니다.
+MAX_ROWS = 20
+
+_NAME_FIELDS = ("기관명", "센터명", "시설명")
+_PHONE_FIELDS = ("전화번호", "연락처", "문의처")
+_REGION_FIELDS = ("시도", "지역", "시·도명")
+_DISTRICT_FIELD = "시·군·구명"
+_DISTRICT_SUFFIXES = ("시", "군", "구")
+_DISTRICT_NAME = re.compile(r"[가-힣]+[시군구]")
+_ADDRESS_FIELDS = ("주소", "소재지")
+_NOTE_FIELDS = ("제공서비스", "팩스")
+_NOTE_LABELS = {"팩스": "팩스 "}
+
+
+def _compact(text: str) -> str:
+    return re.sub(r"\s+", "", str(text or ""))
+
+
+def _first(metadata: dict, fields: Iterable[str]) -> Optional[str]:
+    for field in fields:
+        value = metadata.get(field)
+        if value:
+            return str(value).strip()
+    return None
+
+
+def normalize_region(name: Optional[str]) -> Optional[str]:
+    """지역명을 표준 시·도명으로 바꿉니다. (예: '서울' → '서울특별시', '전라북도' → '전북특별자치도', '경상남두' → '경상남도')"""
+    compact = _compact(name)
+    if not compact:
+        return None
+    if compact in _ALIAS_TO_REGION:
+        return _ALIAS_TO_REGION[compact]
+    if len(compact) >= 3:
+        close = difflib.get_close_matches(compact, [a for a in _ALIAS_TO_REGION if len(a) >= 3], n=1, cutoff=REGION_FUZZY_CUTOFF)
+        if close:
+            return _ALIAS_TO_REGION[close[0]]
+    return None
+
+
+def _tokens(question: str) -> List[str]:
+    tokens = []
+    for token in _TOKEN_SPLIT.split(question):
+        for particle in _PARTICLES:
+            if token.endswith(particle) and len(token) - len(particle) >= 2:
+                token = token[:-len(particle)]
+                break
+        if token:
+            tokens.append(token)
+    return tokens
+
+
+def district_base(name: str) -> str:
+    """시·군·구 이름에서 '시/군/구'를 뗀 이름 (예: '광주시' → '광주', '중구'는 그대로)"""
+    name = _compact(name)
+    if len(name) >= 3 and name.endswith(_DISTRICT_SUFFIXES):
+        return name[:-1]
+    return name
+
+
+def parse_districts(value: Optional[str]) -> Optional[frozenset]:
+    """
+    시·군·구명 값에서 담당 시·군·구 이름(시/군/구를 뗀 이름)을 뽑습니다.
+    '(전체)'이거나 목록이 없으면 None (시·도 전체로 봄)
+    """
+    listed = re.search(r"\(([^)]*)\)", str(value or ""))
+    if not listed or "전체" in listed.group(1):
+        return None
+    names = frozenset(district_base(name) for name in _DISTRICT_NAME.findall(listed.group(1)))
+    return names or None
+
+
+def find_district(question: str, known: Iterable[str] = ()) -> Optional[str]:
+    """
+    질문에 언급된 시·군·구 (시/군/구를 뗀 이름). 없으면 None
+    - 도 바로 뒤의 단어 (예: '경기 광주', '경기도 광주시', '강원 고성군')
+    - known(코퍼스의 담당 시·군·구)에 있는 단어 (예: '춘천시', '춘천')
+    """
+    tokens = _tokens(question)
+    for previous, token in zip(tokens, tokens[1:]):
+        province = normalize_region(previous)
+        if province and province.endswith("도") and (token.endswith(_DISTRICT_SUFFIXES) or token in _ALIAS_TO_REGION):
+            return district_base(token)
+    known = set(known)
+    for token in tokens:
+        if district_base(token) in known and normalize_region(token) is None:
+            return district_base(token)
+    return None
+
+
+def find_regions(question: str, district: Optional[str] = None) -> Set[str]:
+    """질문에 언급된 시·도 (표준 이름). district(도 안의 시·군)와 같은 이름은 시·도로 보지 않습니다."""
+    regions = set()
+    remaining = _compact(question)
+    if district:
+        remaining = re.sub(re.escape(district) + "[시군구]?", " ", remaining)
+    for alias in _ALIASES_BY_LENGTH:
+        if alias in remaining:
+            regions.add(_ALIAS_TO_REGION[alias])
+            remaining = remaining.replace(alias, " ")
+    if not regions:
+        for token in _tokens(question):
+            region = normalize_region(token) if district_base(token) != district else None
+            if region:
+                regions.add(region)
+    return regions
+
+
+def is_contact_question(question: str) -> bool:
+    compact = _compact(question)
+    return any(term in compact for term in CONTACT_INTENT_TERMS)
+
+
+@dataclass(frozen=True)
+class ContactEntry:
+    name: str
+    phone: str
+    region: Optional[str]
+    districts: Optional[frozenset]
+    address: Optional[str]
+    note: Optional[str]
+    service: Optional[str]
+    source_page: Optional[str]
+
+    @property
+    def search_text(self) -> str:
+        return _compact(" ".join(filter(None, (self.name, self.service, self.address, self.note))))
+
+    def serves(self, district: str) -> bool:
+        """담당 시·군·구 목록에 있거나, 목록이 없으면 기관명/주소에 그 시·군·구가 나오는지"""
+        if self.districts is not None:
+            return district in self.districts
+        return district in _compact(f"{self.name} {self.address or ''}")
+
+
+def entry_from_metadata(metadata: dict) -> Optional[ContactEntry]:
+    """연락처가 있는 청크 메타데이터를 디렉토리 항목으로 바꿉니다. 연락처가 없으면 None"""
+    phone = _first(metadata, _PHONE_FIELDS)
+    if not phone:
+        return None
+    return ContactEntry(
+        name=_first(metadata, _NAME_FIELDS) or metadata.get('사업명') or "",
+        phone=phone,
+        region=normalize_region(_first(metadata, _REGION_FIELDS)) or normalize_region(metadata.get(_DISTRICT_FIELD)),
+        districts=parse_districts(metadata.get(_DISTRICT_FIELD)),
+        address=_first(metadata, _ADDRESS_FIELDS),
+        note=next((_NOTE_LABELS.get(f, "") + str(metadata[f]).strip() for f in _NOTE_FIELDS if metadata.get(f)), None),
+        service=metadata.get('사업명'),
+        source_page=str(metadata['source_page']) if metadata.get('source_page') else None,
+    )
+
+
+@dataclass(frozen=True)
+class DirectoryResult:
+    entries: List[ContactEntry]
+    regions: Set[str]
+    terms: List[str]
+
+    def render(self) -> str:
+        """조회 결과를 마크다운 표와 출처로 만듭니다. (값이 있는 열만 표시)"""
+        columns = [("기관/센터", lambda e: e.name), ("지역", lambda e: e.region), ("연락처", lambda e: e.phone),
+                   ("주소", lambda e: e.address), ("비고", lambda e: e.note)]
+        columns = [(title, get) for title, get in columns if any(get(entry) for entry in self.entries)]
+        cell = lambda value: str(value or "").replace("|", "\\|").replace("\n", " ")
+        lines = [
+            "| " + " | ".join(title for title, _ in columns) + " |",
+            "|" + "---|" * len(columns),
+        ]
+        lines += ["| " + " | ".join(cell(get(entry)) for _, get in columns) + " |" for entry in self.entries]
+
+        header = "요청하신 연락처 정보입니다."
+        if self.regions and not any(entry.region in self.regions for entry in self.entries):
+            header = f"{', '.join(sorted(self.regions))} 지역별 연락처는 자료에 없어 전국 문의처를 안내해 드립니다."
+        pages = sorted({entry.source_page for entry in self.entries if entry.source_page}, key=lambda p: (len(p), p))
+        source = "「나에게 힘이 되는 복지서비스」" + (f" p.{', '.join(pages)}" if pages else "")
+        return f"{header}\n\n" + "\n".join(lines) + f"\n\n> 출처: {source}\n> 연락처는 변경될 수 있으니 방문 전 확인해주세요."
+
+
+class ContactDirectory:
+    """지역·기관별 연락처 색인. 스냅샷과 함께 한 번 만들고 변경하지 않습니다."""
+
+    def __init__(self, entries: List[ContactEntry], districts: Iterable[str] = ()):
+        self.entries = entries
+        self._by_region: Dict[Optional[str], List[int]] = {}
+        for position, entry in enumerate(entries):
+            self._by_region.setdefault(entry.region, []).append(position)
+        self._texts = [entry.search_text for entry in entries]
+        self._names = [_compact(entry.name) for entry in entries]
+        # 질문에서 시·군·구를 찾을 때 쓰는 이름 (코퍼스의 시·군·구명 필드에 나온 담당 시·군·구)
+        self._districts = frozenset(districts) | frozenset(name for entry in entries for name in entry.districts or ())
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    @classmethod
+    def from_documents(cls, docs: List[Document]) -> "ContactDirectory":
+        entries, seen, districts = [], set(), set()
+        for doc in docs:
+            districts.update(parse_districts(doc.metadata.get(_DISTRICT_FIELD)) or ())
+            entry = entry_from_metadata(doc.metadata)
+            if entry is None or (entry.name, entry.phone, entry.region) in seen:
+                continue
+            seen.add((entry.name, entry.phone, entry.region))
+            entries.append(entry)
+        return cls(entries, districts)
+
+    @property
+    def regions(self) -> List[str]:
+        return sorted(region for region in self._by_region if region)
+
+    def lookup(self, question: str) -> Optional[DirectoryResult]:
+        """
+        연락처 질문이면 언급된 기관/센터와 지역에 맞는 항목을 찾습니다.
+        연락처 질문이 아니거나, 대상 기관을 특정할 수 없거나, 결과가 MAX_ROWS를 넘으면 None
+        """
+        if not self.entries or not is_contact_question(question):
+            return None
+        district = find_district(question, self._districts)
+        regions = find_regions(question, district)
+        compact_question = _compact(question)
+        region_words = {alias for alias in _ALIAS_TO_REGION if alias in compact_question}
+        terms = [
+            token for token in _tokens(question)
+            if len(token) >= 2 and token not in GENERIC_TERMS and token not in region_words
+            and not any(term in token for term in CONTACT_INTENT_TERMS) and normalize_region(token) is None
+            and district_base(token) != district
+        ]
+
+        scores = []
+        for position, text in enumerate(self._texts):
+            name = self._names[position]
+            score = sum(1 for term in terms if term in text)
+            if len(name) >= 2 and name in compact_question:
+                score += 2
+            scores.append(score)
+        best = max(scores) if scores else 0
+        if best == 0:
+            if not regions or terms:
+                # 언급한 기관/센터가 디렉토리에 없으면 지역 전체 목록 대신 일반 검색으로 넘깁니다.
+                return None
+            # 기관을 특정하지 않은 지역 질문: 해당 지역 항목 전체 (예: '부산 연락처')
+            matched = [position for region in regions for position in self._by_region.get(region, [])]
+        else:
+            matched = [position for position, score in enumerate(scores) if score == best]
+            if regions:
+                in_region = [position for position in matched if self.entries[position].region in regions]
+                # 지역별 항목이 있으면 그 지역만, 없으면 전국(지역 없는) 항목으로 안내합니다.
+                matched = in_region or [position for position in matched if self.entries[position].region is None]
+        if district:
+            # 시·군·구까지 물었으면 그 시·군·구를 담당하는 항목만 남깁니다. (없으면 도 전체 목록 대신 일반 검색)
+            matched = [position for position in matched if self.entries[position].serves(district)]
+
+        if not matched or len(matched) > MAX_ROWS:
+            logging.debug("연락처 디렉토리: 결과 %d개 (지역 %s, 시·군·구 %s, 검색어 %s) → 일반 검색으로 진행",
+                          len(matched), regions, district, terms)
+            return None
+        return DirectoryResult([self.entries[position] for position in matched], regions, terms)
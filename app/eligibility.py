@@ -0,0 +1,397 @@
+# app/eligibility.py
+"""
+소득·가구원 수·나이·장애 여부 기준 자격 판정.
+
+인덱스 스냅샷을 로드할 때 코퍼스의 기준표와 자격 필드를 규칙으로 컴파일합니다.
+- 기준 중위소득 : '알려드립니다 - 용어 및 기준'의 '구분'='N인가구', '금액' 행 (급여별 'N인가구' 열이 있는 행은 해당 %의 고시 금액)
+- 소득 상한     : 소득기준, 중위소득_기준, 조건, 지원대상, 대상의 "기준 중위소득 N% 이하" / 선정기준액의 "단독가구 213만 원, 부부가구 …"
+- 나이 범위     : 대상, 지원대상, 연령의 "만 N세 이상/이하/미만", "만 N~M세"
+- 장애 요건     : 사업명에 '장애'가 들어간 사업
+
+규칙은 사업(사업명) 단위로 컴파일합니다. 한 사업의 청크(개요/대상/급여종류/방법/문의 …)는 함께 남기거나 함께 제외해,
+자격 기준 청크만 빠지고 신청 방법 청크가 남는 일이 없게 합니다.
+질문에서 뽑은 사실(가구원 수, 월 소득, 나이, 장애 여부)이 사업의 규칙을 수치상 명백히 위반할 때만 답변 생성 전에 제외합니다.
+청크나 필드마다 기준이 다르면 가장 넓은 기준을 쓰고, 사실이 없거나 애매하면 제외하지 않습니다. (잘못 빼는 것보다 남기는 편이 안전)
+"""
+import re
+import logging
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+_INCOME_FIELDS = ("소득기준", "중위소득_기준", "조건", "지원대상", "대상")
+_AGE_FIELDS = ("대상", "지원대상", "연령")
+_THRESHOLD_AMOUNT_FIELD = "선정기준액"
+
+_HOUSEHOLD_LABEL = re.compile(r"^(\d+)인\s*가구$")
+_BENEFIT_PERCENT = re.compile(r"중위\s*소득\s*(\d+(?:\.\d+)?)\s*%")
+_MEDIAN_CAP = re.compile(r"중위\s*소득\s*(\d+(?:\.\d+)?)\s*%\s*(?:\([^)]*\)\s*)?이하")
+_AMOUNT = re.compile(r"(\d[\d,]*(?:\.\d+)?)\s*(억|천만|백만|만|천)?")
+_AMOUNT_UNITS = {"억": 100_000_000, "천만": 10_000_000, "백만": 1_000_000, "만": 10_000, "천": 1_000, None: 1}
+_SINGLE_CAP = re.compile(r"단독\s*가구\s*:?\s*([\d,.\s억천백만]+원)")
+_COUPLE_CAP = re.compile(r"부부\s*가구\s*:?\s*([\d,.\s억천백만]+원)")
+
+_AGE_RANGE = re.compile(r"만\s*(\d{1,3})\s*(?:세)?\s*[~∼\-]\s*(?:만\s*)?(\d{1,3})\s*세")
+_AGE_BOUND = re.compile(r"(?<![~∼\-\d])(?:만\s*)?(\d{1,3})\s*세\s*(이상|이하|미만|초과)")
+_ALL_AGES = ("모든 연령", "모든연령", "연령 제한 없", "연령제한없")
+
+_NUMBER_WORDS = {"두": 2, "둘": 2, "세": 3, "셋": 3, "네": 4, "넷": 4, "다섯": 5, "여섯": 6, "일곱": 7, "여덟": 8}
+_HOUSEHOLD_PATTERNS = (
+    re.compile(r"(\d{1,2}|두|세|네|다섯|여섯|일곱|여덟)\s*(?:인|명|식구)\s*(?:가구|가족|가정|세대)"),
+    re.compile(r"(?:가족|식구|가구원)\s*(?:은|이|수는|수가)?\s*(\d{1,2}|두|세|네|다섯|여섯|일곱|여덟|둘|셋|넷)\s*(?:명|인|식구)?"),
+    re.compile(r"(\d{1,2}|두|세|네|다섯|여섯|일곱|여덟)\s*식구"),
+)
+_ALONE = re.compile(r"혼자\s*(?:살|사는|지내)|독거|1인\s*가구|홀로\s*(?:살|사는)")
+_INCOME = re.compile(
+    r"(연봉|연\s*소득|연\s*수입|연간\s*소득|연간\s*수입|월급|월\s*소득|월\s*수입|소득|수입|한\s*달(?:에)?|월)\s*"
+    r"(?:은|는|이|가|이\s*|약|대략|합쳐서|합해서|정도|\s)*"
+    r"((?:\d[\d,]*(?:\.\d+)?\s*(?:억|천만|백만|만|천)?\s*)+원?)"
+)
+# '월 30만원 월세'처럼 '월'·'한 달'만 붙은 금액은 월세·지원금일 수 있으므로, 같은 구절에서 번다는 말이 이어질 때만 소득으로 봅니다.
+_BARE_PERIOD = re.compile(r"^(?:한\s*달(?:에)?|월)$")
+_EARNING = re.compile(r"^[^,.?!\d]{0,12}?(?:벌|번다|버는|소득|수입|월급|급여|들어와|들어오)")
+_NOT_INCOME = re.compile(r"월세|임대료|보증금|관리비|지원금|수당")
+_AGE = re.compile(r"(?<!\d)(?:만\s*)?(\d{1,3})\s*(?:세|살)(?!대|\s*(?:이상|이하|미만|초과))")
+_AGE_DECADE = re.compile(r"(?<!\d)([1-9])0\s*대")
+# 다른 사람(가족)이 언급되면 질문 속 나이가 누구의 것인지 알 수 없으므로 나이 판정을 하지 않습니다.
+_OTHER_PERSON_TERMS = ("아이", "자녀", "아들", "딸", "아기", "부모", "어머니", "아버지", "엄마", "아빠", "할머니", "할아버지",
+                       "손자", "손녀", "남편", "아내", "배우자", "동생", "형", "누나", "언니", "오빠", "조카", "어르신")
+_NO_DISABILITY = re.compile(r"장애\s*(?:는|가|도)?\s*(?:없|아니)|비장애")
+_DISABILITY = re.compile(r"장애")
+_SHARED_DISABILITY = re.compile(r"[·ㆍ,]\s*\S*장애|장애\S*\s*[·ㆍ,]")
+
+# 소득인정액은 근로소득 공제로 실제 소득보다 작아질 수 있습니다. 코퍼스 사업 중 가장 큰 공제
+# (기초연금: 근로소득에서 112만 원을 빼고 나머지의 30%를 추가로 공제)를 적용해도 상한을 넘을 때만 소득으로 제외합니다.
+EARNED_INCOME_BASIC_DEDUCTION = 1_120_000
+EARNED_INCOME_DEDUCTION_RATE = 0.3
+
+
+def parse_krw(text: str) -> Optional[int]:
+    """한국어 금액 표기를 원 단위 정수로 바꿉니다. (예: '340만 8,000원' → 3408000, '3,682,609' → 3682609)"""
+    total, found = 0.0, False
+    for number, unit in _AMOUNT.findall(str(text or "")):
+        try:
+            value = float(number.replace(",", ""))
+        except ValueError:
+            continue
+        total += value * _AMOUNT_UNITS[unit or None]
+        found = True
+    return int(round(total)) if found else None
+
+
+@dataclass(frozen=True)
+class MedianIncomeTable:
+    """가구원 수별 기준 중위소득(월)과 급여별 고시 금액"""
+    amounts: Dict[int, int]
+    # 중위소득 % → 가구원 수별 고시 금액 (예: 32.0 → {1: 713102, ...}), 반올림 차이 없이 고시 금액을 그대로 씁니다.
+    published: Dict[float, Dict[int, int]] = field(default_factory=dict)
+
+    def __bool__(self) -> bool:
+        return bool(self.amounts)
+
+    def median(self, household_size: int) -> Optional[int]:
+        """기준 중위소득. 표보다 큰 가구는 마지막 가구원 1명당 증가액을 더합니다. (고시 방식과 같음)"""
+        if not self.amounts or household_size < 1:
+            return None
+        if household_size in self.amounts:
+            return self.amounts[household_size]
+        largest = max(self.amounts)
+        if household_size < largest:
+            return None
+        step = self.amounts[largest] - self.amounts.get(largest - 1, self.amounts[largest])
+        return self.amounts[largest] + step * (household_size - largest)
+
+    def threshold(self, percent: float, household_size: int) -> Optional[int]:
+        """기준 중위소득 percent% 금액 (고시 금액이 있으면 그 금액)"""
+        published = self.published.get(percent, {}).get(household_size)
+        if published is not None:
+            return published
+        median = self.median(household_size)
+        return int(median * percent / 100) if median is not None else None
+
+    @classmethod
+    def from_documents(cls, docs: Iterable[Document]) -> "MedianIncomeTable":
+        amounts: Dict[int, int] = {}
+        published: Dict[float, Dict[int, int]] = {}
+        for doc in docs:
+            metadata = doc.metadata
+            label = str(metadata.get('구분') or "").strip()
+            size = _HOUSEHOLD_LABEL.match(label)
+            if size and metadata.get('금액'):
+                amount = parse_krw(metadata['금액'])
+                if amount:
+                    amounts[int(size.group(1))] = amount
+                continue
+            percent = _BENEFIT_PERCENT.search(label)
+            if percent:
+                row = {}
+                for key, value in metadata.items():
+                    column = _HOUSEHOLD_LABEL.match(str(key))
+                    amount = parse_krw(value) if column else None
+                    if amount:
+                        row[int(column.group(1))] = amount
+                if row:
+                    published[float(percent.group(1))] = row
+        return cls(amounts, published)
+
+
+@dataclass(frozen=True)
+class EligibilityRule:
+    """청크(또는 사업) 하나의 자격 규칙. None인 기준은 판정하지 않습니다."""
+    max_median_percent: Optional[float] = None
+    max_income_single: Optional[int] = None
+    max_income_couple: Optional[int] = None
+    min_age: Optional[int] = None
+    max_age: Optional[int] = None
+    requires_disability: bool = False
+
+    def __bool__(self) -> bool:
+        return any(value is not None for value in (
+            self.max_median_percent, self.max_income_single, self.max_income_couple, self.min_age, self.max_age,
+        )) or self.requires_disability
+
+
+def _income_cap(metadata: dict) -> Optional[float]:
+    caps = []
+    for name in _INCOME_FIELDS:
+        value = metadata.get(name)
+        if isinstance(value, str):
+            caps.extend(float(percent) for percent in _MEDIAN_CAP.findall(value))
+    return max(caps) if caps else None
+
+
+def _age_range(text: str) -> Optional[Tuple[Optional[int], Optional[int]]]:
+    """
+    필드 하나의 나이 범위 (언급이 여러 개면 모두를 포함하는 범위, 제한이 없으면 None)
+    나이 조건으로 시작하는 필드만 판정합니다. '등록장애인, 만 65세 이상'이나 '6세 이하 자녀가 있는 …'처럼
+    나이가 여러 대상 중 하나이거나 다른 사람의 나이인 경우는 규칙으로 만들지 않습니다.
+    """
+    text = text.strip().lstrip("([{'\"")
+    if any(term in text for term in _ALL_AGES) or not (_AGE_RANGE.match(text) or _AGE_BOUND.match(text)):
+        return None
+    intervals = [(int(lo), int(hi)) for lo, hi in _AGE_RANGE.findall(text)]
+    remaining = _AGE_RANGE.sub(" ", text)
+    for age, bound in _AGE_BOUND.findall(remaining):
+        age = int(age)
+        intervals.append({
+            "이상": (age, None), "초과": (age + 1, None), "이하": (None, age), "미만": (None, age - 1),
+        }[bound])
+    if not intervals:
+        return None
+    lows, highs = [lo for lo, _ in intervals], [hi for _, hi in intervals]
+    low = None if None in lows else min(lows)
+    high = None if None in highs else max(highs)
+    return (low, high) if (low, high) != (None, None) else None
+
+
+def _requires_disability(service_name: str) -> bool:
+    """장애인 대상 사업인지 ('독거노인·장애인 …'처럼 다른 대상과 함께 나열된 사업은 제외)"""
+    return "장애" in service_name and not _SHARED_DISABILITY.search(service_name)
+
+
+def rule_from_metadata(metadata: dict) -> Optional[EligibilityRule]:
+    """청크 메타데이터에서 자격 규칙을 만듭니다. 판정할 기준이 없으면 None"""
+    single = couple = None
+    amount_text = metadata.get(_THRESHOLD_AMOUNT_FIELD)
+    if isinstance(amount_text, str):
+        single_match, couple_match = _SINGLE_CAP.search(amount_text), _COUPLE_CAP.search(amount_text)
+        single = parse_krw(single_match.group(1)) if single_match else None
+        couple = parse_krw(couple_match.group(1)) if couple_match else None
+
+    low = high = None
+    ranges = [_age_range(metadata[name]) for name in _AGE_FIELDS if isinstance(metadata.get(name), str)]
+    ranges = [r for r in ranges if r is not None]
+    if ranges:
+        # 필드마다 다른 조건이 있으면 모두 만족해야 하므로 범위를 교차합니다.
+        lows = [lo for lo, _ in ranges if lo is not None]
+        highs = [hi for _, hi in ranges if hi is not None]
+        low, high = (max(lows) if lows else None), (min(highs) if highs else None)
+        if low is not None and high is not None and low > high:
+            low = high = None
+
+    rule = EligibilityRule(
+        max_median_percent=_income_cap(metadata),
+        max_income_single=single,
+        max_income_couple=couple,
+        min_age=low,
+        max_age=high,
+        requires_disability=_requires_disability(str(metadata.get('사업명') or "")),
+    )
+    return rule if rule else None
+
+
+def _widest(values: List[Optional[int]], pick) -> Optional[int]:
+    """기준을 정의한 청크들 중 가장 넓은 값 (하나라도 제한이 없으면 None)"""
+    return None if not values or None in values else pick(values)
+
+
+def merge_rules(rules: Iterable[Optional[EligibilityRule]]) -> Optional[EligibilityRule]:
+    """
+    한 사업의 청크별 규칙을 사업 규칙 하나로 합칩니다. 기준마다 그 기준을 정의한 청크들 중 가장 넓은 값을 씁니다.
+    (예: 청크 A는 만 65세 이상, 청크 B는 나이 언급 없음 → 만 65세 이상)
+    """
+    rules = [rule for rule in rules if rule]
+    if not rules:
+        return None
+    ages = [rule for rule in rules if rule.min_age is not None or rule.max_age is not None]
+    merged = EligibilityRule(
+        max_median_percent=max((r.max_median_percent for r in rules if r.max_median_percent is not None), default=None),
+        max_income_single=max((r.max_income_single for r in rules if r.max_income_single is not None), default=None),
+        max_income_couple=max((r.max_income_couple for r in rules if r.max_income_couple is not None), default=None),
+        min_age=_widest([rule.min_age for rule in ages], min),
+        max_age=_widest([rule.max_age for rule in ages], max),
+        requires_disability=all(rule.requires_disability for rule in rules),
+    )
+    return merged if merged else None
+
+
+def recognized_income_floor(monthly_income: int) -> int:
+    """근로소득 공제를 최대로 적용했을 때의 소득인정액 하한 (재산 환산액은 모르므로 0으로 봄)"""
+    return int(max(monthly_income - EARNED_INCOME_BASIC_DEDUCTION, 0) * (1 - EARNED_INCOME_DEDUCTION_RATE))
+
+
+@dataclass(frozen=True)
+class Facts:
+    """질문에서 뽑은 자격 판정용 사실 (모르는 값은 None)"""
+    household_size: Optional[int] = None
+    monthly_income: Optional[int] = None
+    ages: Tuple[Tuple[int, int], ...] = ()
+    disabled: Optional[bool] = None
+
+    def __bool__(self) -> bool:
+        return self.household_size is not None or self.monthly_income is not None or bool(self.ages) or self.disabled is not None
+
+    def as_dict(self) -> dict:
+        return {"household_size": self.household_size, "monthly_income": self.monthly_income,
+                "ages": list(self.ages), "disabled": self.disabled}
+
+
+def _count(word: str) -> Optional[int]:
+    return int(word) if word.isdigit() else _NUMBER_WORDS.get(word)
+
+
+def extract_facts(question: str) -> Facts:
+    """
+    질문에서 가구원 수, 월 소득(연 소득은 12로 나눔), 나이, 장애 여부를 정규식으로 뽑습니다.
+    (예: '2인 가구 월 소득 250만원, 67세' → 가구원 2명, 월 2,500,000원, 67세)
+    """
+    text = str(question or "")
+    household = None
+    if _ALONE.search(text):
+        household = 1
+    for pattern in _HOUSEHOLD_PATTERNS:
+        match = pattern.search(text)
+        if match:
+            household = _count(match.group(1)) or household
+            break
+
+    income = None
+    for match in _INCOME.finditer(text):
+        keyword, amount_text = match.groups()
+        if not re.search(r"억|만|천|원", amount_text):
+            continue  # '월 2회' 같은 단위 없는 숫자는 금액이 아닙니다.
+        if _BARE_PERIOD.match(keyword):
+            earning = _EARNING.search(text[match.end():])
+            if not earning or _NOT_INCOME.search(earning.group(0)):
+                continue  # '월 30만원 월세 지원'처럼 소득이 아닌 금액입니다.
+        amount = parse_krw(amount_text)
+        if amount:
+            income = amount // 12 if keyword.replace(" ", "").startswith("연") else amount
+            break
+
+    ages: List[Tuple[int, int]] = []
+    if not any(term in text for term in _OTHER_PERSON_TERMS):
+        ages = [(int(age), int(age)) for age in _AGE.findall(text) if int(age) <= 120]
+        ages += [(int(decade) * 10, int(decade) * 10 + 9) for decade in _AGE_DECADE.findall(text)]
+
+    disabled = None
+    if _NO_DISABILITY.search(text):
+        disabled = False
+    elif _DISABILITY.search(text):
+        disabled = True
+    return Facts(household, income, tuple(ages), disabled)
+
+
+@dataclass(frozen=True)
+class EligibilityResult:
+    facts: Facts
+    kept: List[Document]
+    pruned: Dict[str, int]  # 제외 사유(income/age/disability)별 청크 수
+
+    @property
+    def pruned_count(self) -> int:
+        return sum(self.pruned.values())
+
+
+class EligibilityEngine:
+    """스냅샷 문서에서 컴파일한 자격 규칙. 스냅샷과 함께 한 번 만들고 변경하지 않습니다."""
+
+    def __init__(self, table: MedianIncomeTable, rules: Dict[str, Optional[EligibilityRule]]):
+        self.table = table
+        # 사업명 → 사업 규칙 (그 사업의 모든 청크 규칙을 합친 것)
+        self._rules = rules
+
+    def __len__(self) -> int:
+        return sum(1 for rule in self._rules.values() if rule)
+
+    @classmethod
+    def from_documents(cls, docs: List[Document]) -> "EligibilityEngine":
+        table = MedianIncomeTable.from_documents(docs)
+        if not table:
+            logging.warning("코퍼스에서 기준 중위소득 표를 찾지 못해 소득 비율 판정을 하지 않습니다.")
+        by_service: Dict[str, List[Optional[EligibilityRule]]] = {}
+        for doc in docs:
+            service = doc.metadata.get('사업명')
+            if service:
+                by_service.setdefault(service, []).append(rule_from_metadata(doc.metadata))
+        return cls(table, {service: merge_rules(rules) for service, rules in by_service.items()})
+
+    def rule_for(self, doc: Document) -> Optional[EligibilityRule]:
+        """청크가 속한 사업의 규칙 (사업명이 없거나 스냅샷에 없는 사업이면 청크 자체의 규칙)"""
+        service = doc.metadata.get('사업명')
+        if service in self._rules:
+            return self._rules[service]
+        return rule_from_metadata(doc.metadata)
+
+    def violation(self, rule: EligibilityRule, facts: Facts) -> Optional[str]:
+        """사실이 규칙을 명백히 위반하면 사유(income/age/disability), 아니면 None"""
+        if facts.monthly_income is not None and facts.household_size:
+            caps = []
+            if rule.max_median_percent is not None:
+                caps.append(self.table.threshold(rule.max_median_percent, facts.household_size))
+            if rule.max_income_single is not None or rule.max_income_couple is not None:
+                single_cap = rule.max_income_single if facts.household_size == 1 else None
+                caps.append(single_cap or rule.max_income_couple or rule.max_income_single)
+            caps = [cap for cap in caps if cap is not None]
+            # 상한은 소득인정액 기준이므로 실제 소득이 아니라 공제 후 하한이 상한을 넘을 때만 제외합니다.
+            if caps and recognized_income_floor(facts.monthly_income) > max(caps):
+                return "income"
+        if facts.ages and (rule.min_age is not None or rule.max_age is not None):
+            low = rule.min_age if rule.min_age is not None else 0
+            high = rule.max_age if rule.max_age is not None else 200
+            if not any(age_low <= high and age_high >= low for age_low, age_high in facts.ages):
+                return "age"
+        if rule.requires_disability and facts.disabled is False:
+            return "disability"
+        return None
+
+    def prune(self, docs: List[Document], facts: Facts) -> EligibilityResult:
+        """규칙을 명백히 위반하는 사업의 청크를 모두 뺀 목록을 반환합니다. (순서 유지, 사업별로 한 번만 판정)"""
+        if not facts:
+            return EligibilityResult(facts, list(docs), {})
+        kept, pruned, verdicts = [], {}, {}
+        for doc in docs:
+            service = doc.metadata.get('사업명')
+            if service is not None and service in verdicts:
+                reason = verdicts[service]
+            else:
+                rule = self.rule_for(doc)
+                reason = self.violation(rule, facts) if rule else None
+                if service is not None:
+                    verdicts[service] = reason
+            if reason is None:
+                kept.append(doc)
+            else:
+                pruned[reason] = pruned.get(reason, 0) + 1
+        return EligibilityResult(facts, kept, pruned)
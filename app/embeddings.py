@@ -0,0 +1,109 @@
+# app/embeddings.py
+"""
+임베딩 모델 팩토리.
+로컬 임베딩(BGE-M3, Ollama)은 배포 환경에 의존성이 없을 수 있으므로 선택 시점에만 임포트합니다.
+"""
+import logging
+import threading
+from typing import Callable, List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+EMBEDDING_TYPES = ("google", "bge", "ollama")
+
+
+def get_embeddings(embedding_type: str = "google") -> Embeddings:
+    """embedding_type('google' | 'bge' | 'ollama')에 맞는 임베딩 인스턴스를 반환합니다."""
+    embedding_type = embedding_type.lower()
+    if embedding_type == "google":
+        from .google_embeddings import get_google_embeddings
+        return get_google_embeddings()
+    if embedding_type == "bge":
+        from .local_embeddings import get_local_embeddings
+        return get_local_embeddings()
+    if embedding_type == "ollama":
+        from .ollama_embeddings import get_ollama_embeddings
+        return get_ollama_embeddings()
+    raise ValueError(f"지원하지 않는 임베딩 타입입니다: {embedding_type} (선택 가능: {EMBEDDING_TYPES})")
+
+
+def embedding_model_name(embeddings: Embeddings) -> str:
+    """임베딩 인스턴스가 사용하는 모델 이름 (매니페스트 기록 및 호환성 검사용)"""
+    if isinstance(embeddings, LazyEmbeddings):
+        embeddings = embeddings.get()
+    return getattr(embeddings, "model_name", None) or getattr(embeddings, "model", None) or type(embeddings).__name__
+
+
+def embedding_normalization(embeddings: Embeddings) -> Optional[str]:
+    """임베딩 인스턴스가 벡터를 정규화하는 방식 (예: 'l2'). 선언하지 않은 모델은 None"""
+    if isinstance(embeddings, LazyEmbeddings):
+        embeddings = embeddings.get()
+    return getattr(embeddings, "normalization", None)
+
+
+class LazyEmbeddings(Embeddings):
+    """
+    실제 임베딩 모델을 첫 임베딩 요청 시점에 로드하는 래퍼.
+    메타데이터 검색만 하는 요청은 모델(또는 API 클라이언트)을 전혀 로드하지 않습니다.
+    expected_model/expected_dimension이 주어지면 로드 후 인덱스와 호환되는지 검사합니다.
+    """
+
+    def __init__(
+        self,
+        embedding_type: str = "google",
+        loader: Optional[Callable[[], Embeddings]] = None,
+        expected_model: Optional[str] = None,
+        expected_dimension: Optional[int] = None,
+        expected_normalization: Optional[str] = None,
+    ):
+        self.embedding_type = embedding_type
+        self._loader = loader or (lambda: get_embeddings(embedding_type))
+        self.expected_model = expected_model
+        self.expected_dimension = expected_dimension
+        self.expected_normalization = expected_normalization
+        self._embeddings: Optional[Embeddings] = None
+        self._dimension_checked = expected_dimension is None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._embeddings is not None
+
+    def get(self) -> Embeddings:
+        if self._embeddings is None:
+            with self._lock:
+                if self._embeddings is None:
+                    logging.info(f"'{self.embedding_type}' 임베딩 모델을 로드합니다. (첫 벡터 검색 요청)")
+                    embeddings = self._loader()
+                    model = getattr(embeddings, "model_name", None) or getattr(embeddings, "model", None)
+                    if self.expected_model and model and model != self.expected_model:
+                        raise ValueError(
+                            f"인덱스는 '{self.expected_model}' 모델로 구축되었지만 현재 임베딩 모델은 '{model}'입니다."
+                        )
+                    # 질의 벡터와 저장된 벡터의 정규화가 다르면 L2 거리 순위가 달라집니다.
+                    normalization = getattr(embeddings, "normalization", None)
+                    if normalization != self.expected_normalization:
+                        raise ValueError(
+                            f"인덱스의 벡터 정규화({self.expected_normalization or '없음'})가 현재 임베딩 모델"
+                            f"({normalization or '없음'})과 다릅니다. 인덱스를 다시 구축하세요."
+                        )
+                    self._embeddings = embeddings
+        return self._embeddings
+
+    def _check_dimension(self, vector: List[float]) -> List[float]:
+        if not self._dimension_checked:
+            if len(vector) != self.expected_dimension:
+                raise ValueError(
+                    f"임베딩 차원({len(vector)})이 인덱스 차원({self.expected_dimension})과 다릅니다."
+                )
+            self._dimension_checked = True
+        return vector
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors = self.get().embed_documents(texts)
+        if vectors:
+            self._check_dimension(vectors[0])
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._check_dimension(self.get().embed_query(text))
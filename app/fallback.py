@@ -0,0 +1,82 @@
+# app/fallback.py
+"""
+검색 결과가 없을 때의 안내 답변.
+
+코퍼스의 '책 안에 어떤 내용이 담겨 있나요?'(항목 'sections') 청크에는 전체 복지서비스 분야
+(분야명, 설명, 대표 사업과 쪽수)가 정리되어 있습니다. 인덱스 스냅샷을 로드할 때 이 청크로 안내 답변을
+한 번 만들어 두고, 검색 결과가 없는 질문에는 LLM 호출 없이 그대로 반환합니다.
+"""
+import ast
+import json
+import logging
+from typing import List, Optional
+
+from langchain_core.documents import Document
+
+FALLBACK_SERVICE_NAME = "책 안에 어떤 내용이 담겨 있나요?"
+FALLBACK_ITEM = "sections"
+
+FALLBACK_HEADER = "문의하신 내용에 꼭 맞는 서비스를 찾지 못했지만, 제가 도와드릴 수 있는 전체 복지 서비스 분야는 다음과 같습니다."
+FALLBACK_CLOSING = "더 궁금한 점이 있으시면 위 분야를 참고하여 다시 질문해주세요!"
+
+
+def is_fallback_entry(metadata: dict) -> bool:
+    return metadata.get('사업명') == FALLBACK_SERVICE_NAME and metadata.get('항목') == FALLBACK_ITEM
+
+
+def parse_categories(value) -> List[dict]:
+    """metadata['categories'] (JSON 또는 파이썬 리터럴 문자열)를 분야 목록으로 바꿉니다."""
+    if isinstance(value, list):
+        return [item for item in value if isinstance(item, dict)]
+    if not isinstance(value, str) or not value.strip():
+        return []
+    for parse in (json.loads, ast.literal_eval):
+        try:
+            parsed = parse(value)
+        except (ValueError, SyntaxError, TypeError):
+            continue
+        if isinstance(parsed, list):
+            return [item for item in parsed if isinstance(item, dict)]
+    return []
+
+
+def category_lines(docs: List[Document]) -> List[str]:
+    """안내 청크들의 분야를 '- **분야**: 설명 (예: …)' 목록으로 만듭니다. (분야명 기준 중복 제거)"""
+    lines, seen = [], set()
+    for doc in docs:
+        for category in parse_categories(doc.metadata.get('categories')):
+            name = str(category.get('category') or "").strip()
+            if not name or name in seen:
+                continue
+            seen.add(name)
+            line = f"- **{name}**: {str(category.get('description') or '').strip()}"
+            if category.get('examples'):
+                line += f" (예: {str(category['examples']).strip()})"
+            lines.append(line)
+    return lines
+
+
+def fallback_context(docs: List[Document]) -> str:
+    """개인화 폴백 답변(LLM)에 넘길 '전체 서비스 분야 정보'. 분야를 읽을 수 없으면 원문을 사용합니다."""
+    lines = category_lines(docs)
+    if not lines:
+        return "\n".join(doc.page_content for doc in docs)
+    extra = next((doc.metadata['other_support'] for doc in docs if doc.metadata.get('other_support')), None)
+    return "\n".join(lines + ([f"- {extra}"] if extra else []))
+
+
+def render_fallback_answer(docs: List[Document]) -> Optional[str]:
+    """전체 문서에서 안내 청크를 찾아 정적 안내 답변(마크다운)을 만듭니다. 분야 정보가 없으면 None"""
+    sections = [doc for doc in docs if is_fallback_entry(doc.metadata)]
+    lines = category_lines(sections)
+    if not lines:
+        logging.warning(f"'{FALLBACK_SERVICE_NAME}' 분야 정보를 찾지 못해 정적 안내 답변을 만들지 않습니다.")
+        return None
+    parts = [FALLBACK_HEADER, "\n".join(lines)]
+    extra = next((doc.metadata['other_support'] for doc in sections if doc.metadata.get('other_support')), None)
+    if extra:
+        parts.append(str(extra).strip())
+    page = next((doc.metadata['source_page'] for doc in sections if doc.metadata.get('source_page')), None)
+    parts.append("> 출처: 「나에게 힘이 되는 복지서비스」" + (f" p.{page}" if page else ""))
+    parts.append(FALLBACK_CLOSING)
+    return "\n\n".join(parts)
@@ -0,0 +1,159 @@
+# app/faq.py
+"""
+코퍼스의 '자주하는 질문'(metadata['질문'], metadata['답변']) 직접 답변.
+
+인덱스 스냅샷을 로드할 때 질문/답변 쌍을 두 가지 방식으로 색인합니다.
+- 어휘: 공백/문장부호를 제거한 질문의 글자 2-gram 집합 (Dice 계수)
+- 임베딩: 본 인덱스에 저장된 해당 청크 벡터를 재사용 (임베딩 호출 없음, 코사인 유사도)
+
+사용자 질문이 FAQ 질문과 어휘적으로 충분히 같으면(lexical_threshold) 바로 답하고,
+어휘 점수가 애매한 구간(LEXICAL_FLOOR 이상)일 때만 질의를 임베딩해 의미 유사도(semantic_threshold)로 확인합니다.
+일치하면 챗봇은 LLM 호출 없이 큐레이션된 답변을 출처와 함께 반환합니다.
+"""
+import re
+import logging
+from dataclasses import dataclass
+from typing import Callable, FrozenSet, List, Optional
+
+import numpy as np
+from langchain_core.documents import Document
+
+# 어휘 일치만으로 답할 Dice 계수, 의미 확인을 시도할 최소 어휘 점수, 의미 일치로 인정할 코사인 유사도
+DEFAULT_LEXICAL_THRESHOLD = 0.8
+LEXICAL_FLOOR = 0.35
+DEFAULT_SEMANTIC_THRESHOLD = 0.9
+
+_NON_WORD = re.compile(r"[\W_]+")
+
+
+def normalize_question(text: str) -> str:
+    """비교용 정규화: 소문자, 공백/문장부호 제거"""
+    return _NON_WORD.sub("", (text or "").lower())
+
+
+def _bigrams(text: str) -> FrozenSet[str]:
+    normalized = normalize_question(text)
+    if len(normalized) < 2:
+        return frozenset([normalized]) if normalized else frozenset()
+    return frozenset(normalized[i:i + 2] for i in range(len(normalized) - 1))
+
+
+def dice(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return 2.0 * len(a & b) / (len(a) + len(b))
+
+
+def is_faq_entry(metadata: dict) -> bool:
+    return bool(metadata.get('질문')) and bool(metadata.get('답변'))
+
+
+@dataclass(frozen=True)
+class FaqMatch:
+    """FAQ 일치 결과"""
+    question: str
+    answer: str
+    document: Document
+    method: str  # "lexical" | "semantic"
+    lexical_score: float
+    semantic_score: Optional[float] = None
+
+    def format_answer(self) -> str:
+        """큐레이션된 답변을 출처(사업명, 쪽수)와 함께 마크다운으로 만듭니다."""
+        metadata = self.document.metadata
+        source = "「나에게 힘이 되는 복지서비스」"
+        if metadata.get('사업명'):
+            source += f" {metadata['사업명']}"
+        source += " · 자주하는 질문"
+        if metadata.get('source_page'):
+            source += f" (p.{metadata['source_page']})"
+        return f"**Q. {self.question}**\n\n{self.answer}\n\n> 출처: {source}"
+
+
+class FaqIndex:
+    """질문/답변 쌍의 어휘·임베딩 색인. 스냅샷과 함께 한 번 만들고 변경하지 않습니다."""
+
+    def __init__(self, documents: List[Document], vectors: Optional[np.ndarray] = None):
+        self.documents = documents
+        self.questions = [doc.metadata['질문'] for doc in documents]
+        self._bigrams = [_bigrams(question) for question in self.questions]
+        self._vectors = None
+        if vectors is not None and len(vectors) == len(documents) and len(documents):
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            self._vectors = vectors / np.where(norms == 0, 1, norms)
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    @property
+    def has_vectors(self) -> bool:
+        return self._vectors is not None
+
+    @classmethod
+    def from_documents(cls, docs: List[Document], rows: List[int], index=None) -> "FaqIndex":
+        """
+        전체 문서에서 FAQ 청크를 골라 색인합니다. 같은 질문이 여러 청크에 있으면 처음 것만 사용합니다.
+        index가 주어지면 해당 행의 저장된 벡터를 복원해 의미 비교에 사용합니다. (복원할 수 없으면 어휘 비교만)
+        """
+        selected, selected_rows, seen = [], [], set()
+        for doc, row in zip(docs, rows):
+            if not is_faq_entry(doc.metadata):
+                continue
+            key = normalize_question(doc.metadata['질문'])
+            if not key or key in seen:
+                continue
+            seen.add(key)
+            selected.append(doc)
+            selected_rows.append(row)
+
+        vectors = None
+        if index is not None and selected_rows:
+            try:
+                vectors = np.vstack([index.reconstruct(int(row)) for row in selected_rows]).astype(np.float32)
+            except RuntimeError as e:
+                logging.warning(f"인덱스에서 FAQ 벡터를 복원할 수 없어 어휘 일치만 사용합니다: {e}")
+        return cls(selected, vectors)
+
+    def lexical_scores(self, question: str) -> List[float]:
+        query = _bigrams(question)
+        return [dice(query, candidate) for candidate in self._bigrams]
+
+    def match(
+        self,
+        question: str,
+        embed_query: Optional[Callable[[str], List[float]]] = None,
+        lexical_threshold: float = DEFAULT_LEXICAL_THRESHOLD,
+        semantic_threshold: float = DEFAULT_SEMANTIC_THRESHOLD,
+    ) -> Optional[FaqMatch]:
+        """질문과 일치하는 FAQ를 찾습니다. 임계값을 넘는 FAQ가 없으면 None"""
+        if not self.documents or not normalize_question(question):
+            return None
+        scores = self.lexical_scores(question)
+        best = int(np.argmax(scores))
+        if scores[best] >= lexical_threshold:
+            return self._match(best, "lexical", scores[best])
+
+        candidates = [i for i, score in enumerate(scores) if score >= LEXICAL_FLOOR]
+        if not candidates or embed_query is None or self._vectors is None:
+            return None
+        query = np.asarray(embed_query(question), dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm == 0 or query.shape[0] != self._vectors.shape[1]:
+            return None
+        similarities = self._vectors[candidates] @ (query / norm)
+        top = int(np.argmax(similarities))
+        if similarities[top] < semantic_threshold:
+            return None
+        position = candidates[top]
+        return self._match(position, "semantic", scores[position], float(similarities[top]))
+
+    def _match(self, position: int, method: str, lexical_score: float, semantic_score: Optional[float] = None) -> FaqMatch:
+        doc = self.documents[position]
+        return FaqMatch(
+            question=doc.metadata['질문'],
+            answer=doc.metadata['답변'],
+            document=doc,
+            method=method,
+            lexical_score=round(lexical_score, 4),
+            semantic_score=round(semantic_score, 4) if semantic_score is not None else None,
+        )
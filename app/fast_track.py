@@ -0,0 +1,45 @@
+# app/fast_track.py
+"""
+사용자 질문에서 사업명을 직접 탐지하는 Fast Track 탐지기.
+챗봇과 오프라인 평가 도구(scripts/evaluate_retrieval.py)가 함께 사용합니다.
+"""
+import logging
+from typing import List, Optional
+
+# 유사도 보조 검사의 기본 임계값
+FUZZY_THRESHOLD = 80
+
+
+def detect_fast_track_keyword(user_message: str, service_names: List[str], fuzzy_threshold: int = FUZZY_THRESHOLD) -> Optional[str]:
+    """
+    사용자 질문에서 특정 사업명을 '탐지'하여 그 이름을 반환합니다.
+    1단계는 정확 포함 검사, 2단계는 부분 문자열 유사도 검사입니다.
+    """
+    if not service_names: return None
+
+    normalized_message = user_message.replace(" ", "")
+
+    # 1단계: 정확성 우선 검사
+    for service_name in service_names:
+        if not service_name: continue
+        normalized_service_name = service_name.replace(" ", "")
+
+        # '서비스명'이 '사용자 질문'에 포함되어 있는지 확인합니다.
+        if normalized_service_name in normalized_message and len(normalized_service_name) > 2:
+            logging.debug("🚀 Fast Track 키워드 (정확성) 탐지! -> '%s'", service_name)
+            return service_name # 문서가 아닌 '사업명'을 반환
+
+    # 2단계: 유사도 보조 검사 (thefuzz는 정확 검사에서 찾지 못했을 때만 임포트합니다)
+    from thefuzz import fuzz
+    scores = {
+        name: fuzz.partial_ratio(normalized_message, name.replace(" ", ""))
+        for name in service_names if name
+    }
+    if not scores: return None
+
+    best_match = max(scores, key=scores.get)
+    if scores[best_match] >= fuzzy_threshold: # 임계값은 조정 가능
+        logging.debug("🚀 Fast Track 키워드 (유사도) 탐지! -> '%s'", best_match)
+        return best_match # 문서가 아닌 '사업명'을 반환
+
+    return None
@@ -0,0 +1,189 @@
+"""
+Google Generative Language embedding client (text-embedding-004) for bulk workloads
+"""
+import os
+import time
+import random
+import logging
+import threading
+import requests
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+from requests.adapters import HTTPAdapter
+from langchain_core.embeddings import Embeddings
+
+DEFAULT_BASE_URL = "https://generativelanguage.googleapis.com/v1beta"
+
+# batchEmbedContents accepts at most 100 contents per request
+MAX_BATCH_SIZE = 100
+
+# Status codes treated as transient and retried with backoff
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+class TokenBucket:
+    """Thread-safe token bucket; acquire() blocks until enough tokens are available"""
+
+    def __init__(self, rate_per_second: float, capacity: float):
+        self.rate = rate_per_second
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1):
+        if self.rate <= 0:
+            return
+        tokens = min(tokens, self.capacity)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+class GoogleEmbeddingError(RuntimeError):
+    """Raised when the embedding API returns a non-retryable error or retries are exhausted"""
+
+class GoogleBatchEmbeddings(Embeddings):
+    """
+    Batched, concurrent, rate-limited client for the Gemini embedding REST API.
+
+    Documents are split into batches of up to 100 texts and sent to
+    models/<model>:batchEmbedContents by at most max_concurrency threads. A token
+    bucket limits embedded texts per minute across all threads, 429/5xx responses
+    and connection errors are retried with exponential backoff (honouring
+    Retry-After), and results are returned in input order. base_url can point at a
+    local fake endpoint for testing.
+    """
+
+    def __init__(
+        self,
+        model: str = "models/text-embedding-004",
+        api_key: Optional[str] = None,
+        base_url: str = DEFAULT_BASE_URL,
+        batch_size: int = MAX_BATCH_SIZE,
+        max_concurrency: int = 4,
+        texts_per_minute: float = 1500,
+        max_retries: int = 5,
+        backoff_factor: float = 1.0,
+        max_backoff: float = 60,
+        timeout: float = 60,
+        document_task_type: str = "RETRIEVAL_DOCUMENT",
+        query_task_type: str = "RETRIEVAL_QUERY",
+    ):
+        """Initialize the client (api_key defaults to GOOGLE_API_KEY)"""
+        self.api_key = api_key or os.getenv("GOOGLE_API_KEY", "")
+        if not self.api_key:
+            raise ValueError("GOOGLE_API_KEY is not set")
+        self.model = model if model.startswith("models/") else f"models/{model}"
+        self.base_url = base_url.rstrip("/")
+        self.batch_size = max(1, min(batch_size, MAX_BATCH_SIZE))
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self.document_task_type = document_task_type
+        self.query_task_type = query_task_type
+        # Bucket holds one full batch so a single request never waits on its own size.
+        self.rate_limiter = TokenBucket(texts_per_minute / 60.0, capacity=self.batch_size)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_concurrency)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        logging.info(
+            f"Using Google embedding model: {self.model} (batch_size={self.batch_size}, "
+            f"max_concurrency={self.max_concurrency}, texts_per_minute={texts_per_minute})"
+        )
+
+    def _backoff(self, attempt: int, response: Optional[requests.Response]) -> float:
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after:
+            try:
+                return min(float(retry_after), self.max_backoff)
+            except ValueError:
+                pass
+        delay = self.backoff_factor * (2 ** attempt)
+        return min(delay + random.uniform(0, delay / 2), self.max_backoff)
+
+    def _embed_batch(self, texts: List[str], task_type: str) -> List[List[float]]:
+        """Embed one batch with rate limiting and retries"""
+        url = f"{self.base_url}/{self.model}:batchEmbedContents"
+        payload = {
+            "requests": [
+                {"model": self.model, "content": {"parts": [{"text": text}]}, "taskType": task_type}
+                for text in texts
+            ]
+        }
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.acquire(len(texts))
+            response = None
+            try:
+                response = self.session.post(
+                    url, json=payload, headers={"x-goog-api-key": self.api_key}, timeout=self.timeout
+                )
+                if response.status_code not in RETRY_STATUS_CODES:
+                    if not response.ok:
+                        raise GoogleEmbeddingError(
+                            f"Embedding request failed ({response.status_code}): {response.text[:500]}"
+                        )
+                    embeddings = [item["values"] for item in response.json()["embeddings"]]
+                    if len(embeddings) != len(texts):
+                        raise GoogleEmbeddingError(f"API returned {len(embeddings)} embeddings for {len(texts)} inputs")
+                    return embeddings
+                error = f"HTTP {response.status_code}"
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = f"{type(e).__name__}: {e}"
+            if attempt < self.max_retries:
+                delay = self._backoff(attempt, response)
+                logging.warning(f"Google embedding request failed ({error}); retrying in {delay:.1f}s")
+                time.sleep(delay)
+        raise GoogleEmbeddingError(f"Embedding request failed after {self.max_retries + 1} attempts ({error})")
+
+    def embed_documents_array(self, texts: List[str]) -> np.ndarray:
+        """Embed documents and return a float32 (n, dim) array in input order"""
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        try:
+            if len(batches) <= 1 or self.max_concurrency == 1:
+                results = [self._embed_batch(batch, self.document_task_type) for batch in batches]
+            else:
+                with ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="google-embed") as executor:
+                    results = list(executor.map(lambda batch: self._embed_batch(batch, self.document_task_type), batches))
+        except Exception as e:
+            logging.error(f"Error embedding documents with Google: {e}")
+            raise
+        vectors = [embedding for batch in results for embedding in batch]
+        return np.asarray(vectors, dtype=np.float32).reshape(len(vectors), -1)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed a list of documents (order preserved)"""
+        return self.embed_documents_array(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a single query"""
+        try:
+            return self._embed_batch([text], self.query_task_type)[0]
+        except Exception as e:
+            logging.error(f"Error embedding query with Google: {e}")
+            raise
+
+    def close(self):
+        """Close pooled connections"""
+        self.session.close()
+
+def get_google_embeddings() -> GoogleBatchEmbeddings:
+    """Get Google embeddings instance (configurable via GOOGLE_EMBED_* environment variables)"""
+    return GoogleBatchEmbeddings(
+        model=os.getenv("GOOGLE_EMBED_MODEL", "models/text-embedding-004"),
+        base_url=os.getenv("GOOGLE_API_BASE_URL", DEFAULT_BASE_URL),
+        batch_size=int(os.getenv("GOOGLE_EMBED_BATCH_SIZE", str(MAX_BATCH_SIZE))),
+        max_concurrency=int(os.getenv("GOOGLE_EMBED_CONCURRENCY", "4")),
+        texts_per_minute=float(os.getenv("GOOGLE_EMBED_TEXTS_PER_MINUTE", "1500")),
+        max_retries=int(os.getenv("MAX_RETRIES", "3")),
+        timeout=float(os.getenv("GOOGLE_EMBED_TIMEOUT", "60")),
+    )
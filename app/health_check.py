@@ -1,77 +1,310 @@
-"""
-Health check utilities for Welfare Chatbot
-"""
-import os
-import logging
-from pathlib import Path
-from typing import Dict, Any
-
-def check_system_health() -> Dict[str, Any]:
-    """Perform comprehensive system health check"""
-    health_status = {
-        "status": "healthy",
-        "checks": {},
-        "errors": []
-    }
-
-    try:
-        # Check environment variables
-        api_key = os.getenv("GOOGLE_API_KEY")
-        if not api_key or api_key == "your-google-api-key-here":
-            health_status["checks"]["api_key"] = "❌ Not configured"
-            health_status["errors"].append("Google API key not set")
-            health_status["status"] = "unhealthy"
-        else:
-            health_status["checks"]["api_key"] = "✅ Configured"
-
-        # Check FAISS database files
-        base_dir = Path(__file__).parent.parent
-        faiss_path = base_dir / "db" / "faiss_index"
-        if faiss_path.exists():
-            health_status["checks"]["faiss_db"] = "✅ Available"
-        else:
-            health_status["checks"]["faiss_db"] = "❌ Missing"
-            health_status["errors"].append("FAISS index files not found")
-            health_status["status"] = "unhealthy"
-
-        # Check data files
-        data_file = base_dir / "data" / "vd_base_v2_refined.json"
-        if data_file.exists():
-            health_status["checks"]["data_file"] = "✅ Available"
-        else:
-            health_status["checks"]["data_file"] = "❌ Missing"
-            health_status["errors"].append("Main data file not found")
-            health_status["status"] = "unhealthy"
-
-        # Check required directories
-        required_dirs = ["app", "db", "data"]
-        for dir_name in required_dirs:
-            dir_path = base_dir / dir_name
-            if dir_path.exists():
-                health_status["checks"][f"{dir_name}_dir"] = "✅ Available"
-            else:
-                health_status["checks"][f"{dir_name}_dir"] = "❌ Missing"
-                health_status["errors"].append(f"Required directory '{dir_name}' not found")
-                health_status["status"] = "unhealthy"
-
-        logging.info(f"Health check completed: {health_status['status']}")
-
-    except Exception as e:
-        logging.error(f"Health check failed: {e}")
-        health_status["status"] = "unhealthy"
-        health_status["errors"].append(f"Health check exception: {str(e)}")
-
-    return health_status
-
-def log_health_status(health_status: Dict[str, Any]):
-    """Log health check results"""
-    status = health_status["status"]
-    if status == "healthy":
-        logging.info("🟢 System health check: ALL SYSTEMS OPERATIONAL")
-    else:
-        logging.warning("🟡 System health check: ISSUES DETECTED")
-        for error in health_status["errors"]:
-            logging.warning(f"  ⚠️  {error}")
-
-    for check_name, result in health_status["checks"].items():
-        logging.info(f"  {check_name}: {result}")
\ No newline at end of file
+"""
+Health check utilities for Welfare Chatbot
+
+- check_system_health(): cheap startup check (configuration and files), run before the first paint.
+- check_readiness(): deep readiness probe that loads the selected index and runs a warm-up
+  query through the metadata, embedding and vector search paths (optionally the LLM),
+  measuring per-stage latency and resident memory against configurable budgets.
+  The latest result is served on /readyz by the metrics server.
+
+Only lightweight modules are imported here; DBService and the LLM are passed in by the caller.
+"""
+import os
+import sys
+import json
+import time
+import logging
+from contextlib import ExitStack
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+from .index_locator import MANIFEST_REQUIRED, get_faiss_path, missing_index_files, read_manifest, serving_problem
+from .telemetry import REGISTRY, set_readiness
+
+# Per-stage latency budgets in seconds ("rss_mb" is a memory budget in MiB, unset by default).
+# Override with READINESS_BUDGETS, e.g. "embedding=3,vector_search=0.5,rss_mb=2048".
+DEFAULT_READINESS_BUDGETS = {
+    "index_load": 60.0,
+    "metadata_search": 1.0,
+    "embedding": 10.0,
+    "vector_search": 2.0,
+    "llm": 20.0,
+}
+WARMUP_QUERY = "기초생활수급자 생계급여 신청 방법"
+WARMUP_LLM_PROMPT = "Reply with the single word OK."
+
+
+def check_system_health(embedding_type: str = "google") -> Dict[str, Any]:
+    """Perform comprehensive system health check"""
+    health_status = {
+        "status": "healthy",
+        "checks": {},
+        "errors": []
+    }
+
+    try:
+        # Check environment variables
+        api_key = os.getenv("GOOGLE_API_KEY")
+        if not api_key or api_key == "your-google-api-key-here":
+            health_status["checks"]["api_key"] = "❌ Not configured"
+            health_status["errors"].append("Google API key not set")
+            health_status["status"] = "unhealthy"
+        else:
+            health_status["checks"]["api_key"] = "✅ Configured"
+
+        # Check FAISS database files of the index that will actually be served
+        base_dir = Path(__file__).parent.parent
+        faiss_path = Path(get_faiss_path(embedding_type))
+        missing = missing_index_files(faiss_path)
+        manifest = read_manifest(faiss_path) or {}
+        if not faiss_path.exists():
+            health_status["checks"]["faiss_db"] = "❌ Missing"
+            health_status["errors"].append(f"FAISS index directory not found: {faiss_path}")
+            health_status["status"] = "unhealthy"
+        elif missing:
+            health_status["checks"]["faiss_db"] = f"❌ Incomplete (missing {', '.join(missing)})"
+            health_status["errors"].append(f"FAISS index is incomplete, missing {', '.join(missing)}: {faiss_path}")
+            health_status["status"] = "unhealthy"
+        elif manifest and manifest.get("embedding") != embedding_type:
+            health_status["checks"]["faiss_db"] = f"❌ Built with '{manifest.get('embedding')}' embeddings"
+            health_status["errors"].append(
+                f"FAISS index {faiss_path} was built with '{manifest.get('embedding')}' embeddings, not '{embedding_type}'"
+            )
+            health_status["status"] = "unhealthy"
+        elif serving_problem(embedding_type, manifest):
+            rebuild = MANIFEST_REQUIRED[embedding_type][1]
+            reason = "no manifest" if not manifest else f"normalization {manifest.get('normalization')!r}"
+            health_status["checks"]["faiss_db"] = f"❌ Not servable with '{embedding_type}' embeddings ({reason})"
+            health_status["errors"].append(
+                f"FAISS index {faiss_path} cannot be served with '{embedding_type}' embeddings ({reason}). "
+                f"Rebuild it with `{rebuild}`."
+            )
+            health_status["status"] = "unhealthy"
+        else:
+            version = f" v{manifest['version']}" if manifest.get("version") is not None else ""
+            health_status["checks"]["faiss_db"] = f"✅ Available ({faiss_path.name}{version})"
+
+        # Check data files (the converted columnar corpus is accepted as well)
+        data_file = base_dir / "data" / "vd_base_v2_refined.json"
+        if data_file.exists() or data_file.with_suffix(".arrow").exists():
+            health_status["checks"]["data_file"] = "✅ Available"
+        else:
+            health_status["checks"]["data_file"] = "❌ Missing"
+            health_status["errors"].append("Main data file not found")
+            health_status["status"] = "unhealthy"
+
+        # Check required directories
+        required_dirs = ["app", "db", "data"]
+        for dir_name in required_dirs:
+            dir_path = base_dir / dir_name
+            if dir_path.exists():
+                health_status["checks"][f"{dir_name}_dir"] = "✅ Available"
+            else:
+                health_status["checks"][f"{dir_name}_dir"] = "❌ Missing"
+                health_status["errors"].append(f"Required directory '{dir_name}' not found")
+                health_status["status"] = "unhealthy"
+
+        logging.info(f"Health check completed: {health_status['status']}")
+
+    except Exception as e:
+        logging.error(f"Health check failed: {e}")
+        health_status["status"] = "unhealthy"
+        health_status["errors"].append(f"Health check exception: {str(e)}")
+
+    return health_status
+
+def log_health_status(health_status: Dict[str, Any]):
+    """Log health check results"""
+    status = health_status["status"]
+    if status == "healthy":
+        logging.info("🟢 System health check: ALL SYSTEMS OPERATIONAL")
+    else:
+        logging.warning("🟡 System health check: ISSUES DETECTED")
+        for error in health_status["errors"]:
+            logging.warning(f"  ⚠️  {error}")
+
+    for check_name, result in health_status["checks"].items():
+        logging.info(f"  {check_name}: {result}")
+
+def current_rss_mb() -> Optional[float]:
+    """Resident memory of this process in MiB (peak RSS where the current value is unavailable)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in KiB on Linux
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def parse_budgets(spec: str) -> Dict[str, float]:
+    """Parse 'embedding=3,vector_search=0.5,rss_mb=2048' into a dict"""
+    budgets = {}
+    for part in (spec or "").split(","):
+        if "=" not in part:
+            continue
+        name, value = part.split("=", 1)
+        try:
+            budgets[name.strip()] = float(value)
+        except ValueError:
+            logging.warning(f"Invalid readiness budget ignored: {part}")
+    return budgets
+
+
+def check_readiness(db_service, llm=None, budgets: Optional[Dict[str, float]] = None,
+                    query: str = WARMUP_QUERY) -> Dict[str, Any]:
+    """
+    Deep readiness probe and warm-up.
+
+    Loads the selected index (if not loaded yet) and runs a warm-up query through the
+    metadata search, query embedding and vector search paths, plus a minimal LLM call
+    when an llm is given. Every stage is timed against its budget; a failed stage or an
+    exceeded budget makes the result "not_ready". The result is published for /readyz.
+    """
+    budgets = {**DEFAULT_READINESS_BUDGETS, **(budgets or {})}
+    result = {
+        "status": "ready",
+        "checked_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "checks": {},
+        "errors": [],
+        "index": {},
+        "rss_mb": None,
+    }
+
+    def run_stage(name, fn):
+        start = time.perf_counter()
+        try:
+            detail = fn()
+            error = None
+        except Exception as e:
+            detail, error = None, f"{type(e).__name__}: {e}"
+        seconds = time.perf_counter() - start
+        budget = budgets.get(name)
+        within_budget = budget is None or seconds <= budget
+        check = {"ok": error is None and within_budget, "seconds": round(seconds, 4), "budget": budget}
+        if detail is not None:
+            check["detail"] = detail
+        if error is not None:
+            check["error"] = error
+            result["errors"].append(f"{name} failed: {error}")
+        elif not within_budget:
+            result["errors"].append(f"{name} took {seconds:.2f}s (budget {budget}s)")
+        result["checks"][name] = check
+        REGISTRY.observe("rag_readiness_seconds", seconds, stage=name)
+        return error is None
+
+    with ExitStack() as stack:
+        # All stages run against the same index snapshot.
+        if run_stage("index_load", lambda: f"{len(stack.enter_context(db_service.pin()).all_docs)} documents"):
+            manifest = db_service.index_manifest
+            result["index"] = {
+                "path": db_service.faiss_path,
+                "version": manifest.get("version"),
+                "embedding": db_service.embedding_type,
+                "model": manifest.get("model"),
+                "documents": len(db_service.all_docs),
+            }
+
+            def metadata_search():
+                if not db_service.get_schema_context().get("context_string"):
+                    raise ValueError("schema context is empty")
+                major = next((doc.metadata["대분류"] for doc in db_service.all_docs if doc.metadata.get("대분류")), None)
+                if major is None:
+                    raise ValueError("no document has a '대분류' category")
+                docs = db_service.metadata_search({"대분류": major})
+                if not docs:
+                    raise ValueError(f"metadata search for '{major}' returned no documents")
+                return f"{len(docs)} documents"
+
+            run_stage("metadata_search", metadata_search)
+
+            vector = []
+
+            def embedding():
+                vector.extend(db_service.embeddings.embed_query(query))
+                dimension = db_service.vector_db.index.d
+                if len(vector) != dimension:
+                    raise ValueError(f"query embedding has {len(vector)} dimensions, index has {dimension}")
+                return f"{len(vector)} dimensions"
+
+            def vector_search():
+                docs = db_service.vector_db.similarity_search_by_vector(vector, k=5)
+                if not docs:
+                    raise ValueError("vector search returned no documents")
+                return f"{len(docs)} documents"
+
+            if run_stage("embedding", embedding):
+                run_stage("vector_search", vector_search)
+
+    if llm is not None:
+        def llm_call():
+            response = llm.invoke(WARMUP_LLM_PROMPT)
+            text = getattr(response, "content", response)
+            if not str(text).strip():
+                raise ValueError("LLM returned an empty response")
+            return str(text).strip()[:40]
+
+        run_stage("llm", llm_call)
+
+    result["rss_mb"] = current_rss_mb()
+    rss_budget = budgets.get("rss_mb")
+    if rss_budget is not None and result["rss_mb"] is not None and result["rss_mb"] > rss_budget:
+        result["errors"].append(f"resident memory {result['rss_mb']:.0f}MiB exceeds budget {rss_budget:.0f}MiB")
+
+    if result["errors"]:
+        result["status"] = "not_ready"
+    set_readiness(result)
+    return result
+
+
+def log_readiness_status(result: Dict[str, Any]):
+    """Log readiness probe results"""
+    rss = f"{result['rss_mb']:.0f}MiB" if result.get("rss_mb") is not None else "n/a"
+    if result["status"] == "ready":
+        logging.info(f"🟢 Readiness check: READY (rss {rss})")
+    else:
+        logging.warning(f"🟡 Readiness check: NOT READY (rss {rss})")
+        for error in result["errors"]:
+            logging.warning(f"  ⚠️  {error}")
+    for name, check in result["checks"].items():
+        budget = f" / budget {check['budget']}s" if check.get("budget") is not None else ""
+        logging.info(f"  {name}: {'✅' if check['ok'] else '❌'} {check['seconds'] * 1000:.0f}ms{budget}")
+
+
+def main(argv=None) -> int:
+    """
+    Command-line probe for container health checks.
+        python -m app.health_check            # startup check only
+        python -m app.health_check --deep     # load the index and run the warm-up query
+    Exits with 0 when healthy/ready, 1 otherwise.
+    """
+    import argparse
+    from .config import get_config
+
+    parser = argparse.ArgumentParser(description="Welfare Chatbot health check")
+    parser.add_argument("--deep", action="store_true", help="load the index and run the warm-up query")
+    parser.add_argument("--llm", default=None, help="also call this LLM (gemini | gemma | exaone)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    config = get_config()
+    report = {"health": check_system_health(config.embedding_type)}
+    ok = report["health"]["status"] == "healthy"
+    if args.deep and ok:
+        from .db_service import DBService
+        from .llm_service import get_llm
+        llm = get_llm(args.llm) if args.llm else None
+        report["readiness"] = check_readiness(DBService(embedding_type=config.embedding_type), llm, config.readiness_budgets)
+        ok = report["readiness"]["status"] == "ready"
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
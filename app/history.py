@@ -0,0 +1,122 @@
+# app/history.py
+"""
+대화 기록 압축.
+
+검색 계획/답변 프롬프트에 넣는 대화 기록을 턴마다 정해진 토큰 예산 안으로 줄입니다.
+- 마크업 제거 : 인사 메시지의 HTML/CSS, 마크다운 강조·표·인용 기호, 출처 줄
+- 최근 턴     : 직전 RECENT_MESSAGES개 메시지는 원문(정리 후)을 메시지별 예산까지 잘라서 유지
+- 이전 턴     : 추출 요약(사용자 질문 + 답변의 첫 문장과 언급된 사업명)을 누적한 '이전 대화 요약'
+               요약은 세션에 캐시하고 새로 밀려난 메시지만 요약에 더합니다. (LLM 호출 없음)
+"""
+import html
+import re
+from typing import List, Optional
+
+from .tokens import estimate_tokens, truncate_to_tokens
+
+# 세션 상태(st.session_state)에 요약을 캐시하는 키
+SESSION_KEY = "history_summary"
+
+DEFAULT_HISTORY_TOKEN_BUDGET = 600
+RECENT_MESSAGES = 2
+NO_HISTORY = "이전 대화 기록이 없습니다."
+
+_STYLE_BLOCK = re.compile(r"<(style|script)\b.*?</\1>", re.IGNORECASE | re.DOTALL)
+_TAG = re.compile(r"<[^>]+>")
+_SOURCE_LINE = re.compile(r"^\s*>\s*(출처|연락처는).*$", re.MULTILINE)
+_TABLE_RULE = re.compile(r"^\s*\|?(\s*:?-{3,}:?\s*\|)+\s*$", re.MULTILINE)
+_MARKDOWN = re.compile(r"(\*\*|__|`|^#+\s*|^\s*>\s*|^\s*[-*•]\s+)", re.MULTILINE)
+# 굵게 표시된 사업명 ('**지원 대상**:' 같은 항목 이름은 제외)
+_BOLD = re.compile(r"\*\*([^*\n]{2,40})\*\*(?!\s*:)")
+_SENTENCE_END = re.compile(r"(?<=[.!?。])\s+|(?<=다\.)|(?<=요\.)|\n+")
+_SPACES = re.compile(r"[ \t]+")
+_BLANK_LINES = re.compile(r"\n\s*\n+")
+
+
+def strip_markup(text: str) -> str:
+    """HTML 태그/스타일과 마크다운 기호를 지우고 공백을 정리합니다."""
+    text = _STYLE_BLOCK.sub(" ", str(text or ""))
+    text = html.unescape(_TAG.sub(" ", text))
+    text = _SOURCE_LINE.sub("", text)
+    text = _TABLE_RULE.sub("", text)
+    text = _MARKDOWN.sub("", text).replace("|", " ")
+    text = _SPACES.sub(" ", text)
+    return _BLANK_LINES.sub("\n", text).strip()
+
+
+def _role(message: dict) -> str:
+    return "사용자" if message.get("role") == "user" else "지니(AI)"
+
+
+def summarize_message(message: dict, max_tokens: int = 80) -> str:
+    """
+    메시지 하나의 추출 요약. 사용자 질문은 그대로(예산까지), 답변은 첫 문장과 굵게 표시된 사업명 목록.
+    """
+    content = str(message.get("content") or "")
+    if message.get("role") == "user":
+        return f"사용자: {truncate_to_tokens(strip_markup(content), max_tokens)}"
+    names = []
+    for name in _BOLD.findall(content):
+        name = name.strip().rstrip(":")
+        if name and name not in names:
+            names.append(name)
+    sentences = [s.strip() for s in _SENTENCE_END.split(strip_markup(content)) if s and s.strip()]
+    summary = sentences[0] if sentences else ""
+    if names:
+        summary += f" (언급: {', '.join(names[:8])})"
+    return f"지니(AI): {truncate_to_tokens(summary, max_tokens)}"
+
+
+def _conversation(messages: List[dict]) -> List[dict]:
+    """첫 사용자 질문 이전의 안내 메시지(인사말, 엔진 변경 안내)는 대화 기록에서 제외합니다."""
+    for position, message in enumerate(messages):
+        if message.get("role") == "user":
+            return messages[position:]
+    return []
+
+
+def _trim_summary(lines: List[str], max_tokens: int) -> List[str]:
+    """요약 예산을 넘으면 가장 오래된 줄부터 버립니다."""
+    while lines and estimate_tokens("\n".join(lines)) > max_tokens:
+        lines = lines[1:]
+    return lines
+
+
+def compact_history(messages: List[dict], session_state=None, max_tokens: int = DEFAULT_HISTORY_TOKEN_BUDGET) -> str:
+    """
+    현재 질문(마지막 메시지)을 뺀 대화 기록을 max_tokens 안의 문자열로 만듭니다.
+    session_state가 주어지면 이전 턴 요약을 캐시해 다음 턴에서 이어서 갱신합니다.
+    """
+    conversation = _conversation(messages[:-1])
+    if not conversation:
+        return NO_HISTORY
+
+    recent = conversation[-RECENT_MESSAGES:]
+    older = conversation[:-RECENT_MESSAGES] if len(conversation) > RECENT_MESSAGES else []
+    summary_budget = max_tokens // 3 if older else 0
+    recent_budget = (max_tokens - summary_budget) // max(len(recent), 1)
+
+    summary_lines = _summary_lines(older, session_state, summary_budget)
+    parts = []
+    if summary_lines:
+        parts.append("[이전 대화 요약]\n" + "\n".join(summary_lines))
+    parts.extend(f"{_role(msg)}: {truncate_to_tokens(strip_markup(msg.get('content')), recent_budget)}" for msg in recent)
+    return "\n".join(parts)
+
+
+def _summary_lines(older: List[dict], session_state, max_tokens: int) -> List[str]:
+    """older 메시지의 요약 줄. 세션 캐시에 있는 부분은 재사용하고 새로 밀려난 메시지만 요약합니다."""
+    if not older or max_tokens <= 0:
+        return []
+    cached: Optional[dict] = session_state.get(SESSION_KEY) if session_state is not None else None
+    first = older[0].get("content")
+    if isinstance(cached, dict) and cached.get("first") == first and 0 < cached.get("count", 0) <= len(older):
+        lines, start = list(cached.get("lines", [])), cached["count"]
+    else:
+        # 새 대화이거나 다른 대화 기록으로 바뀌었으면 처음부터 요약합니다.
+        lines, start = [], 0
+    lines += [summarize_message(message) for message in older[start:]]
+    lines = _trim_summary(lines, max_tokens)
+    if session_state is not None:
+        session_state[SESSION_KEY] = {"first": first, "count": len(older), "lines": lines}
+    return lines
@@ -0,0 +1,671 @@
+# app/index_builder.py
+"""
+재시작 가능한 스트리밍 FAISS 인덱스 빌더.
+
+1. 코퍼스를 스트리밍으로 읽어 배치 단위로 병렬 임베딩합니다.
+2. 임베딩 결과는 작업 디렉토리의 추가 전용(append-only) 저장소에 기록합니다.
+   - vectors.f32   : float32 벡터를 행 단위로 이어 붙인 바이너리 파일
+   - records.jsonl : 각 행의 청크 키, 내용 해시, page_content, metadata
+   - checkpoint.json : 차원, 기록된 행 수, 실패한 청크 키 목록 (주기적으로 원자적 갱신)
+3. 중단되더라도 다시 실행하면 이미 기록된 청크는 건너뛰고 이어서 임베딩합니다.
+4. 모든 배치가 끝나면 FAISS 인덱스를 한 번만 조립하여 저장합니다. (merge_from 반복 없음)
+5. 인덱스 디렉토리의 manifest.json에 버전, 임베딩 종류/모델, 차원, 문서 수, 코퍼스 해시, 구축 시각과
+   청크별 내용 해시를 기록합니다. DBService는 이 매니페스트로 인덱스를 선택하고 검증합니다.
+   다음 빌드에서는 새로 추가되거나 내용이 바뀐 청크만 임베딩하고, 삭제된 청크는 인덱스에서 제거합니다.
+6. 코퍼스 구조(분류 체계, 사업명, 목차, 필드 값 사전)를 컴파일한 catalog.json을 함께 저장합니다.
+7. 인덱스 유형(flat/sq8/pq/ivf/hnsw, 기본값 auto)을 고를 수 있습니다. flat이 아닌 인덱스는 구축 시
+   recall@k를 측정해 목표에 못 미치면 저장을 거부하고(작업 디렉토리는 유지), 증분 갱신을 위해
+   원본 벡터(vectors.f32)를 인덱스 옆에 보관합니다. (app/index_factory.py)
+8. 같은 벡터로 대분류별 샤드 인덱스(shards/)를 함께 저장합니다. 중분류 필터 검색은 해당 샤드만 사용합니다.
+   (app/index_shards.py)
+9. 인덱스, 카탈로그, 샤드, 매니페스트는 먼저 옆의 배포 준비 디렉토리(.<인덱스명>.publish)에 모두 저장하고
+   (재현율 검증 포함) 성공한 뒤에만 os.replace로 배포 디렉토리에 옮깁니다. 매니페스트는 마지막에 옮기므로
+   DBService는 매니페스트 버전이 바뀐 시점에 새 파일을 모두 읽을 수 있고, 중간에 실패하면 배포된 인덱스는 그대로입니다.
+   옮기는 도중 중단되면 다음 빌드가 시작할 때 남은 파일을 마저 옮깁니다.
+"""
+import os
+import json
+import time
+import shutil
+import hashlib
+import logging
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from .corpus import DATA_PATH, item_to_document, iter_chunks
+from .embeddings import embedding_model_name, embedding_normalization
+from .index_locator import INDEX_FILES, MANIFEST_FILE, read_manifest
+from .index_factory import (
+    DEFAULT_MIN_RECALL, DEFAULT_RECALL_K, DEFAULT_RECALL_QUERIES, build_index, exact_vectors, resolve_index_type,
+)
+from .corpus_catalog import CATALOG_FILE, CatalogCompiler, read_catalog, write_catalog
+from .index_shards import SHARDS_DIR, publish_shards, read_shards_file, write_shards
+from .merge import CHUNK_NO_FIELD
+
+VECTORS_FILE = "vectors.f32"
+RECORDS_FILE = "records.jsonl"
+CHECKPOINT_FILE = "checkpoint.json"
+# 양자화/근사 인덱스 옆에 보관하는 원본 float32 벡터 (인덱스 행 순서). 서빙 시에는 읽지 않고,
+# 증분 갱신 때 인덱스를 다시 만들고 재현율을 검증하는 데 사용합니다.
+EXACT_VECTORS_FILE = "vectors.f32"
+
+
+@dataclass
+class BuildReport:
+    """인덱스 구축 결과 요약"""
+    output_dir: str
+    incremental: bool = False
+    total_chunks: int = 0
+    embedded: int = 0
+    resumed: int = 0
+    unchanged: int = 0
+    deleted: int = 0
+    failed: Dict[str, str] = field(default_factory=dict)
+    version: Optional[int] = None
+    seconds: float = 0.0
+
+    @property
+    def complete(self) -> bool:
+        return not self.failed
+
+
+# 청크 키와 청크 번호는 내용이 아니므로 해시에서 제외합니다. (번호가 바뀌어도 다시 임베딩하지 않음)
+_UNHASHED_FIELDS = ("chunk_id", CHUNK_NO_FIELD)
+
+
+def content_hash(doc: Document) -> str:
+    """임베딩되는 텍스트와 저장되는 메타데이터의 해시. 이 값이 바뀐 청크만 다시 임베딩합니다."""
+    metadata = {k: v for k, v in doc.metadata.items() if k not in _UNHASHED_FIELDS}
+    payload = json.dumps({"text": doc.page_content, "metadata": metadata}, ensure_ascii=False, sort_keys=True)
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def corpus_hash(chunks: Dict[str, str]) -> str:
+    """청크 키와 내용 해시 목록(코퍼스 순서)으로 계산한 코퍼스 전체 해시"""
+    digest = hashlib.blake2b(digest_size=16)
+    for key, chunk_digest in chunks.items():
+        digest.update(f"{key}\t{chunk_digest}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def write_manifest(index_dir: Union[str, Path], manifest: dict):
+    """manifest.json을 원자적으로 기록합니다."""
+    path = Path(index_dir) / MANIFEST_FILE
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, path)
+
+
+def embed_to_array(embeddings: Embeddings, texts: List[str]) -> np.ndarray:
+    """임베딩 결과를 float32 (n, dim) 배열로 반환합니다. 배열 API가 있으면 리스트 변환을 생략합니다."""
+    if hasattr(embeddings, "embed_documents_array"):
+        vectors = embeddings.embed_documents_array(texts)
+    else:
+        vectors = embeddings.embed_documents(texts)
+    return np.asarray(vectors, dtype=np.float32)
+
+
+def _batched(iterable: Iterable, size: int) -> Iterator[list]:
+    batch = []
+    for element in iterable:
+        batch.append(element)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class VectorStoreWriter:
+    """작업 디렉토리의 추가 전용 벡터/레코드 저장소"""
+
+    def __init__(self, work_dir: Path, signature: Optional[dict] = None):
+        self.work_dir = work_dir
+        self.signature = signature or {}
+        self.vectors_path = work_dir / VECTORS_FILE
+        self.records_path = work_dir / RECORDS_FILE
+        self.checkpoint_path = work_dir / CHECKPOINT_FILE
+        self.dim: Optional[int] = None
+        self.rows = 0
+        self.done: Dict[str, str] = {}  # 청크 키 -> 기록된 내용 해시
+        self.failed: Dict[str, str] = {}
+        self._recover()
+        self.work_dir.mkdir(parents=True, exist_ok=True)
+        self._vectors = open(self.vectors_path, "ab")
+        self._records = open(self.records_path, "a", encoding="utf-8")
+
+    def _recover(self):
+        """이전 실행의 기록을 읽고, 비정상 종료로 남은 불완전한 꼬리 부분을 잘라냅니다."""
+        if self.checkpoint_path.exists():
+            with open(self.checkpoint_path, "r", encoding="utf-8") as f:
+                checkpoint = json.load(f)
+            if checkpoint.get("signature", {}) != self.signature:
+                # 다른 임베딩 모델/설정으로 만든 중간 결과는 섞이면 안 되므로 버립니다.
+                logging.warning(f"작업 디렉토리의 빌드 설정이 다릅니다. 이전 중간 결과를 삭제합니다: {self.work_dir}")
+                shutil.rmtree(self.work_dir)
+                return
+            self.dim = checkpoint.get("dim")
+            self.failed = checkpoint.get("failed", {})
+        if not self.records_path.exists():
+            return
+
+        valid_lines, entries = [], []
+        with open(self.records_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                    entries.append((record["key"], record["hash"]))
+                    valid_lines.append(line)
+                except (json.JSONDecodeError, KeyError):
+                    break  # 마지막 줄이 중간에 잘린 경우
+        vector_rows = 0
+        if self.dim and self.vectors_path.exists():
+            vector_rows = self.vectors_path.stat().st_size // (self.dim * 4)
+        self.rows = min(len(entries), vector_rows) if self.dim else 0
+
+        # 벡터와 레코드가 모두 기록된 행까지만 유지합니다.
+        with open(self.records_path, "w", encoding="utf-8") as f:
+            f.writelines(valid_lines[:self.rows])
+        if self.vectors_path.exists():
+            with open(self.vectors_path, "r+b") as f:
+                f.truncate(self.rows * (self.dim or 0) * 4)
+        self.done = dict(entries[:self.rows])
+        for key in self.done:
+            self.failed.pop(key, None)
+        if self.rows:
+            logging.info(f"이전 빌드에서 {self.rows}개 청크를 복구했습니다. 이어서 진행합니다.")
+
+    def append(self, documents: List[Document], vectors: np.ndarray):
+        """배치 결과를 추가합니다. 벡터를 먼저 쓰고 레코드를 쓰므로 레코드가 있는 행은 항상 벡터가 있습니다."""
+        if self.dim is None:
+            self.dim = int(vectors.shape[1])
+        elif vectors.shape[1] != self.dim:
+            raise ValueError(f"임베딩 차원이 일치하지 않습니다: {vectors.shape[1]} != {self.dim}")
+        self._vectors.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+        self._vectors.flush()
+        for doc in documents:
+            key, digest = doc.metadata["chunk_id"], content_hash(doc)
+            self._records.write(json.dumps(
+                {"key": key, "hash": digest, "page_content": doc.page_content, "metadata": doc.metadata},
+                ensure_ascii=False,
+            ) + "\n")
+            self.done[key] = digest
+            self.failed.pop(key, None)
+        self._records.flush()
+        self.rows += len(documents)
+
+    def mark_failed(self, documents: List[Document], error: Exception):
+        for doc in documents:
+            self.failed[doc.metadata["chunk_id"]] = f"{type(error).__name__}: {error}"
+
+    def checkpoint(self):
+        """파일을 디스크에 동기화하고 체크포인트를 원자적으로 갱신합니다."""
+        for handle in (self._vectors, self._records):
+            handle.flush()
+            os.fsync(handle.fileno())
+        tmp_path = self.checkpoint_path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {"signature": self.signature, "dim": self.dim, "rows": self.rows,
+                 "failed": self.failed, "updated_at": time.time()},
+                f, ensure_ascii=False, indent=2,
+            )
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def close(self):
+        self.checkpoint()
+        self._vectors.close()
+        self._records.close()
+
+    def latest_rows(self, current: Dict[str, str]) -> Tuple[List[int], List[dict]]:
+        """
+        현재 코퍼스 내용과 해시가 일치하는 행만 골라 (행 번호 목록, 레코드 목록)을 반환합니다.
+        같은 청크가 여러 번 기록된 경우(중단 후 내용이 바뀐 경우) 마지막 행을 사용합니다.
+        """
+        latest = {}
+        with open(self.records_path, "r", encoding="utf-8") as f:
+            for row, line in enumerate(f):
+                record = json.loads(line)
+                if current.get(record["key"]) == record["hash"]:
+                    latest[record["key"]] = (row, record)
+        selected = sorted(latest.values(), key=lambda entry: entry[0])
+        return [row for row, _ in selected], [record for _, record in selected]
+
+    def load_vectors(self) -> np.ndarray:
+        """기록된 벡터를 메모리 맵으로 엽니다."""
+        if not self.rows:
+            return np.empty((0, self.dim or 0), dtype=np.float32)
+        return np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(self.rows, self.dim))
+
+
+class StreamingIndexBuilder:
+    """코퍼스를 스트리밍으로 임베딩하고 FAISS 인덱스를 조립(또는 증분 갱신)하는 빌더"""
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        output_dir: Union[str, Path],
+        work_dir: Optional[Union[str, Path]] = None,
+        batch_size: int = 64,
+        workers: int = 4,
+        enrich: bool = False,
+        checkpoint_every: int = 10,
+        max_batch_retries: int = 2,
+        embedding_name: Optional[str] = None,
+        incremental: bool = True,
+        index_type: str = "auto",
+        min_recall: float = DEFAULT_MIN_RECALL,
+        recall_k: int = DEFAULT_RECALL_K,
+        recall_queries: int = DEFAULT_RECALL_QUERIES,
+        shards: bool = True,
+    ):
+        self.embeddings = embeddings
+        self.output_dir = Path(output_dir)
+        self.work_dir = Path(work_dir) if work_dir else self.output_dir.parent / ".build" / self.output_dir.name
+        # 새 버전을 조립하는 디렉토리 (os.replace로 옮길 수 있도록 배포 디렉토리와 같은 위치)
+        self.staging_dir = self.output_dir.parent / f".{self.output_dir.name}.publish"
+        self.batch_size = batch_size
+        self.workers = max(1, workers)
+        self.enrich = enrich
+        self.checkpoint_every = max(1, checkpoint_every)
+        self.max_batch_retries = max_batch_retries
+        self.embedding_name = embedding_name or type(embeddings).__name__
+        self.model_name = embedding_model_name(embeddings)
+        self.normalization = embedding_normalization(embeddings)
+        self.incremental = incremental
+        resolve_index_type(index_type, 0)  # 지원하지 않는 유형이면 구축 전에 ValueError
+        self.index_type = index_type
+        self.min_recall = min_recall
+        self.recall_k = recall_k
+        self.recall_queries = recall_queries
+        self.shards = shards
+        self.index_info: dict = {}
+
+    @property
+    def signature(self) -> dict:
+        """
+        중간 결과와 기존 인덱스를 재사용해도 되는지 판단하는 빌드 설정.
+        벡터를 정규화하는 모델(Ollama)만 normalization을 기록하므로, 정규화 없이 만든 기존 인덱스는 전체 재구축됩니다.
+        """
+        signature = {"embedding": self.embedding_name, "model": self.model_name, "enrich": self.enrich}
+        if self.normalization:
+            signature["normalization"] = self.normalization
+        return signature
+
+    def _embed_batch(self, documents: List[Document]) -> Tuple[List[Document], np.ndarray]:
+        last_error = None
+        for attempt in range(self.max_batch_retries + 1):
+            try:
+                vectors = embed_to_array(self.embeddings, [doc.page_content for doc in documents])
+                if len(vectors) != len(documents):
+                    raise ValueError(f"임베딩 수({len(vectors)})와 문서 수({len(documents)})가 다릅니다.")
+                return documents, vectors
+            except Exception as e:
+                last_error = e
+                if attempt < self.max_batch_retries:
+                    time.sleep(2 ** attempt)
+        raise last_error
+
+    def load_previous(self):
+        """
+        증분 갱신의 기준이 될 (매니페스트, 기존 FAISS 인덱스)를 반환합니다.
+        매니페스트가 없거나 빌드 설정이 다르면 (매니페스트, None)을 반환하여 전체 구축을 하게 합니다.
+        """
+        manifest = read_manifest(self.output_dir)
+        if not self.incremental or manifest is None:
+            return manifest, None
+        if not (self.output_dir / "index.faiss").exists():
+            logging.info("기존 인덱스 파일이 없어 전체 구축을 진행합니다.")
+            return manifest, None
+        if {k: manifest.get(k) for k in self.signature} != self.signature:
+            logging.info(f"기존 인덱스의 빌드 설정이 다릅니다 ({manifest.get('embedding')}, {manifest.get('model')}, enrich={manifest.get('enrich')}). 전체 구축을 진행합니다.")
+            return manifest, None
+
+        from langchain_community.vectorstores import FAISS
+        vector_db = FAISS.load_local(str(self.output_dir), self.embeddings, allow_dangerous_deserialization=True)
+        # 매니페스트에는 있지만 인덱스에 없는 청크는 다시 임베딩하도록 제외합니다.
+        existing_ids = set(vector_db.index_to_docstore_id.values())
+        manifest["chunks"] = {k: v for k, v in manifest.get("chunks", {}).items() if k in existing_ids}
+        return manifest, vector_db
+
+    def iter_pending_documents(
+        self,
+        data_path: Union[str, Path],
+        previous: Dict[str, str],
+        writer: VectorStoreWriter,
+        current: Dict[str, str],
+        report: BuildReport,
+        limit: Optional[int] = None,
+    ) -> Iterator[Document]:
+        """새로 추가되었거나 내용이 바뀌었고, 아직 임베딩되지 않은 청크를 Document로 스트리밍합니다."""
+        for i, (key, item) in enumerate(iter_chunks(data_path)):
+            if limit is not None and i >= limit:
+                break
+            doc = item_to_document(key, item, self.enrich)
+            digest = content_hash(doc)
+            current[key] = digest
+            self.catalog.add(key, doc.metadata)
+            report.total_chunks += 1
+            if previous.get(key) == digest:
+                report.unchanged += 1
+            elif writer.done.get(key) == digest:
+                report.resumed += 1
+            else:
+                yield doc
+
+    def embed_corpus(
+        self,
+        data_path: Union[str, Path] = DATA_PATH,
+        limit: Optional[int] = None,
+        previous: Optional[Dict[str, str]] = None,
+    ) -> Tuple[VectorStoreWriter, BuildReport, Dict[str, str]]:
+        """임베딩이 필요한 청크를 병렬 배치로 임베딩하여 작업 디렉토리에 기록합니다."""
+        start = time.perf_counter()
+        writer = VectorStoreWriter(self.work_dir, self.signature)
+        report = BuildReport(output_dir=str(self.output_dir), incremental=previous is not None)
+        current: Dict[str, str] = {}
+        self.catalog = CatalogCompiler()
+        batches_since_checkpoint = 0
+        lock = threading.Lock()
+
+        pending = _batched(
+            self.iter_pending_documents(data_path, previous or {}, writer, current, report, limit), self.batch_size
+        )
+        in_flight = {}
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="index-embed") as executor:
+            def submit_next() -> bool:
+                batch = next(pending, None)
+                if batch is None:
+                    return False
+                in_flight[executor.submit(self._embed_batch, batch)] = batch
+                return True
+
+            # 메모리 사용량을 제한하기 위해 동시에 대기하는 배치 수를 workers * 2로 제한합니다.
+            while len(in_flight) < self.workers * 2 and submit_next():
+                pass
+            while in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    batch = in_flight.pop(future)
+                    try:
+                        documents, vectors = future.result()
+                        with lock:
+                            writer.append(documents, vectors)
+                        report.embedded += len(documents)
+                    except Exception as e:
+                        logging.error(f"배치 임베딩 실패 ({len(batch)}개 청크, 예: {batch[0].metadata['chunk_id']}): {e}")
+                        writer.mark_failed(batch, e)
+                    batches_since_checkpoint += 1
+                    if batches_since_checkpoint >= self.checkpoint_every:
+                        writer.checkpoint()
+                        batches_since_checkpoint = 0
+                        logging.info(f"체크포인트 저장: {writer.rows}개 청크 기록, 실패 {len(writer.failed)}개")
+                    submit_next()
+
+        # 이번 코퍼스에 없는 청크의 실패 기록은 의미가 없으므로 정리합니다.
+        writer.failed = {k: v for k, v in writer.failed.items() if k in current}
+        writer.checkpoint()
+        report.failed = dict(writer.failed)
+        report.seconds = time.perf_counter() - start
+        return writer, report, current
+
+    def _staged(self, writer: VectorStoreWriter, current: Dict[str, str]) -> Tuple[np.ndarray, List[dict]]:
+        rows, records = writer.latest_rows(current)
+        if not rows:
+            return np.empty((0, writer.dim or 0), dtype=np.float32), []
+        return np.ascontiguousarray(writer.load_vectors()[rows]), records
+
+    def assemble(self, writer: VectorStoreWriter, current: Dict[str, str]):
+        """작업 디렉토리의 벡터와 레코드로 FAISS 인덱스를 한 번만 조립하여 저장합니다."""
+        vectors, records = self._staged(writer, current)
+        return self._write_index(vectors, records)
+
+    def _write_index(self, vectors: np.ndarray, records: List[dict]):
+        """
+        설정된 인덱스 유형으로 인덱스를 만들고(재현율 검증 포함) 문서 저장소와 함께 배포 준비 디렉토리에 저장합니다.
+        재현율이 목표에 못 미치면 RecallTooLowError가 발생하며 아무것도 저장하지 않습니다.
+        """
+        from langchain_community.docstore.in_memory import InMemoryDocstore
+        from langchain_community.vectorstores import FAISS
+
+        index, self.index_info = build_index(
+            vectors, self.index_type, self.min_recall, self.recall_k, self.recall_queries,
+        )
+
+        docs, index_to_docstore_id = {}, {}
+        for row, record in enumerate(records):
+            docs[record["key"]] = Document(page_content=record["page_content"], metadata=record["metadata"])
+            index_to_docstore_id[row] = record["key"]
+
+        vector_db = FAISS(
+            embedding_function=self.embeddings,
+            index=index,
+            docstore=InMemoryDocstore(docs),
+            index_to_docstore_id=index_to_docstore_id,
+        )
+        self.staging_dir.mkdir(parents=True, exist_ok=True)
+        vector_db.save_local(str(self.staging_dir))
+        if self.index_info["index_type"] != "flat":
+            np.ascontiguousarray(vectors, dtype=np.float32).tofile(self.staging_dir / EXACT_VECTORS_FILE)
+        logging.info(
+            f"FAISS 인덱스 조립 완료: {self.staging_dir} ({index.ntotal}개 벡터, {index.d}차원, "
+            f"{self.index_info['spec']}, {self.index_info['index_bytes'] / (1024 * 1024):.1f}MiB)"
+        )
+        return vector_db
+
+    def _previous_vectors(self, vector_db, directory: Optional[Path] = None) -> Optional[np.ndarray]:
+        """
+        인덱스의 원본 벡터 (Flat이면 인덱스에서, 양자화 인덱스면 directory의 vectors.f32에서). 없으면 None
+        directory를 생략하면 배포된 인덱스 디렉토리를 봅니다.
+        """
+        vectors = exact_vectors(vector_db.index)
+        if vectors is not None:
+            return vectors
+        path = (directory or self.output_dir) / EXACT_VECTORS_FILE
+        if not path.exists():
+            return None
+        vectors = np.fromfile(path, dtype=np.float32).reshape(-1, vector_db.index.d)
+        return vectors if len(vectors) == vector_db.index.ntotal else None
+
+    def write_shards(self, vector_db, version: int, digest: str, directory: Optional[Path] = None) -> List[dict]:
+        """
+        인덱스의 원본 벡터로 대분류별 샤드를 directory(기본값: 배포된 인덱스 디렉토리)에 저장합니다. (재임베딩 없음)
+        """
+        directory = directory or self.output_dir
+        vectors = self._previous_vectors(vector_db, directory)
+        if vectors is None:
+            raise ValueError(f"인덱스의 원본 벡터({EXACT_VECTORS_FILE})가 없어 샤드를 만들 수 없습니다.")
+        keys = [vector_db.index_to_docstore_id[row] for row in range(vector_db.index.ntotal)]
+        metadatas = [vector_db.docstore.search(key).metadata for key in keys]
+        return write_shards(
+            directory, vectors, keys, metadatas, version, digest, self.index_type,
+            min_recall=self.min_recall, k=self.recall_k, num_queries=self.recall_queries,
+        )
+
+    def update(self, vector_db, writer: VectorStoreWriter, current: Dict[str, str], report: BuildReport):
+        """
+        기존 인덱스에서 삭제/변경된 청크를 제거하고 새로 임베딩한 청크를 추가하여 배포 준비 디렉토리에 저장합니다.
+        Flat 인덱스는 제자리에서 갱신하고, 양자화/근사 인덱스(또는 유형이 바뀐 경우)는
+        기존 원본 벡터와 새 벡터로 인덱스를 다시 만들어 재현율을 다시 검증합니다.
+        """
+        import faiss
+
+        vectors, records = self._staged(writer, current)
+        if len(records) and vector_db.index.d != vectors.shape[1]:
+            raise ValueError(
+                f"기존 인덱스({vector_db.index.d}차원)와 새 임베딩({vectors.shape[1]}차원)의 차원이 다릅니다. "
+                f"--full 옵션으로 전체 구축하세요."
+            )
+        existing_ids = set(vector_db.index_to_docstore_id.values())
+        new_keys = [record["key"] for record in records]
+        removed = [key for key in existing_ids if key not in current]
+        replaced = [key for key in new_keys if key in existing_ids]
+        report.deleted = len(removed)
+
+        if resolve_index_type(self.index_type, len(current)) != "flat" or not isinstance(vector_db.index, faiss.IndexFlat):
+            previous = self._previous_vectors(vector_db)
+            if previous is None:
+                raise ValueError(
+                    f"기존 양자화 인덱스의 원본 벡터({EXACT_VECTORS_FILE})가 없어 인덱스를 다시 만들 수 없습니다. "
+                    f"--full 옵션으로 전체 구축하세요."
+                )
+            dropped = set(removed) | set(replaced)
+            kept = [(row, key) for row, key in sorted(vector_db.index_to_docstore_id.items()) if key not in dropped]
+            kept_records = []
+            for _, key in kept:
+                doc = vector_db.docstore.search(key)
+                kept_records.append({"key": key, "page_content": doc.page_content, "metadata": doc.metadata})
+            combined = np.vstack([previous[[row for row, _ in kept]], vectors]) if records else previous[[row for row, _ in kept]]
+            vector_db = self._write_index(np.ascontiguousarray(combined, dtype=np.float32), kept_records + records)
+            logging.info(
+                f"FAISS 인덱스 재구성 완료: {self.staging_dir} "
+                f"(추가/변경 {len(records)}개, 삭제 {len(removed)}개, 전체 {vector_db.index.ntotal}개)"
+            )
+            return vector_db
+
+        if removed or replaced:
+            vector_db.delete(removed + replaced)
+        if records:
+            vector_db.add_embeddings(
+                list(zip([record["page_content"] for record in records], vectors)),
+                metadatas=[record["metadata"] for record in records],
+                ids=new_keys,
+            )
+        self.staging_dir.mkdir(parents=True, exist_ok=True)
+        vector_db.save_local(str(self.staging_dir))
+        self.index_info = {
+            "index_type": "flat", "spec": "Flat", "search_params": {}, "recall": None,
+            "index_bytes": vector_db.index.ntotal * vector_db.index.d * 4,
+        }
+        logging.info(
+            f"FAISS 인덱스 증분 갱신 완료: {self.staging_dir} "
+            f"(추가/변경 {len(records)}개, 삭제 {len(removed)}개, 전체 {vector_db.index.ntotal}개)"
+        )
+        return vector_db
+
+    def publish(self) -> bool:
+        """
+        배포 준비 디렉토리의 새 버전을 배포 디렉토리로 옮깁니다. (샤드 세대 → 인덱스/카탈로그 → shards.json → 매니페스트)
+        매니페스트가 아직 없으면(조립 중 실패) 준비 디렉토리를 버리고 False를 반환합니다.
+        각 단계가 os.replace이므로 중단된 배포를 다시 호출해 이어서 마칠 수 있습니다.
+        """
+        staged_manifest = self.staging_dir / MANIFEST_FILE
+        if not staged_manifest.exists():
+            shutil.rmtree(self.staging_dir, ignore_errors=True)
+            return False
+        manifest = read_manifest(self.staging_dir) or {}
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        if (self.staging_dir / SHARDS_DIR).exists():
+            publish_shards(self.staging_dir, self.output_dir)
+        for name in (CATALOG_FILE, EXACT_VECTORS_FILE, *INDEX_FILES):
+            if (self.staging_dir / name).exists():
+                os.replace(self.staging_dir / name, self.output_dir / name)
+        if manifest.get("index_type") == "flat":
+            # Flat 인덱스는 원본 벡터를 인덱스에서 꺼낼 수 있으므로 이전 버전의 vectors.f32를 지웁니다.
+            (self.output_dir / EXACT_VECTORS_FILE).unlink(missing_ok=True)
+        os.replace(staged_manifest, self.output_dir / MANIFEST_FILE)
+        shutil.rmtree(self.staging_dir, ignore_errors=True)
+        logging.info(f"인덱스 배포 완료: {self.output_dir} (버전 {manifest.get('version')})")
+        return True
+
+    def build(self, data_path: Union[str, Path] = DATA_PATH, limit: Optional[int] = None, allow_partial: bool = False) -> BuildReport:
+        """
+        빌드를 실행합니다. 기존 인덱스와 매니페스트가 있으면 바뀐 청크만 반영하는 증분 갱신을 합니다.
+        실패한 청크가 있으면 기본적으로 인덱스를 저장하지 않고 보고서만 반환합니다. (재실행 시 실패분만 재시도)
+        limit은 빈 디렉토리에만 쓸 수 있습니다. (증분 갱신이 나머지 청크를 삭제로 보고 새 버전을 배포하므로)
+        """
+        if limit is not None and read_manifest(self.output_dir) is not None:
+            raise ValueError(
+                f"이미 배포된 인덱스에는 일부 청크(limit={limit})만 반영할 수 없습니다: {self.output_dir}. "
+                f"테스트용 구축은 --output으로 별도 디렉토리를 지정하세요."
+            )
+        if self.staging_dir.exists():
+            # 이전 실행이 배포 도중 중단됐으면 마저 옮기고, 조립 도중 중단됐으면 버립니다.
+            if self.publish():
+                logging.warning("이전 빌드에서 중단된 배포를 마쳤습니다.")
+        manifest, previous_db = self.load_previous()
+        previous_chunks = manifest["chunks"] if previous_db is not None else None
+        writer, report, current = self.embed_corpus(data_path, limit, previous_chunks)
+        report.version = manifest.get("version") if manifest else None
+        completed = False
+        try:
+            logging.info(
+                f"임베딩 완료: 전체 {report.total_chunks}개, 변경 없음 {report.unchanged}개, 이번 실행 {report.embedded}개, "
+                f"이전 실행 복구 {report.resumed}개, 실패 {len(report.failed)}개 ({report.seconds:.1f}초)"
+            )
+            if report.failed:
+                failed_path = self.work_dir / "failed_ids.json"
+                with open(failed_path, "w", encoding="utf-8") as f:
+                    json.dump(report.failed, f, ensure_ascii=False, indent=2)
+                logging.error(f"임베딩에 실패한 청크 {len(report.failed)}개의 목록을 저장했습니다: {failed_path}")
+                if not allow_partial:
+                    logging.error("실패한 청크가 있어 인덱스를 저장하지 않습니다. 다시 실행하면 실패한 청크만 재시도합니다.")
+                    return report
+                for key in report.failed:
+                    # 실패한 청크는 기존 버전이 있으면 유지하고(다음 빌드에서 재시도), 없으면 제외합니다.
+                    if previous_chunks and key in previous_chunks:
+                        current[key] = previous_chunks[key]
+                    else:
+                        current.pop(key, None)
+
+            if previous_db is not None:
+                same_index_type = manifest.get("index_type", "flat") == resolve_index_type(self.index_type, len(current))
+                if report.embedded + report.resumed == 0 and set(previous_chunks) == set(current) and same_index_type:
+                    logging.info(f"변경된 청크가 없습니다. 인덱스를 그대로 유지합니다. (버전 {report.version})")
+                    if read_catalog(self.output_dir, manifest.get("corpus_hash")) is None:
+                        write_catalog(self.output_dir, self.catalog.compile(current, manifest.get("corpus_hash")))
+                        logging.info("카탈로그가 없거나 오래되어 다시 저장했습니다.")
+                    if self.shards and read_shards_file(self.output_dir, manifest.get("corpus_hash")) is None:
+                        self.write_shards(previous_db, report.version, manifest.get("corpus_hash"))
+                        logging.info("샤드가 없거나 오래되어 다시 저장했습니다.")
+                    completed = True
+                    return report
+                vector_db = self.update(previous_db, writer, current, report)
+            elif writer.rows:
+                vector_db = self.assemble(writer, current)
+            else:
+                completed = True
+                return report
+
+            # 카탈로그, 샤드(재현율 검증 포함), 매니페스트까지 준비 디렉토리에 모두 저장한 뒤에 배포합니다.
+            digest = corpus_hash(current)
+            write_catalog(self.staging_dir, self.catalog.compile(current, digest))
+            report.version = (report.version or 0) + 1
+            shard_count = len(self.write_shards(vector_db, report.version, digest, self.staging_dir)) if self.shards else 0
+            write_manifest(self.staging_dir, {
+                "version": report.version,
+                "built_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                **self.signature,
+                "dimension": writer.dim or (previous_db.index.d if previous_db is not None else None),
+                "doc_count": len(current),
+                "index_type": self.index_info.get("index_type"),
+                "index_spec": self.index_info.get("spec"),
+                "search_params": self.index_info.get("search_params", {}),
+                "recall": self.index_info.get("recall"),
+                "index_bytes": self.index_info.get("index_bytes"),
+                "shards": shard_count,
+                "corpus_hash": digest,
+                "chunks": current,
+            })
+            self.publish()
+            logging.info(f"매니페스트 저장 완료: 버전 {report.version}, {len(current)}개 청크")
+            completed = True
+        finally:
+            writer.close()
+            if not (self.staging_dir / MANIFEST_FILE).exists():
+                # 조립 도중 실패한 버전은 버립니다. (배포 도중 중단된 버전은 다음 빌드에서 마저 옮김)
+                shutil.rmtree(self.staging_dir, ignore_errors=True)
+            if completed and not report.failed:
+                # 인덱스에 반영이 끝났으므로 작업 디렉토리는 더 이상 필요하지 않습니다.
+                # (재현율 검증 실패 등 예외로 끝나면 임베딩 결과를 재사용할 수 있도록 남겨 둡니다.)
+                shutil.rmtree(self.work_dir, ignore_errors=True)
+        return report
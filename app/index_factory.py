@@ -0,0 +1,179 @@
+# app/index_factory.py
+"""
+FAISS 인덱스 유형 선택과 재현율(recall) 검증.
+
+- flat : 원본 float32 벡터 (정확 검색, 기존 동작)
+- sq8  : 8비트 스칼라 양자화 (메모리 1/4, 전수 검색)
+- pq   : 곱 양자화 (차원 4개당 1바이트, 메모리 1/16)
+- ivf  : 역색인 + 8비트 스칼라 양자화 (메모리 1/4, nprobe개 클러스터만 검색)
+- hnsw : HNSW 그래프 + 8비트 스칼라 양자화 (빠른 근사 검색)
+- auto : 코퍼스 크기로 선택 (AUTO_INDEX_TYPES)
+
+flat이 아닌 인덱스는 구축 직후 원본 벡터로 구한 정확한 최근접 이웃과 비교해 recall@k를 측정합니다.
+ivf/hnsw는 목표 재현율을 만족하는 가장 작은 탐색 파라미터(nprobe/efSearch)를 고르고,
+어떤 설정으로도 목표에 못 미치면 RecallTooLowError로 구축을 거부합니다.
+"""
+import math
+import logging
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+INDEX_TYPES = ("auto", "flat", "sq8", "pq", "ivf", "hnsw")
+# (청크 수 상한, 인덱스 유형): 상한 미만이면 해당 유형을 사용합니다.
+AUTO_INDEX_TYPES = ((20_000, "flat"), (200_000, "sq8"), (math.inf, "ivf"))
+
+DEFAULT_MIN_RECALL = 0.95
+DEFAULT_RECALL_K = 10
+DEFAULT_RECALL_QUERIES = 200
+
+# 탐색 파라미터 후보 (작은 값부터 시도)
+NPROBE_CANDIDATES = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512)
+EF_SEARCH_CANDIDATES = (16, 32, 64, 128, 256, 512)
+HNSW_M = 32
+# 학습에 필요한 최소 벡터 수 (PQ/IVF k-means의 중심점 수 이상)
+PQ_MIN_TRAINING = 256
+
+
+class RecallTooLowError(ValueError):
+    """양자화/근사 인덱스의 재현율이 목표에 못 미쳐 구축을 거부할 때 발생합니다."""
+
+
+def resolve_index_type(index_type: str, n: int) -> str:
+    """'auto'를 청크 수에 맞는 실제 인덱스 유형으로 바꿉니다."""
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"지원하지 않는 인덱스 유형입니다: {index_type} (선택 가능: {', '.join(INDEX_TYPES)})")
+    if index_type != "auto":
+        return index_type
+    return next(kind for limit, kind in AUTO_INDEX_TYPES if n < limit)
+
+
+def index_spec(index_type: str, n: int, dim: int) -> str:
+    """faiss.index_factory에 넘길 인덱스 설명 문자열"""
+    if index_type == "flat":
+        return "Flat"
+    if index_type == "sq8":
+        return "SQ8"
+    if index_type == "pq":
+        # 차원 4개를 1바이트 코드로 (차원이 4의 배수가 아니면 나누어떨어지는 가장 가까운 개수)
+        m = max(d for d in range(1, dim // 4 + 1) if dim % d == 0)
+        return f"PQ{m}x8"
+    if index_type == "ivf":
+        nlist = int(min(65536, max(16, 4 * math.sqrt(n))))
+        return f"IVF{nlist},SQ8"
+    if index_type == "hnsw":
+        return f"HNSW{HNSW_M},SQ8"
+    raise ValueError(f"지원하지 않는 인덱스 유형입니다: {index_type}")
+
+
+def exact_neighbors(vectors: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    """원본 벡터에 대한 정확한 L2 최근접 이웃 (recall 기준값)"""
+    import faiss
+    index = faiss.IndexFlatL2(vectors.shape[1])
+    index.add(vectors)
+    return index.search(queries, k)[1]
+
+
+def recall_at_k(index, queries: np.ndarray, truth: np.ndarray, k: int) -> float:
+    """정확한 최근접 이웃 k개 중 인덱스가 찾은 비율의 평균"""
+    found = index.search(queries, k)[1]
+    hits = sum(len(set(row[row >= 0]) & set(expected)) for row, expected in zip(found, truth))
+    return hits / float(truth.size)
+
+
+def apply_search_params(index, params: Optional[Dict[str, int]]):
+    """매니페스트에 기록된 탐색 파라미터(nprobe, efSearch)를 로드한 인덱스에 적용합니다."""
+    if not params:
+        return
+    import faiss
+    faiss.ParameterSpace().set_index_parameters(index, ",".join(f"{k}={v}" for k, v in params.items()))
+
+
+def search_parameters(index, selector, params: Optional[Dict[str, int]] = None):
+    """
+    ID 선택자(selector)로 검색 대상을 제한하는 faiss 검색 파라미터.
+    검색 파라미터를 넘기면 인덱스에 설정된 nprobe/efSearch 대신 이 값이 쓰이므로 함께 지정합니다.
+    """
+    import faiss
+    params = params or {}
+    if "nprobe" in params:
+        return faiss.SearchParametersIVF(sel=selector, nprobe=int(params["nprobe"]))
+    if "efSearch" in params:
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=int(params["efSearch"]))
+    return faiss.SearchParameters(sel=selector)
+
+
+def exact_vectors(index) -> Optional[np.ndarray]:
+    """인덱스에서 원본 벡터를 그대로 꺼낼 수 있으면(Flat) 반환하고, 양자화 인덱스면 None"""
+    import faiss
+    if isinstance(index, faiss.IndexFlat) and index.ntotal:
+        return index.reconstruct_n(0, index.ntotal)
+    if isinstance(index, faiss.IndexFlat):
+        return np.empty((0, index.d), dtype=np.float32)
+    return None
+
+
+def build_index(
+    vectors: np.ndarray,
+    index_type: str = "flat",
+    min_recall: float = DEFAULT_MIN_RECALL,
+    k: int = DEFAULT_RECALL_K,
+    num_queries: int = DEFAULT_RECALL_QUERIES,
+    seed: int = 0,
+) -> Tuple[object, dict]:
+    """
+    벡터로 인덱스를 만들고 (인덱스, 정보)를 반환합니다.
+    정보: index_type, spec, search_params, recall(flat이면 None), index_bytes
+    """
+    import faiss
+
+    n, dim = vectors.shape
+    index_type = resolve_index_type(index_type, n)
+    spec = index_spec(index_type, n, dim)
+    if index_type == "pq" and n < PQ_MIN_TRAINING:
+        raise ValueError(f"PQ 인덱스 학습에는 최소 {PQ_MIN_TRAINING}개 벡터가 필요합니다. (현재 {n}개)")
+    if index_type == "ivf" and n < int(spec[3:spec.index(",")]):
+        raise ValueError(f"IVF 인덱스 학습에는 클러스터 수 이상의 벡터가 필요합니다. ({spec}, 현재 {n}개)")
+
+    index = faiss.index_factory(dim, spec, faiss.METRIC_L2)
+    if not index.is_trained:
+        index.train(vectors)
+    for start in range(0, n, 10000):
+        index.add(vectors[start:start + 10000])
+    if index_type == "ivf":
+        # 목차 DB를 만들 때 저장된 벡터를 복원(reconstruct)할 수 있도록 직접 매핑을 유지합니다.
+        faiss.extract_index_ivf(index).make_direct_map()
+
+    info = {"index_type": index_type, "spec": spec, "search_params": {}, "recall": None}
+    if index_type != "flat" and n:
+        rng = np.random.default_rng(seed)
+        sample = rng.choice(n, size=min(num_queries, n), replace=False)
+        queries = np.ascontiguousarray(vectors[sample])
+        k = min(k, n)
+        truth = exact_neighbors(vectors, queries, k)
+
+        if index_type in ("ivf", "hnsw"):
+            name, candidates = ("nprobe", NPROBE_CANDIDATES) if index_type == "ivf" else ("efSearch", EF_SEARCH_CANDIDATES)
+            if index_type == "ivf":
+                candidates = [c for c in candidates if c <= faiss.extract_index_ivf(index).nlist] or [1]
+            recall = 0.0
+            for value in candidates:
+                apply_search_params(index, {name: value})
+                recall = recall_at_k(index, queries, truth, k)
+                logging.info(f"재현율 측정: {spec} {name}={value} recall@{k}={recall:.4f}")
+                if recall >= min_recall:
+                    break
+            info["search_params"] = {name: value}
+        else:
+            recall = recall_at_k(index, queries, truth, k)
+        info["recall"] = round(recall, 4)
+
+        if recall < min_recall:
+            raise RecallTooLowError(
+                f"{spec} 인덱스의 recall@{k}={recall:.4f}가 목표({min_recall})보다 낮아 구축을 거부합니다. "
+                f"더 정확한 유형(--index-type sq8/flat)을 사용하거나 --min-recall을 조정하세요."
+            )
+        logging.info(f"재현율 검증 통과: {spec} recall@{k}={recall:.4f} (목표 {min_recall}, 질의 {len(queries)}개)")
+
+    info["index_bytes"] = int(faiss.serialize_index(index).nbytes)
+    return index, info
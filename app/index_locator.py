@@ -0,0 +1,99 @@
+# app/index_locator.py
+"""
+인덱스 디렉토리 찾기 (매니페스트 읽기, 임베딩별 인덱스 선택).
+
+헬스 체크처럼 첫 화면 전에 실행되는 코드도 사용하므로 표준 라이브러리만 임포트합니다.
+(FAISS/LangChain을 임포트하는 db_service, index_builder는 여기서 이 함수들을 가져다 씁니다)
+"""
+import os
+import json
+import logging
+from pathlib import Path
+from typing import Optional, Tuple, Union
+
+DB_DIR = Path(__file__).parent.parent / "db"
+MANIFEST_FILE = "manifest.json"
+# LangChain FAISS.save_local()이 만드는 파일 (둘 다 있어야 로드할 수 있음)
+INDEX_FILES = ("index.faiss", "index.pkl")
+
+# 매니페스트가 없는 (인덱스 빌더 이전에 만든) 인덱스 디렉토리와 구축에 사용된 임베딩
+# Ollama는 매니페스트 없는 인덱스를 쓸 수 없으므로(아래 MANIFEST_REQUIRED) 후보가 없습니다.
+LEGACY_INDEX_DIRS = {
+    "google": ["faiss_index_google_backup", "faiss_index"],
+    "bge": ["faiss_index_bge"],
+}
+
+# 매니페스트로 벡터 정규화를 확인해야 서빙할 수 있는 임베딩 → (정규화 방식, 재구축 명령)
+# 정규화 방식은 OllamaEmbeddings.normalization과 같아야 합니다.
+MANIFEST_REQUIRED = {
+    "ollama": ("l2", "python rebuild_index_ollama.py"),
+}
+
+
+def read_manifest(index_dir: Union[str, Path]) -> Optional[dict]:
+    """인덱스 디렉토리의 manifest.json을 읽습니다. 없거나 손상된 경우 None을 반환합니다."""
+    path = Path(index_dir) / MANIFEST_FILE
+    if not path.exists():
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        logging.warning(f"매니페스트를 읽을 수 없습니다 ({path}): {e}")
+        return None
+
+
+def missing_index_files(index_dir: Union[str, Path]) -> list:
+    """인덱스 디렉토리에 없는 FAISS 파일 이름 목록 (디렉토리가 없으면 전부)"""
+    return [name for name in INDEX_FILES if not (Path(index_dir) / name).is_file()]
+
+
+def serving_problem(embedding_type: str, manifest: Optional[dict]) -> Optional[str]:
+    """매니페스트로 보아 embedding_type으로 서빙할 수 없는 인덱스면 그 이유, 서빙할 수 있으면 None"""
+    if embedding_type not in MANIFEST_REQUIRED:
+        return None
+    normalization, rebuild = MANIFEST_REQUIRED[embedding_type]
+    if not manifest:
+        return f"'{embedding_type}' 임베딩은 매니페스트가 있는 인덱스만 사용할 수 있습니다. `{rebuild}`로 다시 구축하세요."
+    if manifest.get("normalization") != normalization:
+        return (
+            f"인덱스의 벡터 정규화({manifest.get('normalization')})가 '{embedding_type}' 임베딩({normalization})과 다릅니다. "
+            f"`{rebuild}`로 다시 구축하세요."
+        )
+    return None
+
+
+def find_index(embedding_type: str = "google", db_dir: Path = DB_DIR) -> Tuple[Optional[Path], Optional[dict]]:
+    """
+    embedding_type과 호환되는 인덱스 디렉토리와 매니페스트를 찾습니다.
+    1. 매니페스트의 embedding이 일치하고 서빙할 수 있는(serving_problem이 없는) 인덱스 중 가장 최근에 구축된 것
+    2. 없으면 매니페스트 없는 기존 인덱스 디렉토리 (LEGACY_INDEX_DIRS 순서)
+    """
+    candidates = []
+    if db_dir.exists():
+        for path in db_dir.iterdir():
+            if not path.is_dir() or path.name.startswith("."):
+                continue
+            manifest = read_manifest(path)
+            if manifest and manifest.get("embedding") == embedding_type and serving_problem(embedding_type, manifest) is None:
+                candidates.append((manifest.get("built_at") or "", path, manifest))
+    if candidates:
+        _, path, manifest = max(candidates, key=lambda c: c[0])
+        return path, manifest
+
+    for name in LEGACY_INDEX_DIRS.get(embedding_type, []):
+        path = db_dir / name
+        if path.exists() and read_manifest(path) is None:
+            return path, None
+    return None, None
+
+
+def get_faiss_path(embedding_type: str = "google") -> str:
+    """배포 환경과 임베딩 종류에 맞는 FAISS 경로를 동적으로 결정"""
+    # 환경변수로 경로 설정 가능
+    if os.getenv('FAISS_PATH'):
+        return os.getenv('FAISS_PATH')
+
+    path, _ = find_index(embedding_type)
+    # 기본값 (없으면 런타임에 에러 발생, Ollama는 예전 Google 인덱스를 가리키지 않도록 자기 디렉토리)
+    return str(path or DB_DIR / ("faiss_index_ollama" if embedding_type == "ollama" else "faiss_index"))
@@ -0,0 +1,319 @@
+# app/index_shards.py
+"""
+대분류별 샤드 인덱스.
+
+인덱스 빌더는 본 인덱스(전체 샤드) 옆 shards/ 디렉토리에 대분류마다 FAISS 인덱스를 하나씩 저장합니다.
+- shards/v<버전>/NNN.faiss : 해당 대분류 청크의 벡터 (본 인덱스와 같은 벡터, 재임베딩 없음)
+- shards/shards.json       : 현재 샤드 세대 디렉토리, 코퍼스 해시, 샤드 목록
+                             (대분류, 파일, 행 순서의 청크 키, 포함된 중분류, 인덱스 유형)
+
+DBService는 중분류 필터가 있는 검색을 그 중분류를 포함한 샤드로만 보내고(라우팅), 샤드 안에서는
+ID 선택자로 필터에 맞는 행만 검색합니다. 여러 샤드는 스레드에서 병렬로 검색한 뒤 거리 순으로 상위 k개를 합칩니다.
+샤드 파일은 처음 검색될 때 읽고, 최근 사용 순으로 max_loaded개까지만 메모리에 유지합니다.
+문서 본문은 본 인덱스의 문서 저장소를 공유하므로 샤드에는 벡터와 청크 키만 있습니다.
+"""
+import os
+import json
+import heapq
+import shutil
+import logging
+import threading
+from collections import OrderedDict, defaultdict
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+import numpy as np
+from langchain_core.documents import Document
+
+from .index_factory import RecallTooLowError, apply_search_params, build_index, search_parameters
+from .telemetry import REGISTRY, span
+
+SHARDS_DIR = "shards"
+SHARDS_FILE = "shards.json"
+SHARDS_FORMAT = 1
+# 샤드를 나누는 필드와, 검색 요청을 샤드로 보낼 때 사용하는 필터 필드
+SHARD_FIELD = "대분류"
+ROUTE_FIELD = "중분류"
+UNCLASSIFIED = "(미분류)"
+DEFAULT_MAX_LOADED_SHARDS = 4
+MAX_SEARCH_WORKERS = 4
+
+
+def write_shards(
+    index_dir: Union[str, Path],
+    vectors: np.ndarray,
+    keys: List[str],
+    metadatas: List[dict],
+    version: int,
+    corpus_hash: Optional[str],
+    index_type: str = "auto",
+    **recall_options,
+) -> List[dict]:
+    """
+    본 인덱스의 행 순서대로 주어진 원본 벡터/청크 키/메타데이터를 대분류별로 나누어 샤드를 저장합니다.
+    새 세대 디렉토리를 모두 쓴 뒤 shards.json을 원자적으로 교체하고, 직전 세대는 남겨 둡니다.
+    (교체 전 스냅샷이 아직 읽지 않은 샤드를 지연 로드할 수 있도록)
+    """
+    import faiss
+
+    groups: "OrderedDict[str, List[int]]" = OrderedDict()
+    for row, metadata in enumerate(metadatas):
+        groups.setdefault(metadata.get(SHARD_FIELD) or UNCLASSIFIED, []).append(row)
+
+    root = Path(index_dir) / SHARDS_DIR
+    generation = f"v{version}"
+    tmp_dir = root / f"{generation}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+
+    entries = []
+    for number, (name, rows) in enumerate(groups.items()):
+        shard_vectors = np.ascontiguousarray(vectors[rows], dtype=np.float32)
+        try:
+            index, info = build_index(shard_vectors, index_type, **recall_options)
+        except RecallTooLowError:
+            raise
+        except ValueError as e:
+            # 작은 샤드는 PQ/IVF 학습에 필요한 벡터 수가 부족할 수 있습니다.
+            logging.warning(f"샤드 '{name}'({len(rows)}개)는 {index_type} 인덱스로 만들 수 없어 flat으로 저장합니다: {e}")
+            index, info = build_index(shard_vectors, "flat")
+        file_name = f"{number:03d}.faiss"
+        faiss.write_index(index, str(tmp_dir / file_name))
+        entries.append({
+            "name": name,
+            "file": file_name,
+            "doc_count": len(rows),
+            "routes": sorted({str(metadatas[row][ROUTE_FIELD]) for row in rows if metadatas[row].get(ROUTE_FIELD) is not None}),
+            "index_spec": info["spec"],
+            "search_params": info["search_params"],
+            "recall": info["recall"],
+            "index_bytes": info["index_bytes"],
+            "keys": [keys[row] for row in rows],
+        })
+
+    shutil.rmtree(root / generation, ignore_errors=True)
+    os.replace(tmp_dir, root / generation)
+    previous = read_shards_file(index_dir)
+    path = root / SHARDS_FILE
+    with open(path.with_suffix(".tmp"), "w", encoding="utf-8") as f:
+        json.dump({
+            "format": SHARDS_FORMAT,
+            "built_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "corpus_hash": corpus_hash,
+            "field": SHARD_FIELD,
+            "route_field": ROUTE_FIELD,
+            "directory": generation,
+            "shards": entries,
+        }, f, ensure_ascii=False)
+    os.replace(path.with_suffix(".tmp"), path)
+
+    _prune_generations(root, {generation, previous.get("directory") if previous else None})
+    summary = ", ".join(f"{entry['name']} {entry['doc_count']}" for entry in entries)
+    logging.info(f"샤드 저장 완료: {root / generation} ({len(entries)}개 샤드: {summary})")
+    return entries
+
+
+def _prune_generations(root: Path, keep: set):
+    """keep에 없는 샤드 세대 디렉토리를 지웁니다."""
+    for child in root.iterdir():
+        if child.is_dir() and child.name not in keep:
+            shutil.rmtree(child, ignore_errors=True)
+
+
+def publish_shards(staging_dir: Union[str, Path], index_dir: Union[str, Path]) -> bool:
+    """
+    staging_dir에 write_shards로 저장한 샤드를 index_dir로 옮깁니다. (세대 디렉토리 → shards.json 순서)
+    직전 세대는 남겨 둡니다. 옮길 샤드가 없으면 False를 반환합니다.
+    """
+    staged = read_shards_file(staging_dir)
+    if staged is None:
+        return False
+    staging_root, root = Path(staging_dir) / SHARDS_DIR, Path(index_dir) / SHARDS_DIR
+    root.mkdir(parents=True, exist_ok=True)
+    generation = staged["directory"]
+    if (staging_root / generation).exists():
+        shutil.rmtree(root / generation, ignore_errors=True)
+        os.replace(staging_root / generation, root / generation)
+    previous = read_shards_file(index_dir)
+    os.replace(staging_root / SHARDS_FILE, root / SHARDS_FILE)
+    _prune_generations(root, {generation, previous.get("directory") if previous else None})
+    return True
+
+
+def read_shards_file(index_dir: Union[str, Path], corpus_hash: Optional[str] = None) -> Optional[dict]:
+    """shards.json을 읽습니다. corpus_hash가 주어지면 같은 코퍼스로 만든 샤드일 때만 반환합니다."""
+    path = Path(index_dir) / SHARDS_DIR / SHARDS_FILE
+    if not path.exists():
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        logging.warning(f"샤드 목록을 읽을 수 없습니다 ({path}): {e}")
+        return None
+    if data.get("format") != SHARDS_FORMAT:
+        return None
+    if corpus_hash is not None and data.get("corpus_hash") != corpus_hash:
+        return None
+    return data
+
+
+class _Shard:
+    """메모리에 로드된 샤드 하나: faiss 인덱스, 행별 문서, 중분류별 행 목록"""
+
+    def __init__(self, index, docs: List[Document], search_params: Optional[dict]):
+        self.index = index
+        self.docs = docs
+        self.search_params = search_params
+        apply_search_params(index, search_params)
+        rows = defaultdict(list)
+        for row, doc in enumerate(docs):
+            rows[doc.metadata.get(ROUTE_FIELD)].append(row)
+        self._rows = {value: np.array(positions, dtype=np.int64) for value, positions in rows.items()}
+
+    def search(self, vector: np.ndarray, k: int, values: Optional[Iterable[str]] = None) -> List[Tuple[float, int, Document]]:
+        import faiss
+
+        params, limit = None, self.index.ntotal
+        if values is not None:
+            matched = [self._rows[value] for value in values if value in self._rows]
+            if not matched:
+                return []
+            rows = np.concatenate(matched)
+            limit = len(rows)
+            if limit < self.index.ntotal:
+                params = search_parameters(self.index, faiss.IDSelectorBatch(rows), self.search_params)
+        distances, ids = self.index.search(vector, min(k, limit), params=params)
+        return [(float(d), int(i), self.docs[i]) for d, i in zip(distances[0], ids[0]) if i >= 0]
+
+
+class ShardSet:
+    """한 인덱스 세대의 샤드 목록. 샤드는 처음 검색될 때 로드하고 LRU로 max_loaded개까지 유지합니다."""
+
+    def __init__(self, directory: Path, entries: List[dict], docs_by_key: Dict[str, Document], max_loaded: int):
+        self.directory = directory
+        self.entries = OrderedDict((entry["name"], entry) for entry in entries)
+        self.max_loaded = max_loaded
+        self._docs_by_key = docs_by_key
+        self._loaded: "OrderedDict[str, _Shard]" = OrderedDict()
+        # 디스크에서 읽는 중인 샤드 (같은 샤드를 동시에 요청한 스레드는 먼저 읽기 시작한 스레드의 결과를 기다림)
+        self._loading: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._routes: Dict[str, List[str]] = defaultdict(list)
+        for name, entry in self.entries.items():
+            for value in entry.get("routes", []):
+                self._routes[value].append(name)
+        self._pool = ThreadPoolExecutor(
+            max_workers=max(1, min(MAX_SEARCH_WORKERS, len(self.entries))), thread_name_prefix="shard-search",
+        )
+
+    @classmethod
+    def open(
+        cls,
+        index_dir: Union[str, Path],
+        corpus_hash: Optional[str],
+        docs_by_key: Dict[str, Document],
+        max_loaded: int = DEFAULT_MAX_LOADED_SHARDS,
+    ) -> Optional["ShardSet"]:
+        """샤드 목록만 읽습니다. 샤드가 없거나 본 인덱스와 다른 코퍼스로 만들어졌으면 None을 반환합니다."""
+        data = read_shards_file(index_dir)
+        if data is None:
+            return None
+        if data.get("corpus_hash") != corpus_hash:
+            logging.warning(f"샤드가 현재 인덱스와 다른 코퍼스로 만들어졌습니다. 샤드 없이 검색합니다: {index_dir}")
+            return None
+        entries = data.get("shards", [])
+        missing = sum(1 for entry in entries for key in entry["keys"] if key not in docs_by_key)
+        if missing:
+            logging.warning(f"샤드의 청크 {missing}개가 본 인덱스에 없습니다. 샤드 없이 검색합니다: {index_dir}")
+            return None
+        shard_set = cls(Path(index_dir) / SHARDS_DIR / data["directory"], entries, docs_by_key, max_loaded)
+        logging.info(f"DEBUG: 샤드 목록 로드: {len(entries)}개 샤드 ({data['field']} 기준, 최대 {max_loaded or '무제한'}개 유지)")
+        return shard_set
+
+    def route(self, values: Iterable[str]) -> List[str]:
+        """values(중분류) 중 하나라도 포함한 샤드 이름 목록 (샤드 저장 순서)"""
+        names = {name for value in values for name in self._routes.get(value, [])}
+        return [name for name in self.entries if name in names]
+
+    @property
+    def loaded(self) -> List[str]:
+        return list(self._loaded)
+
+    def _load(self, name: str) -> _Shard:
+        """
+        샤드를 반환합니다. 파일 읽기는 잠금 밖에서 하므로 서로 다른 샤드는 병렬로 로드되고,
+        잠금은 _loaded/_loading을 확인·갱신할 때만 잡습니다.
+        """
+        with span("shard_load") as s:
+            return self._load_cached(name, s)
+
+    def _load_cached(self, name: str, s) -> _Shard:
+        with self._lock:
+            shard = self._loaded.get(name)
+            if shard is not None:
+                self._loaded.move_to_end(name)
+                REGISTRY.inc("rag_shard_loads_total", result="hit")
+                s.set(cache_hit=True)
+                return shard
+            pending = self._loading.get(name)
+            if pending is None:
+                self._loading[name] = Future()
+        s.set(cache_hit=False)
+        if pending is not None:
+            REGISTRY.inc("rag_shard_loads_total", result="wait")
+            return pending.result()
+
+        try:
+            shard = self._read(name)
+        except BaseException as exc:
+            with self._lock:
+                future = self._loading.pop(name)
+            future.set_exception(exc)
+            raise
+        with self._lock:
+            self._loaded[name] = shard
+            future = self._loading.pop(name)
+            REGISTRY.inc("rag_shard_loads_total", result="load")
+            while self.max_loaded and len(self._loaded) > self.max_loaded:
+                evicted, _ = self._loaded.popitem(last=False)
+                REGISTRY.inc("rag_shard_loads_total", result="evict")
+                logging.info(f"DEBUG: 샤드 해제: {evicted}")
+        future.set_result(shard)
+        return shard
+
+    def _read(self, name: str) -> _Shard:
+        """샤드 파일을 디스크에서 읽습니다. (잠금 없이 호출)"""
+        import faiss
+        entry = self.entries[name]
+        index = faiss.read_index(str(self.directory / entry["file"]))
+        if index.ntotal != len(entry["keys"]):
+            raise ValueError(f"샤드 '{name}'의 벡터 수({index.ntotal})가 샤드 목록({len(entry['keys'])})과 다릅니다.")
+        shard = _Shard(index, [self._docs_by_key[key] for key in entry["keys"]], entry.get("search_params"))
+        logging.info(f"DEBUG: 샤드 로드: {name} ({index.ntotal}개 벡터)")
+        return shard
+
+    def search(self, vector: np.ndarray, k: int, values: Optional[Iterable[str]] = None) -> Tuple[List[Document], List[str]]:
+        """
+        values(중분류)가 주어지면 해당 샤드에서 그 중분류 문서만, 없으면 모든 샤드에서 검색하여
+        거리 순 상위 k개 문서와 검색한 샤드 이름 목록을 반환합니다.
+        """
+        values = set(values) if values is not None else None
+        names = self.route(values) if values is not None else list(self.entries)
+        if not names:
+            return [], []
+        vector = np.asarray(vector, dtype=np.float32).reshape(1, -1)
+        if len(names) == 1:
+            results = [self._load(names[0]).search(vector, k, values)]
+        else:
+            futures = [self._pool.submit(lambda name: self._load(name).search(vector, k, values), name) for name in names]
+            results = [future.result() for future in futures]
+        # 샤드 순서와 행 번호로 동점을 정렬하여 결과가 항상 같도록 합니다.
+        merged = heapq.nsmallest(
+            k,
+            ((distance, order, row, doc) for order, hits in enumerate(results) for distance, row, doc in hits),
+            key=lambda hit: hit[:3],
+        )
+        return [doc for _, _, _, doc in merged], names
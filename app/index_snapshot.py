@@ -0,0 +1,280 @@
+# app/index_snapshot.py
+"""
+불변(immutable) 인덱스 스냅샷.
+
+FAISS 인덱스 하나와 그로부터 파생된 구조(전체 문서 목록, 목차 DB, 스키마 컨텍스트, 메타데이터 색인)를
+한 번에 만들어 묶어 둡니다. 분류 체계와 목차 목록은 인덱스와 함께 저장된 카탈로그(catalog.json)를 사용합니다. DBService는 스냅샷 참조만 교체하므로, 새 인덱스를 백그라운드에서
+준비한 뒤 요청 처리 중단 없이 원자적으로 바꿔 끼울 수 있습니다.
+대분류별 샤드(shards/)가 있으면 샤드 목록만 읽어 두고, 샤드 벡터는 처음 검색될 때 로드합니다.
+"""
+import logging
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict, defaultdict
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from .corpus_catalog import CatalogCompiler, read_catalog
+from .directory import ContactDirectory
+from .eligibility import EligibilityEngine, MedianIncomeTable
+from .fallback import render_fallback_answer
+from .faq import FaqIndex
+from .index_factory import apply_search_params
+from .index_locator import INDEX_FILES, read_manifest
+from .index_shards import DEFAULT_MAX_LOADED_SHARDS, ShardSet
+from .merge import CHUNK_NO_FIELD
+from .logging_utils import log_dump
+from .telemetry import span
+
+# 접두어 검색의 상한으로 사용하는 가장 큰 유니코드 문자
+_MAX_CHAR = "\U0010ffff"
+
+
+def index_generation(path: str) -> Optional[tuple]:
+    """
+    인덱스 디렉토리의 세대(generation) 식별값.
+    매니페스트가 있으면 (버전, 구축 시각), 없으면 인덱스 파일의 수정 시각을 사용합니다.
+    인덱스 파일이 없으면 None을 반환합니다.
+    """
+    manifest = read_manifest(path)
+    if manifest:
+        return (str(path), "manifest", manifest.get("version"), manifest.get("built_at"))
+    files = [Path(path) / name for name in INDEX_FILES]
+    if not all(f.exists() for f in files):
+        return None
+    return (str(path), "mtime") + tuple(f.stat().st_mtime_ns for f in files)
+
+
+class MetadataIndex:
+    """
+    필드별로 (문자열 값, 문서 위치)를 정렬해 두고 이분 탐색으로 일치/접두어 조건을 찾는 메타데이터 색인.
+    매 요청마다 전체 문서를 순회하던 metadata_search를 대체합니다.
+    """
+
+    def __init__(self, docs: List[Document]):
+        fields: Dict[str, List[Tuple[str, int]]] = defaultdict(list)
+        for pos, doc in enumerate(docs):
+            for key, value in doc.metadata.items():
+                if value is not None:
+                    fields[key].append((str(value), pos))
+        self._values: Dict[str, List[str]] = {}
+        self._positions: Dict[str, List[int]] = {}
+        for key, pairs in fields.items():
+            pairs.sort()
+            self._values[key] = [value for value, _ in pairs]
+            self._positions[key] = [pos for _, pos in pairs]
+
+    def prefix(self, key: str, prefix: str) -> List[int]:
+        """metadata[key]가 prefix로 시작하는 문서 위치 목록"""
+        values = self._values.get(key)
+        if not values:
+            return []
+        lo = bisect_left(values, prefix)
+        hi = bisect_left(values, prefix + _MAX_CHAR, lo)
+        return self._positions[key][lo:hi]
+
+    def exact(self, key: str, targets: Iterable[str]) -> List[int]:
+        """metadata[key]가 targets 중 하나와 정확히 일치하는 문서 위치 목록"""
+        values = self._values.get(key)
+        if not values:
+            return []
+        positions = []
+        for target in set(targets):
+            lo = bisect_left(values, target)
+            positions.extend(self._positions[key][lo:bisect_right(values, target, lo)])
+        return positions
+
+    def values(self, key: str) -> List[str]:
+        """필드의 고유 값 목록 (정렬됨)"""
+        return list(OrderedDict.fromkeys(self._values.get(key, [])))
+
+
+def load_catalog(path: str, manifest: dict, keys: List[str], docs: List[Document]) -> dict:
+    """
+    인덱스와 함께 저장된 catalog.json을 읽습니다.
+    카탈로그가 없거나 코퍼스가 다르면(기존 인덱스) 문서 메타데이터로 즉석 컴파일합니다.
+    """
+    catalog = read_catalog(path, manifest.get("corpus_hash"))
+    if catalog is not None:
+        return catalog
+    logging.info(f"인덱스에 카탈로그가 없어 문서 메타데이터에서 컴파일합니다: {path}")
+    compiler = CatalogCompiler()
+    for key, doc in zip(keys, docs):
+        compiler.add(key, doc.metadata)
+    return compiler.compile(corpus_hash=manifest.get("corpus_hash"))
+
+
+def build_schema_context(catalog: dict) -> Dict[str, any]:
+    """카탈로그에서 LLM 검색 설계용 '대분류-중분류' 계층 구조 컨텍스트와 사업명 목록을 꺼냅니다."""
+    context_string = catalog.get("schema_context", "")
+    log_dump("schema", "LLM에 전달될 카테고리 계층 구조 컨텍스트:\n%s", context_string)
+    return {'context_string': context_string, 'service_names': catalog.get("service_names", [])}
+
+
+class IndexSnapshot:
+    """한 세대의 FAISS 인덱스와 파생 구조. 생성 후에는 변경하지 않습니다."""
+
+    def __init__(
+        self,
+        path: str,
+        manifest: dict,
+        generation: Optional[tuple],
+        vector_db: FAISS,
+        all_docs: List[Document],
+        toc_docs: List[Document],
+        toc_db: Optional[FAISS],
+        schema_context: Dict[str, any],
+        metadata_index: MetadataIndex,
+        catalog: dict,
+        shards: Optional[ShardSet] = None,
+        faq: Optional[FaqIndex] = None,
+        directory: Optional[ContactDirectory] = None,
+        eligibility: Optional[EligibilityEngine] = None,
+        fallback_answer: Optional[str] = None,
+    ):
+        self.path = path
+        self.manifest = manifest
+        self.generation = generation
+        self.vector_db = vector_db
+        self.all_docs = all_docs
+        self.toc_docs = toc_docs
+        self.toc_db = toc_db
+        self.schema_context = schema_context
+        self.metadata_index = metadata_index
+        self.shards = shards
+        self.faq = faq if faq is not None else FaqIndex([])
+        self.directory = directory if directory is not None else ContactDirectory([])
+        self.eligibility = eligibility if eligibility is not None else EligibilityEngine(MedianIncomeTable({}), {})
+        # 검색 결과가 없을 때 LLM 없이 반환하는 정적 안내 답변 (인덱스 버전마다 한 번 렌더링)
+        self.fallback_answer = fallback_answer
+        self.catalog = catalog
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self.vector_db.embedding_function
+
+    @property
+    def version(self) -> Optional[int]:
+        return self.manifest.get("version")
+
+    @classmethod
+    def load(
+        cls,
+        path: str,
+        manifest: dict,
+        embeddings: Embeddings,
+        embedding_type: str,
+        max_loaded_shards: int = DEFAULT_MAX_LOADED_SHARDS,
+    ) -> "IndexSnapshot":
+        """인덱스를 로드하고 매니페스트와 대조한 뒤 파생 구조를 모두 만들어 스냅샷을 반환합니다."""
+        generation = index_generation(path)
+        try:
+            # FAISS 벡터 DB 로드 (임베딩 모델은 LazyEmbeddings로 전달되어 아직 로드되지 않음)
+            with span("index_load", embedding_type=embedding_type):
+                vector_db = FAISS.load_local(path, embeddings, allow_dangerous_deserialization=True)
+                # 구축 시 재현율 목표를 만족하도록 고른 탐색 파라미터(nprobe/efSearch)를 적용합니다.
+                apply_search_params(vector_db.index, manifest.get("search_params"))
+        except Exception as e:
+            logging.error(f"!!! FAISS 벡터 DB 로드 실패: {e}")
+            raise FileNotFoundError(
+                f"FAISS 인덱스 파일을 로드하는 데 실패했습니다: {path}\n"
+                f"FAISS 파일이 존재하고 손상되지 않았는지, 그리고 임베딩 모델과 호환되는지 확인해주세요.\n"
+                f"상세 오류: {e}"
+            )
+
+        dimension, doc_count = manifest.get("dimension"), manifest.get("doc_count")
+        if dimension is not None and vector_db.index.d != dimension:
+            raise ValueError(f"인덱스 차원({vector_db.index.d})이 매니페스트({dimension})와 다릅니다: {path}")
+        if doc_count is not None and vector_db.index.ntotal != doc_count:
+            logging.warning(f"인덱스 벡터 수({vector_db.index.ntotal})가 매니페스트 문서 수({doc_count})와 다릅니다: {path}")
+
+        all_docs, rows, keys, docs_by_id = [], [], [], {}
+        for row, doc_id in vector_db.index_to_docstore_id.items():
+            doc = vector_db.docstore.search(doc_id)
+            if isinstance(doc, Document):
+                # 검색 결과 병합용 정수 청크 번호 (스냅샷 안에서 고유, 문서 위치와 같음)
+                doc.metadata[CHUNK_NO_FIELD] = len(all_docs)
+                all_docs.append(doc)
+                rows.append(row)
+                keys.append(doc.metadata.get("chunk_id") or str(doc_id))
+                docs_by_id[str(doc_id)] = doc
+
+        with span("catalog_load"):
+            catalog = load_catalog(path, manifest, keys, all_docs)
+
+        # --- ✨ [핵심 복원] 목차 검색을 위한 별도 DB 생성 (목차 청크는 카탈로그에 미리 계산되어 있음) ---
+        toc_keys = set(catalog.get("toc", []))
+        toc = [(doc, row) for doc, row, key in zip(all_docs, rows, keys) if key in toc_keys]
+        toc_docs = [doc for doc, _ in toc]
+        with span("toc_index_build", documents=len(toc_docs)):
+            toc_db = cls._build_toc_db(vector_db, toc, embeddings) if toc else None
+
+        # 자주하는 질문(질문/답변) 색인: 목차 DB와 마찬가지로 저장된 벡터를 재사용합니다.
+        with span("faq_index_build") as s:
+            faq = FaqIndex.from_documents(all_docs, rows, vector_db.index)
+            s.set(documents=len(faq))
+        directory = ContactDirectory.from_documents(all_docs)
+        # 기준 중위소득 표와 소득·나이 자격 조건을 규칙으로 컴파일합니다.
+        with span("eligibility_compile") as s:
+            eligibility = EligibilityEngine.from_documents(all_docs)
+            s.set(documents=len(eligibility))
+
+        snapshot = cls(
+            path=path,
+            manifest={k: v for k, v in manifest.items() if k != "chunks"},
+            generation=generation,
+            vector_db=vector_db,
+            all_docs=all_docs,
+            toc_docs=toc_docs,
+            toc_db=toc_db,
+            schema_context=build_schema_context(catalog),
+            metadata_index=MetadataIndex(all_docs),
+            catalog=catalog,
+            shards=ShardSet.open(path, manifest.get("corpus_hash"), docs_by_id, max_loaded_shards),
+            faq=faq,
+            directory=directory,
+            eligibility=eligibility,
+            fallback_answer=render_fallback_answer(all_docs),
+        )
+        logging.info(
+            f"DEBUG: FAISS 벡터 DB 로드 성공. 전체 {len(all_docs)}개 문서, 목차 {len(toc_docs)}개 항목, FAQ {len(faq)}개, 연락처 {len(directory)}개, 자격 규칙 {len(eligibility)}개."
+        )
+        return snapshot
+
+    @staticmethod
+    def _build_toc_db(vector_db: FAISS, toc: List[Tuple[Document, int]], embeddings: Embeddings) -> FAISS:
+        """
+        목차 전용 DB를 만듭니다. 본 인덱스에 저장된 벡터를 그대로 재사용하므로 임베딩 호출이 없습니다.
+        벡터를 복원할 수 없는 인덱스 유형이면 목차 문서를 다시 임베딩합니다.
+        """
+        docs = [doc for doc, _ in toc]
+        try:
+            vectors = np.vstack([vector_db.index.reconstruct(int(row)) for _, row in toc])
+        except RuntimeError as e:
+            logging.warning(f"인덱스에서 목차 벡터를 복원할 수 없어 다시 임베딩합니다: {e}")
+            return FAISS.from_documents(docs, embeddings)
+        return FAISS.from_embeddings(
+            list(zip([doc.page_content for doc in docs], vectors)),
+            embeddings,
+            metadatas=[doc.metadata for doc in docs],
+        )
+
+    def metadata_search(self, filter_dict: Dict) -> List[Document]:
+        """모든 조건(metadata[key]가 value로 시작)을 만족하는 문서를 원래 순서대로 반환합니다."""
+        if not filter_dict:
+            return [doc for doc in self.all_docs if doc and doc.metadata]
+        matched = None
+        for key, value in filter_dict.items():
+            positions = set(self.metadata_index.prefix(key, str(value)))
+            matched = positions if matched is None else matched & positions
+            if not matched:
+                return []
+        return [self.all_docs[pos] for pos in sorted(matched)]
+
+    def documents_in(self, key: str, values: Iterable[str]) -> List[Document]:
+        """metadata[key]가 values 중 하나와 정확히 일치하는 문서를 원래 순서대로 반환합니다."""
+        return [self.all_docs[pos] for pos in sorted(self.metadata_index.exact(key, values))]
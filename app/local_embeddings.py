@@ -1,43 +1,200 @@
-"""
-Local embedding service using BGE-M3 model
-"""
-import logging
-import numpy as np
-from typing import List
-from sentence_transformers import SentenceTransformer
-from langchain_core.embeddings import Embeddings
-
-class BGE_M3_Embeddings(Embeddings):
-    """BGE-M3 embedding wrapper for LangChain compatibility"""
-
-    def __init__(self, model_name: str = "BAAI/bge-m3"):
-        """Initialize BGE-M3 model"""
-        logging.info(f"Loading BGE-M3 embedding model: {model_name}")
-        try:
-            self.model = SentenceTransformer(model_name)
-            logging.info("BGE-M3 model loaded successfully")
-        except Exception as e:
-            logging.error(f"Failed to load BGE-M3 model: {e}")
-            raise
-
-    def embed_documents(self, texts: List[str]) -> List[List[float]]:
-        """Embed a list of documents"""
-        try:
-            embeddings = self.model.encode(texts, normalize_embeddings=True)
-            return embeddings.tolist()
-        except Exception as e:
-            logging.error(f"Error embedding documents: {e}")
-            raise
-
-    def embed_query(self, text: str) -> List[float]:
-        """Embed a single query"""
-        try:
-            embedding = self.model.encode([text], normalize_embeddings=True)
-            return embedding[0].tolist()
-        except Exception as e:
-            logging.error(f"Error embedding query: {e}")
-            raise
-
-def get_local_embeddings() -> BGE_M3_Embeddings:
-    """Get BGE-M3 embeddings instance"""
-    return BGE_M3_Embeddings()
\ No newline at end of file
+"""
+Local embedding service using BGE-M3 model
+"""
+import os
+import logging
+import threading
+import numpy as np
+from collections import OrderedDict
+from typing import List, Optional
+from sentence_transformers import SentenceTransformer
+from langchain_core.embeddings import Embeddings
+
+from .telemetry import span
+
+# Supported inference backends for BGE-M3
+#   torch : full-precision PyTorch (original behaviour)
+#   int8  : PyTorch with dynamic int8 quantization of Linear layers (CPU)
+#   onnx  : ONNX Runtime via sentence-transformers (optionally a pre-quantized .onnx file)
+BGE_BACKENDS = ("torch", "int8", "onnx")
+
+class BGE_M3_Embeddings(Embeddings):
+    """BGE-M3 embedding wrapper for LangChain compatibility"""
+
+    def __init__(self, model_name: str = "BAAI/bge-m3"):
+        """Initialize BGE-M3 model"""
+        self.model_name = model_name
+        logging.info(f"Loading BGE-M3 embedding model: {model_name}")
+        try:
+            self.model = SentenceTransformer(model_name)
+            logging.info("BGE-M3 model loaded successfully")
+        except Exception as e:
+            logging.error(f"Failed to load BGE-M3 model: {e}")
+            raise
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed a list of documents"""
+        try:
+            embeddings = self.model.encode(texts, normalize_embeddings=True)
+            return embeddings.tolist()
+        except Exception as e:
+            logging.error(f"Error embedding documents: {e}")
+            raise
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a single query"""
+        try:
+            embedding = self.model.encode([text], normalize_embeddings=True)
+            return embedding[0].tolist()
+        except Exception as e:
+            logging.error(f"Error embedding query: {e}")
+            raise
+
+class OptimizedBGE_M3_Embeddings(Embeddings):
+    """
+    CPU-optimized BGE-M3 embeddings.
+
+    - int8 dynamic quantization or ONNX Runtime inference
+    - tuned batch size, thread count and max sequence length
+    - length-sorted batching (shortest-padding batches)
+    - float32 NumPy API (embed_documents_array / embed_query_array) without list conversion
+    - small LRU cache for repeated queries
+    """
+
+    def __init__(
+        self,
+        model_name: str = "BAAI/bge-m3",
+        backend: str = "int8",
+        batch_size: int = 32,
+        num_threads: Optional[int] = None,
+        max_seq_length: int = 512,
+        onnx_file: Optional[str] = None,
+        query_cache_size: int = 256,
+    ):
+        """Initialize an optimized BGE-M3 model"""
+        if backend not in BGE_BACKENDS:
+            raise ValueError(f"Unsupported BGE backend: {backend} (choose from {BGE_BACKENDS})")
+        self.model_name = model_name
+        self.backend = backend
+        self.batch_size = batch_size
+        self.query_cache_size = query_cache_size
+        # Shared across request threads; cached arrays are read-only since every caller gets the same object
+        self._query_cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._query_cache_lock = threading.Lock()
+
+        logging.info(
+            f"Loading BGE-M3 embedding model: {model_name} "
+            f"(backend={backend}, batch_size={batch_size}, threads={num_threads or 'auto'}, max_seq_length={max_seq_length})"
+        )
+        try:
+            self.model = self._load_model(model_name, backend, num_threads, onnx_file)
+            self.model.max_seq_length = max_seq_length
+            logging.info("BGE-M3 model loaded successfully")
+        except Exception as e:
+            logging.error(f"Failed to load BGE-M3 model: {e}")
+            raise
+
+    @staticmethod
+    def _load_model(model_name: str, backend: str, num_threads: Optional[int], onnx_file: Optional[str]) -> SentenceTransformer:
+        if backend == "onnx":
+            model_kwargs = {"provider": "CPUExecutionProvider"}
+            if onnx_file:
+                model_kwargs["file_name"] = onnx_file
+            if num_threads:
+                import onnxruntime as ort
+                session_options = ort.SessionOptions()
+                session_options.intra_op_num_threads = num_threads
+                session_options.inter_op_num_threads = 1
+                model_kwargs["session_options"] = session_options
+            return SentenceTransformer(model_name, device="cpu", backend="onnx", model_kwargs=model_kwargs)
+
+        import torch
+        if num_threads:
+            torch.set_num_threads(num_threads)
+        model = SentenceTransformer(model_name, device="cpu")
+        if backend == "int8":
+            model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        return model
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        """Encode texts in length-sorted batches and return a float32 (n, dim) array in input order"""
+        if not texts:
+            dim = self.model.get_sentence_embedding_dimension() or 0
+            return np.empty((0, dim), dtype=np.float32)
+        # Sort by length so each batch pads to a similar length, then restore input order.
+        order = np.argsort([len(t) for t in texts], kind="stable")
+        sorted_texts = [texts[i] for i in order]
+        sorted_embeddings = self.model.encode(
+            sorted_texts,
+            batch_size=self.batch_size,
+            normalize_embeddings=True,
+            convert_to_numpy=True,
+            show_progress_bar=False,
+        )
+        embeddings = np.empty_like(sorted_embeddings, dtype=np.float32)
+        embeddings[order] = sorted_embeddings
+        return embeddings
+
+    def embed_documents_array(self, texts: List[str]) -> np.ndarray:
+        """Embed documents and return a float32 (n, dim) array"""
+        try:
+            return self._encode(texts)
+        except Exception as e:
+            logging.error(f"Error embedding documents: {e}")
+            raise
+
+    def embed_query_array(self, text: str) -> np.ndarray:
+        """Embed a single query and return a read-only float32 (dim,) array (copy it before modifying)"""
+        with span("query_embedding") as s:
+            with self._query_cache_lock:
+                cached = self._query_cache.get(text)
+                if cached is not None:
+                    self._query_cache.move_to_end(text)
+            if self.query_cache_size:
+                s.set(cache_hit=cached is not None)
+            if cached is not None:
+                return cached
+            try:
+                embedding = self.model.encode(
+                    text, normalize_embeddings=True, convert_to_numpy=True, show_progress_bar=False
+                ).astype(np.float32, copy=False)
+            except Exception as e:
+                logging.error(f"Error embedding query: {e}")
+                raise
+            embedding.setflags(write=False)
+            if self.query_cache_size:
+                with self._query_cache_lock:
+                    self._query_cache[text] = embedding
+                    self._query_cache.move_to_end(text)
+                    while len(self._query_cache) > self.query_cache_size:
+                        self._query_cache.popitem(last=False)
+            return embedding
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed a list of documents (LangChain interface)"""
+        return self.embed_documents_array(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a single query (LangChain interface)"""
+        return self.embed_query_array(text).tolist()
+
+def get_local_embeddings(backend: Optional[str] = None) -> Embeddings:
+    """
+    Get BGE-M3 embeddings instance.
+
+    The backend is taken from the argument or the BGE_BACKEND environment variable;
+    'torch' (default) keeps the original full-precision model, 'int8' and 'onnx'
+    return OptimizedBGE_M3_Embeddings tuned by BGE_BATCH_SIZE, BGE_NUM_THREADS,
+    BGE_MAX_SEQ_LENGTH and BGE_ONNX_FILE.
+    """
+    backend = (backend or os.getenv("BGE_BACKEND", "torch")).lower()
+    if backend == "torch":
+        return BGE_M3_Embeddings()
+    num_threads = os.getenv("BGE_NUM_THREADS")
+    return OptimizedBGE_M3_Embeddings(
+        backend=backend,
+        batch_size=int(os.getenv("BGE_BATCH_SIZE", "32")),
+        num_threads=int(num_threads) if num_threads else None,
+        max_seq_length=int(os.getenv("BGE_MAX_SEQ_LENGTH", "512")),
+        onnx_file=os.getenv("BGE_ONNX_FILE") or None,
+    )
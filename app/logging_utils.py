@@ -0,0 +1,123 @@
+"""
+Non-blocking logging helpers for Welfare Chatbot
+
+- Lazy formatters: large payloads (plans, document listings) are rendered only
+  when a handler actually emits the record, on the logging listener thread.
+- Dump loggers: verbose retrieval/plan dumps go to 'welfare.dump.<category>'
+  loggers and are sampled per category before a record is even created.
+"""
+import json
+import random
+import logging
+import logging.handlers
+from typing import Dict, Iterable, Optional
+
+DUMP_LOGGER_PREFIX = "welfare.dump"
+
+
+class LazyJson:
+    """Defer json.dumps until the record is formatted"""
+    __slots__ = ("obj", "indent", "_text")
+
+    def __init__(self, obj, indent: Optional[int] = 2):
+        self.obj = obj
+        self.indent = indent
+        self._text = None
+
+    def __str__(self):
+        # Each handler formats the record again; render only once.
+        if self._text is None:
+            try:
+                self._text = json.dumps(self.obj, ensure_ascii=False, indent=self.indent, default=str)
+            except (TypeError, ValueError):
+                self._text = repr(self.obj)
+        return self._text
+
+
+class LazyDocListing:
+    """Defer rendering of a '중분류 | 사업명' listing of retrieved documents"""
+    __slots__ = ("docs", "_text")
+
+    def __init__(self, docs: Iterable):
+        self.docs = list(docs)
+        self._text = None
+
+    def __str__(self):
+        if self._text is not None:
+            return self._text
+        lines = []
+        for i, doc in enumerate(self.docs):
+            minor_category = doc.metadata.get('중분류', 'N/A')
+            service_name = doc.metadata.get('사업명', 'N/A')
+            lines.append(f"{i+1:02d}. 중분류: {str(minor_category):<40} | 사업명: {service_name}")
+        self._text = "\n".join(lines)
+        return self._text
+
+
+class DumpSampler:
+    """Per-category sampling rates for verbose dump loggers"""
+
+    def __init__(self, default_rate: float = 1.0, rates: Optional[Dict[str, float]] = None):
+        self.default_rate = default_rate
+        self.rates = rates or {}
+
+    def rate_for(self, category: str) -> float:
+        return self.rates.get(category, self.default_rate)
+
+    def should_log(self, category: str) -> bool:
+        rate = self.rate_for(category)
+        if rate >= 1.0:
+            return True
+        if rate <= 0.0:
+            return False
+        return random.random() < rate
+
+
+_sampler = DumpSampler()
+
+
+def configure_dump_sampling(default_rate: float, rates: Optional[Dict[str, float]] = None):
+    """Set sampling rates for dump categories (e.g. {'retrieval': 0.1, 'plan': 1.0})"""
+    global _sampler
+    _sampler = DumpSampler(default_rate, rates)
+
+
+def parse_sample_rates(spec: str) -> Dict[str, float]:
+    """Parse 'retrieval=0.1,plan=1.0' into a dict"""
+    rates = {}
+    for part in (spec or "").split(","):
+        if "=" not in part:
+            continue
+        category, value = part.split("=", 1)
+        try:
+            rates[category.strip()] = float(value)
+        except ValueError:
+            logging.warning(f"Invalid dump sample rate ignored: {part}")
+    return rates
+
+
+def log_dump(category: str, msg: str, *args):
+    """
+    Emit a verbose DEBUG dump for the given category, subject to sampling.
+    Arguments should be lazy objects (LazyJson, LazyDocListing) so nothing is
+    formatted on the request thread.
+    """
+    logger = logging.getLogger(f"{DUMP_LOGGER_PREFIX}.{category}")
+    if not logger.isEnabledFor(logging.DEBUG):
+        return
+    if not _sampler.should_log(category):
+        return
+    logger.debug(msg, *args)
+
+
+class DeferredFormatQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that enqueues the record without formatting it.
+
+    The stock QueueHandler.prepare() calls self.format() on the caller's thread;
+    since the listener runs in the same process, we hand the record over as is
+    and let the listener's handlers do the formatting.
+    """
+
+    def prepare(self, record):
+        return record
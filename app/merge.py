@@ -0,0 +1,87 @@
+# app/merge.py
+"""
+검색 결과 병합.
+
+Fast Track, 지능형 검색(계획 우선순위별), 위기 지원 검색 결과를 합치면서 같은 청크는 한 번만 남깁니다.
+청크는 스냅샷 로드 시 붙이는 정수 번호(metadata['chunk_no'])로 구분하므로 본문 문자열을 해시하지 않고
+전체 결과 수에 비례하는 시간(O(n))에 병합합니다. 각 청크를 어느 단계·우선순위에서 찾았는지(출처)도 함께 기록합니다.
+"""
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional
+
+from langchain_core.documents import Document
+
+# 스냅샷 안에서 청크마다 고유한 정수 번호 (인덱스 구축 시 내용 해시와 카탈로그에서는 제외)
+CHUNK_NO_FIELD = "chunk_no"
+
+
+@dataclass(frozen=True)
+class Provenance:
+    """청크를 찾은 검색 단계. priority는 지능형 검색 계획의 우선순위 (다른 단계는 None)"""
+    stage: str  # "fast_track" | "intelligent" | "crisis"
+    priority: Optional[int] = None
+
+
+def chunk_no(doc: Document) -> int:
+    """병합 키. 청크 번호가 없는 문서(스냅샷 밖에서 만든 문서)는 객체 id로 구분합니다. (음수라 청크 번호와 겹치지 않음)"""
+    number = doc.metadata.get(CHUNK_NO_FIELD)
+    return number if isinstance(number, int) else ~id(doc)
+
+
+class MergedResults:
+    """처음 찾은 순서를 유지하는 청크 목록과 청크별 출처"""
+
+    def __init__(self):
+        self._positions: Dict[int, int] = {}
+        self.documents: List[Document] = []
+        self.provenance: List[List[Provenance]] = []
+        self.duplicates = 0
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def __bool__(self) -> bool:
+        return bool(self.documents)
+
+    def add(self, stage: str, docs: Iterable[Document], priority: Optional[int] = None) -> int:
+        """docs를 추가하고 새로 추가된 청크 수를 반환합니다. 이미 있는 청크는 출처만 더합니다."""
+        source = Provenance(stage, priority)
+        added = 0
+        for doc in docs:
+            key = chunk_no(doc)
+            position = self._positions.get(key)
+            if position is None:
+                self._positions[key] = len(self.documents)
+                self.documents.append(doc)
+                self.provenance.append([source])
+                added += 1
+                continue
+            self.duplicates += 1
+            sources = self.provenance[position]
+            if source not in sources:
+                sources.append(source)
+        return added
+
+    def sources(self, doc: Document) -> List[Provenance]:
+        position = self._positions.get(chunk_no(doc))
+        return list(self.provenance[position]) if position is not None else []
+
+    def found_by(self, doc: Document, stage: str) -> bool:
+        return any(source.stage == stage for source in self.sources(doc))
+
+    def retain(self, docs: Iterable[Document]) -> None:
+        """docs에 있는 청크만 남깁니다. (순서와 출처 유지)"""
+        keep = {chunk_no(doc) for doc in docs}
+        documents, provenance = self.documents, self.provenance
+        self._positions, self.documents, self.provenance = {}, [], []
+        for doc, sources in zip(documents, provenance):
+            key = chunk_no(doc)
+            if key in keep:
+                self._positions[key] = len(self.documents)
+                self.documents.append(doc)
+                self.provenance.append(sources)
+
+    def stage_counts(self) -> Dict[str, int]:
+        """단계별로 처음 찾은 청크 수"""
+        return dict(Counter(sources[0].stage for sources in self.provenance))
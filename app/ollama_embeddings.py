@@ -1,54 +1,143 @@
-"""
-Ollama embedding service using nomic-embed-text model
-"""
-import logging
-import requests
-import json
-from typing import List
-from langchain_core.embeddings import Embeddings
-
-class OllamaEmbeddings(Embeddings):
-    """Ollama embedding wrapper for LangChain compatibility using nomic-embed-text"""
-
-    def __init__(self, model_name: str = "nomic-embed-text", base_url: str = "http://localhost:11434"):
-        """Initialize Ollama embeddings"""
-        self.model_name = model_name
-        self.base_url = base_url
-        logging.info(f"Using Ollama embedding model: {model_name}")
-
-    def embed_documents(self, texts: List[str]) -> List[List[float]]:
-        """Embed a list of documents"""
-        try:
-            embeddings = []
-            for text in texts:
-                response = requests.post(
-                    f"{self.base_url}/api/embeddings",
-                    json={"model": self.model_name, "prompt": text},
-                    timeout=30
-                )
-                response.raise_for_status()
-                result = response.json()
-                embeddings.append(result["embedding"])
-            return embeddings
-        except Exception as e:
-            logging.error(f"Error embedding documents with Ollama: {e}")
-            raise
-
-    def embed_query(self, text: str) -> List[float]:
-        """Embed a single query"""
-        try:
-            response = requests.post(
-                f"{self.base_url}/api/embeddings",
-                json={"model": self.model_name, "prompt": text},
-                timeout=30
-            )
-            response.raise_for_status()
-            result = response.json()
-            return result["embedding"]
-        except Exception as e:
-            logging.error(f"Error embedding query with Ollama: {e}")
-            raise
-
-def get_ollama_embeddings() -> OllamaEmbeddings:
-    """Get Ollama embeddings instance"""
-    return OllamaEmbeddings()
\ No newline at end of file
+"""
+Ollama embedding service using nomic-embed-text model
+"""
+import os
+import math
+import logging
+import threading
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from langchain_core.embeddings import Embeddings
+
+# Status codes treated as transient and retried with backoff
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+class OllamaEmbeddings(Embeddings):
+    """
+    Ollama embedding wrapper for LangChain compatibility using nomic-embed-text.
+
+    Documents are sent in batches to the batch endpoint (/api/embed) over a pooled
+    requests.Session, with a bounded number of batches in flight and automatic retry
+    of transient errors. Servers without /api/embed fall back to /api/embeddings.
+
+    /api/embed returns L2-normalized vectors while /api/embeddings does not, so every
+    vector is normalized here to keep both paths (and query vs. document vectors)
+    on the same scale. The builder records `normalization` in the index manifest;
+    indexes built before this (unnormalized) must be rebuilt.
+    """
+
+    # Recorded in the index manifest and checked when an index is loaded
+    normalization = "l2"
+
+    def __init__(
+        self,
+        model_name: str = "nomic-embed-text",
+        base_url: str = "http://localhost:11434",
+        batch_size: int = 64,
+        max_workers: int = 4,
+        max_retries: int = 3,
+        backoff_factor: float = 0.5,
+        timeout: float = 60,
+    ):
+        """Initialize Ollama embeddings"""
+        self.model_name = model_name
+        self.base_url = base_url.rstrip("/")
+        self.batch_size = max(1, batch_size)
+        self.max_workers = max(1, max_workers)
+        self.timeout = timeout
+        self._batch_endpoint_supported: Optional[bool] = None
+        self._lock = threading.Lock()
+        self.session = self._create_session(max_retries, backoff_factor)
+        logging.info(
+            f"Using Ollama embedding model: {model_name} "
+            f"(batch_size={self.batch_size}, max_workers={self.max_workers})"
+        )
+
+    def _create_session(self, max_retries: int, backoff_factor: float) -> requests.Session:
+        retry = Retry(
+            total=max_retries,
+            connect=max_retries,
+            read=max_retries,
+            status=max_retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=RETRY_STATUS_CODES,
+            allowed_methods=frozenset(["POST"]),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_workers, max_retries=retry)
+        session = requests.Session()
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def _post(self, path: str, payload: dict) -> requests.Response:
+        return self.session.post(f"{self.base_url}{path}", json=payload, timeout=self.timeout)
+
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        """Embed one batch, preferring the batch endpoint"""
+        if self._batch_endpoint_supported is not False:
+            response = self._post("/api/embed", {"model": self.model_name, "input": texts})
+            if response.status_code == 404 and "model" not in response.text.lower():
+                # Older Ollama servers (< 0.3) only expose /api/embeddings.
+                with self._lock:
+                    if self._batch_endpoint_supported is None:
+                        logging.warning("Ollama /api/embed not available; falling back to /api/embeddings")
+                    self._batch_endpoint_supported = False
+            else:
+                response.raise_for_status()
+                self._batch_endpoint_supported = True
+                embeddings = response.json()["embeddings"]
+                if len(embeddings) != len(texts):
+                    raise ValueError(f"Ollama returned {len(embeddings)} embeddings for {len(texts)} inputs")
+                return [_l2_normalize(embedding) for embedding in embeddings]
+        return [self._embed_single(text) for text in texts]
+
+    def _embed_single(self, text: str) -> List[float]:
+        response = self._post("/api/embeddings", {"model": self.model_name, "prompt": text})
+        response.raise_for_status()
+        return _l2_normalize(response.json()["embedding"])
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed a list of documents (order preserved)"""
+        try:
+            batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+            if len(batches) <= 1 or self.max_workers == 1:
+                results = [self._embed_batch(batch) for batch in batches]
+            else:
+                with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="ollama-embed") as executor:
+                    results = list(executor.map(self._embed_batch, batches))
+            return [embedding for batch in results for embedding in batch]
+        except Exception as e:
+            logging.error(f"Error embedding documents with Ollama: {e}")
+            raise
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a single query"""
+        try:
+            return self._embed_batch([text])[0]
+        except Exception as e:
+            logging.error(f"Error embedding query with Ollama: {e}")
+            raise
+
+    def close(self):
+        """Close pooled connections"""
+        self.session.close()
+
+def _l2_normalize(vector: List[float]) -> List[float]:
+    """Scale a vector to unit length (zero vectors are returned unchanged)"""
+    norm = math.sqrt(sum(value * value for value in vector))
+    return [value / norm for value in vector] if norm else list(vector)
+
+def get_ollama_embeddings() -> OllamaEmbeddings:
+    """Get Ollama embeddings instance (configurable via OLLAMA_* environment variables)"""
+    return OllamaEmbeddings(
+        model_name=os.getenv("OLLAMA_EMBED_MODEL", "nomic-embed-text"),
+        base_url=os.getenv("OLLAMA_BASE_URL", "http://localhost:11434"),
+        batch_size=int(os.getenv("OLLAMA_EMBED_BATCH_SIZE", "64")),
+        max_workers=int(os.getenv("OLLAMA_EMBED_WORKERS", "4")),
+        max_retries=int(os.getenv("MAX_RETRIES", "3")),
+        timeout=float(os.getenv("OLLAMA_TIMEOUT", "60")),
+    )
@@ -0,0 +1,267 @@
+# app/session_store.py
+"""
+대화 기록 저장소.
+
+Streamlit 세션 상태에 모든 대화의 전체 메시지를 쌓아 두던 방식 대신, 대화와 세션별 챗봇 상태를
+로컬 SQLite(WAL)에 저장합니다. 앱을 다시 시작해도 같은 세션 ID(주소의 ?sid=)로 이어서 볼 수 있습니다.
+- 메모리   : 최근 사용한 세션 cache_size개의 사이드바 목록(제목만)과 챗봇 상태만 LRU로 유지
+- 지연 로드 : 대화 메시지는 사이드바에서 대화를 누를 때 DB에서 읽음 (zlib 압축 JSON)
+- 상한     : 세션당 대화 수, 대화당 메시지 수, 세션당 저장 용량, 보관 기간
+"""
+import json
+import logging
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from .conversation import TRIMMED_TURNS_KEY
+from .telemetry import REGISTRY
+
+DEFAULT_SESSION_DB = "./db/sessions.sqlite3"
+DEFAULT_SESSION_CACHE_SIZE = 64
+TITLE_LENGTH = 30
+# 보관 기간이 지난 대화를 지우는 최소 간격(초)
+PURGE_INTERVAL = 3600
+
+# 세션 메모리/저장 용량 히스토그램 버킷 (바이트)
+BYTES_BUCKETS = (1_000, 5_000, 10_000, 50_000, 100_000, 250_000, 500_000, 1_000_000, 5_000_000)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS conversations (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id TEXT NOT NULL,
+    title TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    size_bytes INTEGER NOT NULL,
+    messages BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS conversations_by_session ON conversations (session_id, updated_at);
+CREATE TABLE IF NOT EXISTS session_state (
+    session_id TEXT PRIMARY KEY,
+    updated_at REAL NOT NULL,
+    state TEXT NOT NULL
+);
+"""
+
+
+@dataclass(frozen=True)
+class SessionLimits:
+    """저장 상한. 0 이하는 제한 없음"""
+    max_conversations: int = 20
+    max_messages: int = 100
+    max_bytes: int = 1_000_000
+    max_age_days: float = 30
+
+
+@dataclass(frozen=True)
+class ConversationSummary:
+    """사이드바에 보여줄 대화 목록 항목 (메시지는 포함하지 않음)"""
+    id: int
+    title: str
+    updated_at: float
+    size_bytes: int
+
+
+@dataclass
+class _HotSession:
+    conversations: List[ConversationSummary]
+    state: dict
+
+
+def estimate_bytes(value) -> int:
+    """JSON으로 직렬화한 크기로 추정한 메모리 사용량 (바이트)"""
+    return len(json.dumps(value, ensure_ascii=False, default=str).encode("utf-8"))
+
+
+def conversation_title(messages: List[dict]) -> Optional[str]:
+    """첫 사용자 질문으로 만든 대화 제목. 사용자 질문이 없으면 None"""
+    for message in messages:
+        if message.get("role") == "user":
+            content = " ".join(str(message.get("content") or "").split())
+            return content[:TITLE_LENGTH] + ("..." if len(content) > TITLE_LENGTH else "")
+    return None
+
+
+class SessionStore:
+    """SQLite(WAL) 대화 저장소. 여러 Streamlit 세션 스레드가 공유하므로 모든 DB 접근을 잠금으로 직렬화합니다."""
+
+    def __init__(self, path: str = DEFAULT_SESSION_DB, cache_size: int = DEFAULT_SESSION_CACHE_SIZE,
+                 limits: SessionLimits = SessionLimits()):
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.cache_size = max(cache_size, 1)
+        self.limits = limits
+        self._lock = threading.Lock()
+        self._hot: "OrderedDict[str, _HotSession]" = OrderedDict()
+        self._last_purge = 0.0
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        self.purge_expired()
+
+    # --- 메시지 상한 ---
+    def cap_messages(self, messages: List[dict]) -> List[dict]:
+        """대화당 메시지 수 상한을 넘으면 오래된 메시지부터 버립니다."""
+        limit = self.limits.max_messages
+        return messages[-limit:] if limit > 0 and len(messages) > limit else messages
+
+    def cap_session_messages(self, session_state) -> None:
+        """
+        현재 대화(session_state['messages'])에 메시지 수 상한을 적용합니다.
+        잘라낸 사용자 질문 수는 TRIMMED_TURNS_KEY에 더해 후속 질문 판정의 턴 번호가 이어지도록 합니다.
+        """
+        messages = session_state.get("messages", [])
+        capped = self.cap_messages(messages)
+        if len(capped) == len(messages):
+            return
+        dropped = messages[:len(messages) - len(capped)]
+        session_state[TRIMMED_TURNS_KEY] = session_state.get(TRIMMED_TURNS_KEY, 0) + sum(
+            1 for message in dropped if message.get("role") == "user")
+        session_state["messages"] = capped
+
+    # --- 세션 (LRU) ---
+    def _hot_session(self, session_id: str) -> _HotSession:
+        """잠금 안에서 호출합니다. 캐시에 없으면 DB에서 목록과 상태를 읽고 가장 오래 쓰지 않은 세션을 내보냅니다."""
+        entry = self._hot.get(session_id)
+        if entry is not None:
+            self._hot.move_to_end(session_id)
+            REGISTRY.inc("rag_session_cache_total", result="hit")
+            return entry
+        REGISTRY.inc("rag_session_cache_total", result="miss")
+        rows = self._db.execute(
+            "SELECT id, title, updated_at, size_bytes FROM conversations WHERE session_id = ? ORDER BY updated_at DESC",
+            (session_id,),
+        ).fetchall()
+        state_row = self._db.execute("SELECT state FROM session_state WHERE session_id = ?", (session_id,)).fetchone()
+        entry = _HotSession([ConversationSummary(*row) for row in rows], json.loads(state_row[0]) if state_row else {})
+        self._hot[session_id] = entry
+        while len(self._hot) > self.cache_size:
+            self._hot.popitem(last=False)
+            REGISTRY.inc("rag_session_cache_total", result="evict")
+        return entry
+
+    def conversations(self, session_id: str) -> List[ConversationSummary]:
+        """세션의 대화 목록 (최근 순)"""
+        with self._lock:
+            return list(self._hot_session(session_id).conversations)
+
+    def load_state(self, session_id: str) -> dict:
+        """세션별 챗봇 상태 (현재 대화 ID, 엔진, 대화 모드, 검색 이어받기 상태 등)"""
+        with self._lock:
+            return dict(self._hot_session(session_id).state)
+
+    def save_state(self, session_id: str, state: dict) -> None:
+        payload = json.dumps(state, ensure_ascii=False, default=str)
+        with self._lock:
+            self._hot_session(session_id).state = json.loads(payload)
+            self._db.execute(
+                "INSERT INTO session_state (session_id, updated_at, state) VALUES (?, ?, ?) "
+                "ON CONFLICT(session_id) DO UPDATE SET updated_at = excluded.updated_at, state = excluded.state",
+                (session_id, time.time(), payload),
+            )
+            self._db.commit()
+
+    # --- 대화 ---
+    def load_messages(self, conversation_id: int) -> List[dict]:
+        """대화 메시지를 읽습니다. (사이드바에서 대화를 눌렀을 때만 호출)"""
+        with self._lock:
+            row = self._db.execute("SELECT messages FROM conversations WHERE id = ?", (conversation_id,)).fetchone()
+        if row is None:
+            return []
+        return json.loads(zlib.decompress(row[0]).decode("utf-8"))
+
+    def save_conversation(self, session_id: str, messages: List[dict], conversation_id: Optional[int] = None) -> Optional[int]:
+        """
+        대화를 저장하고 대화 ID를 반환합니다. (사용자 질문이 없는 대화는 저장하지 않고 conversation_id 그대로 반환)
+        저장 후 세션당 대화 수·용량 상한을 넘으면 가장 오래된 대화부터 지웁니다. (방금 저장한 대화는 유지)
+        """
+        title = conversation_title(messages)
+        if title is None:
+            return conversation_id
+        data = json.dumps(self.cap_messages(messages), ensure_ascii=False, default=str).encode("utf-8")
+        blob = zlib.compress(data)
+        now = time.time()
+        with self._lock:
+            updated = 0
+            if conversation_id is not None:
+                updated = self._db.execute(
+                    # 제목은 처음 저장할 때 정합니다. (메시지 수 상한으로 첫 질문이 잘려도 유지)
+                    "UPDATE conversations SET updated_at = ?, size_bytes = ?, messages = ? WHERE id = ? AND session_id = ?",
+                    (now, len(blob), blob, conversation_id, session_id),
+                ).rowcount
+            if not updated:
+                conversation_id = self._db.execute(
+                    "INSERT INTO conversations (session_id, title, updated_at, size_bytes, messages) VALUES (?, ?, ?, ?, ?)",
+                    (session_id, title, now, len(blob), blob),
+                ).lastrowid
+            self._enforce_caps(session_id, conversation_id)
+            self._db.commit()
+            self._hot.pop(session_id, None)
+            entry = self._hot_session(session_id)
+        stored = sum(summary.size_bytes for summary in entry.conversations)
+        REGISTRY.observe("rag_session_bytes", stored, buckets=BYTES_BUCKETS, kind="stored")
+        if now - self._last_purge > PURGE_INTERVAL:
+            self.purge_expired()
+        return conversation_id
+
+    def _enforce_caps(self, session_id: str, keep_id: int) -> None:
+        """잠금 안에서 호출합니다. 세션당 대화 수와 저장 용량 상한을 적용합니다."""
+        rows = self._db.execute(
+            "SELECT id, size_bytes FROM conversations WHERE session_id = ? ORDER BY updated_at DESC", (session_id,)
+        ).fetchall()
+        limits, total, drop = self.limits, 0, []
+        for position, (row_id, size) in enumerate(rows):
+            total += size
+            over_count = limits.max_conversations > 0 and position >= limits.max_conversations
+            over_bytes = limits.max_bytes > 0 and total > limits.max_bytes
+            if row_id != keep_id and (over_count or over_bytes):
+                drop.append((row_id,))
+        if drop:
+            self._db.executemany("DELETE FROM conversations WHERE id = ?", drop)
+            REGISTRY.inc("rag_session_evictions_total", len(drop), reason="cap")
+
+    def purge_expired(self) -> int:
+        """보관 기간이 지난 대화와 세션 상태를 지웁니다. 지운 대화 수를 반환합니다."""
+        self._last_purge = time.time()
+        if self.limits.max_age_days <= 0:
+            return 0
+        cutoff = self._last_purge - self.limits.max_age_days * 86400
+        with self._lock:
+            removed = self._db.execute("DELETE FROM conversations WHERE updated_at < ?", (cutoff,)).rowcount
+            self._db.execute("DELETE FROM session_state WHERE updated_at < ?", (cutoff,))
+            self._db.commit()
+            if removed:
+                self._hot.clear()
+        if removed:
+            REGISTRY.inc("rag_session_evictions_total", removed, reason="age")
+            logging.info(f"보관 기간({self.limits.max_age_days}일)이 지난 대화 {removed}개를 삭제했습니다.")
+        return removed
+
+    # --- 메모리 보고 ---
+    def report_memory(self, session_id: str, session_state: Dict) -> int:
+        """
+        세션 메모리 사용량(현재 대화 메시지 + 캐시된 목록·상태)을 추정해 히스토그램에 기록하고 반환합니다.
+        """
+        with self._lock:
+            entry = self._hot.get(session_id)
+            cached = estimate_bytes([entry.state, [summary.title for summary in entry.conversations]]) if entry else 0
+        total = estimate_bytes(session_state.get("messages", [])) + cached
+        REGISTRY.observe("rag_session_bytes", total, buckets=BYTES_BUCKETS, kind="memory")
+        logging.debug("세션 %s 메모리 약 %d바이트 (캐시된 세션 %d개)", session_id, total, len(self._hot))
+        return total
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            conversations, stored = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM conversations").fetchone()
+            return {"hot_sessions": len(self._hot), "conversations": conversations, "stored_bytes": stored}
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,98 @@
+# app/startup.py
+"""
+앱 시작 지연 줄이기: 백그라운드 초기화와 시작 지표.
+
+- BackgroundLoader: 무거운 객체(챗봇: LLM 클라이언트, FAISS 인덱스, 임베딩)를 데몬 스레드에서 만들고
+  준비 상태(loading/ready/failed)를 제공합니다. UI는 그동안 헤더와 입력창을 먼저 그립니다.
+- record_first_paint() / record_first_answer(): 세션별 첫 화면 표시 시간(TTFP)과
+  첫 답변까지의 시간(TTFA)을 rag_startup_seconds 히스토그램과 로그로 남깁니다.
+
+이 모듈은 첫 화면 전에 임포트되므로 표준 라이브러리와 telemetry 외에는 임포트하지 않습니다.
+"""
+import time
+import logging
+import threading
+from typing import Any, Callable, Optional
+
+from .telemetry import REGISTRY
+
+_first_paint_lock = threading.Lock()
+_process_painted = False
+
+
+class BackgroundLoader:
+    """factory()를 데몬 스레드에서 한 번 실행하고, 결과와 준비 상태를 제공합니다."""
+
+    LOADING, READY, FAILED = "loading", "ready", "failed"
+
+    def __init__(self, name: str, factory: Callable[[], Any]):
+        self.name = name
+        self._factory = factory
+        self._done = threading.Event()
+        self._result: Any = None
+        self.error: Optional[BaseException] = None
+        self.started_at = time.perf_counter()
+        self.elapsed: Optional[float] = None
+        self._thread = threading.Thread(target=self._run, name=f"loader-{name}", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        try:
+            self._result = self._factory()
+            result = "ready"
+        except BaseException as e:
+            self.error = e
+            result = "failed"
+            logging.error(f"백그라운드 초기화 실패 ({self.name}): {e}", exc_info=True)
+        finally:
+            self.elapsed = time.perf_counter() - self.started_at
+            self._done.set()
+        REGISTRY.observe("rag_startup_seconds", self.elapsed, phase="chatbot_ready", result=result)
+        logging.info(f"백그라운드 초기화 완료 ({self.name}): {result}, {self.elapsed:.2f}초")
+
+    @property
+    def status(self) -> str:
+        if not self._done.is_set():
+            return self.LOADING
+        return self.FAILED if self.error is not None else self.READY
+
+    @property
+    def ready(self) -> bool:
+        return self.status == self.READY
+
+    def join(self, timeout: Optional[float] = None) -> str:
+        """초기화가 끝날 때까지(또는 timeout초 동안) 기다린 뒤 상태를 반환합니다."""
+        self._done.wait(timeout)
+        return self.status
+
+    def wait(self, timeout: Optional[float] = None) -> Any:
+        """초기화가 끝날 때까지 기다려 결과를 반환합니다. 실패했으면 원래 예외를 다시 발생시킵니다."""
+        if not self._done.wait(timeout):
+            raise TimeoutError(f"{self.name} 초기화가 {timeout}초 안에 끝나지 않았습니다.")
+        if self.error is not None:
+            raise self.error
+        return self._result
+
+
+def record_first_paint(run_started_at: float) -> float:
+    """
+    세션의 첫 화면(헤더, 입력창)이 그려진 시점에 호출합니다. 스크립트 실행 시작부터 잽니다.
+    프로세스의 첫 세션은 모듈 임포트 비용이 포함되므로 start="cold", 이후 세션은 "warm"으로 구분합니다.
+    """
+    global _process_painted
+    with _first_paint_lock:
+        cold, _process_painted = not _process_painted, True
+    seconds = time.perf_counter() - run_started_at
+    start = "cold" if cold else "warm"
+    REGISTRY.observe("rag_startup_seconds", seconds, phase="first_paint", start=start)
+    logging.info(f"첫 화면 표시(TTFP, {start}): {seconds * 1000:.0f}ms")
+    return seconds
+
+
+def record_first_answer(submitted_at: float, waited_for_init: bool) -> float:
+    """세션의 첫 질문이 제출된 시점부터 답변이 그려질 때까지의 시간(TTFA)을 기록합니다."""
+    seconds = time.perf_counter() - submitted_at
+    waited = "true" if waited_for_init else "false"
+    REGISTRY.observe("rag_startup_seconds", seconds, phase="first_answer", waited_for_init=waited)
+    logging.info(f"첫 답변(TTFA): {seconds:.2f}초 (초기화 대기 {'있음' if waited_for_init else '없음'})")
+    return seconds
@@ -0,0 +1,394 @@
+"""
+RAG 파이프라인 단계별 트레이싱 및 인-프로세스 메트릭 레지스트리
+
+- span(): 단계(stage)별 소요 시간, 문서 수, 토큰 수, 캐시 적중 여부, LLM 백엔드를 기록합니다.
+- REGISTRY: Prometheus 텍스트 포맷으로 노출 가능한 카운터/히스토그램 저장소입니다.
+- start_metrics_server(): '/metrics', '/healthz'(liveness), '/readyz'(readiness) 엔드포인트를 제공하는 경량 HTTP 서버를 띄웁니다.
+- OpenTelemetry 패키지가 설치되어 있고 활성화된 경우 동일한 span을 OTel로도 내보냅니다.
+
+핫패스에서는 문자열 포맷팅을 하지 않습니다. 라벨은 튜플로 저장되고, 문자열 변환은
+'/metrics' 요청 시점에만 수행됩니다.
+"""
+import os
+import sys
+import json
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional, Tuple
+
+# 초 단위 지연 시간 히스토그램 버킷
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# 단계별 문서 수 히스토그램 버킷
+COUNT_BUCKETS = (0, 1, 5, 10, 25, 50, 100, 250, 500, 1000)
+# LLM 호출당 프롬프트 토큰 수 히스토그램 버킷
+TOKEN_BUCKETS = (250, 500, 1000, 2000, 3000, 4000, 6000, 8000, 12000, 16000, 32000)
+
+_LabelKey = Tuple[Tuple[str, str], ...]
+
+
+class MetricsRegistry:
+    """스레드 안전한 카운터/히스토그램 저장소 (Prometheus 텍스트 포맷 렌더링 지원)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[_LabelKey, float]] = {}
+        self._histograms: Dict[str, Dict[_LabelKey, list]] = {}
+        self._buckets: Dict[str, Tuple[float, ...]] = {}
+        self._help: Dict[str, str] = {}
+
+    def describe(self, name: str, help_text: str):
+        """메트릭 설명(HELP)을 등록합니다."""
+        self._help[name] = help_text
+
+    def inc(self, name: str, value: float = 1.0, **labels):
+        """카운터를 증가시킵니다."""
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0.0) + value
+
+    def observe(self, name: str, value: float, buckets: Tuple[float, ...] = LATENCY_BUCKETS, **labels):
+        """히스토그램에 관측값을 추가합니다."""
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            bucket_bounds = self._buckets.setdefault(name, buckets)
+            series = self._histograms.setdefault(name, {})
+            state = series.get(key)
+            if state is None:
+                # [버킷별 카운트..., 합계, 개수]
+                state = [0] * len(bucket_bounds) + [0.0, 0]
+                series[key] = state
+            for i, bound in enumerate(bucket_bounds):
+                if value <= bound:
+                    state[i] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def get_counter(self, name: str, **labels) -> float:
+        """특정 라벨 조합의 카운터 값을 반환합니다."""
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            return self._counters.get(name, {}).get(key, 0.0)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """현재 메트릭 값을 dict 형태로 반환합니다. (헬스체크/디버깅용)"""
+        with self._lock:
+            counters = {
+                name: {_format_labels(key): value for key, value in series.items()}
+                for name, series in self._counters.items()
+            }
+            histograms = {
+                name: {
+                    _format_labels(key): {"count": state[-1], "sum": state[-2]}
+                    for key, state in series.items()
+                }
+                for name, series in self._histograms.items()
+            }
+        return {"counters": counters, "histograms": histograms}
+
+    def render_prometheus(self) -> str:
+        """Prometheus 텍스트 노출 포맷(0.0.4)으로 렌더링합니다."""
+        lines = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} counter")
+                for key, value in series.items():
+                    lines.append(f"{name}{_format_labels(key)} {value}")
+            for name, series in sorted(self._histograms.items()):
+                bounds = self._buckets[name]
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} histogram")
+                for key, state in series.items():
+                    for i, bound in enumerate(bounds):
+                        bucket_key = key + (("le", repr(float(bound))),)
+                        lines.append(f"{name}_bucket{_format_labels(bucket_key)} {state[i]}")
+                    inf_key = key + (("le", "+Inf"),)
+                    lines.append(f"{name}_bucket{_format_labels(inf_key)} {state[-1]}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {state[-2]}")
+                    lines.append(f"{name}_count{_format_labels(key)} {state[-1]}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        """모든 메트릭을 초기화합니다."""
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+            self._buckets.clear()
+
+
+def _format_labels(key: _LabelKey) -> str:
+    if not key:
+        return ""
+    escaped = (
+        '{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for k, v in key
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+REGISTRY = MetricsRegistry()
+REGISTRY.describe("rag_stage_duration_seconds", "RAG 파이프라인 단계별 소요 시간")
+REGISTRY.describe("rag_stage_documents", "단계별 처리 문서 수")
+REGISTRY.describe("rag_stage_errors_total", "단계별 예외 발생 횟수")
+REGISTRY.describe("rag_llm_tokens_total", "LLM 프롬프트/생성 토큰 수 (source: provider 사용량 메타데이터, estimate 로컬 추정)")
+REGISTRY.describe("rag_llm_prompt_tokens", "LLM 호출당 프롬프트 토큰 수")
+REGISTRY.describe("rag_prompt_trims_total", "단계별 프롬프트 토큰 예산 초과로 입력을 줄인 횟수 (part: chat_history/context)")
+REGISTRY.describe("rag_cache_requests_total", "단계별 캐시 조회 결과 (query_embedding: BGE 질의 LRU, shard_load: 샤드 LRU, faq_match: FAQ 답변, followup_match: 직전 턴 문서 재사용)")
+REGISTRY.describe("rag_index_reloads_total", "백그라운드 인덱스 교체 결과")
+REGISTRY.describe("rag_shard_loads_total", "대분류 샤드 조회 결과 (hit, load, wait, evict)")
+REGISTRY.describe("rag_directory_requests_total", "연락처 디렉토리 직접 답변 수")
+REGISTRY.describe("rag_merge_duplicates_total", "검색 단계·우선순위 간에 중복되어 병합 시 제거한 청크 수")
+REGISTRY.describe("rag_eligibility_pruned_total", "자격 규칙으로 답변 생성 전에 제외한 문서 수 (income/age/disability)")
+REGISTRY.describe("rag_fallback_answers_total", "검색 결과가 없을 때의 안내 답변 수 (static: 미리 렌더링, llm: 개인화 생성)")
+REGISTRY.describe("rag_followup_requests_total", "후속 질문 판정 결과 (reused: 직전 턴 검색 결과 재사용, new: 새로 검색)")
+REGISTRY.describe("rag_faq_requests_total", "자주하는 질문 직접 답변 일치 결과 (hit/miss, lexical/semantic)")
+REGISTRY.describe("rag_session_cache_total", "대화 저장소의 세션 LRU 조회 결과 (hit, miss, evict)")
+REGISTRY.describe("rag_session_evictions_total", "상한(cap: 대화 수/용량, age: 보관 기간)으로 삭제한 저장 대화 수")
+REGISTRY.describe("rag_session_bytes", "세션별 메모리 사용량 추정치(memory)와 저장된 대화 용량(stored), 바이트")
+REGISTRY.describe("rag_startup_seconds", "앱 시작 단계별 소요 시간 (first_paint, chatbot_ready, first_answer)")
+REGISTRY.describe("rag_readiness_seconds", "준비 상태 점검(워밍업) 단계별 소요 시간")
+
+
+# --- 준비 상태 (readiness) ---
+# 마지막 준비 상태 점검 결과 (health_check.check_readiness()가 갱신, '/readyz'로 노출)
+_readiness: Dict[str, Any] = {"status": "starting", "errors": []}
+
+
+def set_readiness(result: Dict[str, Any]):
+    """준비 상태 점검 결과를 등록합니다."""
+    global _readiness
+    _readiness = result
+
+
+def get_readiness() -> Dict[str, Any]:
+    """마지막 준비 상태 점검 결과 (점검 전이면 status='starting')"""
+    return _readiness
+
+
+# --- OpenTelemetry (선택 사항) ---
+_otel_tracer = None
+
+
+def configure_opentelemetry(service_name: str = "bokjiro-ai") -> bool:
+    """
+    OpenTelemetry 내보내기를 설정합니다.
+    opentelemetry-sdk(및 OTLP exporter)가 설치되어 있지 않으면 아무 작업도 하지 않고 False를 반환합니다.
+    """
+    global _otel_tracer
+    try:
+        from opentelemetry import trace
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+    except ImportError:
+        logging.info("OpenTelemetry 패키지가 설치되지 않아 OTel 내보내기를 건너뜁니다.")
+        return False
+
+    provider = TracerProvider(resource=Resource.create({"service.name": service_name}))
+    try:
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+    except ImportError:
+        logging.warning("OTLP exporter가 설치되지 않았습니다. span은 생성되지만 외부로 전송되지 않습니다.")
+    trace.set_tracer_provider(provider)
+    _otel_tracer = trace.get_tracer("bokjiro_ai")
+    logging.info("OpenTelemetry 내보내기가 활성화되었습니다.")
+    return True
+
+
+# --- Span ---
+class Span:
+    """단일 파이프라인 단계의 측정 결과"""
+    __slots__ = ("stage", "attributes", "start", "duration")
+
+    def __init__(self, stage: str, attributes: Dict[str, Any]):
+        self.stage = stage
+        self.attributes = attributes
+        self.start = time.perf_counter()
+        self.duration: Optional[float] = None
+
+    def set(self, **attributes):
+        """span 속성(documents, prompt_tokens, completion_tokens, cache_hit, llm_backend 등)을 기록합니다."""
+        self.attributes.update(attributes)
+
+    def add_tokens(self, prompt_tokens: int = 0, completion_tokens: int = 0):
+        """LLM 호출 토큰 수를 누적합니다."""
+        attrs = self.attributes
+        attrs["prompt_tokens"] = attrs.get("prompt_tokens", 0) + prompt_tokens
+        attrs["completion_tokens"] = attrs.get("completion_tokens", 0) + completion_tokens
+
+    def callbacks(self) -> list:
+        """체인 invoke의 config={'callbacks': ...}에 넘길 콜백 목록을 반환합니다."""
+        return [_usage_callback_class()(self)]
+
+
+_usage_callback_cls = None
+
+
+def _usage_callback_class():
+    """
+    LLMUsageCallbackHandler 클래스를 처음 사용할 때 정의합니다.
+    telemetry는 앱 시작 시 가장 먼저 임포트되므로, 무거운 langchain_core 임포트를 첫 LLM 호출까지 미룹니다.
+    """
+    global _usage_callback_cls
+    if _usage_callback_cls is None:
+        from langchain_core.callbacks import BaseCallbackHandler
+
+        class LLMUsageCallbackHandler(BaseCallbackHandler):
+            """LLM 응답의 사용량 메타데이터(usage_metadata/token_usage)를 span에 기록하는 콜백"""
+
+            def __init__(self, target_span: Span):
+                self.span = target_span
+
+            def on_llm_end(self, response, **kwargs):
+                prompt_tokens, completion_tokens = extract_token_usage(response)
+                if prompt_tokens or completion_tokens:
+                    self.span.add_tokens(prompt_tokens, completion_tokens)
+
+        _usage_callback_cls = LLMUsageCallbackHandler
+    return _usage_callback_cls
+
+
+def extract_token_usage(response) -> Tuple[int, int]:
+    """LLMResult에서 (프롬프트 토큰, 생성 토큰)을 추출합니다. 정보가 없으면 (0, 0)."""
+    for generation_list in getattr(response, "generations", None) or []:
+        for generation in generation_list:
+            message = getattr(generation, "message", None)
+            usage = getattr(message, "usage_metadata", None) if message is not None else None
+            if usage:
+                return int(usage.get("input_tokens", 0)), int(usage.get("output_tokens", 0))
+    llm_output = getattr(response, "llm_output", None) or {}
+    usage = llm_output.get("token_usage") or llm_output.get("usage_metadata") or {}
+    if usage:
+        return (
+            int(usage.get("prompt_tokens", usage.get("input_tokens", 0))),
+            int(usage.get("completion_tokens", usage.get("output_tokens", 0))),
+        )
+    return 0, 0
+
+
+@contextmanager
+def span(stage: str, **attributes):
+    """
+    파이프라인 단계를 측정하는 컨텍스트 매니저.
+
+    사용 예:
+        with span("retrieval", llm_backend="gemini-2.0-flash") as s:
+            docs = ...
+            s.set(documents=len(docs))
+    """
+    current = Span(stage, attributes)
+    otel_cm = _otel_tracer.start_as_current_span(stage) if _otel_tracer is not None else None
+    otel_span = otel_cm.__enter__() if otel_cm is not None else None
+    exc_info = (None, None, None)
+    try:
+        yield current
+    except BaseException as e:
+        exc_info = sys.exc_info()
+        current.attributes["error"] = type(e).__name__
+        REGISTRY.inc("rag_stage_errors_total", stage=stage, error=type(e).__name__)
+        raise
+    finally:
+        current.duration = time.perf_counter() - current.start
+        _record(current)
+        if otel_span is not None:
+            for key, value in current.attributes.items():
+                if isinstance(value, (str, bool, int, float)):
+                    otel_span.set_attribute(f"rag.{key}", value)
+            # 예외를 넘겨야 OTel span에 오류 상태와 예외 이벤트가 기록됩니다. (예외는 위에서 다시 발생)
+            otel_cm.__exit__(*exc_info)
+
+
+def _record(current: Span):
+    attrs = current.attributes
+    backend = attrs.get("llm_backend")
+    if backend:
+        REGISTRY.observe("rag_stage_duration_seconds", current.duration, stage=current.stage, llm_backend=backend)
+    else:
+        REGISTRY.observe("rag_stage_duration_seconds", current.duration, stage=current.stage)
+
+    documents = attrs.get("documents")
+    if documents is not None:
+        REGISTRY.observe("rag_stage_documents", documents, buckets=COUNT_BUCKETS, stage=current.stage)
+
+    # source: provider(공급자 사용량 메타데이터) | estimate(app.tokens 추정치)
+    source = attrs.get("token_source", "provider")
+    prompt_tokens = attrs.get("prompt_tokens")
+    if prompt_tokens:
+        REGISTRY.inc("rag_llm_tokens_total", prompt_tokens, stage=current.stage, llm_backend=backend or "unknown", kind="prompt", source=source)
+        REGISTRY.observe("rag_llm_prompt_tokens", prompt_tokens, buckets=TOKEN_BUCKETS, stage=current.stage, llm_backend=backend or "unknown")
+    completion_tokens = attrs.get("completion_tokens")
+    if completion_tokens:
+        REGISTRY.inc("rag_llm_tokens_total", completion_tokens, stage=current.stage, llm_backend=backend or "unknown", kind="completion", source=source)
+
+    cache_hit = attrs.get("cache_hit")
+    if cache_hit is not None:
+        REGISTRY.inc("rag_cache_requests_total", stage=current.stage, result="hit" if cache_hit else "miss")
+
+    if logging.getLogger().isEnabledFor(logging.DEBUG):
+        logging.debug("span %s %.1fms %s", current.stage, current.duration * 1000, attrs)
+
+
+# --- '/metrics', '/healthz', '/readyz' 엔드포인트 ---
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        if path == "/metrics":
+            self._send(200, REGISTRY.render_prometheus(), "text/plain; version=0.0.4; charset=utf-8")
+        elif path == "/healthz":
+            # liveness: 프로세스가 요청을 처리할 수 있으면 항상 200
+            self._send(200, json.dumps({"status": "alive"}), "application/json")
+        elif path == "/readyz":
+            # readiness: 워밍업 점검을 통과했을 때만 200, 점검 전이거나 실패/예산 초과면 503
+            readiness = get_readiness()
+            status = 200 if readiness.get("status") == "ready" else 503
+            self._send(status, json.dumps(readiness, ensure_ascii=False), "application/json; charset=utf-8")
+        else:
+            self.send_error(404)
+
+    def _send(self, status: int, text: str, content_type: str):
+        body = text.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # 스크레이프 요청마다 로그를 남기지 않습니다.
+        pass
+
+
+_metrics_server: Optional[ThreadingHTTPServer] = None
+_metrics_server_lock = threading.Lock()
+
+
+def start_metrics_server(port: int, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+    """
+    Prometheus 스크레이프용 '/metrics' 서버를 데몬 스레드로 시작합니다.
+    Streamlit은 스크립트를 반복 실행하므로, 프로세스당 한 번만 시작되도록 보장합니다.
+    """
+    global _metrics_server
+    with _metrics_server_lock:
+        if _metrics_server is None:
+            _metrics_server = ThreadingHTTPServer((host, port), _MetricsHandler)
+            thread = threading.Thread(target=_metrics_server.serve_forever, name="metrics-server", daemon=True)
+            thread.start()
+            logging.info(f"메트릭 엔드포인트 시작: http://{host}:{port}/metrics (/healthz, /readyz)")
+        return _metrics_server
+
+
+def configure_telemetry(metrics_port: Optional[int] = None, otel_enabled: Optional[bool] = None):
+    """환경 설정에 따라 메트릭 서버와 OpenTelemetry 내보내기를 활성화합니다."""
+    if metrics_port:
+        start_metrics_server(metrics_port)
+    if otel_enabled is None:
+        otel_enabled = os.getenv("OTEL_ENABLED", "false").lower() in ("1", "true", "yes")
+    if otel_enabled and _otel_tracer is None:
+        configure_opentelemetry()
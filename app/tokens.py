@@ -0,0 +1,85 @@
+# app/tokens.py
+"""
+프롬프트 토큰 수 추정과 단계별 토큰 예산.
+
+LLM별 토크나이저 없이 쓸 수 있는 보수적인 근사치입니다. (Gemini, Gemma, EXAONE 모두 한글은 대략 음절당 1토큰 안팎)
+- 한글/한자/가나 : 글자당 1토큰
+- 그 밖의 문자   : 4글자당 1토큰 (영문, 숫자, 공백, 문장부호)
+
+공급자가 사용량 메타데이터(usage_metadata/token_usage)를 주면 그 값을 쓰고, 없을 때만 이 추정치를 씁니다.
+"""
+import re
+from typing import Dict, List, Optional, Tuple
+
+_CJK = re.compile(r"[ᄀ-ᇿ぀-ヿ㄰-㆏㐀-鿿가-힣]")
+_OTHER_CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """text의 토큰 수 추정치"""
+    if not text:
+        return 0
+    cjk = len(_CJK.findall(text))
+    other = len(text) - cjk
+    return cjk + (other + _OTHER_CHARS_PER_TOKEN - 1) // _OTHER_CHARS_PER_TOKEN
+
+
+def truncate_to_tokens(text: str, max_tokens: int, marker: str = "…") -> str:
+    """추정 토큰 수가 max_tokens 이하가 되도록 text의 뒷부분을 자릅니다. (잘렸으면 marker를 붙임)"""
+    if max_tokens <= 0 or not text:
+        return ""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    budget = max_tokens - estimate_tokens(marker)
+    lo, hi = 0, len(text)
+    # 추정치는 글자 수에 대해 단조 증가하므로 이분 탐색으로 자를 위치를 찾습니다.
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if estimate_tokens(text[:mid]) <= budget:
+            lo = mid
+        else:
+            hi = mid - 1
+    return text[:lo].rstrip() + marker
+
+
+def truncate_head_to_tokens(text: str, max_tokens: int, marker: str = "…") -> str:
+    """추정 토큰 수가 max_tokens 이하가 되도록 text의 앞부분을 자릅니다. (최근 내용이 뒤에 있는 대화 기록용)"""
+    if max_tokens <= 0 or not text:
+        return ""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    return marker + truncate_to_tokens(text[::-1], max_tokens - estimate_tokens(marker), marker="")[::-1].lstrip()
+
+
+def fit_sections(sections: List[str], max_tokens: int, separator: str = "\n") -> Tuple[List[str], int]:
+    """
+    앞에서부터(우선순위 순) 예산 안에 들어가는 섹션만 남깁니다. 반환값은 (남은 섹션, 버린 섹션 수)
+    첫 섹션 하나만으로 예산을 넘으면 그 섹션을 잘라서 남깁니다.
+    """
+    kept, used = [], 0
+    separator_tokens = estimate_tokens(separator)
+    for section in sections:
+        cost = estimate_tokens(section) + (separator_tokens if kept else 0)
+        if used + cost > max_tokens:
+            break
+        kept.append(section)
+        used += cost
+    if not kept and sections and max_tokens > 0:
+        kept = [truncate_to_tokens(sections[0], max_tokens)]
+    return kept, len(sections) - len(kept)
+
+
+# 단계별 프롬프트 토큰 예산 (PROMPT_TOKEN_BUDGETS로 단계별 변경)
+DEFAULT_PROMPT_TOKEN_BUDGETS: Dict[str, int] = {
+    "planning": 4000,
+    "generation": 6000,
+    "fallback_generation": 2000,
+}
+
+
+def prompt_budgets(overrides: Optional[Dict[str, float]] = None) -> Dict[str, int]:
+    """기본 예산에 설정값을 덮어쓴 단계별 예산 (0 이하는 예산 없음)"""
+    budgets = dict(DEFAULT_PROMPT_TOKEN_BUDGETS)
+    for stage, budget in (overrides or {}).items():
+        budgets[stage] = int(budget)
+    return {stage: budget for stage, budget in budgets.items() if budget > 0}
@@ -1,72 +1,73 @@
-import json
-
-def generate_and_print_structured_details(file_path: str):
-    """
-    JSON 파일에서 '대분류'에 따라 '중분류'와 '중분류_개요'를 그룹화하고,
-    파일에 명시된 순서대로 출력하는 함수입니다.
-    """
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-    except FileNotFoundError:
-        print(f"오류: '{file_path}' 파일을 찾을 수 없습니다.")
-        print("스크립트를 'vd_base_v2_refined.json' 파일과 같은 위치에 두고 실행해주세요.")
-        return
-
-    all_docs = data
-    
-    # 최종 데이터를 저장할 딕셔너리 (Key: 대분류, Value: 중분류 리스트)
-    # 파이썬 3.7+ 에서는 딕셔너리가 삽입 순서를 유지합니다.
-    structured_details = {}
-    
-    # 이미 추가된 '대분류-중분류' 조합을 추적하기 위한 집합(set)
-    seen_combinations = set()
-
-    for doc in all_docs:
-        metadata = doc.get('metadata', {})
-        major_cat = metadata.get('대분류')
-        minor_cat = metadata.get('중분류')
-        overview = metadata.get('중분류_개요')
-
-        # 모든 정보가 존재할 때만 처리
-        if major_cat and minor_cat and overview:
-            # (대분류, 중분류) 쌍으로 중복 여부 확인
-            combination = (major_cat, minor_cat)
-            if combination not in seen_combinations:
-                # 처음 보는 대분류라면, 딕셔너리에 키를 추가
-                if major_cat not in structured_details:
-                    structured_details[major_cat] = []
-                
-                # 중분류와 개요를 리스트에 추가
-                structured_details[major_cat].append({
-                    '중분류': minor_cat,
-                    '개요': overview
-                })
-                
-                # 처리된 조합으로 기록
-                seen_combinations.add(combination)
-
-    # --- 결과 출력 ---
-    print("=" * 80)
-    print("✨ '대분류' 그룹별 '중분류-중분류_개요' 목록 (원본 순서 유지) ✨")
-    print("=" * 80)
-
-    total_minor_cats = 0
-    for major_cat, minor_details_list in structured_details.items():
-        print(f"\n📁 대분류: {major_cat}")
-        print("-" * 40)
-        for details in minor_details_list:
-            print(f"  ▶ 중분류: {details['중분류']}")
-            print(f"    └ 개요: {details['개요']}")
-            total_minor_cats += 1
-        
-    print("\n" + "=" * 80)
-    print(f"총 {len(structured_details)}개의 대분류, {total_minor_cats}개의 중분류가 성공적으로 추출되었습니다.")
-    print("=" * 80)
-
-
-if __name__ == "__main__":
-    JSON_FILE_PATH = 'vd_base_v2_refined.json'
-    # 'data' 폴더 안에 json 파일이 있는 경우 경로를 아래와 같이 수정할 수 있습니다.
-    # JSON_FILE_PATH = 'data/vd_base_v2_refined.json'
-    generate_and_print_structured_details(JSON_FILE_PATH)
\ No newline at end of file
+import os
+import sys
+import json
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+from app.corpus_catalog import CATALOG_FILE, compile_corpus_catalog, read_catalog
+
+
+def load_catalog(path: str = None) -> dict:
+    """
+    카탈로그를 불러옵니다.
+    - path가 catalog.json 파일 또는 인덱스 디렉토리면 저장된 카탈로그를 읽고,
+    - 코퍼스 JSON 파일이면 즉석에서 컴파일합니다.
+    - path가 없으면 현재 선택된 인덱스의 카탈로그를 사용하고, 없으면 기본 코퍼스에서 컴파일합니다.
+    """
+    if path is None:
+        from app.index_locator import get_faiss_path
+        catalog = read_catalog(get_faiss_path(os.getenv("EMBEDDING_TYPE", "google").lower()))
+        return catalog if catalog is not None else compile_corpus_catalog()
+    if os.path.isdir(path):
+        catalog = read_catalog(path)
+        if catalog is None:
+            raise FileNotFoundError(f"'{path}'에 {CATALOG_FILE} 파일이 없습니다. 인덱스를 다시 구축해주세요.")
+        return catalog
+    if os.path.basename(path) == CATALOG_FILE:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return compile_corpus_catalog(path)
+
+
+def generate_and_print_structured_details(catalog: dict):
+    """
+    카탈로그의 분류 체계에서 '대분류'별 '중분류'와 '중분류_개요'를
+    코퍼스에 등장한 순서대로 출력하는 함수입니다.
+    """
+    # 개요가 있는 중분류만 출력합니다.
+    structured_details = {}
+    for major in catalog.get('taxonomy', []):
+        details = [entry for entry in major['중분류'] if entry.get('개요')]
+        if details:
+            structured_details[major['대분류']] = details
+
+    # --- 결과 출력 ---
+    print("=" * 80)
+    print("✨ '대분류' 그룹별 '중분류-중분류_개요' 목록 (원본 순서 유지) ✨")
+    print("=" * 80)
+
+    total_minor_cats = 0
+    for major_cat, minor_details_list in structured_details.items():
+        print(f"\n📁 대분류: {major_cat}")
+        print("-" * 40)
+        for details in minor_details_list:
+            print(f"  ▶ 중분류: {details['중분류']}")
+            print(f"    └ 개요: {details['개요']}")
+            total_minor_cats += 1
+
+    print("\n" + "=" * 80)
+    print(f"총 {len(structured_details)}개의 대분류, {total_minor_cats}개의 중분류가 성공적으로 추출되었습니다.")
+    print(f"(카탈로그: 문서 {catalog.get('doc_count')}개, 사업명 {len(catalog.get('service_names', []))}개, 생성 {catalog.get('built_at')})")
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    # 사용법: python data/verify_context.py [catalog.json | 인덱스 디렉토리 | 코퍼스 JSON]
+    target = sys.argv[1] if len(sys.argv) > 1 else None
+    try:
+        generate_and_print_structured_details(load_catalog(target))
+    except FileNotFoundError as e:
+        print(f"오류: {e}")
+        sys.exit(1)
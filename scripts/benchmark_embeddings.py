@@ -0,0 +1,120 @@
+# scripts/benchmark_embeddings.py
+"""
+BGE-M3 추론 백엔드(torch / int8 / onnx) 속도 및 검색 재현율 벤치마크
+
+기준 모델(full-precision torch)과 비교하여 각 백엔드의
+- 문서 임베딩 처리량(docs/sec)
+- 단일 질의 임베딩 지연 시간(p50/p90)
+- 최근접 이웃 재현율(recall@k: 기준 모델의 상위 k개 문서를 얼마나 재현하는지)
+- 기준 임베딩과의 평균 코사인 유사도
+를 측정합니다.
+
+사용 예:
+    python scripts/benchmark_embeddings.py --backends torch,int8,onnx --limit 1000 --k 10
+"""
+import sys
+import json
+import time
+import logging
+import argparse
+import statistics
+from itertools import islice
+from pathlib import Path
+
+import numpy as np
+
+CURRENT_DIR = Path(__file__).parent
+BASE_DIR = CURRENT_DIR.parent
+sys.path.insert(0, str(BASE_DIR))
+
+from app.corpus import DATA_PATH, iter_corpus
+from app.local_embeddings import OptimizedBGE_M3_Embeddings
+
+QUERIES_PATH = BASE_DIR / "data" / "eval_queries.json"
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+def embed_all(embeddings, texts):
+    """문서 전체를 임베딩하고 (배열, 소요 시간)을 반환합니다."""
+    start = time.perf_counter()
+    vectors = embeddings.embed_documents_array(texts)
+    return vectors, time.perf_counter() - start
+
+
+def query_latencies(embeddings, queries):
+    """질의별 임베딩 지연 시간을 측정합니다. (캐시 영향을 없애기 위해 캐시를 비웁니다)"""
+    vectors, samples = [], []
+    for query in queries:
+        embeddings._query_cache.clear()
+        start = time.perf_counter()
+        vectors.append(embeddings.embed_query_array(query))
+        samples.append(time.perf_counter() - start)
+    return np.vstack(vectors), samples
+
+
+def top_k(doc_vectors, query_vectors, k):
+    """정규화된 벡터의 내적으로 상위 k개 문서 인덱스를 구합니다."""
+    scores = query_vectors @ doc_vectors.T
+    return np.argsort(-scores, axis=1)[:, :k]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="BGE-M3 백엔드 벤치마크")
+    parser.add_argument("--backends", default="torch,int8,onnx", help="비교할 백엔드 목록 (기준 모델인 torch는 항상 포함)")
+    parser.add_argument("--limit", type=int, default=1000, help="벤치마크에 사용할 문서 수")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--onnx-file", default=None, help="사전 양자화된 ONNX 파일명 (예: onnx/model_qint8_avx512_vnni.onnx)")
+    parser.add_argument("--output", help="결과를 저장할 JSON 경로")
+    args = parser.parse_args()
+
+    # 본문 컬럼만 필요한 만큼 읽습니다. (메타데이터 제외)
+    texts = [item.get('text', '') for item in islice(iter_corpus(DATA_PATH, fields=()), args.limit)]
+    with open(QUERIES_PATH, 'r', encoding='utf-8') as f:
+        queries = [q['query'] for q in json.load(f)]
+    logging.info(f"문서 {len(texts)}개, 질의 {len(queries)}개로 벤치마크를 시작합니다.")
+
+    backends = [b.strip() for b in args.backends.split(",") if b.strip()]
+    if "torch" in backends:
+        backends.remove("torch")
+    backends.insert(0, "torch")
+
+    results, reference = {}, None
+    for backend in backends:
+        embeddings = OptimizedBGE_M3_Embeddings(
+            backend=backend, batch_size=args.batch_size, num_threads=args.threads,
+            onnx_file=args.onnx_file if backend == "onnx" else None,
+        )
+        embeddings.embed_documents_array(texts[:8])  # 워밍업
+        doc_vectors, doc_seconds = embed_all(embeddings, texts)
+        query_vectors, samples = query_latencies(embeddings, queries)
+        neighbours = top_k(doc_vectors, query_vectors, args.k)
+
+        result = {
+            "docs_per_sec": len(texts) / doc_seconds,
+            "doc_seconds": doc_seconds,
+            "query_p50_ms": statistics.median(samples) * 1000,
+            "query_p90_ms": sorted(samples)[int(0.9 * (len(samples) - 1))] * 1000,
+        }
+        if reference is None:
+            reference = (doc_vectors, neighbours)
+        else:
+            ref_vectors, ref_neighbours = reference
+            overlaps = [len(set(a) & set(b)) / args.k for a, b in zip(neighbours, ref_neighbours)]
+            result[f"recall@{args.k}_vs_torch"] = statistics.fmean(overlaps)
+            result["mean_cosine_vs_torch"] = float(np.mean(np.sum(doc_vectors * ref_vectors, axis=1)))
+            result["speedup_vs_torch"] = results["torch"]["doc_seconds"] / doc_seconds
+        results[backend] = result
+        logging.info(f"[{backend}] {json.dumps(result, ensure_ascii=False)}")
+        del embeddings
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        logging.info(f"결과 저장: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+# scripts/build_index.py
+"""
+FAISS 인덱스 구축 도구 (재시작 가능한 스트리밍 빌드)
+
+코퍼스를 스트리밍으로 읽어 병렬 배치로 임베딩하고, 결과를 db/.build/<인덱스명>/ 작업 디렉토리에
+체크포인트와 함께 기록한 뒤 최종 FAISS 인덱스를 한 번에 조립합니다.
+중간에 중단되면 같은 명령을 다시 실행하여 이어서 진행할 수 있습니다.
+기존 인덱스에 manifest.json이 있으면 추가/변경된 청크만 임베딩하고 삭제된 청크는 제거합니다.
+
+사용 예:
+    python scripts/build_index.py --embedding google                 # db/faiss_index (의미 보강 텍스트)
+    python scripts/build_index.py --embedding bge --batch-size 32    # db/faiss_index_bge
+    python scripts/build_index.py --embedding ollama --workers 8     # db/faiss_index_ollama
+    python scripts/build_index.py --embedding bge --restart          # 작업 디렉토리를 지우고 처음부터
+    python scripts/build_index.py --embedding google --full          # 기존 인덱스를 무시하고 전체 재구축
+    python scripts/build_index.py --embedding bge --index-type sq8   # 8비트 양자화 (recall@10 ≥ 0.95 검증)
+"""
+import sys
+import shutil
+import logging
+import argparse
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+CURRENT_DIR = Path(__file__).parent
+BASE_DIR = CURRENT_DIR.parent
+sys.path.insert(0, str(BASE_DIR))
+
+from app.corpus import DATA_PATH, resolve_corpus_path
+from app.embeddings import EMBEDDING_TYPES, get_embeddings
+from app.index_builder import StreamingIndexBuilder
+from app.index_locator import read_manifest
+from app.index_factory import (
+    DEFAULT_MIN_RECALL, DEFAULT_RECALL_K, DEFAULT_RECALL_QUERIES, INDEX_TYPES, RecallTooLowError,
+)
+
+DB_DIR = BASE_DIR / "db"
+
+# 임베딩별 기본 출력 경로와 '의미 보강 텍스트' 사용 여부 (기존 구축 스크립트와 동일)
+DEFAULT_OUTPUTS = {
+    "google": DB_DIR / "faiss_index",
+    "bge": DB_DIR / "faiss_index_bge",
+    "ollama": DB_DIR / "faiss_index_ollama",
+}
+DEFAULT_ENRICH = {"google": True, "bge": False, "ollama": False}
+
+
+def parse_args(argv=None, default_embedding: str = "google") -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="재시작 가능한 스트리밍 FAISS 인덱스 구축")
+    parser.add_argument("--embedding", choices=EMBEDDING_TYPES, default=default_embedding, help="임베딩 모델 종류")
+    parser.add_argument("--data", type=Path, default=DATA_PATH, help="코퍼스 파일 경로 (JSON 또는 변환된 .arrow, JSON 옆에 최신 .arrow가 있으면 자동 사용)")
+    parser.add_argument("--output", type=Path, default=None, help="인덱스 저장 디렉토리 (기본값: 임베딩별 경로)")
+    parser.add_argument("--batch-size", type=int, default=64, help="임베딩 배치 크기")
+    parser.add_argument("--workers", type=int, default=4, help="동시에 임베딩할 배치 수")
+    parser.add_argument("--checkpoint-every", type=int, default=10, help="체크포인트 저장 주기 (배치 수)")
+    enrich = parser.add_mutually_exclusive_group()
+    enrich.add_argument("--enrich", dest="enrich", action="store_true", default=None, help="의미 보강 텍스트로 임베딩")
+    enrich.add_argument("--no-enrich", dest="enrich", action="store_false", help="원본 텍스트로 임베딩")
+    parser.add_argument("--limit", type=int, default=None, help="앞에서부터 N개 청크만 처리 (테스트용, --output으로 별도 디렉토리 필수)")
+    parser.add_argument("--restart", action="store_true", help="이전 작업 디렉토리를 지우고 처음부터 구축")
+    parser.add_argument("--full", action="store_true", help="기존 인덱스를 증분 갱신하지 않고 전체 재구축")
+    parser.add_argument("--allow-partial", action="store_true", help="실패한 청크가 있어도 나머지로 인덱스를 조립")
+    parser.add_argument("--index-type", choices=INDEX_TYPES, default="auto", help="인덱스 유형 (auto: 청크 수에 따라 flat/sq8/ivf)")
+    parser.add_argument("--min-recall", type=float, default=DEFAULT_MIN_RECALL, help="flat이 아닌 인덱스의 최소 recall@k (미달 시 저장 거부)")
+    parser.add_argument("--recall-k", type=int, default=DEFAULT_RECALL_K, help="재현율 측정에 사용할 k")
+    parser.add_argument("--recall-queries", type=int, default=DEFAULT_RECALL_QUERIES, help="재현율 측정에 사용할 표본 질의 수")
+    parser.add_argument("--no-shards", dest="shards", action="store_false", help="대분류별 샤드 인덱스를 만들지 않음")
+    return parser.parse_args(argv)
+
+
+def main(argv=None, default_embedding: str = "google") -> int:
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    args = parse_args(argv, default_embedding)
+
+    data_path = resolve_corpus_path(args.data)
+    if not data_path.exists():
+        logging.error(f"데이터 파일을 찾을 수 없습니다: {args.data}")
+        return 1
+    logging.info(f"코퍼스 파일: {data_path}")
+
+    if args.limit is not None and args.output is None:
+        # 기본 경로는 앱이 사용하는 인덱스이므로 일부 청크만 넣으면 나머지가 삭제된 새 버전이 배포됩니다.
+        logging.error("--limit은 --output으로 테스트용 디렉토리를 지정해야 사용할 수 있습니다.")
+        return 1
+    output_dir = args.output or DEFAULT_OUTPUTS[args.embedding]
+    if args.limit is not None and read_manifest(output_dir) is not None:
+        logging.error(f"--limit으로 이미 배포된 인덱스를 덮어쓸 수 없습니다: {output_dir} (빈 디렉토리를 지정하세요)")
+        return 1
+    enrich = DEFAULT_ENRICH[args.embedding] if args.enrich is None else args.enrich
+
+    logging.info(f"{args.embedding} 임베딩 모델을 로드합니다...")
+    try:
+        embeddings = get_embeddings(args.embedding)
+    except Exception as e:
+        logging.error(f"임베딩 모델 로딩 실패: {e}")
+        if args.embedding == "google":
+            logging.error(".env 파일에 GOOGLE_API_KEY가 올바르게 설정되었는지 확인해주세요.")
+        return 1
+
+    builder = StreamingIndexBuilder(
+        embeddings,
+        output_dir,
+        batch_size=args.batch_size,
+        workers=args.workers,
+        enrich=enrich,
+        checkpoint_every=args.checkpoint_every,
+        embedding_name=args.embedding,
+        incremental=not args.full,
+        index_type=args.index_type,
+        min_recall=args.min_recall,
+        recall_k=args.recall_k,
+        recall_queries=args.recall_queries,
+        shards=args.shards,
+    )
+    if args.restart and builder.work_dir.exists():
+        logging.info(f"이전 작업 디렉토리를 삭제합니다: {builder.work_dir}")
+        shutil.rmtree(builder.work_dir)
+
+    logging.info(f"인덱스 구축을 시작합니다: {output_dir} (작업 디렉토리: {builder.work_dir}, 의미 보강: {enrich})")
+    try:
+        report = builder.build(data_path, limit=args.limit, allow_partial=args.allow_partial)
+    except RecallTooLowError as e:
+        logging.error(f"❌ {e}")
+        logging.error(f"임베딩 결과는 작업 디렉토리에 남아 있어 다른 옵션으로 다시 실행하면 재사용됩니다: {builder.work_dir}")
+        return 1
+
+    if report.failed and not args.allow_partial:
+        logging.error(f"❌ {len(report.failed)}개 청크의 임베딩에 실패했습니다. 같은 명령으로 다시 실행하면 이어서 진행합니다.")
+        return 1
+    if report.failed:
+        logging.warning(f"⚠️ {len(report.failed)}개 청크를 제외하고 인덱스를 저장했습니다.")
+    logging.info(
+        f"✅ FAISS 인덱스 {'증분 갱신' if report.incremental else '구축'}이 완료되었습니다! "
+        f"(버전 {report.version}, 전체 {report.total_chunks}개, 임베딩 {report.embedded + report.resumed}개, "
+        f"변경 없음 {report.unchanged}개, 삭제 {report.deleted}개)"
+    )
+    if builder.index_info:
+        info = builder.index_info
+        recall = f", recall@{args.recall_k} {info['recall']}" if info.get("recall") is not None else ""
+        logging.info(f"🧮 인덱스 유형: {info['spec']} ({info['index_bytes'] / (1024 * 1024):.1f}MiB{recall})")
+    logging.info(f"📁 저장 위치: {output_dir}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
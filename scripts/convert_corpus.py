@@ -0,0 +1,61 @@
+# scripts/convert_corpus.py
+"""
+코퍼스 JSON을 컬럼 형식(Arrow IPC/Feather v2) 파일로 변환합니다.
+
+변환된 파일(data/vd_base_v2_refined.arrow)이 JSON보다 최신이면 인덱스 구축, 카탈로그 컴파일,
+data/verify_context.py 등 코퍼스를 읽는 모든 경로가 JSON 대신 이 파일을 메모리 맵으로 읽습니다.
+JSON을 수정한 뒤에는 다시 변환해주세요. (오래된 변환 파일은 무시되고 JSON을 읽습니다)
+
+사용 예:
+    python scripts/convert_corpus.py                          # data/vd_base_v2_refined.arrow 생성
+    python scripts/convert_corpus.py --source other.json --output /tmp/other.arrow
+    python scripts/convert_corpus.py --verify                 # 변환 결과가 JSON과 같은지 확인
+"""
+import sys
+import logging
+import argparse
+from itertools import zip_longest
+from pathlib import Path
+
+CURRENT_DIR = Path(__file__).parent
+BASE_DIR = CURRENT_DIR.parent
+sys.path.insert(0, str(BASE_DIR))
+
+from app.corpus import DATA_PATH, columnar_path, convert_corpus, iter_chunks
+
+
+def main(argv=None) -> int:
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="코퍼스 JSON → 컬럼 형식 변환")
+    parser.add_argument("--source", type=Path, default=DATA_PATH, help="원본 코퍼스 JSON 경로")
+    parser.add_argument("--output", type=Path, default=None, help="출력 경로 (기본값: 원본과 같은 위치의 .arrow)")
+    parser.add_argument("--batch-size", type=int, default=1024, help="레코드 배치 크기 (행 수)")
+    parser.add_argument("--verify", action="store_true", help="변환 후 모든 항목이 JSON과 같은지 비교")
+    args = parser.parse_args(argv)
+
+    if not args.source.exists():
+        logging.error(f"원본 코퍼스 파일을 찾을 수 없습니다: {args.source}")
+        return 1
+    try:
+        output = convert_corpus(args.source, args.output, batch_size=args.batch_size)
+    except ImportError as e:
+        logging.error(str(e))
+        return 1
+
+    if args.verify:
+        mismatches = sum(
+            1 for expected, actual in zip_longest(iter_chunks(args.source, prefer_columnar=False), iter_chunks(output))
+            if expected != actual
+        )
+        if mismatches:
+            logging.error(f"변환 결과가 원본과 다른 항목이 {mismatches}개 있습니다.")
+            return 1
+        logging.info("변환 결과가 원본과 일치합니다.")
+
+    if output != columnar_path(args.source):
+        logging.info("기본 위치가 아니므로 자동으로 사용되지 않습니다. --data 옵션으로 경로를 지정해주세요.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,270 @@
+# scripts/evaluate_retrieval.py
+"""
+복지 코퍼스에 대한 검색 품질 및 속도 오프라인 평가 도구
+
+라벨링된 질의 세트(data/eval_queries.json)를 DBService와 Fast Track 탐지기에 실행하여
+설정(임베딩/인덱스)별로 recall@k, MRR, 지연 시간 분포를 계산하고, 저장된 기준선과 비교합니다.
+
+사용 예:
+    python scripts/evaluate_retrieval.py --config google=google:db/faiss_index_google_backup \\
+        --config bge=bge:db/faiss_index_bge --k 10 --output eval_report.json
+    python scripts/evaluate_retrieval.py --baseline data/eval_baseline.json      # 기준선과 비교
+    python scripts/evaluate_retrieval.py --save-baseline data/eval_baseline.json # 기준선 갱신
+"""
+import sys
+import json
+import time
+import logging
+import argparse
+import statistics
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+CURRENT_DIR = Path(__file__).parent
+BASE_DIR = CURRENT_DIR.parent
+sys.path.insert(0, str(BASE_DIR))
+
+from app.db_service import DBService
+from app.fast_track import detect_fast_track_keyword
+
+QUERIES_PATH = BASE_DIR / "data" / "eval_queries.json"
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+def load_queries(path: Path) -> List[Dict]:
+    """라벨링된 평가 질의 세트를 로드합니다."""
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def latency_summary(samples: List[float]) -> Dict[str, float]:
+    """지연 시간(초) 샘플을 밀리초 단위 분포로 요약합니다."""
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+
+    def percentile(p: float) -> float:
+        index = min(len(ordered) - 1, max(0, round(p / 100 * (len(ordered) - 1))))
+        return ordered[index] * 1000
+
+    return {
+        "mean_ms": statistics.fmean(ordered) * 1000,
+        "p50_ms": percentile(50),
+        "p90_ms": percentile(90),
+        "p99_ms": percentile(99),
+        "max_ms": ordered[-1] * 1000,
+    }
+
+
+def ranked_unique(docs, field: str) -> List[str]:
+    """검색 결과 문서에서 특정 메타데이터 값을 순위 순서대로 중복 없이 추출합니다."""
+    seen = []
+    for doc in docs:
+        value = doc.metadata.get(field)
+        if value and value not in seen:
+            seen.append(value)
+    return seen
+
+
+def recall_at_k(ranked: List[str], expected: List[str], k: int) -> Optional[float]:
+    if not expected:
+        return None
+    return len(set(ranked[:k]) & set(expected)) / len(set(expected))
+
+
+def reciprocal_rank(ranked: List[str], expected: List[str]) -> Optional[float]:
+    if not expected:
+        return None
+    for rank, value in enumerate(ranked, start=1):
+        if value in expected:
+            return 1.0 / rank
+    return 0.0
+
+
+def _fmt(value: Optional[float]) -> str:
+    return "n/a" if value is None else f"{value:.3f}"
+
+
+def _mean(values: List[Optional[float]]) -> Optional[float]:
+    values = [v for v in values if v is not None]
+    return statistics.fmean(values) if values else None
+
+
+def evaluate_mode(run_search, queries: List[Dict], k: int) -> Dict:
+    """검색 함수 하나(필터 없는 유사도 검색 / 필터+키워드 검색)를 전체 질의에 대해 평가합니다."""
+    latencies, service_recalls, category_recalls, rr_values = [], [], [], []
+    per_query = []
+    for q in queries:
+        start = time.perf_counter()
+        docs = run_search(q)
+        latencies.append(time.perf_counter() - start)
+
+        services = ranked_unique(docs, '사업명')
+        categories = ranked_unique(docs, '중분류')
+        service_recall = recall_at_k(services, q.get('expected_services', []), k)
+        category_recall = recall_at_k(categories, q.get('expected_categories', []), k)
+        # 기대 사업명이 없는 질의는 중분류 기준으로 순위를 매깁니다.
+        rr = reciprocal_rank(services, q['expected_services']) if q.get('expected_services') \
+            else reciprocal_rank(categories, q.get('expected_categories', []))
+
+        service_recalls.append(service_recall)
+        category_recalls.append(category_recall)
+        rr_values.append(rr)
+        per_query.append({
+            "query": q['query'], "top_services": services[:k],
+            "service_recall": service_recall, "category_recall": category_recall, "reciprocal_rank": rr,
+        })
+
+    return {
+        f"service_recall@{k}": _mean(service_recalls),
+        f"category_recall@{k}": _mean(category_recalls),
+        "mrr": _mean(rr_values),
+        "latency": latency_summary(latencies),
+        "queries": per_query,
+    }
+
+
+def evaluate_fast_track(service_names: List[str], queries: List[Dict]) -> Dict:
+    """Fast Track 탐지기의 정확도와 지연 시간을 평가합니다."""
+    latencies, detected, correct = [], 0, 0
+    labelled = [q for q in queries if q.get('expected_services')]
+    for q in labelled:
+        start = time.perf_counter()
+        name = detect_fast_track_keyword(q['query'], service_names)
+        latencies.append(time.perf_counter() - start)
+        if name:
+            detected += 1
+            if name in q['expected_services']:
+                correct += 1
+    return {
+        "hit_rate": correct / len(labelled) if labelled else None,
+        "precision": correct / detected if detected else None,
+        "detected": detected,
+        "latency": latency_summary(latencies),
+    }
+
+
+def evaluate_config(name: str, embedding_type: str, faiss_path: Optional[str], queries: List[Dict], k: int) -> Dict:
+    """하나의 임베딩/인덱스 설정을 평가합니다."""
+    logging.info(f"[{name}] 인덱스 로드 (임베딩: {embedding_type}, 경로: {faiss_path or '기본값'})")
+    start = time.perf_counter()
+    db_service = DBService(faiss_path=faiss_path, embedding_type=embedding_type)
+    load_seconds = time.perf_counter() - start
+    service_names = db_service.get_schema_context().get('service_names', [])
+
+    logging.info(f"[{name}] Fast Track 탐지기 평가")
+    fast_track = evaluate_fast_track(service_names, queries)
+
+    logging.info(f"[{name}] 필터 없는 유사도 검색 평가")
+    dense = evaluate_mode(lambda q: db_service.similarity_search(q['query'], k=k), queries, k)
+
+    logging.info(f"[{name}] 메타데이터 필터 + 키워드 검색 평가")
+    filtered = evaluate_mode(
+        lambda q: db_service.advanced_search(q.get('filters', {}), q.get('keywords') or [q['query']], k=k),
+        queries, k
+    )
+
+    return {
+        "embedding_type": embedding_type,
+        "faiss_path": faiss_path,
+        "load_seconds": load_seconds,
+        "fast_track": fast_track,
+        "dense": dense,
+        "filtered": filtered,
+    }
+
+
+def compare_with_baseline(report: Dict, baseline: Dict, max_quality_drop: float, max_latency_increase: float) -> List[str]:
+    """기준선 대비 품질 하락/지연 증가를 찾아 회귀 목록을 반환합니다."""
+    regressions = []
+    k = report["k"]
+    quality_keys = [f"service_recall@{k}", f"category_recall@{k}", "mrr"]
+    for name, current in report["configs"].items():
+        previous = baseline.get("configs", {}).get(name)
+        if not previous:
+            logging.info(f"[{name}] 기준선에 없는 설정이므로 비교를 건너뜁니다.")
+            continue
+        for mode in ("dense", "filtered"):
+            for key in quality_keys:
+                now, before = current[mode].get(key), previous.get(mode, {}).get(key)
+                if now is None or before is None:
+                    continue
+                delta = now - before
+                logging.info(f"[{name}/{mode}] {key}: {before:.3f} -> {now:.3f} ({delta:+.3f})")
+                if delta < -max_quality_drop:
+                    regressions.append(f"{name}/{mode} {key} 하락: {before:.3f} -> {now:.3f}")
+            now_p90 = current[mode]["latency"].get("p90_ms")
+            before_p90 = previous.get(mode, {}).get("latency", {}).get("p90_ms")
+            if now_p90 is not None and before_p90:
+                ratio = now_p90 / before_p90
+                logging.info(f"[{name}/{mode}] p90 지연: {before_p90:.1f}ms -> {now_p90:.1f}ms (x{ratio:.2f})")
+                if ratio > 1 + max_latency_increase:
+                    regressions.append(f"{name}/{mode} p90 지연 증가: {before_p90:.1f}ms -> {now_p90:.1f}ms")
+    return regressions
+
+
+def parse_config(spec: str):
+    """'이름=임베딩타입[:인덱스경로]' 형식의 설정 문자열을 파싱합니다."""
+    name, _, rest = spec.partition("=")
+    embedding_type, _, faiss_path = (rest or name).partition(":")
+    return name, embedding_type, faiss_path or None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="검색 품질 및 속도 평가")
+    parser.add_argument("--queries", default=str(QUERIES_PATH), help="라벨링된 질의 세트(JSON)")
+    parser.add_argument("--config", action="append", default=[],
+                        help="평가할 설정 '이름=임베딩타입[:인덱스경로]' (반복 지정 가능)")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--output", help="평가 리포트를 저장할 경로")
+    parser.add_argument("--baseline", help="비교할 기준선 리포트 경로")
+    parser.add_argument("--save-baseline", help="이번 결과를 기준선으로 저장할 경로")
+    parser.add_argument("--max-quality-drop", type=float, default=0.02, help="허용되는 recall/MRR 하락 폭")
+    parser.add_argument("--max-latency-increase", type=float, default=0.25, help="허용되는 p90 지연 증가 비율")
+    args = parser.parse_args()
+
+    queries = load_queries(Path(args.queries))
+    configs = [parse_config(spec) for spec in args.config] or [("default", "google", None)]
+    logging.info(f"평가 질의 {len(queries)}개, 설정 {len(configs)}개")
+
+    report = {
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "k": args.k,
+        "query_count": len(queries),
+        "configs": {},
+    }
+    for name, embedding_type, faiss_path in configs:
+        report["configs"][name] = evaluate_config(name, embedding_type, faiss_path, queries, args.k)
+
+    for name, result in report["configs"].items():
+        for mode in ("dense", "filtered"):
+            r = result[mode]
+            logging.info(
+                f"[{name}/{mode}] service_recall@{args.k}={_fmt(r[f'service_recall@{args.k}'])} "
+                f"category_recall@{args.k}={_fmt(r[f'category_recall@{args.k}'])} mrr={_fmt(r['mrr'])} "
+                f"p50={r['latency']['p50_ms']:.1f}ms p90={r['latency']['p90_ms']:.1f}ms"
+            )
+        ft = result["fast_track"]
+        logging.info(f"[{name}/fast_track] hit_rate={_fmt(ft['hit_rate'])} precision={_fmt(ft['precision'])} p90={ft['latency'].get('p90_ms', 0):.2f}ms")
+
+    for path in filter(None, [args.output, args.save_baseline]):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        logging.info(f"리포트 저장: {path}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare_with_baseline(report, baseline, args.max_quality_drop, args.max_latency_increase)
+        if regressions:
+            for regression in regressions:
+                logging.error(f"❌ 회귀: {regression}")
+            sys.exit(1)
+        logging.info("✅ 기준선 대비 회귀가 없습니다.")
+
+
+if __name__ == "__main__":
+    main()
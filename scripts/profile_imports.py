@@ -0,0 +1,88 @@
+# scripts/profile_imports.py
+"""
+모듈 임포트 시간 프로파일러 (python -X importtime 기반)
+
+각 모듈을 새 인터프리터에서 임포트하여 전체 임포트 시간과 누적 시간이 큰 하위 모듈을 보여줍니다.
+첫 화면 전에 임포트되는 모듈(기본값)의 예산을 정해 두고 --budget-ms로 초과 여부를 검사할 수 있습니다.
+
+사용 예:
+    python scripts/profile_imports.py                                  # 첫 화면 전 임포트 모듈
+    python scripts/profile_imports.py app.chatbot app.db_service --top 30
+    python scripts/profile_imports.py --budget-ms 300                  # 예산 초과 시 종료 코드 1
+"""
+import sys
+import argparse
+import subprocess
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+CURRENT_DIR = Path(__file__).parent
+BASE_DIR = CURRENT_DIR.parent
+
+# streamlit_app.py가 첫 화면 전에 임포트하는 앱 모듈 (streamlit 자체는 제외)
+FIRST_PAINT_MODULES = ["app.config", "app.health_check", "app.startup", "app.telemetry"]
+
+
+def profile(modules: List[str]) -> List[Tuple[str, int, int, int]]:
+    """모듈들을 한 인터프리터에서 임포트하고 (모듈명, 자체 시간 us, 누적 시간 us, 깊이) 목록을 반환합니다."""
+    code = "; ".join(f"import {module}" for module in modules) or "pass"
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=BASE_DIR, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "임포트 실패")
+
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return rows
+
+
+def top_level_totals(rows, modules: List[str]) -> Dict[str, int]:
+    """요청한 모듈별 누적 임포트 시간(us). 앞선 모듈이 이미 임포트한 부분은 포함되지 않습니다."""
+    return {name: cumulative for name, _, cumulative, depth in rows if depth == 0 and name in modules}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="모듈 임포트 시간 프로파일")
+    parser.add_argument("modules", nargs="*", default=FIRST_PAINT_MODULES, help="프로파일할 모듈 (기본값: 첫 화면 전 임포트 모듈)")
+    parser.add_argument("--top", type=int, default=15, help="누적 시간 상위 N개 하위 모듈 표시")
+    parser.add_argument("--budget-ms", type=float, default=None, help="전체 임포트 시간 예산(ms). 초과하면 종료 코드 1")
+    args = parser.parse_args(argv)
+
+    try:
+        rows = profile(args.modules)
+    except RuntimeError as e:
+        print(f"오류: {e}")
+        return 1
+
+    # 인터프리터 시작 시 임포트되는 모듈(site 등)은 제외합니다.
+    startup = {name for name, _, _, _ in profile([])}
+    rows = [row for row in rows if row[0] not in startup]
+    totals = top_level_totals(rows, args.modules)
+    total_us = sum(cumulative for _, _, cumulative, depth in rows if depth == 0)
+
+    print("=" * 70)
+    print(f"임포트 시간 합계: {total_us / 1000:.1f}ms ({len(rows)}개 모듈)")
+    for module in args.modules:
+        print(f"  {module:<40} {totals.get(module, 0) / 1000:>8.1f}ms")
+    print("-" * 70)
+    print(f"누적 시간 상위 {args.top}개 (앱 모듈 제외):")
+    external = sorted((row for row in rows if not row[0].startswith("app")), key=lambda row: -row[2])
+    for name, self_us, cumulative_us, _ in external[:args.top]:
+        print(f"  {name:<50} {cumulative_us / 1000:>8.1f}ms (자체 {self_us / 1000:.1f}ms)")
+    print("=" * 70)
+
+    if args.budget_ms is not None and total_us / 1000 > args.budget_ms:
+        print(f"❌ 임포트 시간이 예산({args.budget_ms:.0f}ms)을 초과했습니다.")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,206 +1,319 @@
-import streamlit as st
-import time
-import sys
-import logging
-from app.chatbot import WelfareChatbot
-from app.config import get_config, setup_logging
-from app.health_check import check_system_health, log_health_status
-
-# Initialize configuration and logging
-try:
-    config = get_config()
-    setup_logging(config)
-
-    # Perform system health check
-    health_status = check_system_health()
-    log_health_status(health_status)
-
-    if health_status["status"] != "healthy":
-        st.error("❌ 시스템 상태 확인 실패")
-        for error in health_status["errors"]:
-            st.warning(f"⚠️ {error}")
-        st.info("📝 README.md를 참조하여 시스템을 올바르게 설정해주세요.")
-        st.stop()
-
-except ValueError as e:
-    st.error(f"❌ 설정 오류: {e}")
-    st.info("📝 .env 파일에서 GOOGLE_API_KEY를 올바르게 설정해주세요.")
-    st.stop()
-except Exception as e:
-    st.error(f"❌ 시스템 초기화 오류: {e}")
-    st.stop()
-
-# 1. st.set_page_config()는 반드시 한 번만, 가장 먼저 호출되어야 합니다.
-# --- 페이지 기본 설정 ---
-st.set_page_config(
-    page_title="복지로AI",
-    page_icon="🧭",
-    layout="centered"
-)
-
-# 2. 여러 CSS 코드를 하나의 st.markdown으로 통합하고, 버튼 테두리 제거 속성을 추가합니다.
-# --- CSS 스타일 ---
-# --- CSS 스타일 ---
-st.markdown("""
-<style>
-/* --- 사이드바 스타일 --- */
-/* 토글 스위치 라벨 스타일 지정 */
-div[data-testid="stSidebar"] div[data-testid="stToggle"] label {
-    font-size: 15px !important;
-    font-weight: 600 !important;
-}
-
-/* 사이드바의 버튼, 마크다운 텍스트의 스타일을 통일합니다 */
-div[data-testid="stSidebar"] button,
-div[data-testid="stSidebar"] [data-testid="stMarkdownContainer"] p {
-    font-size: 15px !important;
-    font-weight: 600 !important;
-    text-align: left !important;
-}
-
-/* [수정] 버튼을 더 구체적으로 선택하여 테두리와 배경을 확실히 제거합니다 */
-div[data-testid="stSidebar"] div[data-testid="stButton"] > button {
-    border: none !important;
-    background-color: transparent !important;
-    padding: 0 !important; /* 모든 내부 여백 제거 */
-    margin: 0.25rem 0; /* 상하 마진 추가로 간격 조정 */
-}
-
-/* --- 메인 콘텐츠 스타일 --- */
-/* (기존 메인 콘텐츠 스타일은 그대로 유지) */
-.subtitle {
-    text-align: center;
-    font-size: 2.0em;
-    color: #4A4A4A;
-    margin-top: 0rem !important;
-    margin-bottom: 2.5em;
-    line-height: 1.6;
-}
-div[data-testid="stChatInput"] > div {
-    border: 1px solid transparent !important;
-    border-radius: 1rem;
-}
-div[data-testid="stChatInput"] textarea {
-    padding: 1rem !important;
-    line-height: 1.5;
-}
-</style>
-""", unsafe_allow_html=True)
-
-# --- 페이지 상단 제목 및 설명 ---
-
-st.markdown(
-    '<p style="text-align: center; font-weight: bold; margin-bottom: 0rem; padding-bottom: 0rem;"><span style="color: #4A4A4A; font-size: 2.3rem;">나에게 힘이되는 </span><span style="color: #1E90FF; font-size: 2.9rem;">복지로AI</span></p>',
-    unsafe_allow_html=True
-)
-st.markdown(
-    '<p style="text-align: center; font-size: 1.1em; color: #777777; line-height: 1.3; margin-bottom: 2.5em;">수백 가지 복잡한 복지 혜택의 미로, 더 이상 헤매지 마세요.<br>어떤 상황에 처해있든, <strong>당신의 AI 비서</strong>가 가장 밝은 길을 비춰드립니다.</p>',
-    unsafe_allow_html=True
-)
-
-# --- 챗봇 클래스 로딩 (캐시 사용) ---
-@st.cache_resource
-def load_chatbot_instance(llm_name):
-    """선택된 LLM에 맞춰 챗봇 인스턴스를 로드합니다."""
-    logging.info(f"'{llm_name}' 모델로 챗봇 인스턴스를 새로 로드합니다.")
-    return WelfareChatbot(user_id="streamlit_user", llm_choice=llm_name, embedding_type="bge")
-
-# --- 헬퍼 함수 ---
-def get_initial_message():
-    """초기 인사 메시지를 반환하는 함수"""
-    return [{
-        "role": "assistant",
-        "content": """
-        <div style="display: flex; align-items: flex-start; gap: 12px;">
-          <span style="font-size: 1.8em; line-height: 1.3;">💡</span>
-          <div style="flex: 1; border: 1px solid #e0e0e0; border-radius: 8px; padding: 16px; background-color: #f9f9f9;">
-            <strong>어떤 도움이 필요하신가요?</strong><br>
-            복지서비스가 필요한 분의 <strong>상황</strong>과 원하시는 <strong>지원 내용</strong>을 함께 알려주세요.<br><br>
-            <small style="color: #555;">
-              <strong>예시)</strong><br>
-              • <strong>상황:</strong> 30대, 아이 둘을 키우는 한부모가정<br>
-              • <strong>지원 내용:</strong> 저렴한 주거 공간과 양육비 지원
-            </small>
-          </div>
-        </div>
-        """
-    }]
-
-# --- 세션 상태 초기화 ---
-def initialize_session_state():
-    """웹 페이지가 처음 로드되거나 새로고침될 때 세션 상태를 초기화합니다."""
-    if "messages" not in st.session_state:
-        st.session_state.messages = get_initial_message()
-    if "chat_history" not in st.session_state:
-        st.session_state.chat_history = []
-    if "llm" not in st.session_state:
-        st.session_state.llm = "gemini"
-    if "dialogue_mode" not in st.session_state:
-        st.session_state.dialogue_mode = "NORMAL"
-    if "asked_questions" not in st.session_state:
-        st.session_state.asked_questions = []
-    if "llm_selector_visible" not in st.session_state:
-        st.session_state.llm_selector_visible = False
-
-initialize_session_state()
-
-# --- 사이드바 ---
-with st.sidebar:
-    st.toggle("LLM 엔진 변경", key="llm_selector_visible")
-
-    if st.session_state.llm_selector_visible:
-        llm_options = ["gemini", "gemma", "exaone"]
-        current_llm_index = llm_options.index(st.session_state.llm)
-        selected_llm = st.selectbox(
-            "엔진 선택:",
-            options=llm_options,
-            index=current_llm_index,
-            key='llm_selector'
-        )
-    else:
-        selected_llm = st.session_state.llm
-
-    # [수정] "새 대화 시작" 앞에 아이콘 추가
-    if st.button("➕ 새 대화 시작"):
-        if len(st.session_state.messages) > 1:
-            chat_title = st.session_state.messages[1]['content'][:30] + "..."
-            st.session_state.chat_history.insert(0, {"title": chat_title, "messages": st.session_state.messages})
-        st.session_state.messages = get_initial_message()
-        st.session_state.dialogue_mode = "NORMAL"
-        st.session_state.asked_questions = []
-        st.rerun()
-
-    # [수정] "대화 기록" 앞에 아이콘 추가
-    st.markdown("📜 대화 기록")
-
-    for i, chat in enumerate(st.session_state.chat_history):
-        if st.button(chat["title"], key=f"history_{i}"):
-            st.session_state.messages = chat["messages"]
-            st.rerun()
-
-# --- 모델 변경 및 챗봇 로드 ---
-# 모델 변경 시 캐시된 챗봇 인스턴스 및 세션 상태 초기화
-if st.session_state.llm != selected_llm:
-    st.session_state.llm = selected_llm
-    load_chatbot_instance.clear()
-    st.session_state.messages = [{"role": "assistant", "content": f"AI 엔진을 '{selected_llm}'(으)로 변경했습니다. 무엇을 도와드릴까요?"}]
-    st.session_state.dialogue_mode = "NORMAL"
-    st.session_state.asked_questions = []
-
-chatbot = load_chatbot_instance(st.session_state.llm)
-
-# --- 채팅 기록 표시 ---
-for message in st.session_state.messages:
-    with st.chat_message(message["role"]):
-        st.markdown(message["content"], unsafe_allow_html=True)
-
-# --- 사용자 입력 및 대화 로직 ---
-if prompt := st.chat_input("..."):
-    st.session_state.messages.append({"role": "user", "content": prompt})
-    with st.chat_message("user"):
-        st.markdown(prompt)
-    with st.chat_message("assistant"):
-        with st.spinner("AI가 분석 중입니다..."):
-            response_content, _ = chatbot.chat(st.session_state)
-            st.markdown(response_content, unsafe_allow_html=True)
-    st.session_state.messages.append({"role": "assistant", "content": response_content})
\ No newline at end of file
+import time
+_RUN_STARTED_AT = time.perf_counter()
+
+import streamlit as st
+import sys
+import uuid
+import logging
+# app.chatbot(LangChain, LLM 클라이언트, FAISS)은 임포트만 수 초가 걸리므로 백그라운드 로더 안에서 임포트합니다.
+from app.config import get_config, setup_logging
+from app.conversation import SESSION_KEY as RETRIEVAL_CONTEXT_KEY, TRIMMED_TURNS_KEY
+from app.history import SESSION_KEY as HISTORY_SUMMARY_KEY
+from app.session_store import SessionLimits, SessionStore
+from app.health_check import check_readiness, check_system_health, log_health_status, log_readiness_status
+from app.startup import BackgroundLoader, record_first_answer, record_first_paint
+from app.telemetry import configure_telemetry, get_readiness
+
+# Initialize configuration and logging
+try:
+    config = get_config()
+    setup_logging(config)
+    configure_telemetry(config.metrics_port, config.otel_enabled)
+
+    # Perform system health check
+    health_status = check_system_health(config.embedding_type)
+    log_health_status(health_status)
+
+    if health_status["status"] != "healthy":
+        st.error("❌ 시스템 상태 확인 실패")
+        for error in health_status["errors"]:
+            st.warning(f"⚠️ {error}")
+        st.info("📝 README.md를 참조하여 시스템을 올바르게 설정해주세요.")
+        st.stop()
+
+except ValueError as e:
+    st.error(f"❌ 설정 오류: {e}")
+    st.info("📝 .env 파일에서 GOOGLE_API_KEY를 올바르게 설정해주세요.")
+    st.stop()
+except Exception as e:
+    st.error(f"❌ 시스템 초기화 오류: {e}")
+    st.stop()
+
+# 1. st.set_page_config()는 반드시 한 번만, 가장 먼저 호출되어야 합니다.
+# --- 페이지 기본 설정 ---
+st.set_page_config(
+    page_title="복지로AI",
+    page_icon="🧭",
+    layout="centered"
+)
+
+# 2. 여러 CSS 코드를 하나의 st.markdown으로 통합하고, 버튼 테두리 제거 속성을 추가합니다.
+# --- CSS 스타일 ---
+# --- CSS 스타일 ---
+st.markdown("""
+<style>
+/* --- 사이드바 스타일 --- */
+/* 토글 스위치 라벨 스타일 지정 */
+div[data-testid="stSidebar"] div[data-testid="stToggle"] label {
+    font-size: 15px !important;
+    font-weight: 600 !important;
+}
+
+/* 사이드바의 버튼, 마크다운 텍스트의 스타일을 통일합니다 */
+div[data-testid="stSidebar"] button,
+div[data-testid="stSidebar"] [data-testid="stMarkdownContainer"] p {
+    font-size: 15px !important;
+    font-weight: 600 !important;
+    text-align: left !important;
+}
+
+/* [수정] 버튼을 더 구체적으로 선택하여 테두리와 배경을 확실히 제거합니다 */
+div[data-testid="stSidebar"] div[data-testid="stButton"] > button {
+    border: none !important;
+    background-color: transparent !important;
+    padding: 0 !important; /* 모든 내부 여백 제거 */
+    margin: 0.25rem 0; /* 상하 마진 추가로 간격 조정 */
+}
+
+/* --- 메인 콘텐츠 스타일 --- */
+/* (기존 메인 콘텐츠 스타일은 그대로 유지) */
+.subtitle {
+    text-align: center;
+    font-size: 2.0em;
+    color: #4A4A4A;
+    margin-top: 0rem !important;
+    margin-bottom: 2.5em;
+    line-height: 1.6;
+}
+div[data-testid="stChatInput"] > div {
+    border: 1px solid transparent !important;
+    border-radius: 1rem;
+}
+div[data-testid="stChatInput"] textarea {
+    padding: 1rem !important;
+    line-height: 1.5;
+}
+</style>
+""", unsafe_allow_html=True)
+
+# --- 페이지 상단 제목 및 설명 ---
+
+st.markdown(
+    '<p style="text-align: center; font-weight: bold; margin-bottom: 0rem; padding-bottom: 0rem;"><span style="color: #4A4A4A; font-size: 2.3rem;">나에게 힘이되는 </span><span style="color: #1E90FF; font-size: 2.9rem;">복지로AI</span></p>',
+    unsafe_allow_html=True
+)
+st.markdown(
+    '<p style="text-align: center; font-size: 1.1em; color: #777777; line-height: 1.3; margin-bottom: 2.5em;">수백 가지 복잡한 복지 혜택의 미로, 더 이상 헤매지 마세요.<br>어떤 상황에 처해있든, <strong>당신의 AI 비서</strong>가 가장 밝은 길을 비춰드립니다.</p>',
+    unsafe_allow_html=True
+)
+
+# --- 챗봇 클래스 로딩 (캐시 사용, 백그라운드 스레드) ---
+def create_chatbot(llm_name):
+    """선택된 LLM에 맞춰 챗봇 인스턴스를 만듭니다."""
+    logging.info(f"'{llm_name}' 모델로 챗봇 인스턴스를 새로 로드합니다.")
+    from app.chatbot import WelfareChatbot
+    chatbot = WelfareChatbot(user_id="streamlit_user", llm_choice=llm_name, embedding_type=config.embedding_type,
+                             index_reload_interval=config.index_reload_interval,
+                             shard_cache_size=config.shard_cache_size,
+                             faq_threshold=config.faq_threshold if config.faq_enabled else None,
+                             faq_semantic_threshold=config.faq_semantic_threshold,
+                             directory_enabled=config.directory_enabled,
+                             eligibility_enabled=config.eligibility_enabled,
+                             personalized_fallback=config.personalized_fallback,
+                             history_token_budget=config.history_token_budget,
+                             prompt_token_budgets=config.prompt_token_budgets)
+    # 인덱스 로드와 워밍업 질의를 첫 질문 전에 끝내고 결과를 /readyz로 노출합니다.
+    readiness = check_readiness(chatbot.db_service, chatbot.llm if config.readiness_llm_check else None,
+                                config.readiness_budgets)
+    log_readiness_status(readiness)
+    return chatbot
+
+@st.cache_resource
+def load_chatbot_instance(llm_name):
+    """챗봇 생성을 백그라운드에서 시작하고 로더를 반환합니다. 화면은 생성이 끝나기를 기다리지 않고 먼저 그려집니다."""
+    return BackgroundLoader(f"chatbot-{llm_name}", lambda: create_chatbot(llm_name))
+
+@st.fragment(run_every=1.0)
+def show_loading_status(loader):
+    """챗봇 준비 상태를 표시하고, 준비가 끝나면 앱을 한 번 다시 실행합니다."""
+    if loader.status == BackgroundLoader.LOADING:
+        st.caption("⏳ AI 엔진을 준비하고 있습니다. 질문을 먼저 입력하셔도 준비가 끝나는 대로 답변드립니다.")
+    else:
+        st.rerun()
+
+# --- 헬퍼 함수 ---
+def get_initial_message():
+    """초기 인사 메시지를 반환하는 함수"""
+    return [{
+        "role": "assistant",
+        "content": """
+        <div style="display: flex; align-items: flex-start; gap: 12px;">
+          <span style="font-size: 1.8em; line-height: 1.3;">💡</span>
+          <div style="flex: 1; border: 1px solid #e0e0e0; border-radius: 8px; padding: 16px; background-color: #f9f9f9;">
+            <strong>어떤 도움이 필요하신가요?</strong><br>
+            복지서비스가 필요한 분의 <strong>상황</strong>과 원하시는 <strong>지원 내용</strong>을 함께 알려주세요.<br><br>
+            <small style="color: #555;">
+              <strong>예시)</strong><br>
+              • <strong>상황:</strong> 30대, 아이 둘을 키우는 한부모가정<br>
+              • <strong>지원 내용:</strong> 저렴한 주거 공간과 양육비 지원
+            </small>
+          </div>
+        </div>
+        """
+    }]
+
+# --- 대화 기록 저장소 (SQLite, 프로세스당 하나) ---
+@st.cache_resource
+def get_session_store():
+    return SessionStore(config.session_db_path, config.session_cache_size, SessionLimits(
+        max_conversations=config.session_max_conversations,
+        max_messages=config.session_max_messages,
+        max_bytes=config.session_max_bytes,
+        max_age_days=config.session_max_age_days,
+    ))
+
+# 저장소에 보관해 재시작 후에도 이어가는 세션 상태 키 (대화 메시지는 대화별로 따로 저장)
+PERSISTED_KEYS = ("conversation_id", "llm", "dialogue_mode", "asked_questions",
+                  RETRIEVAL_CONTEXT_KEY, HISTORY_SUMMARY_KEY, TRIMMED_TURNS_KEY)
+
+def get_session_id():
+    """주소의 ?sid= 값. 없으면 새로 만들어 주소에 붙입니다. (새로고침이나 재시작 후에도 같은 대화 기록)"""
+    session_id = st.query_params.get("sid")
+    if not session_id:
+        session_id = uuid.uuid4().hex
+        st.query_params["sid"] = session_id
+    return session_id
+
+def save_session():
+    """현재 세션의 챗봇 상태를 저장소에 기록합니다."""
+    session_store.save_state(session_id, {key: st.session_state[key] for key in PERSISTED_KEYS if key in st.session_state})
+
+def reset_conversation(messages):
+    """화면의 대화를 바꾸고 이전 대화에서 이어받던 상태를 비웁니다."""
+    st.session_state.messages = messages
+    st.session_state.dialogue_mode = "NORMAL"
+    st.session_state.asked_questions = []
+    st.session_state.pop(RETRIEVAL_CONTEXT_KEY, None)
+    st.session_state.pop(TRIMMED_TURNS_KEY, None)
+
+session_store = get_session_store()
+session_id = get_session_id()
+
+# --- 세션 상태 초기화 ---
+def initialize_session_state():
+    """웹 페이지가 처음 로드되거나 새로고침될 때 세션 상태를 초기화합니다. 저장된 세션이면 마지막 대화를 복원합니다."""
+    if "messages" not in st.session_state:
+        saved = session_store.load_state(session_id)
+        for key in PERSISTED_KEYS:
+            if key in saved:
+                st.session_state[key] = saved[key]
+        conversation_id = saved.get("conversation_id")
+        st.session_state.messages = (session_store.load_messages(conversation_id) if conversation_id else []) or get_initial_message()
+    if "conversation_id" not in st.session_state:
+        st.session_state.conversation_id = None
+    if "llm" not in st.session_state:
+        st.session_state.llm = "gemini"
+    if "dialogue_mode" not in st.session_state:
+        st.session_state.dialogue_mode = "NORMAL"
+    if "asked_questions" not in st.session_state:
+        st.session_state.asked_questions = []
+    if "llm_selector_visible" not in st.session_state:
+        st.session_state.llm_selector_visible = False
+
+initialize_session_state()
+
+# --- 사이드바 ---
+with st.sidebar:
+    st.toggle("LLM 엔진 변경", key="llm_selector_visible")
+
+    if st.session_state.llm_selector_visible:
+        llm_options = ["gemini", "gemma", "exaone"]
+        current_llm_index = llm_options.index(st.session_state.llm)
+        selected_llm = st.selectbox(
+            "엔진 선택:",
+            options=llm_options,
+            index=current_llm_index,
+            key='llm_selector'
+        )
+    else:
+        selected_llm = st.session_state.llm
+
+    # [수정] "새 대화 시작" 앞에 아이콘 추가
+    # 현재 대화는 답변할 때마다 저장되어 있으므로 새 대화로 바꾸기만 합니다.
+    if st.button("➕ 새 대화 시작"):
+        reset_conversation(get_initial_message())
+        st.session_state.conversation_id = None
+        save_session()
+        st.rerun()
+
+    # [수정] "대화 기록" 앞에 아이콘 추가
+    st.markdown("📜 대화 기록")
+
+    # 목록에는 제목만 있고, 메시지는 대화를 누를 때 저장소에서 불러옵니다.
+    for chat in session_store.conversations(session_id):
+        if st.button(chat.title, key=f"history_{chat.id}"):
+            reset_conversation(session_store.load_messages(chat.id) or get_initial_message())
+            st.session_state.conversation_id = chat.id
+            save_session()
+            st.rerun()
+
+# --- 모델 변경 및 챗봇 로드 ---
+# 모델 변경 시 캐시된 챗봇 인스턴스 및 세션 상태 초기화
+if st.session_state.llm != selected_llm:
+    st.session_state.llm = selected_llm
+    load_chatbot_instance.clear()
+    reset_conversation([{"role": "assistant", "content": f"AI 엔진을 '{selected_llm}'(으)로 변경했습니다. 무엇을 도와드릴까요?"}])
+    st.session_state.conversation_id = None
+    save_session()
+
+chatbot_loader = load_chatbot_instance(st.session_state.llm)
+
+# --- 채팅 기록 표시 ---
+for message in st.session_state.messages:
+    with st.chat_message(message["role"]):
+        st.markdown(message["content"], unsafe_allow_html=True)
+
+# --- 챗봇 준비 상태 ---
+if chatbot_loader.status == BackgroundLoader.LOADING:
+    show_loading_status(chatbot_loader)
+elif chatbot_loader.status == BackgroundLoader.FAILED:
+    st.error(f"❌ AI 엔진 초기화 실패: {chatbot_loader.error}")
+    if st.button("다시 시도"):
+        load_chatbot_instance.clear()
+        st.rerun()
+elif get_readiness().get("status") == "not_ready":
+    st.warning("⚠️ 일부 기능 점검에 실패했습니다. 답변이 느리거나 부정확할 수 있습니다.")
+
+# --- 사용자 입력 및 대화 로직 ---
+prompt = st.chat_input("...")
+
+if "first_paint_recorded" not in st.session_state:
+    st.session_state.first_paint_recorded = True
+    record_first_paint(_RUN_STARTED_AT)
+
+if prompt:
+    st.session_state.messages.append({"role": "user", "content": prompt})
+    with st.chat_message("user"):
+        st.markdown(prompt)
+    with st.chat_message("assistant"):
+        waited_for_init = not chatbot_loader.ready
+        if waited_for_init:
+            with st.spinner("AI 엔진을 준비하는 중입니다..."):
+                chatbot_loader.join()
+        if chatbot_loader.status == BackgroundLoader.FAILED:
+            response_content = "AI 엔진을 준비하지 못했습니다. 잠시 후 '다시 시도'를 눌러주세요."
+            st.markdown(response_content)
+        else:
+            with st.spinner("AI가 분석 중입니다..."):
+                response_content, _ = chatbot_loader.wait().chat(st.session_state)
+                st.markdown(response_content, unsafe_allow_html=True)
+            if "first_answer_recorded" not in st.session_state:
+                st.session_state.first_answer_recorded = True
+                record_first_answer(_RUN_STARTED_AT, waited_for_init)
+    st.session_state.messages.append({"role": "assistant", "content": response_content})
+    # 대화와 챗봇 상태를 저장하고, 현재 대화에는 메시지 수 상한을 적용합니다.
+    session_store.cap_session_messages(st.session_state)
+    st.session_state.conversation_id = session_store.save_conversation(
+        session_id, st.session_state.messages, st.session_state.conversation_id)
+    save_session()
+    session_store.report_memory(session_id, st.session_state)
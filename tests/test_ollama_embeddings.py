@@ -0,0 +1,132 @@
+"""
+OllamaEmbeddings against a local stub server (no Ollama needed).
+
+Run with: python -m pytest tests  (or python -m unittest discover tests)
+"""
+import json
+import math
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from app.ollama_embeddings import OllamaEmbeddings
+
+
+def _vector(text):
+    """Deterministic, deliberately unnormalized vector for 'doc-<n>'"""
+    return [float(text.split("-")[-1]) + 1.0, 3.0, 4.0]
+
+
+class _StubOllama(ThreadingHTTPServer):
+    """Records requests and serves /api/embed, /api/embeddings with configurable failures"""
+
+    daemon_threads = True
+
+    def __init__(self, batch_endpoint=True, transient_failures=0):
+        super().__init__(("127.0.0.1", 0), _StubHandler)
+        self.batch_endpoint = batch_endpoint
+        self.transient_failures = transient_failures
+        self.requests = []
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        with self.server.lock:
+            self.server.requests.append((self.path, payload))
+            fail = self.server.transient_failures > 0
+            if fail:
+                self.server.transient_failures -= 1
+        if fail:
+            return self._reply(503, {"error": "busy"})
+        if self.path == "/api/embed" and self.server.batch_endpoint:
+            # The first batch answers last so out-of-order completion is exercised.
+            if payload["input"][0] == "doc-0":
+                time.sleep(0.2)
+            return self._reply(200, {"embeddings": [_vector(text) for text in payload["input"]]})
+        if self.path == "/api/embeddings":
+            return self._reply(200, {"embedding": _vector(payload["prompt"])})
+        self._reply(404, "404 page not found")
+
+    def _reply(self, status, body):
+        data = (body if isinstance(body, str) else json.dumps(body)).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class OllamaEmbeddingsStubTest(unittest.TestCase):
+    def start(self, **kwargs):
+        server = _StubOllama(**kwargs)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(thread.join)
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return server
+
+    def client(self, server, **kwargs):
+        kwargs.setdefault("backoff_factor", 0)
+        kwargs.setdefault("timeout", 5)
+        embeddings = OllamaEmbeddings(base_url=server.url, **kwargs)
+        self.addCleanup(embeddings.close)
+        return embeddings
+
+    def assertUnitVectorsFor(self, texts, vectors):
+        self.assertEqual(len(vectors), len(texts))
+        for text, vector in zip(texts, vectors):
+            expected = _vector(text)
+            norm = math.sqrt(sum(value * value for value in expected))
+            for got, want in zip(vector, expected):
+                self.assertAlmostEqual(got, want / norm)
+            self.assertAlmostEqual(math.sqrt(sum(value * value for value in vector)), 1.0)
+
+    def test_batches_documents_and_preserves_input_order(self):
+        server = self.start()
+        texts = [f"doc-{i}" for i in range(7)]
+        vectors = self.client(server, batch_size=3, max_workers=3).embed_documents(texts)
+
+        self.assertUnitVectorsFor(texts, vectors)
+        batches = [payload["input"] for path, payload in server.requests]
+        self.assertEqual({path for path, _ in server.requests}, {"/api/embed"})
+        self.assertCountEqual(batches, [texts[0:3], texts[3:6], texts[6:7]])
+
+    def test_falls_back_to_single_endpoint_on_404(self):
+        server = self.start(batch_endpoint=False)
+        embeddings = self.client(server, batch_size=2, max_workers=1)
+        texts = [f"doc-{i}" for i in range(3)]
+
+        self.assertUnitVectorsFor(texts, embeddings.embed_documents(texts))
+        self.assertUnitVectorsFor(["doc-9"], [embeddings.embed_query("doc-9")])
+        paths = [path for path, _ in server.requests]
+        # Only the first batch probes /api/embed; afterwards the fallback is remembered.
+        self.assertEqual(paths, ["/api/embed"] + ["/api/embeddings"] * 4)
+        self.assertEqual([payload["prompt"] for _, payload in server.requests[1:]], texts + ["doc-9"])
+
+    def test_retries_transient_server_errors(self):
+        server = self.start(transient_failures=2)
+        vector = self.client(server, max_retries=3).embed_query("doc-1")
+
+        self.assertUnitVectorsFor(["doc-1"], [vector])
+        self.assertEqual([path for path, _ in server.requests], ["/api/embed"] * 3)
+
+    def test_gives_up_after_max_retries(self):
+        server = self.start(transient_failures=10)
+        with self.assertRaises(Exception):
+            self.client(server, max_retries=1).embed_query("doc-1")
+        self.assertEqual(len(server.requests), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()